@@ -3,6 +3,10 @@ ASGI config for core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it (e.g. ``daphne core.asgi:application``) to let the async courier
+views (core.async_views.AsyncAPIView) keep many external calls in flight per
+worker process.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
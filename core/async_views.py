@@ -0,0 +1,80 @@
+# core/async_views.py
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+
+# Blocking courier calls a worker process keeps in flight at once. Each runs
+# on the integration's shared keep-alive session, so the real connection
+# limit is that session's pool size.
+COURIER_IO_CONCURRENCY = int(os.getenv("COURIER_IO_CONCURRENCY", 64))
+
+_io_executor = None
+_io_lock = threading.Lock()
+
+
+def _get_io_executor():
+    global _io_executor
+    if _io_executor is None:
+        with _io_lock:
+            if _io_executor is None:
+                _io_executor = ThreadPoolExecutor(
+                    max_workers=COURIER_IO_CONCURRENCY,
+                    thread_name_prefix="courier-io",
+                )
+    return _io_executor
+
+
+async def run_io(func, *args, **kwargs):
+    """
+    Await a blocking HTTP call without holding the event loop or the request's
+    ORM thread. ``func`` must not touch the database.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_io_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+class AsyncAPIView(APIView):
+    """
+    APIView whose handlers are ``async def``.
+
+    Authentication, permissions and throttling run in the request's sync
+    thread; handlers wrap ORM work in ``sync_to_async`` and courier calls in
+    ``run_io``. Under ASGI (core.asgi) a worker can then serve many requests
+    that are waiting on a courier; under WSGI Django runs the view with
+    ``async_to_sync`` and it behaves like a normal APIView.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(
+                    self, request.method.lower(), self.http_method_not_allowed
+                )
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
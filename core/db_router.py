@@ -1,8 +1,29 @@
 # core/db_router.py
 
+import itertools
 import threading
+from contextlib import contextmanager
 
-DB_CONTEXT = threading.local()
+from asgiref.local import Local
+from django.conf import settings
+from django.db import connections
+
+# Per request: thread-local under WSGI, task-local (and visible to
+# sync_to_async threads) under ASGI.
+DB_CONTEXT = Local()
+
+# Read-only copies of 'default'. Only used while the demo switch is off.
+DATABASE_REPLICAS = list(getattr(settings, "DATABASE_REPLICAS", []))
+_replica_cycle = itertools.cycle(DATABASE_REPLICAS or [None])
+_replica_lock = threading.Lock()
+
+# Where sales.archive keeps archived orders while the demo switch is off
+ARCHIVE_DATABASE = getattr(settings, "ORDER_ARCHIVE_DATABASE", "default")
+ARCHIVE_MODELS = {
+    ("sales", "archivedorder"),
+    ("sales", "archivedorderrollup"),
+    ("sales", "archivedproductrollup"),
+}
 
 
 def set_current_db(db_name):
@@ -13,15 +34,68 @@ def get_current_db():
     return getattr(DB_CONTEXT, 'db', 'default')  # fallback
 
 
+def reset_replica_state():
+    """Forget the replica marker and any write seen in this request."""
+    DB_CONTEXT.use_replica = False
+    DB_CONTEXT.wrote = False
+
+
+def mark_replica_reads():
+    """Let reads in the current request go to a replica until it writes."""
+    DB_CONTEXT.use_replica = True
+
+
+@contextmanager
+def replica_reads():
+    """Route reads inside the block to a replica (e.g. reporting commands)."""
+    previous = getattr(DB_CONTEXT, "use_replica", False)
+    DB_CONTEXT.use_replica = True
+    try:
+        yield
+    finally:
+        DB_CONTEXT.use_replica = previous
+
+
+def _is_archive_model(model):
+    return (model._meta.app_label, model._meta.model_name) in ARCHIVE_MODELS
+
+
+def _next_replica():
+    with _replica_lock:
+        return next(_replica_cycle)
+
+
 class DynamicDBRouter:
     def db_for_read(self, model, **hints):
-        return get_current_db()
+        db = get_current_db()
+        if db == 'default' and _is_archive_model(model):
+            return ARCHIVE_DATABASE
+        if (
+            db == 'default'
+            and DATABASE_REPLICAS
+            and getattr(DB_CONTEXT, 'use_replica', False)
+            # Stick to the primary once this request has written, so it
+            # never reads its own changes from a lagging replica.
+            and not getattr(DB_CONTEXT, 'wrote', False)
+            and not connections['default'].in_atomic_block
+        ):
+            return _next_replica()
+        return db
 
     def db_for_write(self, model, **hints):
-        return get_current_db()
+        DB_CONTEXT.wrote = True
+        db = get_current_db()
+        if db == 'default' and _is_archive_model(model):
+            return ARCHIVE_DATABASE
+        return db
 
     def allow_relation(self, obj1, obj2, **hints):
         return True
 
     def allow_migrate(self, db, app_label, model_name=None, **hints):
-        return True  # Allow for both
+        if ARCHIVE_DATABASE != 'default' and (
+            db == ARCHIVE_DATABASE or (app_label, model_name) in ARCHIVE_MODELS
+        ):
+            # A separate archive database holds the archive tables and nothing else
+            return db == ARCHIVE_DATABASE and (app_label, model_name) in ARCHIVE_MODELS
+        return db not in DATABASE_REPLICAS  # Allow for both demo and default
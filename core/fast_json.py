@@ -0,0 +1,84 @@
+# core/fast_json.py
+"""
+orjson-backed JSON renderer and parser for DRF.
+
+Both produce exactly what rest_framework's JSONRenderer and JSONParser do:
+values orjson has no type for (Decimal, datetime, date, time, lazy strings,
+querysets, ...) go through DRF's own JSONEncoder.default, so a Decimal is
+still a float, a UTC datetime still ends in "Z" and a UUID is still its
+str(). U+2028/U+2029 are escaped the same way.
+
+The standard library path is used instead whenever the output could differ:
+indented output (the browsable API), UNICODE_JSON/COMPACT_JSON turned off,
+a non UTF-8 request body, integers wider than 64 bits, or orjson not being
+installed. What remains: floats written in exponent form (below 1e-4 or
+from 1e16 up) read 1e16 instead of 1e+16, the same number, and NaN and
+infinity render as null where DRF raises ValueError.
+
+Off by default; set FAST_JSON=1 (core/settings.py) to enable.
+"""
+
+import io
+import re
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional; requirements.txt pins it
+    orjson = None
+
+if orjson is not None:
+    # Datetimes/dates/times are handed to DRF's encoder instead of orjson's
+    # RFC 3339 formatting, which differs (+00:00 instead of Z).
+    DUMPS_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    # DRF's encoder does not serialize dataclasses; keep it that way.
+    DUMPS_OPTIONS |= orjson.OPT_PASSTHROUGH_DATACLASS
+
+UTF8_CHARSETS = {"utf-8", "utf8"}
+# orjson reads integers that do not fit in 64 bits as floats
+LONG_NUMBER_RE = re.compile(rb"\d{19}")
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+            is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=DUMPS_OPTIONS
+            )
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits; DRF's path handles or raises
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower() not in UTF8_CHARSETS:
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        if LONG_NUMBER_RE.search(body):
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # Let the standard parser accept what orjson refuses (lone
+            # surrogates, NaN without STRICT_JSON) or word the ParseError.
+            return super().parse(io.BytesIO(body), media_type, parser_context)
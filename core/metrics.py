@@ -0,0 +1,186 @@
+# core/metrics.py
+
+import bisect
+import threading
+
+from django.http import HttpResponse
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.permissions import BasePermission
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+# Upper bounds of the histogram buckets; +Inf is implied.
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class ViewStats:
+    """Aggregates for one (view, method) pair."""
+
+    __slots__ = ("requests", "sampled", "latency", "queries", "sql_seconds", "size")
+
+    def __init__(self):
+        self.requests = {}  # status class ("2xx") -> count, every request
+        self.sampled = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_seconds = 0.0
+        self.size = Histogram(SIZE_BUCKETS)
+
+
+class MetricsRegistry:
+    """
+    In-process request metrics. Each worker process keeps its own; nothing is
+    written anywhere until the metrics endpoint is scraped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def _stats(self, view, method):
+        key = (view, method)
+        stats = self._views.get(key)
+        if stats is None:
+            stats = self._views[key] = ViewStats()
+        return stats
+
+    def count(self, view, method, status_code):
+        status_class = f"{status_code // 100}xx"
+        with self._lock:
+            requests = self._stats(view, method).requests
+            requests[status_class] = requests.get(status_class, 0) + 1
+
+    def observe(self, view, method, seconds, queries, sql_seconds, size):
+        with self._lock:
+            stats = self._stats(view, method)
+            stats.sampled += 1
+            stats.latency.observe(seconds)
+            stats.queries.observe(queries)
+            stats.sql_seconds += sql_seconds
+            if size is not None:
+                stats.size.observe(size)
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = []
+            _counter(
+                lines,
+                "http_requests_total",
+                "Requests handled, by view, method and status class.",
+                [
+                    (_labels(view, method, status=status), count)
+                    for (view, method), stats in views
+                    for status, count in sorted(stats.requests.items())
+                ],
+            )
+            _counter(
+                lines,
+                "http_requests_sampled_total",
+                "Requests whose latency and SQL usage were measured.",
+                [(_labels(*key), stats.sampled) for key, stats in views],
+            )
+            _histogram(
+                lines,
+                "http_request_duration_seconds",
+                "Time spent in Django handling a sampled request.",
+                [(key, stats.latency) for key, stats in views],
+            )
+            _histogram(
+                lines,
+                "http_request_sql_queries",
+                "SQL queries issued by a sampled request.",
+                [(key, stats.queries) for key, stats in views],
+            )
+            _counter(
+                lines,
+                "http_request_sql_duration_seconds_total",
+                "Time spent waiting on the database in sampled requests.",
+                [(_labels(*key), stats.sql_seconds) for key, stats in views],
+            )
+            _histogram(
+                lines,
+                "http_response_size_bytes",
+                "Body size of sampled non-streaming responses.",
+                [(key, stats.size) for key, stats in views],
+            )
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(view, method, **extra):
+    pairs = {"view": view, "method": method, **extra}
+    return ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs.items())
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _counter(lines, name, help_text, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for labels, value in samples:
+        lines.append(f"{name}{{{labels}}} {_number(value)}")
+
+
+def _histogram(lines, name, help_text, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (view, method), hist in samples:
+        total = 0
+        for bound, count in zip((*hist.buckets, "+Inf"), hist.counts):
+            total += count
+            labels = _labels(view, method, le=bound)
+            lines.append(f"{name}_bucket{{{labels}}} {total}")
+        labels = _labels(view, method)
+        lines.append(f"{name}_sum{{{labels}}} {_number(hist.sum)}")
+        lines.append(f"{name}_count{{{labels}}} {total}")
+
+
+registry = MetricsRegistry()
+
+
+class IsMetricsAdmin(BasePermission):
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(
+            user
+            and user.is_authenticated
+            and (user.is_staff or getattr(user, "role", None) == "SuperAdmin")
+        )
+
+
+class MetricsView(APIView):
+    """Prometheus scrape target; needs a staff or SuperAdmin user."""
+
+    authentication_classes = [JWTAuthentication, SessionAuthentication]
+    permission_classes = [IsMetricsAdmin]
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -1,33 +1,241 @@
 # core/middleware.py
 
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.deprecation import MiddlewareMixin
+
 from sales.models import DatabaseMode
-from core.db_router import set_current_db
+from core.db_router import mark_replica_reads, reset_replica_state, set_current_db
+from core.metrics import registry as metrics_registry
+from core.slow_queries import current_request, install_slow_query_capture
 
-# Global variable to cache the current DB name
-CURRENT_DB_NAME = None
+logger = logging.getLogger(__name__)
 
+# Shared stamp file holding the active database name. switch_db replaces it
+# atomically, so every worker on the host sees a new inode/mtime and reloads.
+DATABASE_MODE_FILE = settings.DATABASE_MODE_FILE
+# Seconds between stat() calls on the stamp file in each worker.
+DATABASE_MODE_POLL_INTERVAL = settings.DATABASE_MODE_POLL_INTERVAL
+# Reporting views whose GET reads may be served by a replica: app labels, or
+# dotted paths of individual views.
+REPLICA_READ_APPS = set(settings.REPLICA_READ_APPS)
+REPLICA_READ_VIEWS = set(settings.REPLICA_READ_VIEWS)
+# Share of requests whose latency, SQL usage and size are measured (0..1).
+METRICS_SAMPLE_RATE = settings.METRICS_SAMPLE_RATE
 
-def get_current_db_name():
-    global CURRENT_DB_NAME
-    if CURRENT_DB_NAME is None:
+# Per-worker cache of the current DB name and the stamp it was read from
+_mode_cache = {"db_name": None, "stamp": None, "checked_at": 0.0}
+_mode_lock = threading.Lock()
+
+
+def _read_stamp():
+    try:
+        stat = os.stat(DATABASE_MODE_FILE)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _load_db_name(stamp):
+    if stamp is not None:
         try:
-            config = DatabaseMode.get_solo()
-            CURRENT_DB_NAME = 'demo' if config.demo_data else 'default'
-        except Exception:
-            CURRENT_DB_NAME = 'default'
-    return CURRENT_DB_NAME
+            with open(DATABASE_MODE_FILE) as fh:
+                name = fh.read().strip()
+            if name in ("demo", "default"):
+                return name
+        except OSError:
+            pass
+    # No stamp yet (fresh deploy): fall back to the stored mode once
+    try:
+        config = DatabaseMode.get_solo()
+        return 'demo' if config.demo_data else 'default'
+    except Exception:
+        return 'default'
+
+
+def get_current_db_name():
+    now = time.monotonic()
+    cache = _mode_cache
+    if (
+        cache["db_name"] is not None
+        and now - cache["checked_at"] < DATABASE_MODE_POLL_INTERVAL
+    ):
+        return cache["db_name"]
+
+    with _mode_lock:
+        if now - cache["checked_at"] >= DATABASE_MODE_POLL_INTERVAL:
+            stamp = _read_stamp()
+            if cache["db_name"] is None or stamp != cache["stamp"]:
+                cache["db_name"] = _load_db_name(stamp)
+                cache["stamp"] = stamp
+            cache["checked_at"] = now
+        return cache["db_name"]
+
+
+def _write_stamp(db_name):
+    directory = os.path.dirname(os.path.abspath(DATABASE_MODE_FILE))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".database_mode.")
+    try:
+        with os.fdopen(fd, "w") as fh:
+            fh.write(db_name)
+        os.replace(tmp_path, DATABASE_MODE_FILE)
+    except OSError:
+        os.unlink(tmp_path)
+        raise
 
 
 def set_current_db_name(demo_data):
-    global CURRENT_DB_NAME
-    CURRENT_DB_NAME = 'demo' if demo_data else 'default'
+    db_name = 'demo' if demo_data else 'default'
+    try:
+        _write_stamp(db_name)
+    except OSError:
+        logger.exception("Could not write database mode stamp %s", DATABASE_MODE_FILE)
+    with _mode_lock:
+        _mode_cache.update(
+            db_name=db_name, stamp=_read_stamp(), checked_at=time.monotonic()
+        )
+
+
+class ModelBasedDBSwitchMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        db_name = get_current_db_name()
+        set_current_db(db_name)
+        reset_replica_state()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return None
+        view = getattr(view_func, "view_class", view_func)
+        if (
+            view.__module__.split(".")[0] in REPLICA_READ_APPS
+            or f"{view.__module__}.{view.__name__}" in REPLICA_READ_VIEWS
+        ):
+            mark_replica_reads()
+        return None
+
+    def process_response(self, request, response):
+        reset_replica_state()
+        return response
+
 
+class _SQLTimer:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+# Timer of the sampled request being handled. A ContextVar rather than a
+# per-connection wrapper so ORM calls made from sync_to_async threads in
+# async views are counted too.
+_request_sql = ContextVar("request_sql", default=None)
+
+
+def _record_sql(execute, sql, params, many, context):
+    timer = _request_sql.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.queries += 1
+        timer.seconds += time.perf_counter() - started
+
+
+def install_sql_recorder(connection, **kwargs):
+    if _record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_sql)
+
+
+connection_created.connect(install_sql_recorder)
+
+
+class RequestMetricsMiddleware:
+    """
+    Count every request per resolved view and method, and for a sample of
+    them record latency, SQL queries/time and response size in
+    core.metrics.registry (served by MetricsView). Also tells
+    core.slow_queries which request a slow query came from.
+    """
+
+    sync_capable = True
+    async_capable = True
 
-class ModelBasedDBSwitchMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        db_name = get_current_db_name()
-        set_current_db(db_name)
-        return self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        for alias in connections:
+            install_sql_recorder(connections[alias])
+            install_slow_query_capture(connections[alias])
+        request_token = current_request.set(request)
+        try:
+            if random.random() >= METRICS_SAMPLE_RATE:
+                response = self.get_response(request)
+                self._record(request, response)
+                return response
+
+            sql = _SQLTimer()
+            token = _request_sql.set(sql)
+            started = time.perf_counter()
+            try:
+                response = self.get_response(request)
+            finally:
+                _request_sql.reset(token)
+        finally:
+            current_request.reset(request_token)
+        self._record(request, response, time.perf_counter() - started, sql)
+        return response
+
+    async def __acall__(self, request):
+        request_token = current_request.set(request)
+        try:
+            if random.random() >= METRICS_SAMPLE_RATE:
+                response = await self.get_response(request)
+                self._record(request, response)
+                return response
+
+            sql = _SQLTimer()
+            token = _request_sql.set(sql)
+            started = time.perf_counter()
+            try:
+                response = await self.get_response(request)
+            finally:
+                _request_sql.reset(token)
+        finally:
+            current_request.reset(request_token)
+        self._record(request, response, time.perf_counter() - started, sql)
+        return response
+
+    @staticmethod
+    def _record(request, response, elapsed=None, sql=None):
+        match = getattr(request, "resolver_match", None)
+        # Unresolved paths (404s, static files) share one series so random
+        # URLs cannot blow up the label set.
+        view = match.view_name if match is not None else "<unresolved>"
+        metrics_registry.count(view, request.method, response.status_code)
+        if sql is not None:
+            metrics_registry.observe(
+                view,
+                request.method,
+                elapsed,
+                sql.queries,
+                sql.seconds,
+                None if response.streaming else len(response.content),
+            )
@@ -74,6 +74,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestMetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -87,6 +88,19 @@ MIDDLEWARE = [
 
 DATABASE_ROUTERS = ["core.db_router.DynamicDBRouter"]
 
+# Demo/live switch shared by all workers on the host (see core.middleware)
+DATABASE_MODE_FILE = os.getenv("DATABASE_MODE_FILE", str(BASE_DIR / ".database_mode"))
+DATABASE_MODE_POLL_INTERVAL = float(os.getenv("DATABASE_MODE_POLL_INTERVAL", 2))
+
+# Share of requests measured by core.middleware.RequestMetricsMiddleware
+METRICS_SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", 1.0))
+
+# Slow-query capture (core.slow_queries); a threshold of 0 turns it off
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 500))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", 1.0))
+SLOW_QUERY_MAX_ROWS = int(os.getenv("SLOW_QUERY_MAX_ROWS", 5000))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1") == "1"
+
 
 ROOT_URLCONF = "core.urls"
 
@@ -131,6 +145,34 @@ DATABASES = {
     }
 }
 
+# Optional streaming replica of "default" for reporting reads
+if os.getenv("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.getenv("DB_REPLICA_HOST"),
+        "PORT": os.getenv("DB_REPLICA_PORT", os.getenv("DB_PORT")),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias.startswith("replica")]
+REPLICA_READ_APPS = ["statistic", "export_data"]
+REPLICA_READ_VIEWS = [
+    "logistics.views.FranchiseStatementAPIView",
+    "logistics.views.get_complete_dashboard_stats",
+]
+
+# Cold tier for closed orders (sales.archive). DB_ARCHIVE_NAME moves the
+# archive tables to their own database; otherwise they sit next to sales_order.
+if os.getenv("DB_ARCHIVE_NAME"):
+    DATABASES["archive"] = {
+        **DATABASES["default"],
+        "NAME": os.getenv("DB_ARCHIVE_NAME"),
+        "HOST": os.getenv("DB_ARCHIVE_HOST", os.getenv("DB_HOST")),
+        "PORT": os.getenv("DB_ARCHIVE_PORT", os.getenv("DB_PORT")),
+    }
+ORDER_ARCHIVE_DATABASE = "archive" if "archive" in DATABASES else "default"
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", 365))
+ORDER_ARCHIVE_BATCH_SIZE = int(os.getenv("ORDER_ARCHIVE_BATCH_SIZE", 500))
+
 
 """ DATABASES = {
     "default": {
@@ -231,6 +273,25 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Opt-in orjson-backed JSON for API requests and responses (core.fast_json).
+# Faster, but not identical to DRF's renderer: NaN and infinity render as
+# null instead of raising, and exponent floats read 1e16 instead of 1e+16.
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1"
+if FAST_JSON:
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = (
+        "core.fast_json.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    )
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"] = (
+        "core.fast_json.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    )
+
+# Part of every conditional GET ETag (core.conditional); bump it when an API
+# response format changes so clients drop their cached copies
+API_ETAG_VERSION = os.getenv("API_ETAG_VERSION", "1")
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=365),  # 1 year
     "REFRESH_TOKEN_LIFETIME": timedelta(days=365),  # 1 year
@@ -301,3 +362,17 @@ MEDIA_URL = f"https://{AWS_S3_CUSTOM_DOMAIN}/"
 
 # Third-party logistics
 YDM_BASE_URL = os.getenv("YDM_BASE_URL", "")
+YDM_CONNECT_TIMEOUT = float(os.getenv("YDM_CONNECT_TIMEOUT", 5))
+YDM_READ_TIMEOUT = float(os.getenv("YDM_READ_TIMEOUT", 30))
+YDM_BATCH_CONCURRENCY = int(os.getenv("YDM_BATCH_CONCURRENCY", 4))
+
+# Courier outbox dispatcher (python manage.py dispatch_courier_outbox)
+COURIER_OUTBOX_CONCURRENCY = {
+    "YDM": int(os.getenv("COURIER_OUTBOX_YDM_CONCURRENCY", 4)),
+    "DASH": int(os.getenv("COURIER_OUTBOX_DASH_CONCURRENCY", 2)),
+    "PicknDrop": int(os.getenv("COURIER_OUTBOX_PICKNDROP_CONCURRENCY", 2)),
+    "Daraz": int(os.getenv("COURIER_OUTBOX_DARAZ_CONCURRENCY", 2)),
+}
+COURIER_OUTBOX_MAX_ATTEMPTS = int(os.getenv("COURIER_OUTBOX_MAX_ATTEMPTS", 8))
+COURIER_OUTBOX_BACKOFF_BASE = 30  # seconds, doubled per attempt
+COURIER_OUTBOX_BACKOFF_MAX = 60 * 60  # seconds
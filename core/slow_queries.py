@@ -0,0 +1,161 @@
+# core/slow_queries.py
+
+import logging
+import os
+import random
+import time
+import traceback
+from collections import deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DatabaseError, transaction
+from django.db.backends.signals import connection_created
+
+from sales.models import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+# Queries at least this slow are captured; 0 disables capture.
+SLOW_QUERY_THRESHOLD_MS = settings.SLOW_QUERY_THRESHOLD_MS
+# Share of slow queries that are captured (0..1).
+SLOW_QUERY_SAMPLE_RATE = settings.SLOW_QUERY_SAMPLE_RATE
+# Rows kept in the SlowQuery table; older ones are trimmed on each flush.
+SLOW_QUERY_MAX_ROWS = settings.SLOW_QUERY_MAX_ROWS
+# Store the EXPLAIN plan of slow SELECTs (PostgreSQL only).
+SLOW_QUERY_EXPLAIN = settings.SLOW_QUERY_EXPLAIN
+
+PROJECT_ROOT = str(settings.BASE_DIR)
+# Project files that wrap every query and so never explain where it came from
+_INSTRUMENTATION_FILES = {
+    __file__,
+    os.path.join(PROJECT_ROOT, "core", "middleware.py"),
+}
+
+# Request being served, set by core.middleware.RequestMetricsMiddleware.
+current_request = ContextVar("current_request", default=None)
+# True while this module runs its own queries (EXPLAIN, saving captures).
+_internal = ContextVar("slow_query_internal", default=False)
+# Captured queries waiting to be saved. Bounded so that a burst of slow
+# queries cannot grow a worker's memory.
+_pending = deque(maxlen=500)
+
+
+def _params_shape(params, many):
+    if params is None:
+        return ""
+    if many:
+        return "executemany"
+
+    def describe(value):
+        if isinstance(value, (list, tuple)):
+            return f"{type(value).__name__}[{len(value)}]"
+        return type(value).__name__
+
+    if isinstance(params, dict):
+        shape = ", ".join(f"{key}: {describe(value)}" for key, value in params.items())
+        return f"{{{shape}}}"[:255]
+    return f"({', '.join(describe(value) for value in params)})"[:255]
+
+
+def _origin_frame():
+    """Innermost stack frame in project code, e.g. statistic/views.py:120 in get."""
+    for frame in reversed(traceback.extract_stack()):
+        path = frame.filename
+        if (
+            path.startswith(PROJECT_ROOT)
+            and "site-packages" not in path
+            and path not in _INSTRUMENTATION_FILES
+        ):
+            relative = os.path.relpath(path, PROJECT_ROOT)
+            return f"{relative}:{frame.lineno} in {frame.name}"[:500]
+    return ""
+
+
+def _view_name():
+    request = current_request.get()
+    match = getattr(request, "resolver_match", None)
+    return match.view_name[:255] if match is not None else ""
+
+
+def _explain(connection, sql, params):
+    if not SLOW_QUERY_EXPLAIN or connection.vendor != "postgresql":
+        return ""
+    if connection.needs_rollback or not sql.lstrip().upper().startswith(
+        ("SELECT", "WITH")
+    ):
+        return ""
+    token = _internal.set(True)
+    try:
+        # A savepoint, so a failing EXPLAIN cannot break the caller's transaction
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN {sql}", params)
+                return "\n".join(row[0] for row in cursor.fetchall())
+    except DatabaseError:
+        return ""
+    finally:
+        _internal.reset(token)
+
+
+def capture_slow_queries(execute, sql, params, many, context):
+    """execute_wrapper that queues queries slower than the threshold."""
+    if _internal.get() or SLOW_QUERY_THRESHOLD_MS <= 0:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration_ms = (time.perf_counter() - started) * 1000
+    if (
+        duration_ms >= SLOW_QUERY_THRESHOLD_MS
+        and random.random() < SLOW_QUERY_SAMPLE_RATE
+    ):
+        connection = context["connection"]
+        _pending.append(
+            {
+                "duration_ms": round(duration_ms, 2),
+                "database": connection.alias,
+                "sql": sql,
+                "params_shape": _params_shape(params, many),
+                "view": _view_name(),
+                "stack_frame": _origin_frame(),
+                "explain_plan": "" if many else _explain(connection, sql, params),
+            }
+        )
+    return result
+
+
+def install_slow_query_capture(connection, **kwargs):
+    if capture_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(capture_slow_queries)
+
+
+def flush_slow_queries(**kwargs):
+    """
+    Save queued captures to the SlowQuery table and trim it. Runs after each
+    request; management commands may call it before exiting.
+    """
+    if not _pending:
+        return 0
+    records = []
+    while _pending:
+        try:
+            records.append(SlowQuery(**_pending.popleft()))
+        except IndexError:
+            break
+    token = _internal.set(True)
+    try:
+        SlowQuery.objects.bulk_create(records)
+        newest = SlowQuery.objects.order_by("-id").values_list("id", flat=True)
+        cutoff = list(newest[SLOW_QUERY_MAX_ROWS:SLOW_QUERY_MAX_ROWS + 1])
+        if cutoff:
+            SlowQuery.objects.filter(id__lte=cutoff[0]).delete()
+    except DatabaseError:
+        logger.exception("Could not save %d slow queries", len(records))
+    finally:
+        _internal.reset(token)
+    return len(records)
+
+
+connection_created.connect(install_slow_query_capture)
+request_finished.connect(flush_slow_queries)
@@ -20,9 +20,12 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from core.metrics import MetricsView
+
 urlpatterns = (
     [
         path("admin/", admin.site.urls),
+        path("api/metrics/", MetricsView.as_view(), name="metrics"),
         path("api/account/", include("account.urls")),
         path("api/sales/", include("sales.urls")),
         path("api/baliyo/", include("baliyo.urls")),
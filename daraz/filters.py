@@ -1,7 +1,7 @@
 import django_filters
 from django.db.models import Q
 
-from .models import DarazLocation
+from .models import DarazLocation, normalize_location_search
 
 
 class DarazLocationFilter(django_filters.FilterSet):
@@ -15,5 +15,14 @@ class DarazLocationFilter(django_filters.FilterSet):
         if not value:
             return queryset
 
-        # Filter where city contains search term OR area contains search term
-        return queryset.filter(Q(city__icontains=value) | Q(area__icontains=value))
+        # search_text is the lower-cased "<city> <area>". Terms of three or
+        # more characters use the trigram index; shorter ones (too short for
+        # trigrams) are matched as the start of any word, city or area.
+        term = normalize_location_search(value)
+        if not term:
+            return queryset
+        if len(term) < 3:
+            return queryset.filter(
+                Q(search_text__startswith=term) | Q(search_text__contains=f" {term}")
+            )
+        return queryset.filter(search_text__contains=term)
@@ -6,6 +6,9 @@ This module re-exports the official Lazop Python SDK classes
 IopClient, IopRequest, and IopResponse so the rest of the
 `daraz` app can use a stable internal interface regardless of
 where the SDK lives on disk.
+
+IopClient keeps a keep-alive session per gateway URL; call
+``close_sessions()`` to drop them (e.g. in tests).
 """
 
 import os
@@ -26,6 +29,8 @@ from lazop.base import (  # noqa: E402
     LazopClient as IopClient,
     LazopRequest as IopRequest,
     LazopResponse as IopResponse,
+    close_sessions,
+    sign,
 )
 
-__all__ = ["IopClient", "IopRequest", "IopResponse"]
+__all__ = ["IopClient", "IopRequest", "IopResponse", "close_sessions", "sign"]
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from daraz.services.location_service import (
+    DEFAULT_CHUNK_SIZE,
+    import_locations_from_csv,
+)
+
+
+class Command(BaseCommand):
+    help = "Import/update Daraz locations from a CSV file, streaming it in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV with City, L3 ID, Area, L4 ID columns")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f"Rows upserted per chunk (default: {DEFAULT_CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def progress(saved):
+            self.stdout.write(
+                f"  {saved} rows saved ({time.monotonic() - started:.1f}s)"
+            )
+
+        with open(options["path"], "rb") as file_obj:
+            count = import_locations_from_csv(
+                file_obj, chunk_size=options["chunk_size"], progress=progress
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {count} Daraz locations in {time.monotonic() - started:.1f}s"
+            )
+        )
@@ -0,0 +1,65 @@
+from django.db import migrations, models
+
+SEARCH_INDEXES = (
+    # Trigram index: serves "contains" (LIKE '%term%') lookups.
+    "CREATE INDEX IF NOT EXISTS daraz_location_search_trgm "
+    "ON daraz_darazlocation USING gin (search_text gin_trgm_ops)",
+    # Pattern-ops btree: serves prefix (LIKE 'term%') lookups in any collation.
+    "CREATE INDEX IF NOT EXISTS daraz_location_search_prefix "
+    "ON daraz_darazlocation (search_text varchar_pattern_ops)",
+)
+
+
+def normalize(*parts):
+    return " ".join(" ".join(part or "" for part in parts).lower().split())
+
+
+def populate_search_text(apps, schema_editor):
+    DarazLocation = apps.get_model("daraz", "DarazLocation")
+    batch = []
+    for location in DarazLocation.objects.only("id", "city", "area").iterator(
+        chunk_size=2000
+    ):
+        location.search_text = normalize(location.city, location.area)
+        batch.append(location)
+        if len(batch) >= 2000:
+            DarazLocation.objects.bulk_update(batch, ["search_text"])
+            batch = []
+    if batch:
+        DarazLocation.objects.bulk_update(batch, ["search_text"])
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for sql in SEARCH_INDEXES:
+            schema_editor.execute(sql)
+    else:
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS daraz_location_search_prefix "
+            "ON daraz_darazlocation (search_text)"
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    schema_editor.execute("DROP INDEX IF EXISTS daraz_location_search_trgm")
+    schema_editor.execute("DROP INDEX IF EXISTS daraz_location_search_prefix")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("daraz", "0003_darazlocation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="darazlocation",
+            name="search_text",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=511
+            ),
+        ),
+        migrations.RunPython(populate_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
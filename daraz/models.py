@@ -32,11 +32,21 @@ class DarazSellerStore(models.Model):
         return f"{self.franchise.name} - {self.shipper_warehouse_name}"
 
 
+def normalize_location_search(*parts):
+    """Lower-case, whitespace-collapsed text used for location autocomplete."""
+    return " ".join(" ".join(part or "" for part in parts).lower().split())
+
+
 class DarazLocation(models.Model):
     city = models.CharField(max_length=255, db_index=True)
     l3_id = models.CharField(max_length=100, null=True, blank=True)
     area = models.CharField(max_length=255, db_index=True)
     l4_id = models.CharField(max_length=100, unique=True, db_index=True)
+    # "<city> <area>" normalised; indexed with a trigram GIN and a prefix
+    # (varchar_pattern_ops) index on PostgreSQL, see migration 0004.
+    search_text = models.CharField(
+        max_length=511, blank=True, default="", editable=False
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -48,3 +58,10 @@ class DarazLocation(models.Model):
 
     def __str__(self):
         return f"{self.city} - {self.area} ({self.l4_id})"
+
+    def save(self, *args, **kwargs):
+        self.search_text = normalize_location_search(self.city, self.area)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"city", "area"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "search_text"}
+        super().save(*args, **kwargs)
@@ -1,68 +1,92 @@
+import codecs
 import csv
-import io
+import logging
+from itertools import islice
 
 from django.db import transaction
 
-from daraz.models import DarazLocation
+from daraz.models import DarazLocation, normalize_location_search
 
+logger = logging.getLogger(__name__)
 
-def import_locations_from_csv(file_obj) -> int:
-    """
-    Parses a CSV file and imports/updates Daraz locations.
-    Returns the count of successfully processed locations.
-    """
-    # Decode with utf-8-sig to automatically handle and strip UTF-8 BOM if present
-    content = file_obj.read().decode("utf-8-sig")
-    csv_file = io.StringIO(content)
-    reader = csv.DictReader(csv_file)
+# Rows parsed and upserted per round trip.
+DEFAULT_CHUNK_SIZE = 1000
 
-    # Clean the header names to prevent leading/trailing whitespace
-    if reader.fieldnames:
-        reader.fieldnames = [name.strip() for name in reader.fieldnames]
-    else:
-        reader.fieldnames = []
 
-    locations_to_create = []
-    seen_l4_ids = set()
+def _first(row, *keys):
+    for key in keys:
+        if row.get(key):
+            return row[key]
+    return None
+
 
+def _iter_locations(reader, seen_l4_ids):
     for row in reader:
         # Standardize matching both capitalized and lowercase header variations
-        city = row.get("City") or row.get("city")
-        l3_id = (
-            row.get("L3 ID") or row.get("l3_id") or row.get("L3Id") or row.get("l3id")
-        )
-        area = row.get("Area") or row.get("area")
-        l4_id = (
-            row.get("L4 ID") or row.get("l4_id") or row.get("L4Id") or row.get("l4id")
-        )
+        city = _first(row, "City", "city")
+        l3_id = _first(row, "L3 ID", "l3_id", "L3Id", "l3id")
+        area = _first(row, "Area", "area")
+        l4_id = _first(row, "L4 ID", "l4_id", "L4Id", "l4id")
 
         if not city or not area or not l4_id:
             continue
 
         city = city.strip()
-        l3_id = l3_id.strip() if l3_id else ""
         area = area.strip()
         l4_id = l4_id.strip()
 
-        # Avoid duplicates within the CSV list itself
+        # Avoid duplicates within the CSV itself (first occurrence wins)
         if l4_id in seen_l4_ids:
             continue
         seen_l4_ids.add(l4_id)
 
-        locations_to_create.append(
-            DarazLocation(city=city, l3_id=l3_id, area=area, l4_id=l4_id)
+        yield DarazLocation(
+            city=city,
+            l3_id=l3_id.strip() if l3_id else "",
+            area=area,
+            l4_id=l4_id,
+            search_text=normalize_location_search(city, area),
         )
 
-    if not locations_to_create:
-        return 0
 
-    with transaction.atomic():
-        # Django bulk_create with update_conflicts handles inserting new and updating existing entries efficiently
-        DarazLocation.objects.bulk_create(
-            locations_to_create,
-            update_conflicts=True,
-            update_fields=["city", "l3_id", "area"],
-            unique_fields=["l4_id"],
-        )
+def import_locations_from_csv(
+    file_obj, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=None, progress=None
+) -> int:
+    """
+    Streams a CSV file and imports/updates Daraz locations.
+
+    The upload is decoded line by line and upserted ``chunk_size`` rows at a
+    time (``bulk_create(update_conflicts=True)`` on ``l4_id``), so memory
+    stays flat whatever the file size. Each chunk commits on its own unless
+    the caller wraps the import in a transaction, as the upload view does.
+    ``progress(rows_saved)`` is called after every chunk.
+
+    Returns the count of successfully processed locations.
+    """
+    # utf-8-sig strips a UTF-8 BOM if present
+    reader = csv.DictReader(codecs.iterdecode(file_obj, "utf-8-sig"))
+
+    # Clean the header names to prevent leading/trailing whitespace
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip() for name in reader.fieldnames]
+
+    locations = _iter_locations(reader, set())
+    saved = 0
+    while True:
+        chunk = list(islice(locations, chunk_size))
+        if not chunk:
+            break
+        with transaction.atomic():
+            DarazLocation.objects.bulk_create(
+                chunk,
+                batch_size=batch_size or chunk_size,
+                update_conflicts=True,
+                update_fields=["city", "l3_id", "area", "search_text", "updated_at"],
+                unique_fields=["l4_id"],
+            )
+        saved += len(chunk)
+        logger.info("Daraz location import: %s rows saved", saved)
+        if progress is not None:
+            progress(saved)
 
-    return len(locations_to_create)
+    return saved
@@ -0,0 +1,317 @@
+import json
+import logging
+import os
+
+from django.utils import timezone
+
+from daraz.iop import IopClient, IopRequest
+from logistics.outbox import CourierHandler, PermanentDispatchError
+
+logger = logging.getLogger(__name__)
+
+# Daraz Nepal REST gateway
+DARAZ_API_URL = os.getenv("DARAZ_API_URL", "https://api.daraz.com.np/rest")
+DARAZ_TIMEOUT = float(os.getenv("DARAZ_TIMEOUT", 30))  # seconds
+DARAZ_POOL_SIZE = int(os.getenv("DARAZ_POOL_SIZE", 10))
+
+# Request fields the send view lets the caller override. They are copied into
+# the courier outbox payload so a queued push is built exactly like a direct one.
+PACKAGE_PARAM_KEYS = (
+    "dimWeight",
+    "length",
+    "width",
+    "height",
+    "weight",
+    "destination",
+    "payment",
+    "options",
+    "dangerousGood",
+    "deliveryOption",
+    "location_id",
+    "location",
+)
+
+# Pricing map for specific products:
+# Yachu Hair Oil - 2500
+# Hairfall Case Oil - 2500
+# Dandruff Case Oil - 2500
+# Baldness Case Oil - 2500
+# Shampoo Bottle - 1000
+# sachet oil - 990
+# sachet shampoo - 100
+PRICE_MAP = {
+    "yachu hair oil": 2500,
+    "hairfall oil bottle": 2500,
+    "dandruff oil bottle": 2500,
+    "baldness oil bottle": 2500,
+    "shampoo bottle": 1000,
+    "hair oil sachet": 990,
+    "shampoo sachet": 100,
+}
+
+
+def _log_daraz_call(event: dict) -> None:
+    logger.debug(
+        "Daraz %s %s -> http=%s code=%s in %.1f ms (request_id=%s)",
+        event["method"],
+        event["api"],
+        event["status_code"],
+        event["code"],
+        event["elapsed_ms"],
+        event["request_id"],
+    )
+
+
+def get_daraz_client() -> IopClient:
+    """
+    Return an IopClient initialised from environment variables.
+
+    Clients share one keep-alive session per gateway URL, so creating one per
+    request does not cost a new TLS handshake.
+    """
+    app_key = os.getenv("DARAZ_APPKEY", "")
+    app_secret = os.getenv("DARAZ_SECRET", "")
+
+    if not app_key or not app_secret:
+        raise ValueError(
+            "DARAZ_APPKEY and DARAZ_SECRET must be set in the environment."
+        )
+
+    return IopClient(
+        DARAZ_API_URL,
+        app_key,
+        app_secret,
+        timeout=DARAZ_TIMEOUT,
+        pool_size=DARAZ_POOL_SIZE,
+        on_request=_log_daraz_call,
+    )
+
+
+def extract_package_params(data) -> dict:
+    """Copy the overridable package fields out of request data."""
+    return {key: data.get(key) for key in PACKAGE_PARAM_KEYS if data.get(key)}
+
+
+def build_package_request(order, store_config, daraz_location, params, order_products=None):
+    """
+    Build the ``/logistics/epis/packages`` IopRequest for an order.
+
+    ``params`` holds the optional overrides accepted by SendOrderToDarazView
+    (dimWeight, destination, payment, options, ...).
+    """
+    iop_request = IopRequest("/logistics/epis/packages", "POST")
+
+    # ------------------------------------------------------------------
+    # Items from order products
+    # ------------------------------------------------------------------
+    if order_products is None:
+        order_products = list(order.order_products.select_related("product__product"))
+
+    total_qty = sum(op.quantity for op in order_products) or 1
+    subtotal = order.total_amount - (order.delivery_charge or 0)
+    unit_price = max(int(subtotal / total_qty), 0)
+
+    # dimWeight is required both at top-level AND inside each item (per Daraz reference)
+    dim_weight = params.get("dimWeight") or {
+        "length": str(params.get("length", "1")),  # cm
+        "width": str(params.get("width", "1")),  # cm
+        "height": str(params.get("height", "1")),  # cm
+        "weight": str(params.get("weight", "500")),  # grams
+    }
+
+    items_list = []
+    for op in order_products:
+        product_name = (
+            op.product.product.name
+            if op.product and op.product.product
+            else "Unknown Product"
+        )
+
+        # Find item unit price from PRICE_MAP based on substring match or exact match
+        name_lower = product_name.lower().strip()
+        item_unit_price = None
+        for key, val in PRICE_MAP.items():
+            if key in name_lower:
+                item_unit_price = val
+                break
+
+        if item_unit_price is None:
+            item_unit_price = unit_price
+
+        items_list.append({
+            "unitPrice": str(item_unit_price),
+            "quantity": str(op.quantity),
+            "name": product_name,
+            "paidPrice": str(item_unit_price),
+            "dimWeight": dim_weight,  # required per Daraz spec
+        })
+
+    # ------------------------------------------------------------------
+    # Origin / warehouse details (dynamic from store config)
+    # ------------------------------------------------------------------
+    origin = {
+        "name": store_config.origin_name,
+        "phone": store_config.origin_phone,
+        "email": store_config.origin_email,
+        "address": {
+            "city": store_config.origin_address_city,
+            "id": store_config.origin_address_id,
+            "details": store_config.origin_address_details,
+            "type": store_config.origin_address_type,
+        },
+    }
+
+    # ------------------------------------------------------------------
+    # Destination / customer details (derived from order)
+    # ------------------------------------------------------------------
+    destination = params.get("destination")
+    if not destination:
+        destination = {
+            "address": {
+                "city": daraz_location.city,
+                "details": order.delivery_address or "Delivery address",
+                "id": daraz_location.l4_id,
+            },
+            "phone": order.phone_number,
+            "name": order.full_name,
+        }
+    else:
+        destination = dict(destination)
+        destination["address"] = dict(destination.get("address") or {})
+        destination["address"]["city"] = daraz_location.city
+        destination["address"]["id"] = daraz_location.l4_id
+
+    # ------------------------------------------------------------------
+    # Shipper / seller info (dynamic from store config)
+    # ------------------------------------------------------------------
+    shipper = {
+        "externalSellerId": store_config.shipper_seller_id,
+        "platformName": store_config.shipper_platform_name,
+        "externalWarehouseCode": store_config.shipper_external_warehouse_code,
+        "warehouseName": store_config.shipper_warehouse_name,
+    }
+
+    # ------------------------------------------------------------------
+    # Payment info
+    # ------------------------------------------------------------------
+    prepaid_amount = order.prepaid_amount or 0
+    net_amount = order.total_amount - prepaid_amount
+
+    # NON-COD only when the order is fully prepaid (net_amount == 0).
+    # Any outstanding balance is always treated as COD.
+    payment_type = "NON-COD" if net_amount == 0 else "COD"
+
+    payment = params.get("payment") or {
+        "totalAmount": str(net_amount),
+        "currency": os.getenv("DARAZ_CURRENCY", "NPR"),
+        "paymentType": payment_type,
+    }
+
+    # ------------------------------------------------------------------
+    # Delivery options
+    # ------------------------------------------------------------------
+    options = params.get("options")
+    if not options:
+        options = {
+            "deliveryNote": order.remarks or "",
+            "partnerOrderId": order.order_code,
+            "directReturnToMerchant": "true",
+        }
+    options = dict(options)
+    options["vasFdStorageOption"] = "true"
+
+    # ------------------------------------------------------------------
+    # Populate API parameters on the request object
+    # ------------------------------------------------------------------
+    creation_time = (
+        int(order.created_at.timestamp() * 1000)
+        if order.created_at
+        else int(timezone.now().timestamp() * 1000)
+    )
+
+    iop_request.add_api_param("externalOrderId", order.order_code)
+    iop_request.add_api_param("platformOrderCreationTime", str(creation_time))
+    iop_request.add_api_param("dangerousGood", params.get("dangerousGood", "false"))
+    iop_request.add_api_param("items", json.dumps(items_list))
+    iop_request.add_api_param("shipper", json.dumps(shipper))
+    iop_request.add_api_param("origin", json.dumps(origin))
+    iop_request.add_api_param("destination", json.dumps(destination))
+    iop_request.add_api_param("payment", json.dumps(payment))
+    iop_request.add_api_param("options", json.dumps(options))
+    # dimWeight is a top-level JSON object (NOT inside a 'package' wrapper)
+    iop_request.add_api_param("dimWeight", json.dumps(dim_weight))
+    iop_request.add_api_param(
+        "deliveryOption", params.get("deliveryOption", "standard")
+    )
+    return iop_request
+
+
+def save_package_result(order, daraz_location, response_body):
+    """Persist logistics, location, tracking number and package code."""
+    order.logistics = "Daraz"
+    order.daraz_location = daraz_location
+    update_fields = ["logistics", "daraz_location", "updated_at"]
+    tracking_number = response_body.get("data", {}).get("trackingNumber")
+    if tracking_number:
+        order.tracking_code = tracking_number
+        update_fields.append("tracking_code")
+        logger.info(
+            "Successfully saved Daraz tracking number %s to order %s",
+            tracking_number,
+            order.order_code,
+        )
+    package_code = response_body.get("data", {}).get("packageCode")
+    if package_code:
+        order.package_code = package_code
+        update_fields.append("package_code")
+        logger.info(
+            "Successfully saved Daraz package code %s to order %s",
+            package_code,
+            order.order_code,
+        )
+    order.save(update_fields=update_fields)
+
+
+class DarazOutboxHandler(CourierHandler):
+    """Delivers queued Daraz package creations for the courier outbox."""
+
+    def prepare(self, entry):
+        from daraz.models import DarazLocation, DarazSellerStore
+
+        order = entry.order
+        params = entry.payload or {}
+        try:
+            client = get_daraz_client()
+        except ValueError as exc:
+            raise PermanentDispatchError(str(exc)) from exc
+
+        store_config = DarazSellerStore.objects.filter(
+            franchise_id=order.franchise_id
+        ).first()
+        if store_config is None:
+            raise PermanentDispatchError("No Daraz store configuration found.")
+
+        location_id = params.get("location_id") or params.get("location")
+        daraz_location = DarazLocation.objects.filter(id=location_id).first()
+        if daraz_location is None:
+            raise PermanentDispatchError(f"DarazLocation with ID {location_id} not found.")
+
+        iop_request = build_package_request(order, store_config, daraz_location, params)
+        return client, iop_request, daraz_location
+
+    def send(self, prepared):
+        client, iop_request, daraz_location = prepared
+        iop_response = client.execute(iop_request)
+        response_body = iop_response.body if isinstance(iop_response.body, dict) else {}
+        if str(iop_response.code) != "0":
+            raise PermanentDispatchError(
+                f"Daraz rejected the package: code={iop_response.code} "
+                f"message={iop_response.message}"
+            )
+        return {"body": response_body, "daraz_location_id": daraz_location.id}
+
+    def apply(self, entry, result):
+        from daraz.models import DarazLocation
+
+        daraz_location = DarazLocation.objects.get(id=result["daraz_location_id"])
+        save_package_result(entry.order, daraz_location, result["body"])
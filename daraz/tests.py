@@ -0,0 +1,152 @@
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase
+
+from .iop import IopClient, IopRequest, close_sessions, sign
+from .models import DarazLocation
+from .services.location_service import import_locations_from_csv
+
+
+class LazopStubServer:
+    """Local gateway echoing the signed form parameters back as JSON."""
+
+    def __init__(self):
+        self.hits = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                params = dict(parse_qsl(self.rfile.read(length).decode()))
+                stub.hits.append((self.path, self.client_address[1], params))
+                body = json.dumps(
+                    {"code": "0", "request_id": params.get("ref"), "params": params}
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/rest"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class LazopClientTests(SimpleTestCase):
+    def setUp(self):
+        self.stub = LazopStubServer()
+        self.events = []
+        self.client_ = IopClient(
+            self.stub.url, "key", "secret", on_request=self.events.append
+        )
+
+    def tearDown(self):
+        self.stub.close()
+        close_sessions()
+
+    def _request(self, ref):
+        request = IopRequest("/logistics/epis/packages/cancel", "POST")
+        request.add_api_param("ref", ref)
+        return request
+
+    def test_precomputed_signature_matches_reference_sign(self):
+        params = self.client_.execute(self._request("A")).body["params"]
+        signature = params.pop("sign")
+        self.assertEqual(
+            signature, sign("secret", "/logistics/epis/packages/cancel", params)
+        )
+
+    def test_clients_reuse_one_keep_alive_connection(self):
+        other = IopClient(self.stub.url, "key", "secret")
+        self.client_.execute(self._request("A"))
+        other.execute(self._request("B"))
+        self.assertEqual(self.stub.hits[0][1], self.stub.hits[1][1])
+
+    def test_execute_many_keeps_order_and_reports_timings(self):
+        responses = self.client_.execute_many(
+            [self._request(str(i)) for i in range(6)], max_workers=3
+        )
+        self.assertEqual(
+            [r.request_id for r in responses], [str(i) for i in range(6)]
+        )
+        self.assertEqual(len(self.events), 6)
+        self.assertTrue(all(e["status_code"] == 200 for e in self.events))
+        self.assertTrue(all(e["elapsed_ms"] >= 0 for e in self.events))
+
+
+class DarazLocationImportTests(TestCase):
+    CSV = (
+        "\ufeffCity , L3 ID,Area,L4 ID\n"
+        "Kathmandu,10,Baneshwor,401\n"
+        "Kathmandu,10,Koteshwor,402\n"
+        "Kathmandu,10,Duplicate,402\n"
+        "Lalitpur,11,Jawalakhel,403\n"
+        ",11,Missing City,404\n"
+        "Bhaktapur,12,Suryabinayak,405\n"
+    )
+
+    def _import(self, text, **kwargs):
+        return import_locations_from_csv(io.BytesIO(text.encode("utf-8")), **kwargs)
+
+    def test_streams_chunks_and_upserts(self):
+        saved = []
+        count = self._import(self.CSV, chunk_size=2, progress=saved.append)
+
+        self.assertEqual(count, 4)
+        self.assertEqual(saved, [2, 4])
+        self.assertEqual(DarazLocation.objects.get(l4_id="402").area, "Koteshwor")
+        self.assertEqual(
+            DarazLocation.objects.get(l4_id="403").search_text, "lalitpur jawalakhel"
+        )
+
+        self._import("City,L3 ID,Area,L4 ID\nKathmandu,10,New Baneshwor,401\n")
+        self.assertEqual(DarazLocation.objects.count(), 4)
+        self.assertEqual(
+            DarazLocation.objects.get(l4_id="401").search_text,
+            "kathmandu new baneshwor",
+        )
+
+    def test_upload_failing_part_way_keeps_nothing(self):
+        rows = "".join(f"Kathmandu,10,Area {i},{i}\n" for i in range(1200))
+        upload = SimpleUploadedFile(
+            "locations.csv",
+            ("City,L3 ID,Area,L4 ID\n" + rows).encode("utf-8") + b"Bad,1,\xff,x\n",
+            content_type="text/csv",
+        )
+
+        response = self.client.post("/api/daraz/locations/import/", {"file": upload})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Failed to import CSV", response.json()["error"])
+        self.assertFalse(DarazLocation.objects.exists())
+
+    def test_search_matches_normalized_city_or_area(self):
+        self._import(self.CSV)
+
+        def search(term):
+            response = self.client.get("/api/daraz/locations/", {"search": term})
+            rows = response.json()
+            rows = rows["results"] if isinstance(rows, dict) else rows
+            return sorted(row["l4_id"] for row in rows)
+
+        self.assertEqual(search("  KOTE "), ["402"])
+        self.assertEqual(search("kathmandu"), ["401", "402"])
+        self.assertEqual(search("la"), ["403"])
+        # Short terms match the start of an area as well as of a city
+        self.assertEqual(search("Ko"), ["402"])
+        self.assertEqual(search("ja"), ["403"])
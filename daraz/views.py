@@ -2,9 +2,10 @@ import json
 import logging
 import os
 
+from asgiref.sync import sync_to_async
+from django.db import transaction
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, status
 from rest_framework.parsers import FormParser, MultiPartParser
@@ -12,34 +13,28 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from sales.models import Inventory, Order, OrderProduct
+from core.async_views import AsyncAPIView, run_io
+from logistics.outbox import enqueue_courier_push, is_deferred
+from logistics.transitions import transition_orders
+from sales.models import Order
 
 from .filters import DarazLocationFilter
-from .iop import IopClient, IopRequest
+from .iop import IopRequest
 from .models import DarazLocation, DarazSellerStore
 from .serializers import DarazLocationImportSerializer, DarazLocationSerializer
 from .services.location_service import import_locations_from_csv
+from .services.package_service import (
+    DARAZ_API_URL,
+    build_package_request,
+    extract_package_params,
+    get_daraz_client,
+    save_package_result,
+)
 
 logger = logging.getLogger(__name__)
 
-# Daraz Nepal REST gateway
-DARAZ_API_URL = os.getenv("DARAZ_API_URL", "https://api.daraz.com.np/rest")
 
-
-def _get_client() -> IopClient:
-    """Return an IopClient initialised from environment variables."""
-    app_key = os.getenv("DARAZ_APPKEY", "")
-    app_secret = os.getenv("DARAZ_SECRET", "")
-
-    if not app_key or not app_secret:
-        raise ValueError(
-            "DARAZ_APPKEY and DARAZ_SECRET must be set in the environment."
-        )
-
-    return IopClient(DARAZ_API_URL, app_key, app_secret)
-
-
-class SendOrderToDarazView(APIView):
+class SendOrderToDarazView(AsyncAPIView):
     """
     POST /daraz/orders/<order_id>/send/
 
@@ -55,12 +50,12 @@ class SendOrderToDarazView(APIView):
 
     permission_classes = [IsAuthenticated]
 
-    def post(self, request, order_id):
+    def _prepare(self, request, order_id):
         # ------------------------------------------------------------------
         # 1. Build the SDK client from env credentials
         # ------------------------------------------------------------------
         try:
-            client = _get_client()
+            client = get_daraz_client()
         except ValueError as exc:
             return Response(
                 {"error": str(exc)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -105,97 +100,16 @@ class SendOrderToDarazView(APIView):
         )
 
         # ------------------------------------------------------------------
-        # 3. Build the IopRequest
+        # 3. Validate products and destination
         # ------------------------------------------------------------------
-        iop_request = IopRequest("/logistics/epis/packages", "POST")
+        order_products = list(order.order_products.select_related("product__product"))
 
-        # ------------------------------------------------------------------
-        # 4. Items from order products
-        # ------------------------------------------------------------------
-
-        order_products = order.order_products.all()
-
-        if not order_products.exists():
+        if not order_products:
             return Response(
                 {"error": "This order has no associated products."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        total_qty = sum(op.quantity for op in order_products) or 1
-        subtotal = order.total_amount - (order.delivery_charge or 0)
-        unit_price = max(int(subtotal / total_qty), 0)
-
-        # dimWeight is required both at top-level AND inside each item (per Daraz reference)
-        dim_weight = request.data.get("dimWeight") or {
-            "length": str(request.data.get("length", "1")),  # cm
-            "width": str(request.data.get("width", "1")),  # cm
-            "height": str(request.data.get("height", "1")),  # cm
-            "weight": str(request.data.get("weight", "500")),  # grams
-        }
-
-        # Pricing map for specific products:
-        # Yachu Hair Oil - 2500
-        # Hairfall Case Oil - 2500
-        # Dandruff Case Oil - 2500
-        # Baldness Case Oil - 2500
-        # Shampoo Bottle - 1000
-        # sachet oil - 990
-        # sachet shampoo - 100
-        PRICE_MAP = {
-            "yachu hair oil": 2500,
-            "hairfall oil bottle": 2500,
-            "dandruff oil bottle": 2500,
-            "baldness oil bottle": 2500,
-            "shampoo bottle": 1000,
-            "hair oil sachet": 990,
-            "shampoo sachet": 100,
-        }
-
-        items_list = []
-        for op in order_products:
-            product_name = (
-                op.product.product.name
-                if op.product and op.product.product
-                else "Unknown Product"
-            )
-
-            # Find item unit price from PRICE_MAP based on substring match or exact match
-            name_lower = product_name.lower().strip()
-            item_unit_price = None
-            for key, val in PRICE_MAP.items():
-                if key in name_lower:
-                    item_unit_price = val
-                    break
-
-            if item_unit_price is None:
-                item_unit_price = unit_price
-
-            items_list.append({
-                "unitPrice": str(item_unit_price),
-                "quantity": str(op.quantity),
-                "name": product_name,
-                "paidPrice": str(item_unit_price),
-                "dimWeight": dim_weight,  # required per Daraz spec
-            })
-
-        # ------------------------------------------------------------------
-        # 5. Origin / warehouse details (dynamic from store config)
-        # ------------------------------------------------------------------
-        origin = {
-            "name": store_config.origin_name,
-            "phone": store_config.origin_phone,
-            "email": store_config.origin_email,
-            "address": {
-                "city": store_config.origin_address_city,
-                "id": store_config.origin_address_id,
-                "details": store_config.origin_address_details,
-                "type": store_config.origin_address_type,
-            },
-        }
-
-        # ------------------------------------------------------------------
-        # 6. Destination / customer details (derived from order)
-        # ------------------------------------------------------------------
         location_id = request.data.get("location_id") or request.data.get("location")
         if not location_id:
             return Response(
@@ -205,97 +119,43 @@ class SendOrderToDarazView(APIView):
 
         try:
             daraz_location = DarazLocation.objects.get(id=location_id)
-            dest_city = daraz_location.city
-            dest_id = daraz_location.l4_id
         except DarazLocation.DoesNotExist:
             return Response(
                 {"error": f"DarazLocation with ID {location_id} not found."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        destination = request.data.get("destination")
-        if not destination:
-            destination = {
-                "address": {
-                    "city": dest_city,
-                    "details": order.delivery_address or "Delivery address",
-                    "id": dest_id,
-                },
-                "phone": order.phone_number,
-                "name": order.full_name,
-            }
-        else:
-            if "address" not in destination:
-                destination["address"] = {}
-            destination["address"]["city"] = dest_city
-            destination["address"]["id"] = dest_id
-
-        # ------------------------------------------------------------------
-        # 7. Shipper / seller info (dynamic from store config)
-        # ------------------------------------------------------------------
-        shipper = {
-            "externalSellerId": store_config.shipper_seller_id,
-            "platformName": store_config.shipper_platform_name,
-            "externalWarehouseCode": store_config.shipper_external_warehouse_code,
-            "warehouseName": store_config.shipper_warehouse_name,
-        }
-
-        # ------------------------------------------------------------------
-        # 8. Payment info
-        # ------------------------------------------------------------------
-        prepaid_amount = order.prepaid_amount or 0
-        net_amount = order.total_amount - prepaid_amount
-
-        # NON-COD only when the order is fully prepaid (net_amount == 0).
-        # Any outstanding balance is always treated as COD.
-        payment_type = "NON-COD" if net_amount == 0 else "COD"
-
-        payment = request.data.get("payment") or {
-            "totalAmount": str(net_amount),
-            "currency": os.getenv("DARAZ_CURRENCY", "NPR"),
-            "paymentType": payment_type,
-        }
+        params = extract_package_params(request.data)
 
-        # ------------------------------------------------------------------
-        # 9. Delivery options
-        # ------------------------------------------------------------------
-        options = request.data.get("options")
-        if not options:
-            options = {
-                "deliveryNote": order.remarks or "",
-                "partnerOrderId": order.order_code,
-                "directReturnToMerchant": "true",
-            }
-        options["vasFdStorageOption"] = "true"
+        # Deferred mode: record the push in the courier outbox and let the
+        # dispatcher call Daraz, so this request never waits on the API.
+        if is_deferred(request):
+            with transaction.atomic():
+                order.logistics = "Daraz"
+                order.daraz_location = daraz_location
+                order.save(
+                    update_fields=["logistics", "daraz_location", "updated_at"]
+                )
+                entry = enqueue_courier_push(order, "Daraz", user=user, payload=params)
+            return Response(
+                {
+                    "success": True,
+                    "queued": True,
+                    "outbox_id": entry.id,
+                    "order_code": order.order_code,
+                },
+                status=status.HTTP_202_ACCEPTED,
+            )
 
         # ------------------------------------------------------------------
-        # 10. Populate API parameters on the request object
+        # 4. Build the IopRequest
         # ------------------------------------------------------------------
-        creation_time = (
-            int(order.created_at.timestamp() * 1000)
-            if order.created_at
-            else int(timezone.now().timestamp() * 1000)
-        )
-
-        iop_request.add_api_param("externalOrderId", order.order_code)
-        iop_request.add_api_param("platformOrderCreationTime", str(creation_time))
-        iop_request.add_api_param(
-            "dangerousGood", request.data.get("dangerousGood", "false")
-        )
-        iop_request.add_api_param("items", json.dumps(items_list))
-        iop_request.add_api_param("shipper", json.dumps(shipper))
-        iop_request.add_api_param("origin", json.dumps(origin))
-        iop_request.add_api_param("destination", json.dumps(destination))
-        iop_request.add_api_param("payment", json.dumps(payment))
-        iop_request.add_api_param("options", json.dumps(options))
-        # dimWeight is a top-level JSON object (NOT inside a 'package' wrapper)
-        iop_request.add_api_param("dimWeight", json.dumps(dim_weight))
-        iop_request.add_api_param(
-            "deliveryOption", request.data.get("deliveryOption", "standard")
+        iop_request = build_package_request(
+            order, store_config, daraz_location, params, order_products=order_products
         )
 
         # ------------------------------------------------------------------
-        # 10b. Print/log request parameters in a nice format
+        # 5. Print/log request parameters in a nice format
         # ------------------------------------------------------------------
         pretty_params = {}
         for k, v in iop_request._api_params.items():
@@ -314,10 +174,17 @@ class SendOrderToDarazView(APIView):
             f"Daraz Request Parameters for {order.order_code}:\n{json.dumps(pretty_params, indent=4, ensure_ascii=False)}"
         )
 
+        return client, iop_request, order, daraz_location
+
+    async def post(self, request, order_id):
+        prepared = await sync_to_async(self._prepare)(request, order_id)
+        if isinstance(prepared, Response):
+            return prepared
+        client, iop_request, order, daraz_location = prepared
+
         try:
-            iop_response = client.execute(
-                iop_request
-            )  # signature-only, no access_token
+            # signature-only, no access_token
+            iop_response = await run_io(client.execute, iop_request)
         except Exception as exc:  # noqa: BLE001
             logger.exception("Daraz SDK request failed for order %s", order.order_code)
             return Response(
@@ -326,7 +193,7 @@ class SendOrderToDarazView(APIView):
             )
 
         # ------------------------------------------------------------------
-        # 12. Parse and return the response
+        # 6. Parse and return the response
         # ------------------------------------------------------------------
         response_body = iop_response.body if isinstance(iop_response.body, dict) else {}
 
@@ -344,28 +211,9 @@ class SendOrderToDarazView(APIView):
         )
 
         if success:
-            order.logistics = "Daraz"
-            order.daraz_location = daraz_location
-            update_fields = ["logistics", "daraz_location"]
-            tracking_number = response_body.get("data", {}).get("trackingNumber")
-            if tracking_number:
-                order.tracking_code = tracking_number
-                update_fields.append("tracking_code")
-                logger.info(
-                    "Successfully saved Daraz tracking number %s to order %s",
-                    tracking_number,
-                    order.order_code,
-                )
-            package_code = response_body.get("data", {}).get("packageCode")
-            if package_code:
-                order.package_code = package_code
-                update_fields.append("package_code")
-                logger.info(
-                    "Successfully saved Daraz package code %s to order %s",
-                    package_code,
-                    order.order_code,
-                )
-            order.save(update_fields=update_fields)
+            await sync_to_async(save_package_result)(
+                order, daraz_location, response_body
+            )
 
         http_status = status.HTTP_200_OK if success else status.HTTP_400_BAD_REQUEST
 
@@ -441,7 +289,9 @@ class DarazLocationImportView(APIView):
 
         file_obj = serializer.validated_data["file"]
         try:
-            count = import_locations_from_csv(file_obj)
+            # All or nothing: a failure part way through keeps no chunk
+            with transaction.atomic():
+                count = import_locations_from_csv(file_obj)
             return Response(
                 {"message": "Locations imported successfully.", "count": count},
                 status=status.HTTP_201_CREATED,
@@ -453,7 +303,7 @@ class DarazLocationImportView(APIView):
             )
 
 
-class CancelDarazOrderView(APIView):
+class CancelDarazOrderView(AsyncAPIView):
     """
     POST /api/daraz/orders/<order_id>/cancel/
     Cancels a package/order on Daraz.
@@ -461,7 +311,7 @@ class CancelDarazOrderView(APIView):
 
     permission_classes = [IsAuthenticated]
 
-    def post(self, request, order_id):
+    def _prepare(self, request, order_id):
         order = get_object_or_404(
             Order.objects.select_related("franchise"), id=order_id
         )
@@ -492,7 +342,7 @@ class CancelDarazOrderView(APIView):
         reason = request.data.get("reason") or "User trigger cancel"
 
         try:
-            client = _get_client()
+            client = get_daraz_client()
         except ValueError as exc:
             return Response(
                 {"error": str(exc)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -525,8 +375,16 @@ class CancelDarazOrderView(APIView):
             reason,
         )
 
+        return client, iop_request, order
+
+    async def post(self, request, order_id):
+        prepared = await sync_to_async(self._prepare)(request, order_id)
+        if isinstance(prepared, Response):
+            return prepared
+        client, iop_request, order = prepared
+
         try:
-            iop_response = client.execute(iop_request)
+            iop_response = await run_io(client.execute, iop_request)
         except Exception as exc:
             logger.exception(
                 "Daraz cancel SDK request failed for order %s", order.order_code
@@ -552,8 +410,9 @@ class CancelDarazOrderView(APIView):
         success = daraz_code == "0"
 
         if success:
-            order.order_status = "Cancelled"
-            order.save(update_fields=["order_status"])
+            await sync_to_async(transition_orders)(
+                [order], "Cancelled", user=request.user
+            )
 
         http_status = status.HTTP_200_OK if success else status.HTTP_400_BAD_REQUEST
 
@@ -589,7 +448,7 @@ class CancelDarazOrderByPackageCodeView(APIView):
         reason = request.data.get("reason") or "User trigger cancel"
 
         try:
-            client = _get_client()
+            client = get_daraz_client()
         except ValueError as exc:
             return Response(
                 {"error": str(exc)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -772,9 +631,8 @@ class DarazWebhookView(APIView):
                     status=status.HTTP_200_OK,
                 )
 
-            # Update order status
-            order.order_status = mapped_status
-            order.save(update_fields=["order_status"])
+            # Update order status; cancelled/returned orders are restocked
+            transition_orders([order], mapped_status)
             logger.info(
                 "Updated order %s status from %s to %s via Daraz webhook",
                 order.order_code,
@@ -782,36 +640,6 @@ class DarazWebhookView(APIView):
                 mapped_status,
             )
 
-            # Restock inventory if cancelled or returned
-            CANCEL_RETURN_STATUSES = ["Cancelled", "Returned By Daraz"]
-            if (
-                mapped_status in CANCEL_RETURN_STATUSES
-                and previous_status != mapped_status
-            ):
-                order_products = OrderProduct.objects.filter(
-                    order=order
-                ).select_related("product__product")
-                for op in order_products:
-                    try:
-                        inventory = Inventory.objects.get(
-                            product__id=op.product.product.id,
-                            franchise=order.franchise,
-                        )
-                        inventory.quantity += op.quantity
-                        inventory.save()
-                        logger.info(
-                            "Restocked %s unit(s) of %s for order %s",
-                            op.quantity,
-                            op.product.product.name,
-                            order.order_code,
-                        )
-                    except Inventory.DoesNotExist:
-                        logger.warning(
-                            "Inventory record not found for product %s, franchise %s",
-                            op.product.product.name,
-                            order.franchise,
-                        )
-
             return Response(
                 {
                     "status": "success",
@@ -1,3 +1,218 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import AsyncClient, TransactionTestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from account.models import CustomUser, Franchise
+from sales.models import Inventory, Order, OrderProduct, Product
+
+from .models import Dash
+from .utils import token_manager
+
+
+class StubDashServer:
+    """Local stand-in for the Dash login and add-order endpoints."""
+
+    def __init__(self, delay=0):
+        self.hits = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                stub.hits.append(self.path)
+                if self.path.startswith("/api/v1/login/client/"):
+                    data = {
+                        "data": {
+                            "accessToken": f"token-{len(stub.hits)}",
+                            "refreshToken": "refresh",
+                            "expiresIn": 3600,
+                        }
+                    }
+                else:
+                    time.sleep(delay)
+                    data = {
+                        "data": {
+                            "detail": [
+                                {
+                                    "tracking_code": f"DASH-{c['order_reference_id']}",
+                                    "order_reference_id": c["order_reference_id"],
+                                }
+                                for c in body["customers"]
+                            ]
+                        }
+                    }
+                payload = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.patcher = mock.patch("dash.utils.DASH_BASE_URL", self.url)
+
+    def __enter__(self):
+        self.patcher.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.patcher.stop()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def logins(self):
+        return [hit for hit in self.hits if "login" in hit]
+
+
+class DashTokenManagerTests(TransactionTestCase):
+    def setUp(self):
+        token_manager.clear()
+        self.franchise = Franchise.objects.create(name="Dash Token Franchise")
+        self.dash = Dash.objects.create(
+            franchise=self.franchise, email="dash@example.com", password="secret"
+        )
+
+    def test_concurrent_callers_share_one_login(self):
+        tokens = []
+
+        def worker():
+            try:
+                dash_obj, error = token_manager.get(Dash(pk=self.dash.pk))
+                tokens.append(dash_obj.access_token)
+            finally:
+                connection.close()
+
+        with StubDashServer() as stub:
+            threads = [threading.Thread(target=worker) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(stub.logins()), 1)
+        self.assertEqual(len(set(tokens)), 1)
+        self.dash.refresh_from_db()
+        self.assertEqual(self.dash.access_token, tokens[0])
+
+    def test_token_is_refreshed_before_it_expires(self):
+        self.dash.access_token = "almost-expired"
+        self.dash.expires_at = timezone.now() + timedelta(seconds=30)
+        self.dash.save()
+
+        with StubDashServer() as stub:
+            dash_obj, _ = token_manager.get(self.dash)
+            token_manager.get(self.dash)
+
+        self.assertEqual(len(stub.logins()), 1)
+        self.assertNotEqual(dash_obj.access_token, "almost-expired")
+
+
+class SendOrdersToDashViewTests(APITestCase):
+    def setUp(self):
+        token_manager.clear()
+        self.franchise = Franchise.objects.create(name="Dash Bulk Franchise")
+        self.user = CustomUser.objects.create_user(
+            username="dash_bulk",
+            email="dash_bulk@example.com",
+            phone_number="9876543801",
+            password="password123",
+            role="Franchise",
+            franchise=self.franchise,
+        )
+        Dash.objects.create(
+            franchise=self.franchise, email="dash@example.com", password="secret"
+        )
+        inventory = Inventory.objects.create(
+            product=Product.objects.create(name="Hair Oil"),
+            franchise=self.franchise,
+            quantity=100,
+        )
+        self.orders = []
+        for index, order_status in enumerate(
+            ["Processing", "Processing", "Processing", "Delivered"]
+        ):
+            order = Order.objects.create(
+                full_name=f"Dash Customer {index}",
+                phone_number=f"98000005{index:02d}",
+                delivery_address="Kathmandu",
+                payment_method="Cash on Delivery",
+                sales_person=self.user,
+                franchise=self.franchise,
+                order_status=order_status,
+                total_amount=Decimal("1500.00"),
+            )
+            OrderProduct.objects.create(order=order, product=inventory, quantity=1)
+            self.orders.append(order)
+
+    def test_bulk_send_uses_one_login_and_one_call(self):
+        self.client.force_authenticate(user=self.user)
+        with StubDashServer() as stub:
+            response = self.client.post(
+                "/api/dash/send-orders/",
+                {"order_ids": [order.id for order in self.orders]},
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(stub.logins()), 1)
+        self.assertEqual(len(stub.hits), 2)
+        self.assertEqual(response.data["sent"], 3)
+        self.assertEqual(response.data["failed"], 1)
+        self.assertEqual(
+            [row["status"] for row in response.data["results"]],
+            ["success", "success", "success", "error"],
+        )
+        for order in self.orders[:3]:
+            order.refresh_from_db()
+            self.assertEqual(order.order_status, "Sent to Dash")
+            self.assertEqual(order.tracking_code, f"DASH-{order.id}")
+
+    def test_single_order_view_runs_async(self):
+        self.client.force_authenticate(user=self.user)
+        order = self.orders[0]
+        with StubDashServer() as stub:
+            response = self.client.post(f"/api/dash/send-order/{order.id}/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(stub.hits), 2)
+        order.refresh_from_db()
+        self.assertEqual(order.order_status, "Sent to Dash")
+        self.assertEqual(order.tracking_code, f"DASH-{order.id}")
+
+    async def test_single_order_sends_overlap_under_asgi(self):
+        client = AsyncClient()
+        auth = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        orders = self.orders[:3]
+        with StubDashServer(delay=0.5):
+            started = time.monotonic()
+            responses = await asyncio.gather(
+                *(
+                    client.post(f"/api/dash/send-order/{order.id}/", headers=auth)
+                    for order in orders
+                )
+            )
+            elapsed = time.monotonic() - started
+
+        self.assertEqual([r.status_code for r in responses], [200] * 3)
+        # Three 0.5s courier calls in flight together, not one after another.
+        self.assertLess(elapsed, 1.2)
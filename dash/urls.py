@@ -5,6 +5,7 @@ from .views import (
     DashListCreateView,
     DashLoginView,
     SendOrderToDashByIdView,
+    SendOrdersToDashView,
 )
 
 urlpatterns = [
@@ -14,6 +15,7 @@ urlpatterns = [
         SendOrderToDashByIdView.as_view(),
         name="send-order-to-dash",
     ),
+    path("send-orders/", SendOrdersToDashView.as_view(), name="send-orders-to-dash"),
     path("create/", DashListCreateView.as_view(), name="dash-list-create"),
     path("dash-status/", CheckDashLoginStatus.as_view(), name="dash-status"),
 ]
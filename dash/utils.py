@@ -0,0 +1,342 @@
+import logging
+import os
+import threading
+from datetime import timedelta
+
+import requests
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from core.async_views import run_io
+from logistics.outbox import CourierHandler, PermanentDispatchError
+
+from .models import Dash
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DASH_BASE_URL = os.getenv("DASH_BASE_URL")
+CLIENT_SECRET = os.getenv("CLIENT_SECRET")
+CLIENT_ID = os.getenv("CLIENT_ID")
+GRANT_TYPE = os.getenv("GRANT_TYPE")
+
+# Tokens are renewed this many seconds before Dash says they expire.
+DASH_TOKEN_REFRESH_MARGIN = int(os.getenv("DASH_TOKEN_REFRESH_MARGIN", 300))
+DASH_POOL_SIZE = int(os.getenv("DASH_POOL_SIZE", 10))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_dash_session():
+    """Process-wide keep-alive session for every call to the Dash API."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=DASH_POOL_SIZE, pool_maxsize=DASH_POOL_SIZE
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def dash_login(email, password, dash_obj=None):
+    """
+    Log in to Dash and store the new tokens on the franchise's Dash record.
+
+    Returns ``(dash_obj, None)`` on success or ``(None, error_dict)``.
+    """
+    # Use values from dash_obj if provided, else use defaults
+    client_id = dash_obj.client_id if dash_obj.client_id is not None else CLIENT_ID
+    client_secret = (
+        dash_obj.client_secret if dash_obj.client_secret is not None else CLIENT_SECRET
+    )
+    grant_type = dash_obj.grant_type if dash_obj.grant_type is not None else GRANT_TYPE
+    body = {
+        "clientId": client_id,
+        "clientSecret": client_secret,
+        "grantType": grant_type,
+        "email": email,
+        "password": password,
+    }
+    try:
+        response = get_dash_session().post(
+            f"{DASH_BASE_URL}/api/v1/login/client/", json=body, timeout=30
+        )
+        logger.info(
+            "Dash login for franchise id=%s -> %s",
+            dash_obj.franchise_id,
+            response.status_code,
+        )
+        if response.status_code == 200:
+            data = response.json().get("data", {})
+            access_token = data.get("accessToken")
+            refresh_token = data.get("refreshToken")
+            expires_in = data.get("expiresIn")
+            expires_at = (
+                timezone.now() + timedelta(seconds=expires_in) if expires_in else None
+            )
+            dash_defaults = {
+                "password": password,
+                "access_token": access_token,
+                "refresh_token": refresh_token,
+                "expires_at": expires_at,
+                "client_id": client_id,
+                "client_secret": client_secret,
+                "grant_type": grant_type,
+            }
+            dash_obj_db, created = Dash.objects.update_or_create(
+                franchise=dash_obj.franchise,
+                email=email,
+                defaults=dash_defaults,
+            )
+            token_manager.store(dash_obj_db)
+            return dash_obj_db, None
+        elif response.status_code == 422:
+            return None, response.json()
+        else:
+            return None, {
+                "error": "Failed to login to Dash",
+                "details": response.text,
+                "status": response.status_code,
+            }
+    except requests.RequestException as e:
+        return None, {"error": "Failed to login to Dash", "details": str(e)}
+
+
+class DashTokenManager:
+    """
+    Per-franchise Dash access tokens cached for the whole process.
+
+    * Tokens are served from memory until ``refresh_margin`` seconds before
+      they expire, so requests never wait on a login for a token that is
+      about to lapse.
+    * Refreshes are single-flight: one thread per Dash account logs in while
+      the others wait on its lock, and the Dash row is locked with
+      ``select_for_update`` so other workers reuse the token instead of
+      logging in again.
+    * ``invalidate`` drops a token Dash rejected (401) so the next call
+      logs in again.
+    """
+
+    def __init__(self, refresh_margin=DASH_TOKEN_REFRESH_MARGIN):
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self._tokens = {}  # Dash pk -> (access_token, expires_at)
+        self._rejected = {}  # Dash pk -> last token Dash answered 401 to
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _lock_for(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _is_fresh(self, access_token, expires_at):
+        if not access_token:
+            return False
+        return expires_at is None or expires_at - self.refresh_margin > timezone.now()
+
+    def store(self, dash_obj):
+        self._tokens[dash_obj.pk] = (dash_obj.access_token, dash_obj.expires_at)
+        self._rejected.pop(dash_obj.pk, None)
+
+    def invalidate(self, dash_obj, access_token):
+        cached = self._tokens.get(dash_obj.pk)
+        if cached and cached[0] == access_token:
+            self._tokens.pop(dash_obj.pk, None)
+        self._rejected[dash_obj.pk] = access_token
+
+    def clear(self):
+        self._tokens.clear()
+        self._rejected.clear()
+
+    def get(self, dash_obj):
+        """
+        Return ``(dash_obj, None)`` with a fresh ``access_token`` set on it,
+        or ``(None, error_dict)`` when Dash refused the login.
+        """
+        cached = self._tokens.get(dash_obj.pk)
+        if cached and self._is_fresh(*cached):
+            dash_obj.access_token, dash_obj.expires_at = cached
+            return dash_obj, None
+
+        with self._lock_for(dash_obj.pk):
+            cached = self._tokens.get(dash_obj.pk)
+            if cached and self._is_fresh(*cached):
+                dash_obj.access_token, dash_obj.expires_at = cached
+                return dash_obj, None
+
+            with transaction.atomic():
+                current = Dash.objects.select_for_update().get(pk=dash_obj.pk)
+                if self._is_fresh(
+                    current.access_token, current.expires_at
+                ) and current.access_token != self._rejected.get(dash_obj.pk):
+                    # Another worker already logged in.
+                    self.store(current)
+                    return current, None
+                return dash_login(current.email, current.password, dash_obj=current)
+
+
+token_manager = DashTokenManager()
+
+
+def refresh_dash_token_if_expired(dash_obj):
+    """
+    Make sure ``dash_obj`` carries a usable access token, logging in again
+    when it is missing, expired or about to expire.
+
+    Returns (dash_obj, error) like ``dash_login``.
+    """
+    return token_manager.get(dash_obj)
+
+
+def build_dash_customer(order, order_products=None):
+    """
+    Build the Dash ``customers`` entry for an order.
+
+    ``order_products`` may be passed when the caller already loaded them.
+    """
+    if order_products is None:
+        order_products = order.order_products.select_related("product__product")
+    product_name = ", ".join(
+        [f"{op.quantity}-{op.product.product.name}" for op in order_products]
+    )
+
+    product_price = order.total_amount
+    if order.prepaid_amount:
+        product_price = order.total_amount - order.prepaid_amount
+
+    payment_type = (
+        "pre-paid"
+        if order.prepaid_amount and (order.total_amount - order.prepaid_amount) == 0
+        else "cashOnDelivery"
+    )
+    address_parts = []
+    if getattr(order, "delivery_address", None):
+        address_parts.append(order.delivery_address)
+    if getattr(order, "city", None):
+        address_parts.append(order.city)
+    full_address = ", ".join(address_parts)
+
+    return {
+        "receiver_name": order.full_name,
+        "receiver_contact": order.phone_number,
+        "receiver_alternate_number": order.alternate_phone_number or "",
+        "receiver_address": full_address,
+        "receiver_location": order.location.name if order.location else "",
+        "payment_type": payment_type,
+        "product_name": product_name,
+        "client_note": order.remarks or "",
+        "receiver_landmark": order.landmark or "",
+        "order_reference_id": str(order.id),
+        "product_price": float(product_price),
+    }
+
+
+def post_dash_orders(access_token, customers, session=None):
+    """POST ``customers`` to the Dash add-order endpoint and return the JSON body."""
+    http = session or get_dash_session()
+    response = http.post(
+        f"{DASH_BASE_URL}/api/v1/clientOrder/add-order",
+        json={"customers": customers},
+        headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {access_token}",
+        },
+        timeout=30,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def send_dash_orders(dash_obj, customers):
+    """
+    Post ``customers`` with the franchise's cached token.
+
+    If Dash rejects the token (401) it is dropped and the call is retried
+    once with a fresh login. Returns ``(response_data, error)``; request
+    failures other than the login raise ``requests.RequestException``.
+    """
+    for attempt in range(2):
+        dash_obj, error = token_manager.get(dash_obj)
+        if not dash_obj:
+            return None, error
+        try:
+            return post_dash_orders(dash_obj.access_token, customers), None
+        except requests.HTTPError as exc:
+            if attempt or exc.response is None or exc.response.status_code != 401:
+                raise
+            token_manager.invalidate(dash_obj, dash_obj.access_token)
+
+
+async def asend_dash_orders(dash_obj, customers):
+    """
+    ``send_dash_orders`` for async views: token work runs in the request's
+    ORM thread and the add-order POST on ``run_io``.
+    """
+    for attempt in range(2):
+        dash_obj, error = await sync_to_async(token_manager.get)(dash_obj)
+        if not dash_obj:
+            return None, error
+        try:
+            data = await run_io(post_dash_orders, dash_obj.access_token, customers)
+            return data, None
+        except requests.HTTPError as exc:
+            if attempt or exc.response is None or exc.response.status_code != 401:
+                raise
+            await sync_to_async(token_manager.invalidate)(
+                dash_obj, dash_obj.access_token
+            )
+
+
+def extract_dash_tracking_codes(response_data):
+    detail = (response_data.get("data") or {}).get("detail") or []
+    return [
+        {
+            "tracking_code": item.get("tracking_code"),
+            "order_reference_id": item.get("order_reference_id"),
+        }
+        for item in detail
+    ]
+
+
+class DashOutboxHandler(CourierHandler):
+    """Delivers queued "Sent to Dash" pushes for the courier outbox."""
+
+    def prepare(self, entry):
+        from .models import Dash
+
+        order = entry.order
+        dash_obj = Dash.objects.filter(franchise_id=order.franchise_id).first()
+        if dash_obj is None:
+            raise PermanentDispatchError("Dash credentials not found.")
+
+        dash_obj, error = refresh_dash_token_if_expired(dash_obj)
+        if not dash_obj:
+            raise RuntimeError(f"Failed to refresh Dash token: {error}")
+
+        return {
+            "access_token": dash_obj.access_token,
+            "customer": build_dash_customer(order),
+        }
+
+    def send(self, prepared):
+        try:
+            return post_dash_orders(prepared["access_token"], [prepared["customer"]])
+        except requests.HTTPError as exc:
+            if exc.response is not None and exc.response.status_code in (400, 422):
+                raise PermanentDispatchError(str(exc)) from exc
+            raise
+
+    def apply(self, entry, result):
+        tracking_codes = extract_dash_tracking_codes(result)
+        if tracking_codes and tracking_codes[0]["tracking_code"]:
+            entry.order.tracking_code = tracking_codes[0]["tracking_code"]
+            entry.order.save(update_fields=["tracking_code", "updated_at"])
@@ -1,27 +1,32 @@
 import os
-from datetime import timedelta
 
 import requests
+from asgiref.sync import sync_to_async
+from django.db import transaction
 from django.utils import timezone
-from dotenv import load_dotenv
 from rest_framework import status
 from rest_framework.generics import ListCreateAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from sales.models import Order, OrderProduct
+from core.async_views import AsyncAPIView
+from logistics.outbox import enqueue_courier_push, is_deferred
+from logistics.transitions import transition_orders
+from sales.models import Order
 
 from .models import Dash
 from .serializers import DashLoginSerializer, DashSerializer
+from .utils import (
+    asend_dash_orders,
+    build_dash_customer,
+    dash_login,
+    extract_dash_tracking_codes,
+    send_dash_orders,
+)
 
-load_dotenv()
-
-# Reusable function for Dash login
-DASH_BASE_URL = os.getenv("DASH_BASE_URL")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
-CLIENT_ID = os.getenv("CLIENT_ID")
-GRANT_TYPE = os.getenv("GRANT_TYPE")
+# Orders posted to Dash per add-order call by SendOrdersToDashView.
+DASH_BULK_CHUNK_SIZE = int(os.getenv("DASH_BULK_CHUNK_SIZE", 50))
 
 
 class DashListCreateView(ListCreateAPIView):
@@ -47,64 +52,6 @@ class DashListCreateView(ListCreateAPIView):
         )
 
 
-def dash_login(email, password, dash_obj=None):
-    # Use values from dash_obj if provided, else use defaults
-    client_id = dash_obj.client_id if dash_obj.client_id is not None else CLIENT_ID
-    print("client_id", client_id)
-    client_secret = (
-        dash_obj.client_secret if dash_obj.client_secret is not None else CLIENT_SECRET
-    )
-    print("client_secret", client_secret)
-    grant_type = dash_obj.grant_type if dash_obj.grant_type is not None else GRANT_TYPE
-    print("grant_type", grant_type)
-    DASH_LOGIN_URL = f"{DASH_BASE_URL}/api/v1/login/client/"
-    print("DASH_LOGIN_URL", DASH_LOGIN_URL)
-    body = {
-        "clientId": client_id,
-        "clientSecret": client_secret,
-        "grantType": grant_type,
-        "email": email,
-        "password": password,
-    }
-    print("body", body)
-    try:
-        response = requests.post(DASH_LOGIN_URL, json=body)
-        print("response", response)
-        if response.status_code == 200:
-            data = response.json().get("data", {})
-            access_token = data.get("accessToken")
-            refresh_token = data.get("refreshToken")
-            expires_in = data.get("expiresIn")
-            expires_at = (
-                timezone.now() + timedelta(seconds=expires_in) if expires_in else None
-            )
-            dash_defaults = {
-                "password": password,
-                "access_token": access_token,
-                "refresh_token": refresh_token,
-                "expires_at": expires_at,
-                "client_id": client_id,
-                "client_secret": client_secret,
-                "grant_type": grant_type,
-            }
-            dash_obj_db, created = Dash.objects.update_or_create(
-                franchise=dash_obj.franchise,
-                email=email,
-                defaults=dash_defaults,
-            )
-            return dash_obj_db, None
-        elif response.status_code == 422:
-            return None, response.json()
-        else:
-            return None, {
-                "error": "Failed to login to Dash",
-                "details": response.text,
-                "status": response.status_code,
-            }
-    except requests.RequestException as e:
-        return None, {"error": "Failed to login to Dash", "details": str(e)}
-
-
 class DashLoginView(APIView):
     permission_classes = [IsAuthenticated]
     serializer_class = DashLoginSerializer
@@ -145,10 +92,10 @@ class DashLoginView(APIView):
             return Response(error, status=status_code)
 
 
-class SendOrderToDashByIdView(APIView):
+class SendOrderToDashByIdView(AsyncAPIView):
     permission_classes = [IsAuthenticated]
 
-    def post(self, request, order_id):
+    def _prepare(self, request, order_id):
         user = request.user
         if not hasattr(user, "franchise") or not user.franchise:
             return Response({"error": "User does not have a franchise."}, status=400)
@@ -157,38 +104,6 @@ class SendOrderToDashByIdView(APIView):
         except Dash.DoesNotExist:
             return Response({"error": "Dash credentials not found."}, status=404)
 
-        # Check if token is missing or expired
-        if not dash_obj.access_token or (
-            dash_obj.expires_at and dash_obj.expires_at <= timezone.now()
-        ):
-            # Clear expired tokens before relogin
-            dash_obj.access_token = None
-            dash_obj.refresh_token = None
-            dash_obj.expires_at = None
-            dash_obj.save()
-
-            # Relogin to get fresh access token
-            dash_obj, error = dash_login(
-                dash_obj.email, dash_obj.password, dash_obj=dash_obj
-            )
-            if not dash_obj:
-                status_code = error.get("status", 400)
-                return Response(
-                    {"error": "Failed to refresh Dash token", **error},
-                    status=status_code,
-                )
-
-            # Refresh the dash_obj from database to get the updated access_token
-            dash_obj.refresh_from_db()
-
-        access_token = dash_obj.access_token
-
-        DASH_API_URL = f"{DASH_BASE_URL}/api/v1/clientOrder/add-order"
-        HEADERS = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {access_token}",
-        }
-
         try:
             order = Order.objects.get(id=order_id)
         except Order.DoesNotExist:
@@ -204,66 +119,44 @@ class SendOrderToDashByIdView(APIView):
         if order.order_status != "Processing":
             return Response({"error": "Order is not in Processing status."}, status=400)
 
-        order_products = OrderProduct.objects.filter(order=order)
-        product_name = ", ".join(
-            [f"{op.quantity}-{op.product.product.name}" for op in order_products]
-        )
+        # Deferred mode: mark the order as sent and let the outbox dispatcher
+        # talk to Dash, so this request never waits on the courier API.
+        if is_deferred(request):
+            with transaction.atomic():
+                transition_orders([order], "Sent to Dash", user=user)
+                entry = enqueue_courier_push(order, "DASH", user=user)
+            return Response(
+                {"message": "Order queued for Dash.", "outbox_id": entry.id},
+                status=202,
+            )
 
-        product_price = order.total_amount
-        if order.prepaid_amount:
-            product_price = order.total_amount - order.prepaid_amount
+        return dash_obj, order, build_dash_customer(order)
 
-        payment_type = (
-            "pre-paid"
-            if order.prepaid_amount and (order.total_amount - order.prepaid_amount) == 0
-            else "cashOnDelivery"
+    def _save(self, order, tracking_codes, user):
+        if tracking_codes:
+            order.tracking_code = tracking_codes[0]["tracking_code"]
+        transition_orders(
+            [order], "Sent to Dash", user=user, update_fields=["tracking_code"]
         )
-        address_parts = []
-        if getattr(order, "delivery_address", None):
-            address_parts.append(order.delivery_address)
-        if getattr(order, "city", None):
-            address_parts.append(order.city)
-        full_address = ", ".join(address_parts)
-
-        customer = {
-            "receiver_name": order.full_name,
-            "receiver_contact": order.phone_number,
-            "receiver_alternate_number": order.alternate_phone_number or "",
-            "receiver_address": full_address,
-            "receiver_location": order.location.name if order.location else "",
-            "payment_type": payment_type,
-            "product_name": product_name,
-            "client_note": order.remarks or "",
-            "receiver_landmark": order.landmark or "",
-            "order_reference_id": str(order.id),
-            "product_price": float(product_price),
-        }
 
-        payload = {"customers": [customer]}
+    async def post(self, request, order_id):
+        prepared = await sync_to_async(self._prepare)(request, order_id)
+        if isinstance(prepared, Response):
+            return prepared
+        dash_obj, order, customer = prepared
+
         try:
-            dash_response = requests.post(
-                DASH_API_URL, json=payload, headers=HEADERS, timeout=30
-            )
-            dash_response.raise_for_status()
+            # Uses the cached franchise token, logging in only when needed
+            response_data, error = await asend_dash_orders(dash_obj, [customer])
+            if error is not None:
+                return Response(
+                    {"error": "Failed to refresh Dash token", **error},
+                    status=error.get("status", 400),
+                )
 
             # Parse the response to get tracking codes
-            response_data = dash_response.json()
-            tracking_codes = []
-            if response_data.get("data", {}).get("detail"):
-                tracking_codes = [
-                    {
-                        "tracking_code": item.get("tracking_code"),
-                        "order_reference_id": item.get("order_reference_id"),
-                    }
-                    for item in response_data["data"]["detail"]
-                ]
-
-                if tracking_codes:
-                    order.tracking_code = tracking_codes[0]["tracking_code"]
-                    order.save()
-
-            order.order_status = "Sent to Dash"
-            order.save()
+            tracking_codes = extract_dash_tracking_codes(response_data)
+            await sync_to_async(self._save)(order, tracking_codes, request.user)
 
             return Response(
                 {
@@ -280,6 +173,121 @@ class SendOrderToDashByIdView(APIView):
             )
 
 
+class SendOrdersToDashView(APIView):
+    """
+    POST /api/dash/send-orders/  {"order_ids": [1, 2, ...]}
+
+    Sends several Processing orders of the user's franchise to Dash with one
+    token and one keep-alive connection, ``DASH_BULK_CHUNK_SIZE`` orders per
+    add-order call. Returns one result per requested id. With ``defer`` the
+    orders are marked "Sent to Dash" and queued on the courier outbox.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        user = request.user
+        if not hasattr(user, "franchise") or not user.franchise:
+            return Response({"error": "User does not have a franchise."}, status=400)
+
+        order_ids = request.data.get("order_ids")
+        if not isinstance(order_ids, list) or not order_ids:
+            return Response(
+                {"error": "order_ids must be a non-empty list."}, status=400
+            )
+        try:
+            order_ids = list(dict.fromkeys(int(order_id) for order_id in order_ids))
+        except (TypeError, ValueError):
+            return Response({"error": "order_ids must be integers."}, status=400)
+
+        dash_obj = Dash.objects.filter(franchise=user.franchise).first()
+        if dash_obj is None:
+            return Response({"error": "Dash credentials not found."}, status=404)
+
+        orders = {
+            order.id: order
+            for order in Order.objects.filter(
+                id__in=order_ids, franchise=user.franchise
+            )
+            .select_related("location")
+            .prefetch_related("order_products__product__product")
+        }
+
+        results = {}
+        eligible = []
+        for order_id in order_ids:
+            order = orders.get(order_id)
+            if order is None:
+                results[order_id] = {"status": "error", "error": "Order not found."}
+            elif order.order_status == "Sent to Dash":
+                results[order_id] = {
+                    "status": "error",
+                    "error": "Order has already been sent to Dash.",
+                }
+            elif order.order_status != "Processing":
+                results[order_id] = {
+                    "status": "error",
+                    "error": "Order is not in Processing status.",
+                }
+            else:
+                eligible.append(order)
+
+        if is_deferred(request):
+            with transaction.atomic():
+                transition_orders(eligible, "Sent to Dash", user=user)
+                for order in eligible:
+                    entry = enqueue_courier_push(order, "DASH", user=user)
+                    results[order.id] = {"status": "queued", "outbox_id": entry.id}
+            return Response(self._summary(order_ids, results), status=202)
+
+        sent = []
+        for start in range(0, len(eligible), DASH_BULK_CHUNK_SIZE):
+            chunk = eligible[start : start + DASH_BULK_CHUNK_SIZE]
+            customers = [
+                build_dash_customer(order, order.order_products.all())
+                for order in chunk
+            ]
+            try:
+                response_data, error = send_dash_orders(dash_obj, customers)
+            except requests.RequestException as e:
+                response_data, error = None, {"details": str(e)}
+            if error is not None:
+                message = error.get("error") or "Failed to send orders to Dash."
+                for order in chunk:
+                    results[order.id] = {
+                        "status": "error",
+                        "error": message,
+                        "details": error.get("details"),
+                    }
+                continue
+
+            tracking = {
+                item["order_reference_id"]: item["tracking_code"]
+                for item in extract_dash_tracking_codes(response_data)
+            }
+            for order in chunk:
+                tracking_code = tracking.get(str(order.id))
+                if tracking_code:
+                    order.tracking_code = tracking_code
+                sent.append(order)
+                results[order.id] = {
+                    "status": "success",
+                    "tracking_code": tracking_code,
+                }
+
+        if sent:
+            transition_orders(
+                sent, "Sent to Dash", user=user, update_fields=["tracking_code"]
+            )
+        return Response(self._summary(order_ids, results), status=200)
+
+    @staticmethod
+    def _summary(order_ids, results):
+        rows = [{"order_id": order_id, **results[order_id]} for order_id in order_ids]
+        failed = sum(row["status"] == "error" for row in rows)
+        return {"sent": len(rows) - failed, "failed": failed, "results": rows}
+
+
 class CheckDashLoginStatus(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -15,7 +15,9 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from account.models import CustomUser, Franchise
-from sales.models import Order, OrderProduct
+from logistics.transitions import transition_orders
+from sales.archive import historical_orders
+from sales.models import ArchivedOrder, Order, OrderProduct
 
 # Create your views here.
 
@@ -119,7 +121,7 @@ class OrderCSVExportView(generics.GenericAPIView):
                 ])
 
             # After successful export, update all processed orders to "Sent to Dash"
-            orders.update(order_status="Sent to Dash")
+            transition_orders(orders, "Sent to Dash", user=user)
 
             return response
 
@@ -1137,6 +1139,50 @@ class YachuFullOrderExportView(APIView):
             yield self._echo_row(buf, writer, fixed_values + product_values)
 
 
+def _old_order_row(index, order):
+    """Spreadsheet row of a hot Order or an ArchivedOrder for the old-order exports."""
+    if isinstance(order, ArchivedOrder):
+        data = order.payload
+        products = [
+            (p["quantity"], p["product"]["name"]) for p in data["order_products"]
+        ]
+        location = data.get("location_name") or ""
+    else:
+        data = {
+            "alternate_phone_number": order.alternate_phone_number,
+            "delivery_address": order.delivery_address,
+            "city": order.city,
+            "landmark": order.landmark,
+            "payment_method": order.payment_method,
+            "remarks": order.remarks,
+        }
+        products = [
+            (p.quantity, p.product.product.name) for p in order.order_products.all()
+        ]
+        location = order.location.name if order.location else ""
+
+    return [
+        index,
+        order.order_code or "",
+        timezone.localtime(order.created_at).strftime("%Y-%m-%d %H:%M:%S")
+        if order.created_at
+        else "",
+        order.full_name,
+        order.phone_number,
+        data["alternate_phone_number"] or "",
+        data["delivery_address"],
+        data["city"] or "",
+        location,
+        data["landmark"] or "",
+        ", ".join(f"{quantity}x {name}" for quantity, name in products),
+        float(order.total_amount) if order.total_amount else 0.0,
+        float(order.prepaid_amount) if order.prepaid_amount else 0.0,
+        data["payment_method"],
+        order.order_status,
+        data["remarks"] or "",
+    ]
+
+
 class UniqueOldOrdersExcelExportView(APIView):
     """
     Exports a unique list of historical orders (older than 6 months).
@@ -1151,19 +1197,16 @@ class UniqueOldOrdersExcelExportView(APIView):
         # Calculate date/time 6 months ago
         six_months_ago = timezone.now() - timedelta(days=180)
 
-        # Query orders older than 6 months
+        # Query orders older than 6 months, archived ones included
         # We prefetch related fields to avoid N+1 queries
-        orders_qs = (
-            Order.objects
-            .filter(created_at__lt=six_months_ago)
-            .select_related("location")
-            .prefetch_related(
+        orders_qs = historical_orders(
+            hot=Order.objects.select_related("location").prefetch_related(
                 Prefetch(
                     "order_products",
                     queryset=OrderProduct.objects.select_related("product__product"),
                 )
-            )
-            .order_by("-id")
+            ),
+            created_at__lt=six_months_ago,
         )
 
         unique_orders = []
@@ -1172,7 +1215,7 @@ class UniqueOldOrdersExcelExportView(APIView):
 
         # Iterate over base queryset to collect exactly 7000 unique entries
         # Deduplicating on phone number and customer name
-        for order in orders_qs.iterator(chunk_size=1000):
+        for order in orders_qs:
             if len(unique_orders) >= 7000:
                 break
 
@@ -1250,34 +1293,7 @@ class UniqueOldOrdersExcelExportView(APIView):
 
         # Write rows
         for index, order in enumerate(unique_orders, 1):
-            # Format product details
-            products = order.order_products.all()
-            products_str = ", ".join([
-                f"{p.quantity}x {p.product.product.name}" for p in products
-            ])
-
-            row_data = [
-                index,
-                order.order_code or "",
-                timezone.localtime(order.created_at).strftime("%Y-%m-%d %H:%M:%S")
-                if order.created_at
-                else "",
-                order.full_name,
-                order.phone_number,
-                order.alternate_phone_number or "",
-                order.delivery_address,
-                order.city or "",
-                order.location.name if order.location else "",
-                order.landmark or "",
-                products_str,
-                float(order.total_amount) if order.total_amount else 0.0,
-                float(order.prepaid_amount) if order.prepaid_amount else 0.0,
-                order.payment_method,
-                order.order_status,
-                order.remarks or "",
-            ]
-
-            ws.append(row_data)
+            ws.append(_old_order_row(index, order))
 
             # Style current row
             row_num = index + 1
@@ -1328,18 +1344,17 @@ class RemainingOldOrdersExcelExportView(APIView):
 
         # 1. Identify the exact 7000 unique orders that would be exported to exclude them.
         # We query only the fields needed for deduplication to be memory and query-efficient.
-        exclude_qs = (
-            Order.objects
-            .filter(created_at__lt=six_months_ago)
-            .only("id", "phone_number", "full_name")
-            .order_by("-id")
+        exclude_qs = historical_orders(
+            hot=Order.objects.only("id", "phone_number", "full_name"),
+            cold=ArchivedOrder.objects.only("order_id", "phone_number", "full_name"),
+            created_at__lt=six_months_ago,
         )
 
         excluded_ids = set()
         seen_phones = set()
         seen_names = set()
 
-        for order in exclude_qs.iterator(chunk_size=1000):
+        for order in exclude_qs:
             if len(excluded_ids) >= 7000:
                 break
 
@@ -1356,21 +1371,20 @@ class RemainingOldOrdersExcelExportView(APIView):
 
             seen_phones.add(phone)
             seen_names.add(name)
-            excluded_ids.add(order.id)
+            excluded_ids.add(
+                order.order_id if isinstance(order, ArchivedOrder) else order.id
+            )
 
         # 2. Query the remaining orders older than 6 months (excluding the 7000 unique records)
-        orders_qs = (
-            Order.objects
-            .filter(created_at__lt=six_months_ago)
-            .exclude(id__in=excluded_ids)
-            .select_related("location")
-            .prefetch_related(
+        orders_qs = historical_orders(
+            hot=Order.objects.select_related("location").prefetch_related(
                 Prefetch(
                     "order_products",
                     queryset=OrderProduct.objects.select_related("product__product"),
                 )
-            )
-            .order_by("-id")
+            ),
+            exclude_ids=excluded_ids,
+            created_at__lt=six_months_ago,
         )
 
         # Create Excel workbook using openpyxl
@@ -1426,36 +1440,9 @@ class RemainingOldOrdersExcelExportView(APIView):
 
         # Write rows using iterator to keep memory consumption low
         has_data = False
-        for index, order in enumerate(orders_qs.iterator(chunk_size=1000), 1):
+        for index, order in enumerate(orders_qs, 1):
             has_data = True
-            # Format product details
-            products = order.order_products.all()
-            products_str = ", ".join([
-                f"{p.quantity}x {p.product.product.name}" for p in products
-            ])
-
-            row_data = [
-                index,
-                order.order_code or "",
-                timezone.localtime(order.created_at).strftime("%Y-%m-%d %H:%M:%S")
-                if order.created_at
-                else "",
-                order.full_name,
-                order.phone_number,
-                order.alternate_phone_number or "",
-                order.delivery_address,
-                order.city or "",
-                order.location.name if order.location else "",
-                order.landmark or "",
-                products_str,
-                float(order.total_amount) if order.total_amount else 0.0,
-                float(order.prepaid_amount) if order.prepaid_amount else 0.0,
-                order.payment_method,
-                order.order_status,
-                order.remarks or "",
-            ]
-
-            ws.append(row_data)
+            ws.append(_old_order_row(index, order))
 
             # Style current row
             row_num = index + 1
@@ -3,6 +3,7 @@ from unfold.admin import ModelAdmin
 
 from .models import (
     AssignOrder,
+    CourierOutbox,
     Invoice,
     OrderChangeLog,
     OrderComment,
@@ -11,6 +12,7 @@ from .models import (
     RiderPayout,
     YdmLogisticsSetting,
 )
+from .outbox import requeue
 
 # Register your models here.
 
@@ -133,3 +135,30 @@ class YdmLogisticsSettingAdmin(ModelAdmin):
 
 
 admin.site.register(YdmLogisticsSetting, YdmLogisticsSettingAdmin)
+
+
+class CourierOutboxAdmin(ModelAdmin):
+    list_display = (
+        "order",
+        "provider",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "last_error",
+        "created_at",
+        "sent_at",
+    )
+    list_filter = ("provider", "status", "created_at")
+    search_fields = ("order__order_code", "last_error")
+    list_select_related = ("order",)
+    readonly_fields = ("created_at", "updated_at", "sent_at", "response")
+    ordering = ("-created_at",)
+    actions = ["requeue_entries"]
+
+    @admin.action(description="Re-queue selected entries now")
+    def requeue_entries(self, request, queryset):
+        count = requeue(queryset)
+        self.message_user(request, f"Re-queued {count} outbox entries.")
+
+
+admin.site.register(CourierOutbox, CourierOutboxAdmin)
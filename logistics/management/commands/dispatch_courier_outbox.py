@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from logistics.outbox import dispatch_pending
+
+
+class Command(BaseCommand):
+    help = "Deliver queued courier pushes (YDM, Dash, PicknDrop, Daraz) from the outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process a single batch and exit instead of polling forever",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Maximum number of entries claimed per batch (default: 100)",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep when the outbox is empty (default: 5)",
+        )
+        parser.add_argument(
+            "--provider",
+            action="append",
+            dest="providers",
+            help="Only dispatch this provider (repeatable), e.g. --provider YDM",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        providers = options["providers"]
+
+        while True:
+            close_old_connections()
+            counts = dispatch_pending(batch_size=batch_size, providers=providers)
+            if counts:
+                self.stdout.write(
+                    "Dispatched batch: "
+                    + ", ".join(f"{key}={value}" for key, value in counts.items())
+                )
+
+            if options["once"]:
+                break
+            # Keep draining while there is a backlog, otherwise wait for work.
+            if sum(counts.values()) < batch_size:
+                time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS("Courier outbox dispatch finished."))
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from logistics.partitions import (
+    add_months,
+    create_partition,
+    detach_partition,
+    is_partitioned,
+    list_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming monthly OrderChangeLog partitions and detach old ones "
+        "(PostgreSQL only; run daily from cron)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=3,
+            help="Months after the current one that must have a partition (default: 3)",
+        )
+        parser.add_argument(
+            "--keep-months",
+            type=int,
+            help="Detach partitions older than this many months. Detached "
+            "partitions stay as plain archive tables with the same name.",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop detached partitions instead of keeping them as archives",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor != "postgresql":
+            self.stdout.write("OrderChangeLog is only partitioned on PostgreSQL.")
+            return
+        if not is_partitioned(connection):
+            raise CommandError(
+                "logistics_orderchangelog is not partitioned; run migrate first."
+            )
+        if options["drop"] and options["keep_months"] is None:
+            raise CommandError("--drop needs --keep-months")
+
+        dry_run = options["dry_run"]
+        existing = list_partitions(connection)
+        current = timezone.localdate().replace(day=1)
+
+        for offset in range(options["ahead"] + 1):
+            month = add_months(current, offset)
+            if month in existing:
+                continue
+            self.stdout.write(f"Creating partition for {month:%Y-%m}")
+            if not dry_run:
+                create_partition(connection, month)
+
+        if options["keep_months"] is not None:
+            oldest_kept = add_months(current, -options["keep_months"])
+            action = "Dropping" if options["drop"] else "Detaching"
+            for month, name in sorted(existing.items()):
+                if month >= oldest_kept:
+                    break
+                self.stdout.write(f"{action} {name}")
+                if not dry_run:
+                    detach_partition(connection, name, drop=options["drop"])
+
+        self.stdout.write(self.style.SUCCESS("OrderChangeLog partitions up to date."))
@@ -0,0 +1,111 @@
+# Only changes anything on PostgreSQL. Check it forward and backward there
+# with logistics.tests.ChangeLogPartitionMigrationTests before deploying edits.
+import re
+
+from django.db import migrations
+from django.utils import timezone
+
+from logistics.partitions import (
+    DEFAULT_PARTITION,
+    PARENT_TABLE,
+    add_months,
+    create_partition,
+)
+
+# Monthly partitions created ahead of the current month
+MONTHS_AHEAD = 3
+
+
+def rebuild_table(schema_editor, partitioned):
+    """
+    Swap logistics_orderchangelog for a copy that is (or is no longer)
+    partitioned by month, keeping the rows, id sequence, indexes and
+    foreign keys. PostgreSQL requires the partition key in the primary key,
+    so the partitioned table's primary key is (id, changed_at).
+    """
+    connection = schema_editor.connection
+    execute = schema_editor.execute
+    old = f"{PARENT_TABLE}_{'unpartitioned' if partitioned else 'partitioned'}"
+    sequence = f"{PARENT_TABLE}_id_seq"
+
+    execute(f"ALTER TABLE {PARENT_TABLE} RENAME TO {old}")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conname FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'p'",
+            [old],
+        )
+        primary_key = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s",
+            [old],
+        )
+        indexes = [row for row in cursor.fetchall() if row[0] != primary_key]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [old],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f"SELECT MIN(changed_at), MAX(id) FROM {old}")
+        first_change, max_id = cursor.fetchone()
+
+    execute(
+        f"CREATE TABLE {PARENT_TABLE} (LIKE {old})"
+        + (" PARTITION BY RANGE (changed_at)" if partitioned else "")
+    )
+    if partitioned:
+        execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT")
+        current = timezone.localdate().replace(day=1)
+        month = min(
+            current, timezone.localtime(first_change or timezone.now()).date()
+        ).replace(day=1)
+        while month <= add_months(current, MONTHS_AHEAD):
+            create_partition(connection, month)
+            month = add_months(month, 1)
+
+    execute(f"CREATE SEQUENCE {sequence}_new OWNED BY {PARENT_TABLE}.id")
+    execute(
+        f"ALTER TABLE {PARENT_TABLE} "
+        f"ALTER COLUMN id SET DEFAULT nextval('{sequence}_new')"
+    )
+    execute(f"INSERT INTO {PARENT_TABLE} SELECT * FROM {old}")
+    execute("SELECT setval(%s, %s, false)", [f"{sequence}_new", (max_id or 0) + 1])
+    # Drops the old table's own id sequence and frees the index names
+    execute(f"DROP TABLE {old}")
+    execute(f"ALTER SEQUENCE {sequence}_new RENAME TO {sequence}")
+
+    key = "id, changed_at" if partitioned else "id"
+    execute(
+        f"ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT {PARENT_TABLE}_pkey "
+        f"PRIMARY KEY ({key})"
+    )
+    for _, definition in indexes:
+        execute(
+            re.sub(
+                rf" ON (ONLY )?(\w+\.)?{old} ", f" ON {PARENT_TABLE} ", definition
+            )
+        )
+    for name, definition in foreign_keys:
+        execute(f"ALTER TABLE {PARENT_TABLE} ADD CONSTRAINT {name} {definition}")
+
+
+def partition_changelog(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        rebuild_table(schema_editor, partitioned=True)
+
+
+def unpartition_changelog(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        rebuild_table(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("logistics", "0017_courieroutbox"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_changelog, unpartition_changelog),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 from account.models import CustomUser
 from sales.models import Order
@@ -7,6 +8,7 @@ from sales.models import Order
 
 
 class OrderChangeLog(models.Model):
+    # Range-partitioned by changed_at month on PostgreSQL (logistics.partitions)
     order = models.ForeignKey(
         Order, on_delete=models.CASCADE, related_name="change_logs"
     )
@@ -261,3 +263,64 @@ class YdmLogisticsSetting(models.Model):
             },
         )
         return obj
+
+
+class CourierOutbox(models.Model):
+    """
+    Pending push of an order to an external courier.
+
+    Rows are written in the same transaction as the order status change and
+    delivered later by the ``dispatch_courier_outbox`` management command, so
+    the request that marks an order as sent never waits on a courier API.
+    """
+
+    PROVIDER_CHOICES = (
+        ("YDM", "YDM"),
+        ("DASH", "DASH"),
+        ("PicknDrop", "PicknDrop"),
+        ("Daraz", "Daraz"),
+    )
+    STATUS_PENDING = "pending"
+    STATUS_PROCESSING = "processing"
+    STATUS_SENT = "sent"
+    STATUS_DEAD = "dead"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "Pending"),
+        (STATUS_PROCESSING, "Processing"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_DEAD, "Dead"),
+    )
+
+    order = models.ForeignKey(
+        Order, on_delete=models.CASCADE, related_name="courier_outbox"
+    )
+    provider = models.CharField(max_length=20, choices=PROVIDER_CHOICES)
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Provider specific options captured when the push was queued.",
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    response = models.JSONField(null=True, blank=True)
+    created_by = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["next_attempt_at", "id"]
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+            models.Index(fields=["order", "provider"]),
+        ]
+
+    def __str__(self):
+        return f"{self.provider} - {self.order.order_code} ({self.status})"
@@ -0,0 +1,346 @@
+"""
+Transactional outbox for courier pushes.
+
+Views that mark an order as sent to a courier call ``enqueue_courier_push``
+inside the same ``transaction.atomic`` block that saves the new status. The
+``dispatch_courier_outbox`` management command later claims due rows and
+delivers them through the provider's handler:
+
+    prepare(entry)  -> runs on the dispatcher thread, may touch the ORM
+    send(prepared)  -> runs on a per-provider worker pool, HTTP only
+    apply(entry, r) -> runs on the dispatcher thread, persists the result
+
+or, for handlers that push many orders in one pass (``batch = True``):
+
+    send_batch(entries) -> runs on the dispatcher thread, pushes and persists
+                           every entry, returns {entry.pk: result or exception}
+
+Transient failures are retried with exponential backoff; permanent failures
+(and anything past ``COURIER_OUTBOX_MAX_ATTEMPTS``) are dead-lettered and can
+be re-queued from the admin.
+"""
+
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import CourierOutbox
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HANDLERS = {
+    "YDM": "ydm.services.ydm_service.YDMOutboxHandler",
+    "DASH": "dash.utils.DashOutboxHandler",
+    "PicknDrop": "pickndrop.utils.PickNDropOutboxHandler",
+    "Daraz": "daraz.services.package_service.DarazOutboxHandler",
+}
+DEFAULT_CONCURRENCY = 2
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_BACKOFF_BASE = 30  # seconds
+DEFAULT_BACKOFF_MAX = 60 * 60  # seconds
+DEFAULT_LEASE = 5 * 60  # seconds a claimed row stays reserved for one worker
+
+
+class PermanentDispatchError(Exception):
+    """Raised by a handler when retrying the push can never succeed."""
+
+
+class CourierHandler:
+    """
+    Base class for provider handlers.
+
+    ``prepare`` may return ``None`` when there is nothing to send (for example
+    the franchise has no courier credentials); the entry is then marked sent
+    without calling ``send``.
+
+    A batch handler implements ``send_batch`` instead. An exception in place
+    of an entry's result fails that entry; PermanentDispatchError dead-letters
+    it, anything else is retried.
+    """
+
+    batch = False
+
+    def prepare(self, entry):
+        raise NotImplementedError
+
+    def send(self, prepared):
+        raise NotImplementedError
+
+    def apply(self, entry, result):
+        pass
+
+    def send_batch(self, entries):
+        raise NotImplementedError
+
+
+def get_handler(provider):
+    handlers = {**DEFAULT_HANDLERS, **getattr(settings, "COURIER_OUTBOX_HANDLERS", {})}
+    if provider not in handlers:
+        raise PermanentDispatchError(f"No outbox handler for provider '{provider}'.")
+    return import_string(handlers[provider])()
+
+
+def get_concurrency(provider):
+    limits = getattr(settings, "COURIER_OUTBOX_CONCURRENCY", {})
+    return max(int(limits.get(provider, DEFAULT_CONCURRENCY)), 1)
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with full jitter, capped at COURIER_OUTBOX_BACKOFF_MAX."""
+    base = getattr(settings, "COURIER_OUTBOX_BACKOFF_BASE", DEFAULT_BACKOFF_BASE)
+    cap = getattr(settings, "COURIER_OUTBOX_BACKOFF_MAX", DEFAULT_BACKOFF_MAX)
+    ceiling = min(cap, base * (2 ** max(attempts - 1, 0)))
+    return timedelta(seconds=random.uniform(ceiling / 2, ceiling))
+
+
+def is_deferred(request):
+    """True when the caller asked for a queued push (``?defer=true`` or ``"defer": true``)."""
+    value = request.query_params.get("defer")
+    if value is None and hasattr(request.data, "get"):
+        value = request.data.get("defer")
+    return str(value).lower() in ["true", "1", "yes"]
+
+
+def enqueue_courier_push(order, provider, user=None, payload=None):
+    """
+    Queue a push of ``order`` to ``provider``.
+
+    Must be called inside the transaction that changes the order status so
+    both commit or roll back together. An entry that is still pending for the
+    same order and provider is reused instead of queueing a duplicate push.
+    """
+    existing = (
+        CourierOutbox.objects.select_for_update()
+        .filter(
+            order=order,
+            provider=provider,
+            status__in=[CourierOutbox.STATUS_PENDING, CourierOutbox.STATUS_PROCESSING],
+        )
+        .first()
+    )
+    if existing:
+        return existing
+    return CourierOutbox.objects.create(
+        order=order, provider=provider, created_by=user, payload=payload or {}
+    )
+
+
+def claim_due_entries(batch_size=100, providers=None):
+    """
+    Reserve up to ``batch_size`` due entries for this dispatcher.
+
+    Rows are locked with SKIP LOCKED so several dispatchers can run side by
+    side; a processing row whose lease expired (crashed worker) is reclaimed.
+    """
+    now = timezone.now()
+    lease = getattr(settings, "COURIER_OUTBOX_LEASE", DEFAULT_LEASE)
+    due = CourierOutbox.objects.filter(
+        Q(status=CourierOutbox.STATUS_PENDING, next_attempt_at__lte=now)
+        | Q(status=CourierOutbox.STATUS_PROCESSING, locked_until__lt=now)
+    )
+    if providers:
+        due = due.filter(provider__in=providers)
+
+    with transaction.atomic():
+        ids = list(
+            due.select_for_update(skip_locked=True)
+            .order_by("next_attempt_at", "id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        CourierOutbox.objects.filter(id__in=ids).update(
+            status=CourierOutbox.STATUS_PROCESSING,
+            locked_until=now + timedelta(seconds=lease),
+            updated_at=now,
+        )
+    return list(
+        CourierOutbox.objects.filter(id__in=ids)
+        .select_related("order", "order__franchise", "order__location")
+        .order_by("next_attempt_at", "id")
+    )
+
+
+def _mark_sent(entry, response):
+    entry.status = CourierOutbox.STATUS_SENT
+    entry.attempts += 1
+    entry.response = response if isinstance(response, (dict, list)) else None
+    entry.last_error = ""
+    entry.locked_until = None
+    entry.sent_at = timezone.now()
+    entry.save(
+        update_fields=[
+            "status",
+            "attempts",
+            "response",
+            "last_error",
+            "locked_until",
+            "sent_at",
+            "updated_at",
+        ]
+    )
+
+
+def _mark_failed(entry, exc, permanent=False):
+    max_attempts = getattr(
+        settings, "COURIER_OUTBOX_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS
+    )
+    entry.attempts += 1
+    entry.last_error = f"{type(exc).__name__}: {exc}"
+    entry.locked_until = None
+    if permanent or entry.attempts >= max_attempts:
+        entry.status = CourierOutbox.STATUS_DEAD
+        logger.error(
+            "Courier outbox entry %s (%s, order pk=%s) dead-lettered after %s attempt(s): %s",
+            entry.pk,
+            entry.provider,
+            entry.order_id,
+            entry.attempts,
+            entry.last_error,
+        )
+    else:
+        entry.status = CourierOutbox.STATUS_PENDING
+        entry.next_attempt_at = timezone.now() + backoff_delay(entry.attempts)
+        logger.warning(
+            "Courier outbox entry %s (%s, order pk=%s) failed, retry #%s at %s: %s",
+            entry.pk,
+            entry.provider,
+            entry.order_id,
+            entry.attempts,
+            entry.next_attempt_at,
+            entry.last_error,
+        )
+    entry.save(
+        update_fields=[
+            "status",
+            "attempts",
+            "last_error",
+            "locked_until",
+            "next_attempt_at",
+            "updated_at",
+        ]
+    )
+
+
+def _finish(entry, handler, result):
+    try:
+        with transaction.atomic():
+            handler.apply(entry, result)
+    except Exception as exc:  # noqa: BLE001
+        # The courier already accepted the push, so retrying would create a
+        # duplicate shipment. Dead-letter it for manual reconciliation.
+        _mark_failed(entry, exc, permanent=True)
+        return
+    _mark_sent(entry, result)
+
+
+def _dispatch_batch(handler, entries):
+    try:
+        outcomes = handler.send_batch(entries)
+    except Exception as exc:  # noqa: BLE001
+        outcomes = {entry.pk: exc for entry in entries}
+    for entry in entries:
+        outcome = outcomes[entry.pk]
+        if isinstance(outcome, Exception):
+            permanent = isinstance(outcome, PermanentDispatchError)
+            _mark_failed(entry, outcome, permanent=permanent)
+        else:
+            _mark_sent(entry, outcome)
+
+
+def dispatch_entries(entries):
+    """
+    Deliver already claimed ``entries``.
+
+    Each provider gets its own bounded thread pool so a slow courier cannot
+    starve the others. Returns a dict of counts keyed by final status.
+    """
+    by_provider = {}
+    for entry in entries:
+        by_provider.setdefault(entry.provider, []).append(entry)
+
+    pools = []
+    futures = {}
+    batches = []
+    try:
+        for provider, provider_entries in by_provider.items():
+            try:
+                handler = get_handler(provider)
+            except PermanentDispatchError as exc:
+                for entry in provider_entries:
+                    _mark_failed(entry, exc, permanent=True)
+                continue
+            if handler.batch:
+                batches.append((handler, provider_entries))
+                continue
+
+            pool = ThreadPoolExecutor(
+                max_workers=get_concurrency(provider),
+                thread_name_prefix=f"outbox-{provider}",
+            )
+            pools.append(pool)
+            for entry in provider_entries:
+                try:
+                    prepared = handler.prepare(entry)
+                except PermanentDispatchError as exc:
+                    _mark_failed(entry, exc, permanent=True)
+                    continue
+                except Exception as exc:  # noqa: BLE001
+                    _mark_failed(entry, exc)
+                    continue
+                if prepared is None:
+                    _mark_sent(entry, {})
+                    continue
+                futures[pool.submit(handler.send, prepared)] = (entry, handler)
+
+        # Batch handlers run here while the other providers' pools work
+        for handler, provider_entries in batches:
+            _dispatch_batch(handler, provider_entries)
+
+        for future in as_completed(futures):
+            entry, handler = futures[future]
+            try:
+                result = future.result()
+            except PermanentDispatchError as exc:
+                _mark_failed(entry, exc, permanent=True)
+                continue
+            except Exception as exc:  # noqa: BLE001
+                _mark_failed(entry, exc)
+                continue
+            _finish(entry, handler, result)
+    finally:
+        for pool in pools:
+            pool.shutdown(wait=True)
+
+    counts = {
+        CourierOutbox.STATUS_SENT: 0,
+        CourierOutbox.STATUS_PENDING: 0,
+        CourierOutbox.STATUS_DEAD: 0,
+    }
+    for entry in entries:
+        counts[entry.status] = counts.get(entry.status, 0) + 1
+    return counts
+
+
+def dispatch_pending(batch_size=100, providers=None):
+    """Claim one batch of due entries and deliver it."""
+    entries = claim_due_entries(batch_size=batch_size, providers=providers)
+    if not entries:
+        return {}
+    return dispatch_entries(entries)
+
+
+def requeue(queryset):
+    """Put dead-lettered (or stuck) entries back on the queue immediately."""
+    return queryset.exclude(status=CourierOutbox.STATUS_SENT).update(
+        status=CourierOutbox.STATUS_PENDING,
+        attempts=0,
+        next_attempt_at=timezone.now(),
+        locked_until=None,
+        updated_at=timezone.now(),
+    )
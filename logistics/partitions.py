@@ -0,0 +1,116 @@
+# logistics/partitions.py
+"""
+Monthly partitions of the OrderChangeLog table on PostgreSQL.
+
+Migration 0018 turns logistics_orderchangelog into a table range-partitioned
+by changed_at. Each calendar month in settings.TIME_ZONE gets its own
+partition named logistics_orderchangelog_pYYYY_MM, and a default partition
+catches anything outside them. ``manage.py manage_changelog_partitions``
+creates upcoming months and detaches (archives) old ones.
+
+Filter on ``changed_at`` ranges (see ``month_bounds``) rather than
+``__month``/``__date`` lookups so PostgreSQL can prune to one partition.
+"""
+
+import re
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import transaction
+
+PARENT_TABLE = "logistics_orderchangelog"
+DEFAULT_PARTITION = f"{PARENT_TABLE}_default"
+PARTITION_RE = re.compile(rf"^{PARENT_TABLE}_p(\d{{4}})_(\d{{2}})$")
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """Aware [start, end) datetimes of ``month`` in the project time zone."""
+    tz = ZoneInfo(settings.TIME_ZONE)
+    end = add_months(month, 1)
+    return (
+        datetime(month.year, month.month, 1, tzinfo=tz),
+        datetime(end.year, end.month, 1, tzinfo=tz),
+    )
+
+
+def partition_name(month):
+    return f"{PARENT_TABLE}_p{month.year}_{month.month:02d}"
+
+
+def is_partitioned(connection):
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [PARENT_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection):
+    """``{month: table name}`` of the attached monthly partitions."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [PARENT_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match:
+            partitions[date(int(match[1]), int(match[2]), 1)] = name
+    return partitions
+
+
+def create_partition(connection, month):
+    """
+    Create the partition for ``month``. Rows already sitting in the default
+    partition for that month are moved into it.
+    """
+    name = partition_name(month)
+    start, end = month_bounds(month)
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    in_range = "changed_at >= %s AND changed_at < %s"
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range})",
+            [start, end],
+        )
+        if not cursor.fetchone()[0]:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} "
+                f"PARTITION OF {PARENT_TABLE} FOR VALUES {bounds}"
+            )
+            return name
+        cursor.execute(
+            f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS)"
+        )
+        cursor.execute(
+            f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_range}",
+            [start, end],
+        )
+        cursor.execute(
+            f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}", [start, end]
+        )
+        cursor.execute(
+            f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} FOR VALUES {bounds}"
+        )
+    return name
+
+
+def detach_partition(connection, name, drop=False):
+    """Detach ``name``; it stays behind as a plain archive table unless dropped."""
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}")
+        if drop:
+            cursor.execute(f"DROP TABLE {name}")
@@ -1,13 +1,27 @@
-from datetime import date
+import json
+import threading
+import unittest
+from datetime import date, timedelta
 from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from account.models import CustomUser, Franchise
-from sales.models import Order
-from logistics.models import OrderChangeLog, AssignOrder, YdmLogisticsSetting
+from sales.models import Inventory, InventoryChangeLog, Order, OrderProduct, Product
+from logistics.models import CourierOutbox, OrderChangeLog, AssignOrder, YdmLogisticsSetting
+from logistics.outbox import dispatch_pending
+from logistics.partitions import add_months, month_bounds, partition_name
+from ydm.models import YDMLogistics
 
 
 class RiderDailyStatsViewTests(APITestCase):
@@ -451,3 +465,553 @@ class FranchiseStatementAPIViewTests(APITestCase):
 
 
 
+
+
+class StubCourierServer:
+    """Local HTTP server standing in for a courier API during tests."""
+
+    def __init__(self, status_code=201, body=None):
+        self.status_code = status_code
+        self.body = body if body is not None else {}
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                stub.requests.append(
+                    {
+                        "path": self.path,
+                        "headers": dict(self.headers),
+                        "json": json.loads(self.rfile.read(length) or b"{}"),
+                    }
+                )
+                payload = json.dumps(stub.body).encode()
+                self.send_response(stub.status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class CourierOutboxTests(APITestCase):
+    def setUp(self):
+        self.franchise = Franchise.objects.create(name="Outbox Franchise")
+        self.user = CustomUser.objects.create_user(
+            username="outbox_franchise",
+            email="outbox@example.com",
+            phone_number="9876543601",
+            password="password123",
+            role="Franchise",
+            franchise=self.franchise,
+        )
+        YDMLogistics.objects.create(franchise=self.franchise, api_key="test-key")
+        product = Product.objects.create(name="Hair Oil")
+        inventory = Inventory.objects.create(
+            product=product, franchise=self.franchise, quantity=10
+        )
+        self.order = Order.objects.create(
+            full_name="Outbox Customer",
+            phone_number="9800000301",
+            delivery_address="Kathmandu",
+            payment_method="Cash on Delivery",
+            sales_person=self.user,
+            franchise=self.franchise,
+            order_status="Processing",
+            total_amount=Decimal("1500.00"),
+        )
+        OrderProduct.objects.create(order=self.order, product=inventory, quantity=2)
+
+    def _queue(self):
+        return CourierOutbox.objects.create(order=self.order, provider="YDM")
+
+    def test_status_change_queues_push_without_calling_courier(self):
+        with StubCourierServer(body={"tracking_number": "YDM-1"}) as stub:
+            with override_settings(YDM_BASE_URL=stub.url):
+                self.client.force_authenticate(user=self.user)
+                response = self.client.patch(
+                    f"/api/sales/orders/{self.order.id}/",
+                    {"order_status": "Sent to YDM"},
+                    format="json",
+                )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(stub.requests, [])
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.order_status, "Sent to YDM")
+        entry = CourierOutbox.objects.get(order=self.order)
+        self.assertEqual(entry.provider, "YDM")
+        self.assertEqual(entry.status, CourierOutbox.STATUS_PENDING)
+
+    def test_dispatch_delivers_and_saves_tracking_code(self):
+        entry = self._queue()
+        with StubCourierServer(body={"tracking_number": "YDM-42"}) as stub:
+            with override_settings(YDM_BASE_URL=stub.url):
+                counts = dispatch_pending()
+
+        self.assertEqual(counts[CourierOutbox.STATUS_SENT], 1)
+        self.assertEqual(len(stub.requests), 1)
+        self.assertEqual(stub.requests[0]["path"], "/api/orders/")
+        self.assertEqual(stub.requests[0]["headers"]["X-API-KEY"], "test-key")
+        self.assertEqual(
+            stub.requests[0]["json"]["product"], [{"name": "Hair Oil", "quantity": 2}]
+        )
+        entry.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual(entry.status, CourierOutbox.STATUS_SENT)
+        self.assertEqual(self.order.tracking_code, "YDM-42")
+
+    def test_server_error_is_retried_with_backoff(self):
+        entry = self._queue()
+        with StubCourierServer(status_code=503, body={"detail": "down"}) as stub:
+            with override_settings(YDM_BASE_URL=stub.url):
+                dispatch_pending()
+                # Not due yet, so a second pass must not hit the courier again.
+                dispatch_pending()
+
+        self.assertEqual(len(stub.requests), 1)
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, CourierOutbox.STATUS_PENDING)
+        self.assertEqual(entry.attempts, 1)
+        self.assertGreater(entry.next_attempt_at, timezone.now())
+        self.assertIn("503", entry.last_error)
+
+    def test_exhausted_retries_are_dead_lettered(self):
+        entry = self._queue()
+        with StubCourierServer(status_code=503) as stub:
+            with override_settings(YDM_BASE_URL=stub.url, COURIER_OUTBOX_MAX_ATTEMPTS=2):
+                dispatch_pending()
+                CourierOutbox.objects.filter(id=entry.id).update(
+                    next_attempt_at=timezone.now()
+                )
+                dispatch_pending()
+
+        entry.refresh_from_db()
+        self.assertEqual(len(stub.requests), 2)
+        self.assertEqual(entry.status, CourierOutbox.STATUS_DEAD)
+
+    def test_validation_error_is_dead_lettered_immediately(self):
+        entry = self._queue()
+        with StubCourierServer(status_code=400, body={"phone": ["invalid"]}) as stub:
+            with override_settings(YDM_BASE_URL=stub.url):
+                dispatch_pending()
+
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, CourierOutbox.STATUS_DEAD)
+        self.assertEqual(entry.attempts, 1)
+
+
+class ChangeLogPartitionTests(APITestCase):
+    def test_month_helpers(self):
+        self.assertEqual(add_months(date(2025, 11, 1), 3), date(2026, 2, 1))
+        self.assertEqual(add_months(date(2026, 1, 1), -1), date(2025, 12, 1))
+        self.assertEqual(
+            partition_name(date(2026, 3, 1)), "logistics_orderchangelog_p2026_03"
+        )
+        start, end = month_bounds(date(2026, 12, 1))
+        self.assertEqual(
+            (start.year, start.month, start.day, start.hour), (2026, 12, 1, 0)
+        )
+        self.assertEqual((end.year, end.month), (2027, 1))
+        self.assertEqual(start.utcoffset(), timedelta(hours=5, minutes=45))
+
+    def test_month_range_matches_month_lookup(self):
+        sales_person = CustomUser.objects.create_user(
+            username="partition_sales",
+            phone_number="9876549001",
+            password="password123",
+            role="SalesPerson",
+        )
+        order = Order.objects.create(
+            full_name="Customer",
+            phone_number="9800000009",
+            payment_method="Cash on Delivery",
+            sales_person=sales_person,
+        )
+        month = date(2026, 5, 1)
+        start, end = month_bounds(month)
+        for changed_at in (
+            start - timedelta(minutes=1),
+            start,
+            end - timedelta(minutes=1),
+            end,
+        ):
+            log = OrderChangeLog.objects.create(
+                order=order, old_status="Pending", new_status="Delivered"
+            )
+            OrderChangeLog.objects.filter(pk=log.pk).update(changed_at=changed_at)
+
+        by_range = OrderChangeLog.objects.filter(
+            changed_at__gte=start, changed_at__lt=end
+        )
+        by_lookup = OrderChangeLog.objects.filter(
+            changed_at__year=2026, changed_at__month=5
+        )
+        self.assertEqual(by_range.count(), 2)
+        self.assertQuerySetEqual(by_range, by_lookup, ordered=False)
+
+    def test_command_is_noop_off_postgres(self):
+        out = StringIO()
+        call_command("manage_changelog_partitions", stdout=out)
+        self.assertIn("only partitioned on PostgreSQL", out.getvalue())
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "PostgreSQL only")
+class ChangeLogPartitionMigrationTests(TransactionTestCase):
+    """
+    Runs logistics 0018 backward and forward over existing change logs.
+    Needs PostgreSQL; run it before deploying changes to the migration:
+    DB_* pointing at a scratch database, then
+    ``python manage.py test logistics.tests.ChangeLogPartitionMigrationTests``.
+    """
+
+    before = [("logistics", "0017_courieroutbox")]
+    after = [("logistics", "0018_partition_orderchangelog")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+
+    def table_state(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relkind FROM pg_class WHERE relname = %s",
+                ["logistics_orderchangelog"],
+            )
+            kind = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT confrelid::regclass::text FROM pg_constraint "
+                "WHERE conrelid = 'logistics_orderchangelog'::regclass "
+                "AND contype = 'f' ORDER BY 1"
+            )
+            references = [row[0] for row in cursor.fetchall()]
+            cursor.execute("SELECT id FROM logistics_orderchangelog ORDER BY id")
+            ids = [row[0] for row in cursor.fetchall()]
+        return kind, references, ids
+
+    def test_backward_and_forward_keep_rows_and_foreign_keys(self):
+        user = CustomUser.objects.create_user(
+            username="partition_migration",
+            phone_number="9876549101",
+            password="password123",
+            role="SalesPerson",
+        )
+        order = Order.objects.create(
+            full_name="Customer",
+            phone_number="9800000019",
+            payment_method="Cash on Delivery",
+            sales_person=user,
+        )
+        logs = [
+            OrderChangeLog.objects.create(
+                order=order, user=user, old_status="Pending", new_status=new_status
+            )
+            for new_status in ("Processing", "Delivered")
+        ]
+        # A row from before the earliest monthly partition
+        OrderChangeLog.objects.filter(pk=logs[0].pk).update(
+            changed_at=timezone.now() - timedelta(days=400)
+        )
+        ids = [log.pk for log in logs]
+        references = ["account_customuser", "sales_order"]
+        self.assertEqual(self.table_state(), ("p", references, ids))
+
+        self.addCleanup(self.migrate, self.after)
+        self.migrate(self.before)
+        self.assertEqual(self.table_state(), ("r", references, ids))
+
+        self.migrate(self.after)
+        self.assertEqual(self.table_state(), ("p", references, ids))
+        # The id sequence carries on after the copied rows
+        log = OrderChangeLog.objects.create(
+            order=order, old_status="Delivered", new_status="Cancelled"
+        )
+        self.assertGreater(log.pk, max(ids))
+
+
+class OrderTransitionTests(APITestCase):
+    def setUp(self):
+        self.franchise = Franchise.objects.create(name="Transition Franchise")
+        self.user = CustomUser.objects.create_user(
+            username="transition_franchise",
+            phone_number="9876543701",
+            password="password123",
+            role="Franchise",
+            franchise=self.franchise,
+        )
+        self.rider = CustomUser.objects.create_user(
+            username="transition_rider",
+            phone_number="9876543702",
+            password="password123",
+            role="YDM_Rider",
+        )
+        YdmLogisticsSetting.objects.create(cancelled_charge=Decimal("50.00"))
+        product = Product.objects.create(name="Hair Oil")
+        self.inventory = Inventory.objects.create(
+            product=product, franchise=self.franchise, quantity=10
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _orders(self, count, order_status="Sent to YDM"):
+        orders = []
+        for i in range(count):
+            order = Order.objects.create(
+                full_name=f"Customer {i}",
+                phone_number=f"98000007{i:02d}",
+                delivery_address="Kathmandu",
+                payment_method="Cash on Delivery",
+                sales_person=self.user,
+                franchise=self.franchise,
+                logistics="YDM",
+                order_status=order_status,
+            )
+            OrderProduct.objects.create(order=order, product=self.inventory, quantity=1)
+            AssignOrder.objects.create(order=order, user=self.rider)
+            orders.append(order)
+        return orders
+
+    def _bulk_update(self, orders, new_status):
+        return self.client.post(
+            reverse("update-order-status"),
+            {"order_ids": [order.id for order in orders], "status": new_status},
+            format="json",
+        )
+
+    def test_bulk_cancel_logs_charges_and_restocks(self):
+        orders = self._orders(3)
+
+        response = self._bulk_update(orders, "Cancelled")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {row["previous_status"] for row in response.data["updated_orders"]},
+            {"Sent to YDM"},
+        )
+        self.assertEqual(
+            OrderChangeLog.objects.filter(
+                order__in=orders, old_status="Sent to YDM", new_status="Cancelled"
+            ).count(),
+            3,
+        )
+        self.assertEqual(
+            set(
+                AssignOrder.objects.filter(order__in=orders).values_list(
+                    "ydm_cancelled_charge", flat=True
+                )
+            ),
+            {Decimal("50.00")},
+        )
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.quantity, 13)
+        self.assertEqual(
+            InventoryChangeLog.objects.filter(action="order_cancelled").count(), 3
+        )
+
+        # Reopening deducts the stock again and clears the charge
+        response = self._bulk_update(orders, "Verified")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.quantity, 10)
+        self.assertFalse(
+            AssignOrder.objects.filter(ydm_cancelled_charge__isnull=False).exists()
+        )
+
+    def test_query_count_does_not_grow_with_orders(self):
+        few, many = self._orders(2), self._orders(8)
+        counts = []
+        for orders in (few, many):
+            with CaptureQueriesContext(connection) as ctx:
+                self._bulk_update(orders, "Cancelled")
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_short_stock_rolls_back_the_whole_batch(self):
+        orders = self._orders(2, order_status="Cancelled")
+        Inventory.objects.filter(pk=self.inventory.pk).update(quantity=1)
+
+        response = self._bulk_update(orders, "Verified")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        statuses = Order.objects.filter(id__in=[o.id for o in orders]).values_list(
+            "order_status", flat=True
+        )
+        self.assertEqual(set(statuses), {"Cancelled"})
+        self.assertFalse(OrderChangeLog.objects.filter(order__in=orders).exists())
+
+    def test_ydm_webhook_logs_the_change(self):
+        order = self._orders(1)[0]
+
+        response = self.client.post(
+            reverse("ydm-webhook"),
+            {
+                "event": "order.status_changed",
+                "data": {
+                    "external_order_code": order.order_code,
+                    "new_status": "RETURNED_TO_VENDOR",
+                },
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        order.refresh_from_db()
+        self.assertEqual(order.order_status, "Returned By YDM")
+        log = OrderChangeLog.objects.get(order=order)
+        self.assertEqual((log.old_status, log.user), ("Sent to YDM", None))
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.quantity, 11)
+
+    def test_detail_update_cancel_logs_charges_and_restocks(self):
+        order = self._orders(1)[0]
+
+        response = self.client.patch(
+            reverse("order-update", args=[order.id]),
+            {"order_status": "Cancelled", "comment": "Customer refused"},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        log = OrderChangeLog.objects.get(order=order)
+        self.assertEqual(
+            (log.old_status, log.new_status, log.comment),
+            ("Sent to YDM", "Cancelled", "Customer refused"),
+        )
+        self.assertEqual(
+            AssignOrder.objects.get(order=order).ydm_cancelled_charge,
+            Decimal("50.00"),
+        )
+        self.inventory.refresh_from_db()
+        self.assertEqual(self.inventory.quantity, 11)
+
+    def test_pickndrop_tracking_goes_through_the_transition(self):
+        from pickndrop.utils import save_pickndrop_tracking
+
+        order = self._orders(1, order_status="Processing")[0]
+
+        save_pickndrop_tracking(order, "PND-1", user=self.user)
+
+        order.refresh_from_db()
+        self.assertEqual(
+            (order.logistics, order.tracking_code, order.order_status),
+            ("PicknDrop", "PND-1", "Sent to PicknDrop"),
+        )
+        log = OrderChangeLog.objects.get(order=order)
+        self.assertEqual((log.old_status, log.user), ("Processing", self.user))
+
+
+class AssignOrderTests(APITestCase):
+    def setUp(self):
+        self.franchise = Franchise.objects.create(name="Assign Franchise")
+        self.user = CustomUser.objects.create_user(
+            username="assign_franchise",
+            phone_number="9876543801",
+            password="password123",
+            role="Franchise",
+            franchise=self.franchise,
+        )
+        self.rider = CustomUser.objects.create_user(
+            username="assign_rider",
+            first_name="Ram",
+            phone_number="9876543802",
+            password="password123",
+            role="YDM_Rider",
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def _orders(self, count):
+        return [
+            Order.objects.create(
+                full_name=f"Customer {i}",
+                phone_number=f"98000008{i:02d}",
+                delivery_address="Kathmandu",
+                payment_method="Cash on Delivery",
+                sales_person=self.user,
+                franchise=self.franchise,
+                logistics="YDM",
+                order_status="Sent to YDM",
+            )
+            for i in range(count)
+        ]
+
+    def _assign(self, orders, method="post", **data):
+        return getattr(self.client, method)(
+            reverse("assign-order"),
+            {"user_id": self.rider.id, "order_ids": [o.id for o in orders], **data},
+            format="json",
+        )
+
+    def test_post_assigns_and_logs_in_constant_queries(self):
+        few, many = self._orders(2), self._orders(8)
+        for orders in (few, many):
+            AssignOrder.objects.create(order=orders[0], user=self.rider)
+        counts = []
+        for orders in (few, many):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self._assign(orders, is_rider_verified=True)
+            counts.append(len(ctx.captured_queries))
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(counts[0], counts[1])
+        # The already assigned order is only verified, not assigned again
+        self.assertEqual(len(response.data["assigned"]), 7)
+        self.assertTrue(response.data["assigned"][0]["is_rider_verified"])
+        self.assertTrue(AssignOrder.objects.get(order=many[0]).is_rider_verified)
+        self.assertEqual(
+            OrderChangeLog.objects.filter(
+                new_status="Out For Delivery", user=self.user
+            ).count(),
+            8,
+        )
+        self.assertFalse(OrderChangeLog.objects.filter(order=many[0]).exists())
+
+    def test_patch_reassigns_and_reports_each_order(self):
+        orders = self._orders(3)
+        other = CustomUser.objects.create_user(
+            username="assign_other_rider",
+            phone_number="9876543803",
+            password="password123",
+            role="YDM_Rider",
+        )
+        AssignOrder.objects.create(order=orders[0], user=other, is_rider_verified=True)
+
+        response = self._assign(orders, method="patch")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = {row["order_code"]: row for row in response.data["updated"]}
+        self.assertEqual(
+            rows[orders[0].order_code],
+            {
+                "order_code": orders[0].order_code,
+                "status": "reassigned",
+                "assigned_to": "Ram",
+                "order_status": "Out For Delivery",
+                "is_rider_verified": True,
+            },
+        )
+        self.assertEqual(rows[orders[1].order_code]["status"], "assigned")
+        self.assertFalse(rows[orders[1].order_code]["is_rider_verified"])
+        self.assertEqual(
+            set(AssignOrder.objects.values_list("order_id", "user_id")),
+            {(order.id, self.rider.id) for order in orders},
+        )
+        self.assertEqual(
+            OrderChangeLog.objects.filter(new_status="Out For Delivery").count(), 3
+        )
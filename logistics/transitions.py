@@ -0,0 +1,180 @@
+"""
+Order status transitions and their side effects.
+
+``transition_orders`` moves any number of orders to a new status in a fixed
+number of queries, whatever the number of orders:
+
+    orders          one UPDATE of order_status/updated_at
+    change log      one OrderChangeLog row per changed order (bulk_create)
+    YDM charges     AssignOrder.ydm_cancelled_charge set when a YDM order
+                    becomes cancelled/returned, cleared when it comes back
+    inventory       products restocked when an order enters a return status
+                    and deducted again when it leaves one
+
+Views that save the order themselves (OrderUpdateView, OrderDetailUpdateView)
+call ``apply_transition_effects`` with the transition they made instead.
+"""
+
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from sales.constants import RETURN_STATUSES
+from sales.models import Inventory, InventoryChangeLog, Order, OrderProduct
+
+from .models import AssignOrder, OrderChangeLog, YdmLogisticsSetting
+
+# YDM bills its cancelled charge for orders in these statuses
+YDM_CANCELLED_STATUSES = [
+    "Cancelled",
+    "Return Pending",
+    "Returned By Customer",
+    "Returned By YDM",
+]
+
+
+@dataclass
+class Transition:
+    order: Order
+    old_status: str
+    new_status: str
+
+
+def _entering(transitions, statuses):
+    return [
+        t.order.id
+        for t in transitions
+        if t.new_status in statuses and t.old_status not in statuses
+    ]
+
+
+def _leaving(transitions, statuses):
+    return [
+        t.order.id
+        for t in transitions
+        if t.old_status in statuses and t.new_status not in statuses
+    ]
+
+
+def _update_ydm_cancelled_charges(transitions):
+    ydm = [t for t in transitions if t.order.logistics == "YDM"]
+    cancelled = _entering(ydm, YDM_CANCELLED_STATUSES)
+    restored = _leaving(ydm, YDM_CANCELLED_STATUSES)
+    if cancelled:
+        charge = YdmLogisticsSetting.load().cancelled_charge
+        AssignOrder.objects.filter(order_id__in=cancelled).update(
+            ydm_cancelled_charge=charge
+        )
+    if restored:
+        AssignOrder.objects.filter(order_id__in=restored).update(
+            ydm_cancelled_charge=None
+        )
+
+
+def _sync_inventory(transitions, user):
+    restock = set(_entering(transitions, RETURN_STATUSES))
+    deduct = set(_leaving(transitions, RETURN_STATUSES))
+    if not restock and not deduct:
+        return
+    order_products = list(
+        OrderProduct.objects.filter(order_id__in=restock | deduct).order_by("id")
+    )
+    inventories = (
+        Inventory.objects
+        .select_for_update(of=("self",))
+        .select_related("product")
+        .in_bulk({op.product_id for op in order_products})
+    )
+
+    logs = []
+    for op in order_products:
+        inventory = inventories[op.product_id]
+        old_quantity = inventory.quantity
+        if op.order_id in restock:
+            inventory.quantity += op.quantity
+            action = "order_cancelled"
+        else:
+            if inventory.quantity < op.quantity:
+                raise ValidationError(
+                    f"Insufficient inventory for {inventory.product.name} "
+                    "to restore order."
+                )
+            inventory.quantity -= op.quantity
+            action = "order_created"
+        # InventoryChangeLog needs a user; webhook changes only move stock
+        if user is not None:
+            logs.append(
+                InventoryChangeLog(
+                    inventory=inventory,
+                    user=user,
+                    old_quantity=old_quantity,
+                    new_quantity=inventory.quantity,
+                    action=action,
+                )
+            )
+    Inventory.objects.bulk_update(inventories.values(), ["quantity"])
+    InventoryChangeLog.objects.bulk_create(logs)
+
+
+def apply_transition_effects(transitions, user=None, comment=None):
+    """
+    Write the change log, YDM charges and inventory moves for status changes
+    that were already saved. Transitions that keep the status are ignored.
+    Raises ValidationError when stock is short for an order leaving a return
+    status.
+    """
+    transitions = [t for t in transitions if t.old_status != t.new_status]
+    if not transitions:
+        return []
+    if user is not None and not user.is_authenticated:
+        user = None
+    # No savepoint of its own: a failure here must undo the status change too
+    with transaction.atomic(savepoint=False):
+        OrderChangeLog.objects.bulk_create(
+            OrderChangeLog(
+                order=t.order,
+                user=user,
+                old_status=t.old_status,
+                new_status=t.new_status,
+                comment=comment,
+            )
+            for t in transitions
+        )
+        _update_ydm_cancelled_charges(transitions)
+        _sync_inventory(transitions, user)
+    return transitions
+
+
+def transition_orders(orders, new_status, user=None, comment=None, update_fields=()):
+    """
+    Move ``orders`` (Order instances or a queryset, which is locked) to
+    ``new_status`` with all side effects, and return the Transitions made.
+    ``update_fields`` are other fields the caller changed on the instances;
+    they are saved, with a new updated_at, for every order, changed or not.
+    """
+    with transaction.atomic():
+        if isinstance(orders, QuerySet):
+            orders = orders.select_for_update(of=("self",))
+        orders = list(orders)
+        now = timezone.now()
+        transitions = []
+        for order in orders:
+            if order.order_status != new_status:
+                transitions.append(Transition(order, order.order_status, new_status))
+                order.order_status = new_status
+                order.updated_at = now
+            elif update_fields:
+                order.updated_at = now
+
+        if update_fields:
+            Order.objects.bulk_update(
+                orders, ["order_status", "updated_at", *update_fields]
+            )
+        elif transitions:
+            Order.objects.filter(id__in=[t.order.id for t in transitions]).update(
+                order_status=new_status, updated_at=now
+            )
+        return apply_transition_effects(transitions, user=user, comment=comment)
@@ -4,6 +4,7 @@ from collections import defaultdict
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 
+from django.db import transaction
 from django.db.models import (
     Count,
     DecimalField,
@@ -36,10 +37,12 @@ from rest_framework.views import APIView
 
 from account.models import CustomUser
 from account.serializers import SmallUserSerializer
+from core.conditional import ConditionalGetMixin
 from sales.models import Order
 
 # You'll need to create this serializer
 from sales.serializers import OrderSerializer
+from sales.utils import order_change_markers
 
 from .models import (
     AssignOrder,
@@ -51,6 +54,8 @@ from .models import (
     RiderPayout,
     YdmLogisticsSetting,
 )
+from .outbox import enqueue_courier_push
+from .partitions import month_bounds
 from .serializers import (
     AssignOrderSerializer,
     FranchiseStatementSerializer,
@@ -63,6 +68,7 @@ from .serializers import (
     RiderPayoutSerializer,
     YdmLogisticsSettingSerializer,
 )
+from .transitions import transition_orders
 
 
 class CustomPagination(PageNumberPagination):
@@ -637,7 +643,8 @@ def daily_orders_by_franchise(request, franchise_id):
     """
 
     today = date.today()
-    year, month = today.year, today.month
+    # A changed_at range (not __month) lets PostgreSQL prune to one partition
+    month_start, month_end = month_bounds(today.replace(day=1))
 
     # Statuses of interest (aligning with other views used in this module)
     active_statuses = [
@@ -663,8 +670,8 @@ def daily_orders_by_franchise(request, franchise_id):
             order__franchise_id=franchise_id,
             order__logistics="YDM",
             new_status__in=statuses_of_interest,
-            changed_at__year=year,
-            changed_at__month=month,
+            changed_at__gte=month_start,
+            changed_at__lt=month_end,
         )
         .annotate(change_date=TruncDate("changed_at"))
         .values("change_date", "new_status", "order_id")
@@ -783,6 +790,7 @@ def daily_delivered_orders(request, franchise_id):
     """
     today = timezone.now().date()
     year, month = today.year, today.month
+    month_start, month_end = month_bounds(today.replace(day=1))
 
     # Step 1: For each order, get its FIRST Delivered change within current month
 
@@ -791,8 +799,8 @@ def daily_delivered_orders(request, franchise_id):
         .filter(
             order_id=OuterRef("pk"),
             new_status="Delivered",
-            changed_at__year=year,
-            changed_at__month=month,
+            changed_at__gte=month_start,
+            changed_at__lt=month_end,
         )
         .order_by("-changed_at")
         .values("changed_at")[:1]
@@ -875,8 +883,8 @@ def daily_delivered_orders(request, franchise_id):
         .filter(
             order_id=OuterRef("order_id"),
             new_status="Delivered",
-            changed_at__year=year,
-            changed_at__month=month,
+            changed_at__gte=month_start,
+            changed_at__lt=month_end,
         )
         .order_by("-changed_at")
         .values("changed_at")[:1]
@@ -1052,33 +1060,32 @@ class AssignOrderView(APIView):
             )
 
         # validate orders
-        orders = Order.objects.filter(id__in=order_ids).prefetch_related(
-            "assign_orders__user"
-        )
-        if orders.count() != len(order_ids):
+        if Order.objects.filter(id__in=order_ids).count() != len(order_ids):
             return Response(
                 {"detail": "One or more orders not found"},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        assignments = []
+        with transaction.atomic():
+            orders, assigned = self._lock_orders(order_ids)
 
-        for order in orders:
-            existing_assignment = order.assign_orders.first()
-            if existing_assignment:
-                if is_rider_verified != existing_assignment.is_rider_verified:
-                    existing_assignment.is_rider_verified = is_rider_verified
-                    existing_assignment.save()
-                continue
-            else:
-                assignment = AssignOrder.objects.create(
-                    order=order, user=user, is_rider_verified=is_rider_verified
-                )
-                # Update order status to 'Out For Delivery' when assigned to rider
-                if order.order_status != "Out For Delivery":
-                    order.order_status = "Out For Delivery"
-                    order.save()
-                assignments.append(assignment)
+            # Orders already assigned only get their verification flag synced
+            changed = [
+                assignment
+                for assignment in assigned.values()
+                if assignment.is_rider_verified != is_rider_verified
+            ]
+            for assignment in changed:
+                assignment.is_rider_verified = is_rider_verified
+            AssignOrder.objects.bulk_update(changed, ["is_rider_verified"])
+
+            new_orders = [order for order in orders if order.id not in assigned]
+            assignments = AssignOrder.objects.bulk_create(
+                AssignOrder(order=order, user=user, is_rider_verified=is_rider_verified)
+                for order in new_orders
+            )
+            # Orders assigned to a rider are out for delivery
+            transition_orders(new_orders, "Out For Delivery", user=request.user)
 
         return Response(
             {
@@ -1087,6 +1094,17 @@ class AssignOrderView(APIView):
             status=status.HTTP_201_CREATED,
         )
 
+    def _lock_orders(self, order_ids):
+        """Lock the orders; return them and ``{order id: latest assignment}``."""
+        orders = list(
+            Order.objects.select_for_update(of=("self",)).filter(id__in=order_ids)
+        )
+        assigned = {}
+        for assignment in AssignOrder.objects.filter(order_id__in=order_ids):
+            # AssignOrder is ordered newest first
+            assigned.setdefault(assignment.order_id, assignment)
+        return orders, assigned
+
     def patch(self, request):
         user_id = request.data.get("user_id")
         order_ids = request.data.get("order_ids")
@@ -1119,48 +1137,42 @@ class AssignOrderView(APIView):
             )
 
         # validate orders
-        orders = Order.objects.filter(id__in=order_ids).prefetch_related(
-            "assign_orders__user"
-        )
-        if orders.count() != len(order_ids):
+        if Order.objects.filter(id__in=order_ids).count() != len(order_ids):
             return Response(
                 {"detail": "One or more orders not found"},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        updated = []
-
-        for order in orders:
-            # Update or create assignment for each order
-            defaults = {"user": user}
-            if is_rider_verified is not None:
-                defaults["is_rider_verified"] = is_rider_verified
-
-            assign_order, created = AssignOrder.objects.update_or_create(
-                order=order, defaults=defaults
+        fields = {"user": user}
+        if is_rider_verified is not None:
+            fields["is_rider_verified"] = is_rider_verified
+
+        with transaction.atomic():
+            orders, assigned = self._lock_orders(order_ids)
+
+            # Existing assignments move to the rider, the rest are created
+            reassigned = set(assigned)
+            AssignOrder.objects.filter(order_id__in=reassigned).update(**fields)
+            for assignment in assigned.values():
+                for name, value in fields.items():
+                    setattr(assignment, name, value)
+            created = AssignOrder.objects.bulk_create(
+                AssignOrder(order=order, **fields)
+                for order in orders
+                if order.id not in reassigned
             )
+            assigned.update((assignment.order_id, assignment) for assignment in created)
+            transition_orders(orders, "Out For Delivery", user=request.user)
 
-            # Update order status to 'Out For Delivery' when assigned to rider
-            if order.order_status != "Out For Delivery":
-                order.order_status = "Out For Delivery"
-                order.save()
-
-            if created:
-                updated.append({
-                    "order_code": order.order_code,
-                    "status": "assigned",
-                    "assigned_to": user.first_name or user.username,
-                    "order_status": "Out For Delivery",
-                    "is_rider_verified": assign_order.is_rider_verified,
-                })
-            else:
-                updated.append({
-                    "order_code": order.order_code,
-                    "status": "reassigned",
-                    "assigned_to": user.first_name or user.username,
-                    "order_status": "Out For Delivery",
-                    "is_rider_verified": assign_order.is_rider_verified,
-                })
+        updated = []
+        for order in orders:
+            updated.append({
+                "order_code": order.order_code,
+                "status": "reassigned" if order.id in reassigned else "assigned",
+                "assigned_to": user.first_name or user.username,
+                "order_status": "Out For Delivery",
+                "is_rider_verified": assigned[order.id].is_rider_verified,
+            })
 
         return Response(
             {
@@ -1210,18 +1222,34 @@ class UpdateOrderStatusView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        updated_orders = []
-        for order in orders:
-            if order.order_status != status_value:
-                order.order_status = status_value
-                order.save()
-                updated_orders.append({
-                    "order_id": order.id,
-                    "order_code": order.order_code,
-                    "previous_status": order.order_status,
-                    "new_status": status_value,
-                    "updated_at": order.updated_at,
-                })
+        # Orders that just became "Sent to YDM" are queued on the courier
+        # outbox in the same transaction; the dispatcher pushes them to YDM in
+        # batches. Orders sent to YDM before are not pushed again.
+        with transaction.atomic():
+            already_sent_to_ydm = set(
+                OrderChangeLog.objects.filter(
+                    order__in=orders, new_status="Sent to YDM"
+                ).values_list("order_id", flat=True)
+            )
+            transitions = transition_orders(orders, status_value, user=request.user)
+            for t in transitions:
+                if (
+                    t.new_status == "Sent to YDM"
+                    and t.order.logistics == "YDM"
+                    and t.order.id not in already_sent_to_ydm
+                ):
+                    enqueue_courier_push(t.order, "YDM", user=request.user)
+
+        updated_orders = [
+            {
+                "order_id": t.order.id,
+                "order_code": t.order.order_code,
+                "previous_status": t.old_status,
+                "new_status": t.new_status,
+                "updated_at": t.order.updated_at,
+            }
+            for t in transitions
+        ]
 
         return Response(
             {
@@ -1713,7 +1741,7 @@ class RiderOrderFilter(django_filters.FilterSet):
         ]
 
 
-class RiderOrdersListView(generics.ListAPIView):
+class RiderOrdersListView(ConditionalGetMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated]
     pagination_class = CustomPagination
     serializer_class = OrderSerializer
@@ -1726,6 +1754,11 @@ class RiderOrdersListView(generics.ListAPIView):
     search_fields = ["phone_number", "full_name", "order_code", "delivery_address"]
     ordering_fields = ["__all__"]
 
+    def get_change_markers(self):
+        return order_change_markers(
+            self.filter_queryset(self.get_queryset()), assignments=True, comments=True
+        )
+
     def get_queryset(self):
         user = self.request.user
 
@@ -1755,20 +1788,14 @@ class RiderOrdersListView(generics.ListAPIView):
         assigned_order_ids = AssignOrder.objects.filter(user=rider).values_list(
             "order_id", flat=True
         )
-        return (
+        return OrderSerializer.optimize_queryset(
             Order.objects
             .filter(
                 id__in=assigned_order_ids,
                 logistics__startswith="YDM",
             )
-            .select_related("sales_person", "location")
-            .prefetch_related(
-                "order_products__product__product",
-                "assign_orders__user",
-                "comments",
-                "change_logs",
-            )
-            .order_by("-id")
+            .order_by("-id"),
+            self.request,
         )
 
 
@@ -2120,13 +2147,24 @@ class FranchiseStatementPagination(PageNumberPagination):
     max_page_size = 100
 
 
-class FranchiseStatementAPIView(generics.ListAPIView):
+class FranchiseStatementAPIView(ConditionalGetMixin, generics.ListAPIView):
     serializer_class = FranchiseStatementSerializer
     pagination_class = FranchiseStatementPagination
 
     def get_queryset(self):
         return []
 
+    def get_change_markers(self):
+        franchise_id = self.kwargs["franchise_id"]
+        markers = order_change_markers(
+            Order.objects.filter(franchise_id=franchise_id, logistics="YDM"),
+            assignments=True,
+        )
+        markers["invoices"] = Invoice.objects.filter(
+            franchise_id=franchise_id
+        ).aggregate(count=Count("id"), updated=Max("updated_at"))
+        return markers
+
     def list(self, request, franchise_id=None):
         # 1. Parse date filters
         start_date_param = request.GET.get("start_date")
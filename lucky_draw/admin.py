@@ -5,6 +5,7 @@ from unfold.admin import ModelAdmin
 
 from .models import (
     Customer,
+    DailyGiftCounter,
     FixOffer,
     GiftItem,
     LuckyDrawSystem,
@@ -50,6 +51,14 @@ class CustomerAdmin(ModelAdmin):
 
 
 admin.site.register(Customer, CustomerAdmin)
+
+
+class DailyGiftCounterAdmin(ModelAdmin):
+    list_display = ("date", "lucky_draw_system", "gift", "assigned_count")
+    list_filter = ("date", "lucky_draw_system")
+
+
+admin.site.register(DailyGiftCounter, DailyGiftCounterAdmin)
 admin.site.register(OfferCondition, ModelAdmin)
 
 
@@ -0,0 +1,84 @@
+# Generated by Django 5.1.4 on 2026-10-19 01:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_sales(apps, schema_editor):
+    """Fold same-day Sales rows created by concurrent spins into one."""
+    Sales = apps.get_model("lucky_draw", "Sales")
+    duplicates = (
+        Sales.objects.values("lucky_draw_system_id", "date")
+        .annotate(rows=Count("id"), keep=Min("id"), total=Sum("sales_count"))
+        .filter(rows__gt=1)
+    )
+    for row in duplicates:
+        Sales.objects.filter(pk=row["keep"]).update(sales_count=row["total"])
+        Sales.objects.filter(
+            lucky_draw_system_id=row["lucky_draw_system_id"], date=row["date"]
+        ).exclude(pk=row["keep"]).delete()
+
+
+def backfill_gift_counters(apps, schema_editor):
+    Customer = apps.get_model("lucky_draw", "Customer")
+    DailyGiftCounter = apps.get_model("lucky_draw", "DailyGiftCounter")
+    rows = (
+        Customer.gift.through.objects.values(
+            "customer__lucky_draw_system_id",
+            "giftitem_id",
+            "customer__date_of_purchase",
+        )
+        .annotate(assigned=Count("customer_id"))
+        .order_by()
+    )
+    DailyGiftCounter.objects.bulk_create(
+        (
+            DailyGiftCounter(
+                lucky_draw_system_id=row["customer__lucky_draw_system_id"],
+                gift_id=row["giftitem_id"],
+                date=row["customer__date_of_purchase"],
+                assigned_count=row["assigned"],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lucky_draw', '0010_alter_giftitem_image_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyGiftCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('assigned_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(merge_duplicate_sales, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='sales',
+            constraint=models.UniqueConstraint(fields=('lucky_draw_system', 'date'), name='unique_lucky_draw_sales_per_day'),
+        ),
+        migrations.AddField(
+            model_name='dailygiftcounter',
+            name='gift',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_counters', to='lucky_draw.giftitem'),
+        ),
+        migrations.AddField(
+            model_name='dailygiftcounter',
+            name='lucky_draw_system',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gift_counters', to='lucky_draw.luckydrawsystem'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailygiftcounter',
+            constraint=models.UniqueConstraint(fields=('lucky_draw_system', 'gift', 'date'), name='unique_daily_gift_counter'),
+        ),
+        migrations.RunPython(backfill_gift_counters, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 from django.utils import timezone
 
 from account.models import Franchise
@@ -25,6 +26,14 @@ class Sales(models.Model):
         "LuckyDrawSystem", on_delete=models.CASCADE, related_name="sales"
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["lucky_draw_system", "date"],
+                name="unique_lucky_draw_sales_per_day",
+            )
+        ]
+
     def __str__(self):
         return str(self.sales_count)
 
@@ -160,3 +169,70 @@ class Customer(models.Model):
 
     class Meta:
         ordering = ("-date_of_purchase",)
+
+
+class DailyGiftCounter(models.Model):
+    """
+    How many customers won ``gift`` in ``lucky_draw_system`` on ``date``.
+
+    Maintained by the slot machine so a spin reads every gift's count in one
+    query instead of counting Customer rows per gift.
+    """
+
+    lucky_draw_system = models.ForeignKey(
+        LuckyDrawSystem, on_delete=models.CASCADE, related_name="gift_counters"
+    )
+    gift = models.ForeignKey(
+        GiftItem, on_delete=models.CASCADE, related_name="daily_counters"
+    )
+    date = models.DateField()
+    assigned_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["lucky_draw_system", "gift", "date"],
+                name="unique_daily_gift_counter",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.gift} on {self.date}: {self.assigned_count}"
+
+    @classmethod
+    def counts_for(cls, lucky_draw_system, date, gift_ids):
+        """Lock and return ``{gift_id: assigned_count}`` for the given gifts."""
+        if not gift_ids:
+            return {}
+        return dict(
+            cls.objects.select_for_update()
+            .filter(
+                lucky_draw_system=lucky_draw_system, date=date, gift_id__in=gift_ids
+            )
+            .values_list("gift_id", "assigned_count")
+        )
+
+    @classmethod
+    def increment(cls, lucky_draw_system, date, gift_ids, counts):
+        """
+        Add one to each gift's counter. ``counts`` is the locked snapshot from
+        ``counts_for``, which tells which rows already exist.
+        """
+        existing = [gift_id for gift_id in gift_ids if gift_id in counts]
+        missing = [gift_id for gift_id in gift_ids if gift_id not in counts]
+        if existing:
+            cls.objects.filter(
+                lucky_draw_system=lucky_draw_system, date=date, gift_id__in=existing
+            ).update(assigned_count=F("assigned_count") + 1)
+        if missing:
+            cls.objects.bulk_create(
+                [
+                    cls(
+                        lucky_draw_system=lucky_draw_system,
+                        gift_id=gift_id,
+                        date=date,
+                        assigned_count=1,
+                    )
+                    for gift_id in missing
+                ]
+            )
@@ -1,3 +1,91 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from sales.models import DatabaseMode
+
+from .models import DailyGiftCounter, GiftItem, LuckyDrawSystem, Offer, Sales
+
+
+class SlotMachineCounterTests(APITestCase):
+    def setUp(self):
+        DatabaseMode.get_solo()
+        today = timezone.now().date()
+        self.today = today
+        self.system = LuckyDrawSystem.objects.create(
+            name="Festival Draw",
+            start_date=today - timedelta(days=1),
+            end_date=today + timedelta(days=1),
+        )
+
+    def _offer(self, gifts, daily_quantity=1):
+        offer = Offer.objects.create(
+            lucky_draw_system=self.system,
+            start_date=self.today,
+            end_date=self.today,
+            daily_quantity=daily_quantity,
+            type_of_offer="After every certain sale",
+            offer_condition_value="1",
+        )
+        offer.gift.set(gifts)
+        return offer
+
+    def _gifts(self, count):
+        start = GiftItem.objects.count()
+        return [
+            GiftItem.objects.create(lucky_draw_system=self.system, name=f"Gift {i}")
+            for i in range(start, start + count)
+        ]
+
+    def _spin(self, random_pool=True):
+        return self.client.post(
+            "/api/slot-machine/",
+            {
+                "lucky_draw_system": self.system.id,
+                "full_name": "9800000000",
+                "random": "true" if random_pool else "",
+            },
+            format="json",
+        )
+
+    def test_daily_caps_come_from_counters(self):
+        gift_a, gift_b = self._gifts(2)
+        self._offer([gift_a])
+        self._offer([gift_b])
+
+        won = [self._spin().data["prize_details"] for _ in range(3)]
+
+        self.assertEqual(sum("Congratulations" in prize for prize in won), 2)
+        self.assertEqual(won[2], "Thank you for your purchase!")
+        sales = Sales.objects.get(lucky_draw_system=self.system, date=self.today)
+        self.assertEqual(sales.sales_count, 3)
+        counters = dict(
+            DailyGiftCounter.objects.filter(date=self.today).values_list(
+                "gift_id", "assigned_count"
+            )
+        )
+        self.assertEqual(counters, {gift_a.id: 1, gift_b.id: 1})
+
+    def test_spin_query_count_does_not_grow_with_offers(self):
+        for random_pool in (True, False):
+            with self.subTest(random_pool=random_pool):
+                Offer.objects.all().delete()
+                self._offer(self._gifts(2), daily_quantity=100)
+                self._spin(random_pool)
+                with CaptureQueriesContext(connection) as small:
+                    self._spin(random_pool)
+
+                for _ in range(5):
+                    self._offer(self._gifts(3), daily_quantity=100)
+                self._spin(random_pool)
+                with CaptureQueriesContext(connection) as large:
+                    response = self._spin(random_pool)
+
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+                self.assertEqual(
+                    len(large.captured_queries), len(small.captured_queries)
+                )
@@ -2,6 +2,8 @@ import csv
 import datetime
 import random
 
+from django.db import transaction
+from django.db.models import F
 from django.http import HttpResponse
 from django.utils import timezone
 from rest_framework import generics, status
@@ -13,6 +15,7 @@ from sales_fest.models import FestConfig
 
 from .models import (
     Customer,
+    DailyGiftCounter,
     FixOffer,
     GiftItem,
     LuckyDrawSystem,
@@ -423,67 +426,111 @@ class SlotMachineListCreateView(generics.ListCreateAPIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        customer = Customer.objects.create(
-            lucky_draw_system=lucky_draw,
-            full_name=full_name,
-        )
-
         # If the caller sends `"random": true/1/yes` in the request body,
         # every entry is guaranteed a random gift (capped by daily_quantity).
         # Otherwise the original offer-condition logic runs.
         is_random = str(request.data.get("random", "")).lower() in ("true", "1", "yes")
-        if is_random:
-            self.assign_gift_random(customer)
-        else:
-            self.assign_gift(customer)
+        with transaction.atomic():
+            customer = Customer.objects.create(
+                lucky_draw_system=lucky_draw,
+                full_name=full_name,
+            )
+            if is_random:
+                self.assign_gift_random(customer)
+            else:
+                self.assign_gift(customer)
 
         serializer = CustomerGiftSerializer(customer)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    # ---------------- GIFT ASSIGNMENT (original — unchanged) ---------------- #
-    def assign_gift(self, customer):
-        today_date = timezone.now().date()
-        lucky_draw_system = customer.lucky_draw_system
+    # ---------------- SPIN BOOKKEEPING ---------------- #
+    # A spin holds the row lock on today's Sales row for its lucky draw
+    # system until the request's transaction ends, so concurrent spins of
+    # one system are serialised and the DailyGiftCounter rows they read
+    # cannot change underneath them. Query count per spin is fixed no
+    # matter how many offers and gifts are configured.
 
-        # Update daily sales count
-        sales_today, _ = Sales.objects.get_or_create(
+    def _count_sale(self, lucky_draw_system, today_date):
+        sales_today, _ = Sales.objects.select_for_update().get_or_create(
             date=today_date,
             lucky_draw_system=lucky_draw_system,
             defaults={"sales_count": 0},
         )
-        sales_today.sales_count += 1
-        sales_today.save()
-        sales_count = sales_today.sales_count
+        Sales.objects.filter(pk=sales_today.pk).update(
+            sales_count=F("sales_count") + 1
+        )
+        return sales_today.sales_count + 1
 
-        phone_number = customer.full_name
+    def _assign_fixed_offer(self, customer, today_date):
+        """Give the phone-number-linked gifts, if any; True when given."""
+        lucky_draw_system = customer.lucky_draw_system
+        fixed_offer = (
+            FixOffer.objects.filter(
+                lucky_draw_system=lucky_draw_system,
+                phone_number=customer.full_name,
+                quantity__gt=0,
+            )
+            .prefetch_related("gift")
+            .first()
+        )
+        if not fixed_offer:
+            return False
+
+        gifts = list(fixed_offer.gift.all())
+        gift_ids = [gift.id for gift in gifts]
+        counts = DailyGiftCounter.counts_for(lucky_draw_system, today_date, gift_ids)
+        customer.gift.set(gifts)
+        gift_names = ", ".join([gift.name for gift in gifts])
+        customer.prize_details = f"Congratulations! You've won {gift_names}"
+        customer.save()
+        FixOffer.objects.filter(pk=fixed_offer.pk, quantity__gt=0).update(
+            quantity=F("quantity") - 1
+        )
+        DailyGiftCounter.increment(lucky_draw_system, today_date, gift_ids, counts)
+        return True
+
+    def _active_offers(self, lucky_draw_system, today_date):
+        """Today's offers with gifts preloaded, plus locked per-gift counts."""
+        offers = list(
+            Offer.objects.filter(
+                lucky_draw_system=lucky_draw_system,
+                start_date__lte=today_date,
+                end_date__gte=today_date,
+                daily_quantity__gt=0,
+            ).prefetch_related("gift")
+        )
+        gift_ids = {gift.id for offer in offers for gift in offer.gift.all()}
+        counts = DailyGiftCounter.counts_for(lucky_draw_system, today_date, gift_ids)
+        return offers, counts
 
-        # ------------------ FIXED OFFERS ------------------ #
-        fixed_offer = FixOffer.objects.filter(
-            lucky_draw_system=lucky_draw_system,
-            phone_number=phone_number,
-            quantity__gt=0,
-        ).first()
+    def _award(self, customer, gift, today_date, counts):
+        customer.gift.add(gift)
+        customer.prize_details = f"Congratulations! You've won {gift.name}"
+        customer.save()
+        DailyGiftCounter.increment(
+            customer.lucky_draw_system, today_date, [gift.id], counts
+        )
 
-        if fixed_offer:
-            customer.gift.set(fixed_offer.gift.all())
-            gift_names = ", ".join([gift.name for gift in fixed_offer.gift.all()])
-            customer.prize_details = f"Congratulations! You've won {gift_names}"
-            customer.save()
-            fixed_offer.quantity -= 1
-            fixed_offer.save()
+    # ---------------- GIFT ASSIGNMENT (original rules) ---------------- #
+    def assign_gift(self, customer):
+        today_date = timezone.now().date()
+        lucky_draw_system = customer.lucky_draw_system
+
+        # Update daily sales count
+        sales_count = self._count_sale(lucky_draw_system, today_date)
+
+        # ------------------ FIXED OFFERS ------------------ #
+        if self._assign_fixed_offer(customer, today_date):
             return
 
         # ------------------ ELECTRONIC OFFERS ------------------ #
-        offers = Offer.objects.filter(
-            lucky_draw_system=lucky_draw_system,
-            start_date__lte=today_date,
-            end_date__gte=today_date,
-            daily_quantity__gt=0,
-        )
+        offers, counts = self._active_offers(lucky_draw_system, today_date)
 
         # Step 1: collect offers that match condition
         matching_offers = [
-            offer for offer in offers if self.check_offer_condition(offer, sales_count)
+            offer
+            for offer in offers
+            if self.check_offer_condition(offer, sales_count, counts)
         ]
 
         if not matching_offers:
@@ -496,9 +543,7 @@ class SlotMachineListCreateView(generics.ListCreateAPIView):
 
         for offer in matching_offers:
             for gift in offer.gift.all():
-                already_assigned = Customer.objects.filter(
-                    date_of_purchase=today_date, gift=gift
-                ).count()
+                already_assigned = counts.get(gift.id, 0)
 
                 # Only include gifts that haven't exceeded their daily limit
                 if already_assigned < offer.daily_quantity:
@@ -527,9 +572,7 @@ class SlotMachineListCreateView(generics.ListCreateAPIView):
         weights = list(gift_weights.values())
         selected_gift = random.choices(gifts, weights=weights, k=1)[0]
 
-        customer.gift.add(selected_gift)
-        customer.prize_details = f"Congratulations! You've won {selected_gift.name}"
-        customer.save()
+        self._award(customer, selected_gift, today_date, counts)
 
     # ---------------- RANDOM GIFT ASSIGNMENT (new) ---------------- #
     def assign_gift_random(self, customer):
@@ -547,40 +590,15 @@ class SlotMachineListCreateView(generics.ListCreateAPIView):
         lucky_draw_system = customer.lucky_draw_system
 
         # Update daily sales count
-        sales_today, _ = Sales.objects.get_or_create(
-            date=today_date,
-            lucky_draw_system=lucky_draw_system,
-            defaults={"sales_count": 0},
-        )
-        sales_today.sales_count += 1
-        sales_today.save()
-
-        phone_number = customer.full_name
+        self._count_sale(lucky_draw_system, today_date)
 
         # ------------------ FIXED OFFERS (always checked first) ------------------ #
-        fixed_offer = FixOffer.objects.filter(
-            lucky_draw_system=lucky_draw_system,
-            phone_number=phone_number,
-            quantity__gt=0,
-        ).first()
-
-        if fixed_offer:
-            customer.gift.set(fixed_offer.gift.all())
-            gift_names = ", ".join([gift.name for gift in fixed_offer.gift.all()])
-            customer.prize_details = f"Congratulations! You've won {gift_names}"
-            customer.save()
-            fixed_offer.quantity -= 1
-            fixed_offer.save()
+        if self._assign_fixed_offer(customer, today_date):
             return
 
         # ------------------ RANDOM GIFT POOL ------------------ #
         # Gather all active offers for this lucky draw system.
-        offers = Offer.objects.filter(
-            lucky_draw_system=lucky_draw_system,
-            start_date__lte=today_date,
-            end_date__gte=today_date,
-            daily_quantity__gt=0,
-        )
+        offers, counts = self._active_offers(lucky_draw_system, today_date)
 
         eligible_gifts = []
         today_time = timezone.now().time()
@@ -592,12 +610,8 @@ class SlotMachineListCreateView(generics.ListCreateAPIView):
                     continue
 
             for gift in offer.gift.all():
-                already_assigned = Customer.objects.filter(
-                    date_of_purchase=today_date, gift=gift
-                ).count()
-
                 # Include this gift only if its daily cap has not been reached
-                if already_assigned < offer.daily_quantity:
+                if counts.get(gift.id, 0) < offer.daily_quantity:
                     eligible_gifts.append(gift)
 
         if not eligible_gifts:
@@ -608,14 +622,11 @@ class SlotMachineListCreateView(generics.ListCreateAPIView):
 
         # Pick one gift uniformly at random from the eligible pool
         selected_gift = random.choice(eligible_gifts)
-        customer.gift.add(selected_gift)
-        customer.prize_details = f"Congratulations! You've won {selected_gift.name}"
-        customer.save()
+        self._award(customer, selected_gift, today_date, counts)
 
     # ---------------- OFFER CONDITION CHECK ---------------- #
 
-    def check_offer_condition(self, offer, sales_count):
-        today_date = timezone.now().date()
+    def check_offer_condition(self, offer, sales_count, counts):
         today_time = timezone.now().time()
 
         if offer.has_time_limit:
@@ -623,11 +634,9 @@ class SlotMachineListCreateView(generics.ListCreateAPIView):
                 return False
 
         if offer.type_of_offer == "After every certain sale":
-            todays_gift_count = (
-                Customer.objects
-                .filter(date_of_purchase=today_date, gift__in=offer.gift.all())
-                .distinct()
-                .count()
+            # Gifts of this offer handed out today (from the counter table)
+            todays_gift_count = sum(
+                counts.get(gift.id, 0) for gift in offer.gift.all()
             )
 
             return (
@@ -1,3 +1,152 @@
-from django.test import TestCase
+import json
+import threading
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from account.models import CustomUser, Franchise
+from sales.models import (
+    DatabaseMode,
+    Inventory,
+    Location,
+    Order,
+    OrderProduct,
+    Product,
+)
+
+from .models import PickNDrop
+from .utils import invalidate_branch_cache
+
+
+class StubPickNDropServer:
+    """Local stand-in for the Pick n Drop create_order endpoint."""
+
+    def __init__(self):
+        self.payloads = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                stub.payloads.append(payload)
+                code = payload["primaryMobileNo"][-2:]
+                body = json.dumps(
+                    {
+                        "message": {
+                            "status": "success",
+                            "message": "Order created",
+                            "data": {
+                                "orderID": f"PND-{code}",
+                                "tracking_url": f"https://track.example/PND-{code}/",
+                            },
+                        }
+                    }
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.patcher = mock.patch("pickndrop.utils.PICKNDROP_BASE_URL", url)
+
+    def __enter__(self):
+        self.patcher.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.patcher.stop()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class SendOrdersToPicknDropViewTests(APITestCase):
+    def setUp(self):
+        invalidate_branch_cache()
+        DatabaseMode.get_solo()
+        self.franchise = Franchise.objects.create(name="PicknDrop Bulk Franchise")
+        self.user = CustomUser.objects.create_user(
+            username="pickndrop_bulk",
+            email="pickndrop_bulk@example.com",
+            phone_number="9876543901",
+            password="password123",
+            role="Franchise",
+            franchise=self.franchise,
+        )
+        PickNDrop.objects.create(
+            franchise=self.franchise, client_key="key", client_secret="secret"
+        )
+        branch = Location.objects.create(name="Kathmandu", logistics="PicknDrop")
+        unknown = Location.objects.create(name="Nowhere", logistics="YDM")
+        inventory = Inventory.objects.create(
+            product=Product.objects.create(name="Hair Oil"),
+            franchise=self.franchise,
+            quantity=100,
+        )
+        self.orders = []
+        for index, location in enumerate([branch, branch, unknown, branch]):
+            order = Order.objects.create(
+                full_name=f"PicknDrop Customer {index}",
+                phone_number=f"98000006{index:02d}",
+                delivery_address="Kathmandu",
+                payment_method="Cash on Delivery",
+                sales_person=self.user,
+                franchise=self.franchise,
+                location=location,
+                order_status="Processing",
+                total_amount=Decimal("1500.00"),
+            )
+            OrderProduct.objects.create(order=order, product=inventory, quantity=1)
+            self.orders.append(order)
+
+    def test_bulk_send_reports_per_order_results(self):
+        self.client.force_authenticate(user=self.user)
+        with StubPickNDropServer() as stub:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(
+                    "/api/send-pickndrop/bulk/",
+                    {"order_ids": [order.id for order in self.orders]},
+                    format="json",
+                )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(stub.payloads), 3)
+        self.assertEqual(
+            [row["status"] for row in response.data["results"]],
+            ["success", "success", "error", "success"],
+        )
+        self.assertIn("NOWHERE", response.data["results"][2]["message"])
+        for order in self.orders:
+            order.refresh_from_db()
+        self.assertEqual(self.orders[0].tracking_code, "PND-00")
+        self.assertEqual(self.orders[0].order_status, "Sent to PicknDrop")
+        self.assertEqual(self.orders[2].order_status, "Processing")
+        # db mode + credentials + orders + 3 prefetch levels + branches +
+        # update (inside a savepoint), independent of how many orders are sent
+        self.assertLessEqual(len(ctx.captured_queries), 10)
+
+    def test_single_order_view_saves_tracking(self):
+        self.client.force_authenticate(user=self.user)
+        order = self.orders[1]
+        with StubPickNDropServer() as stub:
+            response = self.client.post(f"/api/send-pickndrop/{order.id}/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(stub.payloads), 1)
+        order.refresh_from_db()
+        self.assertEqual(order.tracking_code, "PND-01")
+        self.assertEqual(order.order_status, "Sent to PicknDrop")
@@ -5,6 +5,7 @@ from .views import (
     FetchAndSavePicknDropBranches,
     PickNDropListCreateView,
     PickNDropWebhookView,
+    SendOrdersToPicknDropView,
     SendOrderToPicknDropByIdView,
 )
 
@@ -24,6 +25,11 @@ urlpatterns = [
         SendOrderToPicknDropByIdView.as_view(),
         name="send_pickndrop",
     ),
+    path(
+        "send-pickndrop/bulk/",
+        SendOrdersToPicknDropView.as_view(),
+        name="send_pickndrop_bulk",
+    ),
     path(
         "pickndrop/webhook/", PickNDropWebhookView.as_view(), name="pickndrop-webhook"
     ),
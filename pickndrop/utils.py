@@ -1,26 +1,82 @@
+import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from logistics.outbox import CourierHandler, PermanentDispatchError
 
-def create_pickndrop_order(order, pickndrop):
+logger = logging.getLogger(__name__)
+
+PICKNDROP_BASE_URL = os.getenv("PICKNDROP_BASE_URL")
+PICKNDROP_POOL_SIZE = int(os.getenv("PICKNDROP_POOL_SIZE", 10))
+# Seconds the branch directory is kept in memory before it is re-read.
+PICKNDROP_BRANCH_CACHE_TTL = int(os.getenv("PICKNDROP_BRANCH_CACHE_TTL", 600))
+PICKNDROP_BULK_CONCURRENCY = int(os.getenv("PICKNDROP_BULK_CONCURRENCY", 4))
+
+_session = None
+_session_lock = threading.Lock()
+_branch_cache = {"names": None, "loaded_at": 0.0}
+_branch_lock = threading.Lock()
+
+
+def get_pickndrop_session():
+    """Process-wide keep-alive session for every call to the Pick n Drop API."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=PICKNDROP_POOL_SIZE,
+                    pool_maxsize=PICKNDROP_POOL_SIZE,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def get_branch_names():
     """
-    Create and send an order to Pick n Drop API.
+    Upper-cased names of the Pick n Drop branches saved by
+    FetchAndSavePicknDropBranches, cached for PICKNDROP_BRANCH_CACHE_TTL.
+    """
+    from sales.models import Location
 
-    Args:
-        order: Order instance
-        pickndrop: PickNDrop instance with API credentials
+    now = time.monotonic()
+    with _branch_lock:
+        names = _branch_cache["names"]
+        expired = now - _branch_cache["loaded_at"] > PICKNDROP_BRANCH_CACHE_TTL
+        if names is None or expired:
+            rows = Location.objects.filter(logistics="PicknDrop").values_list(
+                "name", flat=True
+            )
+            names = frozenset(name.upper() for name in rows)
+            _branch_cache.update(names=names, loaded_at=now)
+    return names
 
-    Returns:
-        dict: API response from Frappe
+
+def invalidate_branch_cache():
+    with _branch_lock:
+        _branch_cache.update(names=None, loaded_at=0.0)
+
+
+def build_pickndrop_request(order, pickndrop, order_items=None):
     """
+    Build the endpoint, headers and payload for a Pick n Drop create_order call.
 
-    base_url = os.getenv("PICKNDROP_BASE_URL")
-    endpoint = f"{base_url}/api/method/logi360.api.create_order"
+    ``order_items`` may be passed when the caller already loaded the order
+    products (with ``product__product``).
+    """
+
+    endpoint = f"{PICKNDROP_BASE_URL}/api/method/logi360.api.create_order"
 
     client_key = pickndrop.client_key
     client_secret = pickndrop.client_secret
-    print(client_key, client_secret)
 
     headers = {
         "Authorization": f"token {client_key}:{client_secret}",
@@ -30,9 +86,10 @@ def create_pickndrop_order(order, pickndrop):
     # ------------------------------
     # Build order description
     # ------------------------------
-    order_items = order.order_products.all()
+    if order_items is None:
+        order_items = list(order.order_products.select_related("product__product"))
 
-    if order_items.exists():
+    if order_items:
         order_description = ", ".join(
             [f"{item.product.product.name} x {item.quantity}" for item in order_items]
         )
@@ -60,54 +117,179 @@ def create_pickndrop_order(order, pickndrop):
         "instruction": order.remarks or "",
         "destinationCityArea": order.delivery_address,
     }
+    return endpoint, headers, payload
+
+
+def parse_pickndrop_response(status_code, data):
+    """
+    Normalise a Pick n Drop create_order response into the result dict used
+    by the views (``status`` is either "success" or "error").
+    """
+    # ------------------------------
+    # HANDLE FAILURE RESPONSE (400)
+    # ------------------------------
+    if status_code == 400 or data.get("success") is False:
+        return {
+            "status": "error",
+            "error_code": data.get("error_code"),
+            "message": data.get("message"),
+            "data": data.get("data", {}),
+        }
+
+    # ------------------------------
+    # HANDLE SUCCESS RESPONSE (200)
+    # ------------------------------
+    message = data.get("message", {})
+    if isinstance(message, dict) and message.get("status") == "success":
+        delivery_data = message.get("data", {})
+        tracking_url = delivery_data.get("tracking_url")
+        tracking_code = None
+
+        if tracking_url:
+            tracking_code = tracking_url.rstrip("/").split("/")[-1]
+
+        return {
+            "status": "success",
+            "message": message.get("message"),
+            "tracking_code": tracking_code,
+            "pickup_order_id": delivery_data.get("orderID"),
+            "tracking_url": delivery_data.get("tracking_url"),
+        }
+
+    # Unexpected format → treat as error
+    return {
+        "status": "error",
+        "message": "Unexpected response format from PickNDrop",
+        "response": data,
+    }
+
+
+def submit_pickndrop_request(endpoint, headers, payload):
+    """
+    POST a create_order request on the shared session.
 
+    Returns the parsed result dict; network failures come back as
+    ``{"status": "error", "message": ...}``.
+    """
     try:
-        response = requests.post(endpoint, json=payload, headers=headers, timeout=10)
-        data = response.json()
-
-        # ------------------------------
-        # HANDLE FAILURE RESPONSE (400)
-        # ------------------------------
-        if response.status_code == 400 or data.get("success") is False:
-            return {
+        response = get_pickndrop_session().post(
+            endpoint, json=payload, headers=headers, timeout=10
+        )
+        return parse_pickndrop_response(response.status_code, response.json())
+    except (requests.RequestException, ValueError) as e:
+        return {"status": "error", "message": str(e)}
+
+
+def save_pickndrop_tracking(order, tracking_code, user=None):
+    """Persist logistics, tracking code and status after a successful push."""
+    from logistics.transitions import transition_orders
+
+    order.logistics = "PicknDrop"
+    order.tracking_code = tracking_code
+    transition_orders(
+        [order],
+        "Sent to PicknDrop",
+        user=user,
+        update_fields=["logistics", "tracking_code"],
+    )
+
+
+def create_pickndrop_order(order, pickndrop):
+    """
+    Create and send an order to Pick n Drop API.
+
+    Args:
+        order: Order instance
+        pickndrop: PickNDrop instance with API credentials
+
+    Returns:
+        dict: API response from Frappe
+    """
+    endpoint, headers, payload = build_pickndrop_request(order, pickndrop)
+    result = submit_pickndrop_request(endpoint, headers, payload)
+
+    if result["status"] == "success":
+        # SAVE LOGISTICS + TRACKING CODE
+        save_pickndrop_tracking(order, result["tracking_code"])
+    return result
+
+
+def send_pickndrop_orders(orders, pickndrop, max_workers=None):
+    """
+    Submit several orders to Pick n Drop concurrently.
+
+    ``orders`` must have ``location`` and ``order_products__product__product``
+    loaded. Payloads whose ``destinationBranch`` is not in the cached branch
+    directory are rejected without calling the API (the check is skipped
+    while the directory is still empty). Requests run on a bounded thread
+    pool over the shared session; nothing is saved here.
+
+    Returns ``{order.id: result}`` where result is the dict produced by
+    ``parse_pickndrop_response`` (or a local error).
+    """
+    branches = get_branch_names()
+    if not branches:
+        logger.warning(
+            "PicknDrop branch directory is empty; destinationBranch not validated."
+        )
+
+    results = {}
+    jobs = []
+    for order in orders:
+        endpoint, headers, payload = build_pickndrop_request(
+            order, pickndrop, order.order_products.all()
+        )
+        branch = payload["destinationBranch"]
+        if branches and branch not in branches:
+            results[order.id] = {
                 "status": "error",
-                "error_code": data.get("error_code"),
-                "message": data.get("message"),
-                "data": data.get("data", {}),
+                "message": f"Unknown PicknDrop branch '{branch}'.",
             }
+            continue
+        jobs.append((order.id, endpoint, headers, payload))
 
-        # ------------------------------
-        # HANDLE SUCCESS RESPONSE (200)
-        # ------------------------------
-        message = data.get("message", {})
-        if message.get("status") == "success":
-            delivery_data = message.get("data", {})
-            tracking_url = delivery_data.get("tracking_url")
-            tracking_code = None
-
-            if tracking_url:
-                tracking_code = tracking_url.rstrip("/").split("/")[-1]
-
-            # SAVE LOGISTICS + TRACKING CODE
-            order.logistics = "PicknDrop"
-            order.tracking_code = tracking_code
-            order.order_status = "Sent to PicknDrop"
-            order.save(update_fields=["logistics", "tracking_code", "order_status"])
-
-            return {
-                "status": "success",
-                "message": message.get("message"),
-                "tracking_code": tracking_code,
-                "pickup_order_id": delivery_data.get("orderID"),
-                "tracking_url": delivery_data.get("tracking_url"),
+    if jobs:
+        workers = min(max_workers or PICKNDROP_BULK_CONCURRENCY, len(jobs))
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="pickndrop"
+        ) as pool:
+            futures = {
+                order_id: pool.submit(submit_pickndrop_request, *request)
+                for order_id, *request in jobs
             }
+        for order_id, future in futures.items():
+            results[order_id] = future.result()
+    return results
 
-        # Unexpected format → treat as error
-        return {
-            "status": "error",
-            "message": "Unexpected response format from PickNDrop",
-            "response": data,
-        }
 
-    except requests.RequestException as e:
-        return {"status": "error", "message": str(e)}
+class PickNDropOutboxHandler(CourierHandler):
+    """Delivers queued "Sent to PicknDrop" pushes for the courier outbox."""
+
+    def prepare(self, entry):
+        from .models import PickNDrop
+
+        pickndrop = PickNDrop.objects.filter(
+            franchise_id=entry.order.franchise_id
+        ).first()
+        if pickndrop is None:
+            raise PermanentDispatchError("PickNDrop credentials not found.")
+        return build_pickndrop_request(entry.order, pickndrop)
+
+    def send(self, prepared):
+        endpoint, headers, payload = prepared
+        response = get_pickndrop_session().post(
+            endpoint, json=payload, headers=headers, timeout=10
+        )
+        if response.status_code >= 500:
+            response.raise_for_status()
+        result = parse_pickndrop_response(response.status_code, response.json())
+        if result["status"] != "success":
+            raise PermanentDispatchError(
+                result.get("message") or "PickNDrop rejected the order"
+            )
+        return result
+
+    def apply(self, entry, result):
+        save_pickndrop_tracking(
+            entry.order, result["tracking_code"], user=entry.created_by
+        )
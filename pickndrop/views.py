@@ -2,6 +2,8 @@
 import os
 
 import requests
+from asgiref.sync import sync_to_async
+from django.db import transaction
 from dotenv import load_dotenv
 from rest_framework import status
 from rest_framework.generics import ListCreateAPIView
@@ -9,10 +11,20 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from core.async_views import AsyncAPIView, run_io
+from logistics.outbox import enqueue_courier_push, is_deferred
+from logistics.transitions import transition_orders
 from pickndrop.models import PickNDrop
 from pickndrop.serializers import PickNDropSerializer
-from pickndrop.utils import create_pickndrop_order
-from sales.models import Inventory, Location, Order, OrderProduct
+from pickndrop.utils import (
+    build_pickndrop_request,
+    get_pickndrop_session,
+    invalidate_branch_cache,
+    save_pickndrop_tracking,
+    send_pickndrop_orders,
+    submit_pickndrop_request,
+)
+from sales.models import Location, Order
 
 load_dotenv()
 
@@ -42,12 +54,24 @@ class PickNDropListCreateView(ListCreateAPIView):
         )
 
 
-class FetchAndSavePicknDropBranches(APIView):
+class FetchAndSavePicknDropBranches(AsyncAPIView):
     """
     Fetch branches from Pick n Drop API and save to Location model
     """
 
-    def get(self, request):
+    def _save_branches(self, branches):
+        saved_locations = []
+        for branch in branches:
+            location, created = Location.objects.update_or_create(
+                name=branch["branch_name"],
+                logistics="PicknDrop",
+                defaults={"coverage_areas": branch.get("area", [])},
+            )
+            saved_locations.append(location.name)
+        invalidate_branch_cache()
+        return saved_locations
+
+    async def get(self, request):
         base_url = os.getenv("PICKNDROP_BASE_URL")  # replace with your baseUrl
         endpoint = f"{base_url}/api/method/logi360.api.get_branches"
         # Your API key and secret
@@ -60,7 +84,9 @@ class FetchAndSavePicknDropBranches(APIView):
         }
 
         try:
-            response = requests.get(endpoint, headers=headers, timeout=10)
+            response = await run_io(
+                get_pickndrop_session().get, endpoint, headers=headers, timeout=10
+            )
             response.raise_for_status()
             data = response.json()
 
@@ -71,15 +97,7 @@ class FetchAndSavePicknDropBranches(APIView):
                 )
 
             branches = data["message"]["data"]["branches"]
-            saved_locations = []
-
-            for branch in branches:
-                location, created = Location.objects.update_or_create(
-                    name=branch["branch_name"],
-                    logistics="PicknDrop",
-                    defaults={"coverage_areas": branch.get("area", [])},
-                )
-                saved_locations.append(location.name)
+            saved_locations = await sync_to_async(self._save_branches)(branches)
 
             return Response(
                 {
@@ -94,10 +112,10 @@ class FetchAndSavePicknDropBranches(APIView):
             )
 
 
-class SendOrderToPicknDropByIdView(APIView):
+class SendOrderToPicknDropByIdView(AsyncAPIView):
     permission_classes = [IsAuthenticated]
 
-    def post(self, request, order_id):
+    def _prepare(self, request, order_id):
         user = request.user
 
         if not hasattr(user, "franchise") or not user.franchise:
@@ -111,7 +129,40 @@ class SendOrderToPicknDropByIdView(APIView):
         except PickNDrop.DoesNotExist:
             return Response({"error": "PickNDrop credentials not found."}, status=404)
 
-        result = create_pickndrop_order(order, pickndrop_obj)
+        # Deferred mode: mark the order as sent and let the outbox dispatcher
+        # talk to PicknDrop, so this request never waits on the courier API.
+        if is_deferred(request):
+            with transaction.atomic():
+                order.logistics = "PicknDrop"
+                transition_orders(
+                    [order],
+                    "Sent to PicknDrop",
+                    user=user,
+                    update_fields=["logistics"],
+                )
+                entry = enqueue_courier_push(order, "PicknDrop", user=user)
+            return Response(
+                {
+                    "status": "queued",
+                    "message": "Order queued for PicknDrop.",
+                    "outbox_id": entry.id,
+                },
+                status=202,
+            )
+
+        return order, build_pickndrop_request(order, pickndrop_obj)
+
+    async def post(self, request, order_id):
+        prepared = await sync_to_async(self._prepare)(request, order_id)
+        if isinstance(prepared, Response):
+            return prepared
+        order, pickndrop_request = prepared
+
+        result = await run_io(submit_pickndrop_request, *pickndrop_request)
+        if result["status"] == "success":
+            await sync_to_async(save_pickndrop_tracking)(
+                order, result["tracking_code"], user=request.user
+            )
 
         # Frappe Authentication error
         if "exception" in result:
@@ -185,6 +236,101 @@ class SendOrderToPicknDropByIdView(APIView):
         )
 
 
+class SendOrdersToPicknDropView(APIView):
+    """
+    POST /api/send-pickndrop/bulk/  {"order_ids": [1, 2, ...]}
+
+    Sends several orders of the user's franchise to Pick n Drop. Orders and
+    their products are loaded in a fixed number of queries, each
+    ``destinationBranch`` is checked against the cached branch directory,
+    and the API calls run on a bounded thread pool. Returns one result per
+    requested id. With ``defer`` the orders are queued on the courier outbox.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        user = request.user
+        if not hasattr(user, "franchise") or not user.franchise:
+            return Response({"error": "User does not have a franchise."}, status=400)
+
+        order_ids = request.data.get("order_ids")
+        if not isinstance(order_ids, list) or not order_ids:
+            return Response(
+                {"error": "order_ids must be a non-empty list."}, status=400
+            )
+        try:
+            order_ids = list(dict.fromkeys(int(order_id) for order_id in order_ids))
+        except (TypeError, ValueError):
+            return Response({"error": "order_ids must be integers."}, status=400)
+
+        pickndrop_obj = PickNDrop.objects.filter(franchise=user.franchise).first()
+        if pickndrop_obj is None:
+            return Response({"error": "PickNDrop credentials not found."}, status=404)
+
+        orders = {
+            order.id: order
+            for order in Order.objects.filter(
+                id__in=order_ids, franchise=user.franchise
+            )
+            .select_related("location")
+            .prefetch_related("order_products__product__product")
+        }
+
+        results = {}
+        eligible = []
+        for order_id in order_ids:
+            order = orders.get(order_id)
+            if order is None:
+                results[order_id] = {"status": "error", "message": "Order not found."}
+            elif order.order_status == "Sent to PicknDrop":
+                results[order_id] = {
+                    "status": "error",
+                    "message": "Order has already been sent to PicknDrop.",
+                }
+            else:
+                eligible.append(order)
+
+        if is_deferred(request):
+            with transaction.atomic():
+                for order in eligible:
+                    order.logistics = "PicknDrop"
+                transition_orders(
+                    eligible,
+                    "Sent to PicknDrop",
+                    user=user,
+                    update_fields=["logistics"],
+                )
+                for order in eligible:
+                    entry = enqueue_courier_push(order, "PicknDrop", user=user)
+                    results[order.id] = {"status": "queued", "outbox_id": entry.id}
+            return Response(self._summary(order_ids, results), status=202)
+
+        results.update(send_pickndrop_orders(eligible, pickndrop_obj))
+
+        sent = []
+        for order in eligible:
+            result = results[order.id]
+            if result.get("status") == "success":
+                order.logistics = "PicknDrop"
+                order.tracking_code = result.get("tracking_code")
+                sent.append(order)
+        if sent:
+            transition_orders(
+                sent,
+                "Sent to PicknDrop",
+                user=user,
+                update_fields=["logistics", "tracking_code"],
+            )
+        return Response(self._summary(order_ids, results), status=200)
+
+    @staticmethod
+    def _summary(order_ids, results):
+        rows = [{"order_id": order_id, **results[order_id]} for order_id in order_ids]
+        failed = sum(row["status"] == "error" for row in rows)
+        return {"sent": len(rows) - failed, "failed": failed, "results": rows}
+
+
 # Mapping table
 PICKNDROP_STATUS_MAP = {
     "package_pickup_assigned": "Sent to PicknDrop",
@@ -229,15 +375,12 @@ class PickNDropWebhookView(APIView):
                 status=404,
             )
 
-        # Store previous status for comparison
-        previous_status = order.order_status
-
         # Map PicknDrop → Internal Status
         mapped_status = PICKNDROP_STATUS_MAP.get(status)
 
         if not mapped_status:
             order.remarks = f"[WEBHOOK UNKNOWN STATUS] {status}: {comments}"
-            order.save(update_fields=["remarks"])
+            order.save(update_fields=["remarks", "updated_at"])
             return Response(
                 {
                     "status": "ignored",
@@ -249,51 +392,13 @@ class PickNDropWebhookView(APIView):
         # ------------------------------
         # UPDATE ORDER STATUS FROM WEBHOOK
         # ------------------------------
-        order.order_status = mapped_status
-
         # Append webhook comments
         if comments:
             existing = order.remarks or ""
             order.remarks = f"{existing}\nWebhook: {comments}"
 
-        order.save(update_fields=["order_status", "remarks"])
-
-        # -----------------------------------------
-        # 6️⃣ HANDLE ORDER CANCELLATION / RETURNS
-        # -----------------------------------------
-
-        CANCEL_RETURN_STATUSES = [
-            "Cancelled",
-            "Returned By Customer",
-            "Returned By Dash",
-            "Returned By YDM",
-            "Returned By PicknDrop",
-        ]
-
-        if (
-            mapped_status in CANCEL_RETURN_STATUSES
-            and previous_status != mapped_status  # Prevent double-restock
-        ):
-            order_products = OrderProduct.objects.filter(order=order).select_related(
-                "product__product"
-            )
-
-            for order_product in order_products:
-                try:
-                    inventory = Inventory.objects.get(
-                        product__id=order_product.product.product.id,
-                        franchise=order.franchise,
-                    )
-
-                    inventory.quantity += order_product.quantity
-                    inventory.save()
-                except Inventory.DoesNotExist:
-                    return Response(
-                        {
-                            "detail": f"Inventory not found for product {order_product.product.product.name}"
-                        },
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
+        # Status change with its change log; cancelled/returned orders are restocked
+        transition_orders([order], mapped_status, update_fields=["remarks"])
 
         return Response(
             {
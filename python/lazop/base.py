@@ -8,29 +8,18 @@ Created on 2018-03-21
 import hashlib
 import hmac
 import logging
-import os
 import platform
 import socket
+import threading
 import time
-from os.path import expanduser
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
 
-# dir = os.getenv('HOME')
-dir = expanduser("~")
-isExists = os.path.exists(dir + "/logs")
-if not isExists:
-    os.makedirs(dir + "/logs")
+# Errors are reported through the standard logging tree; the host application
+# decides where they go (previously a file handler was attached at import time).
 logger = logging.getLogger(__name__)
-logger.setLevel(level=logging.ERROR)
-handler = logging.FileHandler(
-    dir + "/logs/lazopsdk.log." + time.strftime("%Y-%m-%d", time.localtime())
-)
-handler.setLevel(logging.ERROR)
-# formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-formatter = logging.Formatter("%(message)s")
-handler.setFormatter(formatter)
-logger.addHandler(handler)
 
 P_SDK_VERSION = "lazop-sdk-python-20181207"
 
@@ -59,25 +48,55 @@ P_LOG_LEVEL_DEBUG = "DEBUG"
 P_LOG_LEVEL_INFO = "INFO"
 P_LOG_LEVEL_ERROR = "ERROR"
 
+P_DEFAULT_POOL_SIZE = 10
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(server_url, pool_size=P_DEFAULT_POOL_SIZE):
+    """
+    Return the keep-alive session shared by every client of ``server_url``
+    with the same pool size, so repeated calls reuse TLS connections.
+    """
+    key = (server_url, pool_size)
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=pool_size, pool_maxsize=pool_size
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _sessions[key] = session
+    return session
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
 
 def sign(secret, api, parameters):
     # ===========================================================================
     # @param secret
     # @param parameters
     # ===========================================================================
-    sort_dict = sorted(parameters)
+    h = hmac.new(secret.encode(encoding="utf-8"), digestmod=hashlib.sha256)
+    h.update(api.encode(encoding="utf-8"))
+    return _finish_sign(h, parameters)
 
-    parameters_str = "%s%s" % (
-        api,
-        str().join("%s%s" % (key, parameters[key]) for key in sort_dict),
-    )
 
-    h = hmac.new(
-        secret.encode(encoding="utf-8"),
-        parameters_str.encode(encoding="utf-8"),
-        digestmod=hashlib.sha256,
+def _finish_sign(h, parameters):
+    parameters_str = str().join(
+        "%s%s" % (key, parameters[key]) for key in sorted(parameters)
     )
-
+    h.update(parameters_str.encode(encoding="utf-8"))
     return h.hexdigest().upper()
 
 
@@ -90,9 +109,23 @@ def mixStr(pstr):
         return str(pstr)
 
 
+_host_info = None
+
+
+def _get_host_info():
+    # Resolved once per process instead of a DNS lookup on every error.
+    global _host_info
+    if _host_info is None:
+        try:
+            local_ip = socket.gethostbyname(socket.gethostname())
+        except OSError:
+            local_ip = "unknown"
+        _host_info = (local_ip, platform.platform())
+    return _host_info
+
+
 def logApiError(appkey, sdkVersion, requestUrl, code, message):
-    localIp = socket.gethostbyname(socket.gethostname())
-    platformType = platform.platform()
+    localIp, platformType = _get_host_info()
     logger.error(
         "%s^_^%s^_^%s^_^%s^_^%s^_^%s^_^%s^_^%s"
         % (
@@ -145,9 +178,29 @@ class LazopResponse(object):
 
 
 class LazopClient(object):
+    """
+    Signed client for the Lazop gateway.
+
+    Requests go through a keep-alive session shared per ``(server_url,
+    pool_size)`` (pass ``session`` to use your own). ``on_request``, when
+    given, is called after every call with a dict::
+
+        {"api": ..., "method": ..., "status_code": ..., "code": ...,
+         "request_id": ..., "elapsed_ms": ..., "error": ...}
+    """
+
     log_level = P_LOG_LEVEL_ERROR
 
-    def __init__(self, server_url, app_key, app_secret, timeout=30):
+    def __init__(
+        self,
+        server_url,
+        app_key,
+        app_secret,
+        timeout=30,
+        pool_size=P_DEFAULT_POOL_SIZE,
+        session=None,
+        on_request=None,
+    ):
         if not app_key:
             raise ValueError("app_key cannot be empty or None")
         if not app_secret:
@@ -156,6 +209,44 @@ class LazopClient(object):
         self._app_key = str(app_key)
         self._app_secret = str(app_secret)
         self._timeout = timeout
+        self._pool_size = pool_size
+        self._session = session or get_session(server_url, pool_size)
+        self._on_request = on_request
+        # HMAC keyed with the secret once; each call copies it instead of
+        # re-deriving the key. Per-API prefixes (the api name is always the
+        # first signed chunk) are cached on top of that.
+        self._base_hmac = hmac.new(
+            self._app_secret.encode(encoding="utf-8"), digestmod=hashlib.sha256
+        )
+        self._api_hmacs = {}
+
+    def _sign(self, api, parameters):
+        prefix = self._api_hmacs.get(api)
+        if prefix is None:
+            prefix = self._base_hmac.copy()
+            prefix.update(api.encode(encoding="utf-8"))
+            self._api_hmacs[api] = prefix
+        return _finish_sign(prefix.copy(), parameters)
+
+    def _full_url(self, api_url, parameters):
+        return api_url + "?" + "&".join(
+            key + "=" + str(parameters[key]) for key in parameters
+        )
+
+    def _notify(self, request, started, status_code, response, error):
+        if self._on_request is None:
+            return
+        self._on_request(
+            {
+                "api": request._api_pame,
+                "method": request._http_method,
+                "status_code": status_code,
+                "code": response.code if response else None,
+                "request_id": response.request_id if response else None,
+                "elapsed_ms": (time.perf_counter() - started) * 1000,
+                "error": error,
+            }
+        )
 
     def execute(self, request, access_token=None):
 
@@ -177,34 +268,39 @@ class LazopClient(object):
         sign_parameter = sys_parameters.copy()
         sign_parameter.update(application_parameter)
 
-        sign_parameter[P_SIGN] = sign(
-            self._app_secret, request._api_pame, sign_parameter
-        )
+        sign_parameter[P_SIGN] = self._sign(request._api_pame, sign_parameter)
 
         api_url = "%s%s" % (self._server_url, request._api_pame)
 
-        full_url = api_url + "?"
-        for key in sign_parameter:
-            full_url += key + "=" + str(sign_parameter[key]) + "&"
-        full_url = full_url[0:-1]
-
+        started = time.perf_counter()
         try:
             if request._http_method == "POST" or len(request._file_params) != 0:
-                r = requests.post(
+                r = self._session.post(
                     api_url,
                     sign_parameter,
                     files=request._file_params,
                     timeout=self._timeout,
                 )
             else:
-                r = requests.get(api_url, sign_parameter, timeout=self._timeout)
+                r = self._session.get(api_url, sign_parameter, timeout=self._timeout)
         except Exception as err:
-            logApiError(self._app_key, P_SDK_VERSION, full_url, "HTTP_ERROR", str(err))
+            logApiError(
+                self._app_key,
+                P_SDK_VERSION,
+                self._full_url(api_url, sign_parameter),
+                "HTTP_ERROR",
+                str(err),
+            )
+            self._notify(request, started, None, None, str(err))
             raise err
 
         response = LazopResponse()
 
-        jsonobj = r.json()
+        try:
+            jsonobj = r.json()
+        except ValueError as err:
+            self._notify(request, started, r.status_code, None, str(err))
+            raise
 
         if P_CODE in jsonobj:
             response.code = jsonobj[P_CODE]
@@ -217,15 +313,55 @@ class LazopClient(object):
 
         if response.code is not None and response.code != "0":
             logApiError(
-                self._app_key, P_SDK_VERSION, full_url, response.code, response.message
+                self._app_key,
+                P_SDK_VERSION,
+                self._full_url(api_url, sign_parameter),
+                response.code,
+                response.message,
             )
         else:
             if (
                 self.log_level == P_LOG_LEVEL_DEBUG
                 or self.log_level == P_LOG_LEVEL_INFO
             ):
-                logApiError(self._app_key, P_SDK_VERSION, full_url, "", "")
+                logApiError(
+                    self._app_key,
+                    P_SDK_VERSION,
+                    self._full_url(api_url, sign_parameter),
+                    "",
+                    "",
+                )
 
         response.body = jsonobj
+        self._notify(request, started, r.status_code, response, None)
 
         return response
+
+    def execute_many(
+        self, requests_, access_token=None, max_workers=None, return_exceptions=False
+    ):
+        """
+        Execute several requests concurrently on the shared session.
+
+        Results come back in the order of ``requests_``. With
+        ``return_exceptions=True`` a failed call yields its exception in that
+        slot; otherwise the first failure is raised once every call finished.
+        """
+        requests_ = list(requests_)
+        if not requests_:
+            return []
+        workers = min(max_workers or self._pool_size, len(requests_))
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="lazop"
+        ) as pool:
+            futures = [
+                pool.submit(self.execute, request, access_token)
+                for request in requests_
+            ]
+        results = []
+        for future in futures:
+            exc = future.exception()
+            if exc is not None and not return_exceptions:
+                raise exc
+            results.append(exc if exc is not None else future.result())
+        return results
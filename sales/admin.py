@@ -360,3 +360,56 @@ admin.site.register(Location, LocationAdmin)
 
 admin.site.register(DatabaseMode, ModelAdmin)
 admin.site.register(HistoricalDataConfig, ModelAdmin)
+
+
+class SlowQueryAdmin(ModelAdmin):
+    list_display = ("captured_at", "duration_ms", "view", "stack_frame", "database")
+    list_filter = ("database", "view", "captured_at")
+    search_fields = ("sql", "view", "stack_frame")
+    readonly_fields = (
+        "captured_at",
+        "duration_ms",
+        "database",
+        "view",
+        "stack_frame",
+        "params_shape",
+        "sql",
+        "explain_plan",
+    )
+    ordering = ("-captured_at",)
+
+    def has_add_permission(self, request):
+        # Rows are written by core.slow_queries only
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(SlowQuery, SlowQueryAdmin)
+
+
+class ArchivedOrderAdmin(ModelAdmin):
+    list_display = (
+        "order_code",
+        "full_name",
+        "phone_number",
+        "order_status",
+        "total_amount",
+        "date",
+        "archived_at",
+    )
+    list_filter = ("order_status", "logistics", "archived_at")
+    search_fields = ("order_code", "full_name", "phone_number")
+    readonly_fields = [field.name for field in ArchivedOrder._meta.fields]
+    ordering = ("-order_id",)
+
+    def has_add_permission(self, request):
+        # Rows are written by sales.archive only
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(ArchivedOrder, ArchivedOrderAdmin)
@@ -0,0 +1,365 @@
+# sales/archive.py
+"""
+Cold tier for closed orders.
+
+``archive_orders`` moves closed orders older than ORDER_ARCHIVE_AFTER_DAYS out
+of sales_order in batches. Each becomes an ArchivedOrder holding the order's
+API representation plus the order, product, change log and comment rows in
+fixture format (``manage.py loaddata`` can put them back). The deleted hot
+rows are added to the per-day ArchivedOrderRollup and ArchivedProductRollup
+totals, which the statistics views add to what they count in sales_order.
+Run ``manage.py archive_orders`` from cron.
+
+Readers of old orders use ``historical_orders``, which lists hot and archived
+orders together, newest first.
+"""
+
+import heapq
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import chain
+
+from django.conf import settings
+from django.core import serializers
+from django.db import router, transaction
+from django.db.models import Count, F, Prefetch, Sum
+from django.utils import timezone
+
+from logistics.models import CourierOutbox
+
+from .constants import CLOSED_ORDER_STATUSES
+from .models import (
+    ArchivedOrder,
+    ArchivedOrderRollup,
+    ArchivedProductRollup,
+    Order,
+    OrderProduct,
+)
+from .serializers import OrderSerializer
+
+# Closed orders created this many days ago or earlier are archived.
+ORDER_ARCHIVE_AFTER_DAYS = settings.ORDER_ARCHIVE_AFTER_DAYS
+# Orders moved per transaction.
+ORDER_ARCHIVE_BATCH_SIZE = settings.ORDER_ARCHIVE_BATCH_SIZE
+
+ROLLUP_KEY = [
+    "date",
+    "franchise_id",
+    "distributor_id",
+    "factory_id",
+    "sales_person_id",
+    "order_status",
+    "logistics",
+]
+PRODUCT_ROLLUP_KEY = [
+    "date",
+    "franchise_id",
+    "distributor_id",
+    "factory_id",
+    "sales_person_id",
+    "order_status",
+]
+
+
+def archive_cutoff():
+    return timezone.now() - timedelta(days=ORDER_ARCHIVE_AFTER_DAYS)
+
+
+def archivable_orders(before):
+    """
+    Closed orders created before ``before`` that nothing live depends on.
+    YDM orders and rider assignments feed franchise statements and rider
+    payouts, and game winners are shown to customers, so those stay hot.
+    """
+    return (
+        Order.objects
+        .filter(order_status__in=CLOSED_ORDER_STATUSES, created_at__lt=before)
+        .exclude(logistics="YDM")
+        .exclude(assign_orders__isnull=False)
+        .exclude(game_winners__isnull=False)
+        .exclude(
+            courier_outbox__status__in=[
+                CourierOutbox.STATUS_PENDING,
+                CourierOutbox.STATUS_PROCESSING,
+            ]
+        )
+    )
+
+
+def _archived_order(order):
+    records = [
+        order,
+        *order.order_products.all(),
+        *order.change_logs.all(),
+        *order.comments.all(),
+    ]
+    return ArchivedOrder(
+        order_id=order.id,
+        order_code=order.order_code,
+        franchise_id=order.franchise_id,
+        distributor_id=order.distributor_id,
+        factory_id=order.factory_id,
+        sales_person_id=order.sales_person_id,
+        full_name=order.full_name,
+        phone_number=order.phone_number,
+        order_status=order.order_status,
+        logistics=order.logistics,
+        date=order.date,
+        created_at=order.created_at,
+        total_amount=order.total_amount,
+        prepaid_amount=order.prepaid_amount,
+        payload=OrderSerializer(order).data,
+        records=json.loads(serializers.serialize("json", records)),
+    )
+
+
+def _upsert_rollups(model, totals, defaults=None):
+    """
+    Add ``{key: {field: amount}}`` to the rollup rows of ``model``; a key is
+    the ``(field, value)`` pairs of the row. ``defaults[key]`` holds other
+    fields of rows that have to be created.
+    """
+    for key, amounts in totals.items():
+        lookup = dict(key)
+        updated = model.objects.filter(**lookup).update(
+            **{field: F(field) + amount for field, amount in amounts.items()}
+        )
+        if not updated:
+            model.objects.create(
+                **lookup, **(defaults or {}).get(key, {}), **amounts
+            )
+
+
+def _add_to_rollups(orders):
+    order_totals = defaultdict(lambda: defaultdict(int))
+    product_totals = defaultdict(lambda: defaultdict(int))
+    product_names = {}
+    for order in orders:
+        row = order_totals[tuple((f, getattr(order, f)) for f in ROLLUP_KEY)]
+        row["order_count"] += 1
+        row["total_amount"] += order.total_amount or 0
+        row["prepaid_amount"] += order.prepaid_amount or 0
+        row["delivery_charge"] += order.delivery_charge or 0
+
+        # Products share the order total by quantity, as in TopProductsView
+        order_products = order.order_products.all()
+        quantity = sum(op.quantity for op in order_products)
+        key = tuple((f, getattr(order, f)) for f in PRODUCT_ROLLUP_KEY)
+        for op in order_products:
+            product = op.product.product
+            product_key = (*key, ("product_id", product.id))
+            product_names[product_key] = {"product_name": product.name}
+            row = product_totals[product_key]
+            row["quantity"] += op.quantity
+            if quantity:
+                share = Decimal(order.total_amount or 0) * op.quantity / quantity
+                row["revenue"] += share.quantize(Decimal("0.01"))
+
+    _upsert_rollups(ArchivedOrderRollup, order_totals)
+    _upsert_rollups(ArchivedProductRollup, product_totals, product_names)
+
+
+def archive_batch(ids, before):
+    """
+    Archive the orders in ``ids`` that are still archivable and return how
+    many left sales_order. Orders already archived by an interrupted run are
+    only deleted, so they are never copied or counted twice.
+    """
+    hot_db = router.db_for_write(Order)
+    archive_db = router.db_for_write(ArchivedOrder)
+    # With two databases the archive commits first; a failure after that
+    # leaves the hot rows in place for the next run to delete.
+    with transaction.atomic(using=hot_db), transaction.atomic(using=archive_db):
+        orders = list(
+            archivable_orders(before)
+            .filter(id__in=ids)
+            .select_for_update(of=("self",))
+            .select_related("sales_person", "location", "daraz_location", "promo_code")
+            .prefetch_related(
+                "change_logs",
+                "comments",
+                Prefetch(
+                    "order_products",
+                    queryset=OrderProduct.objects.select_related("product__product"),
+                ),
+            )
+        )
+        if not orders:
+            return 0
+        archived = set(
+            ArchivedOrder.objects
+            .filter(order_id__in=[order.id for order in orders])
+            .values_list("order_id", flat=True)
+        )
+        new = [order for order in orders if order.id not in archived]
+        ArchivedOrder.objects.bulk_create([_archived_order(order) for order in new])
+        _add_to_rollups(new)
+        Order.objects.filter(id__in=[order.id for order in orders]).delete()
+    return len(orders)
+
+
+def archive_orders(before=None, batch_size=None, limit=None, dry_run=False):
+    """
+    Move archivable orders created before ``before`` (default: the
+    ORDER_ARCHIVE_AFTER_DAYS cutoff) into the archive, oldest id first, and
+    return how many were moved (or would be, with ``dry_run``).
+    """
+    before = before or archive_cutoff()
+    batch_size = batch_size or ORDER_ARCHIVE_BATCH_SIZE
+    moved = 0
+    last_id = 0
+    while limit is None or moved < limit:
+        size = batch_size if limit is None else min(batch_size, limit - moved)
+        ids = list(
+            archivable_orders(before)
+            .filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:size]
+        )
+        if not ids:
+            break
+        last_id = ids[-1]
+        moved += len(ids) if dry_run else archive_batch(ids, before)
+    return moved
+
+
+def _sales_order_id(order):
+    """sales_order id of a hot Order or an ArchivedOrder."""
+    return order.order_id if isinstance(order, ArchivedOrder) else order.id
+
+
+class TieredOrders:
+    """
+    Hot and archived orders read as one list, newest (highest id) first.
+    Supports ``count()``, slicing and iteration, so it can be paginated and
+    streamed like a queryset. Items are Order or ArchivedOrder instances.
+    """
+
+    def __init__(self, hot, cold):
+        self.hot = hot.order_by("-id")
+        self.cold = cold.order_by("-order_id")
+
+    def count(self):
+        return self.hot.count() + self.cold.count()
+
+    def __len__(self):
+        return self.count()
+
+    def _merge(self, hot, cold):
+        return heapq.merge(hot, cold, key=lambda order: -_sales_order_id(order))
+
+    def __iter__(self):
+        return self._merge(
+            self.hot.iterator(chunk_size=1000), self.cold.iterator(chunk_size=1000)
+        )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step is not None or (index.start or 0) < 0:
+                raise ValueError("TieredOrders only supports forward slices")
+            start, stop = index.start or 0, index.stop
+            if stop is None:
+                return list(self)[start:]
+            merged = self._merge(list(self.hot[:stop]), list(self.cold[:stop]))
+            return list(merged)[start:stop]
+        return self[index:index + 1][0]
+
+
+def historical_orders(hot=None, cold=None, exclude_ids=(), **filters):
+    """
+    Orders matching ``filters`` from sales_order and the archive.
+    The filters must use fields both tables have, e.g. ``franchise_id``,
+    ``date`` or ``created_at``. ``hot`` and ``cold`` are optional base
+    querysets (for select_related, only(), ...).
+    """
+    hot = (Order.objects.all() if hot is None else hot).filter(**filters)
+    cold = (ArchivedOrder.objects.all() if cold is None else cold).filter(**filters)
+    if exclude_ids:
+        hot = hot.exclude(id__in=exclude_ids)
+        cold = cold.exclude(order_id__in=exclude_ids)
+    return TieredOrders(hot, cold)
+
+
+def representations(orders, serialize):
+    """API data of ``orders``: ``serialize(order)`` for hot ones, the stored
+    payload for archived ones."""
+    return [
+        order.payload if isinstance(order, ArchivedOrder) else serialize(order)
+        for order in orders
+    ]
+
+
+def archived_totals(**filters):
+    """
+    ``{order_status: (orders, total_amount)}`` of archived orders matching
+    ``filters`` (ArchivedOrderRollup fields, e.g. ``franchise_id``, ``date``).
+    """
+    rows = (
+        ArchivedOrderRollup.objects
+        .filter(**filters)
+        .values("order_status")
+        .annotate(orders=Sum("order_count"), amount=Sum("total_amount"))
+    )
+    return {
+        row["order_status"]: (row["orders"] or 0, row["amount"] or Decimal(0))
+        for row in rows
+    }
+
+
+def rollup_filters(filters, prefix=""):
+    """
+    Order ``filters`` (``franchise_id``, ``date__gte``, ... optionally behind
+    a relation ``prefix`` such as "order__") as rollup filters. Rollups only
+    know the order date, so created_at lookups become date lookups.
+    """
+    converted = {}
+    for lookup, value in filters.items():
+        lookup = lookup.removeprefix(prefix)
+        field, _, rest = lookup.partition("__")
+        if field == "created_at":
+            rest = rest.removeprefix("date").removeprefix("__")
+            lookup = f"date__{rest}" if rest else "date"
+        converted[lookup] = value
+    return converted
+
+
+def rollup_aggregates(aggregates):
+    """
+    Order aggregates rewritten for ArchivedOrderRollup: ``Count("id")`` sums
+    order_count, sums of total_amount, prepaid_amount and delivery_charge
+    stay as they are.
+    """
+    return {
+        name: (
+            Sum("order_count", filter=aggregate.filter, default=0)
+            if isinstance(aggregate, Count)
+            else aggregate
+        )
+        for name, aggregate in aggregates.items()
+    }
+
+
+def add_archived_rows(rows, archived_rows, key):
+    """
+    Add per-``key`` aggregate rows of archived orders to those of hot orders.
+    The numbers of rows with the same key are summed; datetime keys
+    (truncated created_at) are matched by their date. Returns a list ordered
+    by key.
+    """
+    merged = {}
+    for row in chain(rows, archived_rows):
+        value = row[key]
+        if value is None:
+            continue
+        if isinstance(value, datetime):
+            value = value.date()
+        if value not in merged:
+            merged[value] = {**row, key: value}
+            continue
+        target = merged[value]
+        for field, number in row.items():
+            if field != key and isinstance(number, (int, Decimal, float)):
+                target[field] = (target.get(field) or 0) + number
+    return [merged[value] for value in sorted(merged)]
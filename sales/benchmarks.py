@@ -0,0 +1,317 @@
+"""
+Endpoint benchmarks with per-endpoint query and latency budgets.
+
+Each entry in ENDPOINTS names one hot API call. ``run_benchmarks`` replays
+it through the test client against whatever data is in the database
+(normally built with ``manage.py generate_synthetic_data``). It records
+wall time, SQL query count and SQL time, and compares them with the
+budgets checked in next to this module (benchmark_budgets.json).
+
+Writes (order create/update, webhooks) run inside a transaction that is
+rolled back, so a benchmark run leaves the data unchanged.
+
+Run ``manage.py benchmark_endpoints``, or use the test in sales/tests.py.
+
+``benchmark_renderers`` times DRF's JSON renderer against core.fast_json on
+pages of OrderSerializer output (``manage.py benchmark_renderers``).
+"""
+
+import json
+import statistics
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.db import connection, transaction
+from django.db.models import Count
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from account.models import CustomUser
+from core.fast_json import FastJSONRenderer
+from logistics.models import AssignOrder
+from sales.models import Inventory, Order
+from sales.serializers import OrderSerializer
+
+BUDGETS_FILE = Path(__file__).with_name("benchmark_budgets.json")
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    # Formatted with the BenchmarkContext attributes, e.g. "{order_id}".
+    path: str
+    user: str = "franchise_user"
+    payload: object = None
+    params: dict = field(default_factory=dict)
+    writes: bool = False
+
+
+def _order_payload(ctx):
+    return {
+        "full_name": "Benchmark Customer",
+        "city": "Kathmandu",
+        "delivery_address": "Benchmark Street",
+        "landmark": "",
+        "phone_number": "9811111111",
+        "alternate_phone_number": "",
+        "remarks": "",
+        "payment_method": "Cash on Delivery",
+        "total_amount": "1500.00",
+        "force_order": True,
+        "order_products": [{"product_id": ctx.inventory_id, "quantity": 1}],
+    }
+
+
+def _ydm_webhook_payload(ctx):
+    return {
+        "event": "order.status_changed",
+        "data": {
+            "external_order_code": ctx.order_code,
+            "tracking_number": "YDM-BENCH",
+            "new_status": "DELIVERED",
+        },
+    }
+
+
+ENDPOINTS = [
+    Endpoint("order-list", "GET", "/api/sales/orders/"),
+    Endpoint(
+        "order-create",
+        "POST",
+        "/api/sales/orders/",
+        user="salesperson",
+        payload=_order_payload,
+        writes=True,
+    ),
+    Endpoint(
+        "order-update",
+        "PATCH",
+        "/api/sales/orders/{order_id}/",
+        payload=lambda ctx: {"remarks": "benchmark"},
+        writes=True,
+    ),
+    Endpoint("sales-statistics", "GET", "/api/sales/statistics/"),
+    Endpoint("top-salespersons", "GET", "/api/sales/top-salespersons/"),
+    Endpoint(
+        "franchise-statement",
+        "GET",
+        "/api/logistics/franchise/{franchise_id}/statement/",
+    ),
+    Endpoint(
+        "rider-commission", "GET", "/api/logistics/rider-commission/", user="rider"
+    ),
+    # Exporting marks the franchise's Processing orders as sent to Dash.
+    Endpoint("export-csv", "GET", "/api/sales/export-csv/", writes=True),
+    Endpoint("logistics-export-orders", "GET", "/api/logistics/export-orders/"),
+    Endpoint(
+        "ydm-webhook",
+        "POST",
+        "/api/ydm/webhook/",
+        user=None,
+        payload=_ydm_webhook_payload,
+        writes=True,
+    ),
+]
+
+
+class BenchmarkContext:
+    """Ids of the busiest franchise and its users in the current database."""
+
+    def __init__(self):
+        busiest = (
+            Order.objects.values("franchise_id")
+            .annotate(total=Count("id"))
+            .order_by("-total")
+            .first()
+        )
+        if busiest is None:
+            raise ValueError(
+                "No orders to benchmark; run generate_synthetic_data first."
+            )
+        self.franchise_id = busiest["franchise_id"]
+        self.franchise_user = CustomUser.objects.filter(
+            role="Franchise", franchise_id=self.franchise_id
+        ).first()
+        top_seller = (
+            Order.objects.filter(franchise_id=self.franchise_id)
+            .values("sales_person_id")
+            .annotate(total=Count("id"))
+            .order_by("-total")
+            .first()
+        )
+        self.salesperson = CustomUser.objects.get(pk=top_seller["sales_person_id"])
+        busiest_rider = (
+            AssignOrder.objects.values("user_id")
+            .annotate(total=Count("id"))
+            .order_by("-total")
+            .first()
+        )
+        self.rider = (
+            CustomUser.objects.get(pk=busiest_rider["user_id"])
+            if busiest_rider
+            else None
+        )
+        order = (
+            Order.objects.filter(franchise_id=self.franchise_id)
+            .order_by("-created_at")
+            .first()
+        )
+        self.order_id = order.id
+        self.order_code = order.order_code
+        self.inventory_id = (
+            Inventory.objects.filter(franchise_id=self.franchise_id, quantity__gt=10)
+            .values_list("id", flat=True)
+            .first()
+        )
+
+
+class SQLTimer:
+    """execute_wrapper counting queries and the time spent in the database."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - started
+
+
+def load_budgets(path=BUDGETS_FILE):
+    """``{"dataset": {...generate_synthetic_data options}, "endpoints": {...}}``"""
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def _call(client, endpoint, ctx):
+    path = endpoint.path.format(**vars(ctx))
+    payload = endpoint.payload(ctx) if callable(endpoint.payload) else None
+    request = getattr(client, endpoint.method.lower())
+    if endpoint.method == "GET":
+        return request(path, endpoint.params)
+    return request(path, payload, format="json")
+
+
+def benchmark_endpoint(endpoint, ctx, repeat=5, warmup=1):
+    client = APIClient()
+    user = getattr(ctx, endpoint.user) if endpoint.user else None
+    if user is not None:
+        client.force_authenticate(user=user)
+
+    timings, query_counts, sql_times = [], [], []
+    status_code = None
+    for run in range(warmup + repeat):
+        sql = SQLTimer()
+        with transaction.atomic():
+            with connection.execute_wrapper(sql):
+                started = time.perf_counter()
+                response = _call(client, endpoint, ctx)
+                elapsed = (time.perf_counter() - started) * 1000
+            if endpoint.writes:
+                transaction.set_rollback(True)
+        status_code = response.status_code
+        if run < warmup:
+            continue
+        timings.append(elapsed)
+        query_counts.append(sql.queries)
+        sql_times.append(sql.seconds * 1000)
+
+    return {
+        "name": endpoint.name,
+        "status_code": status_code,
+        "queries": max(query_counts),
+        "sql_ms": round(statistics.median(sql_times), 2),
+        "median_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(_percentile(timings, 95), 2),
+    }
+
+
+def check_budget(result, budget, check_latency=True):
+    """Return a list of human-readable budget violations for one result."""
+    problems = []
+    if not 200 <= result["status_code"] < 300:
+        problems.append(f"HTTP {result['status_code']}")
+    if budget is None:
+        problems.append("no budget checked in")
+        return problems
+    if result["queries"] > budget["max_queries"]:
+        problems.append(f"{result['queries']} queries > {budget['max_queries']}")
+    if check_latency and result["p95_ms"] > budget["p95_ms"]:
+        problems.append(f"p95 {result['p95_ms']}ms > {budget['p95_ms']}ms")
+    return problems
+
+
+def run_benchmarks(names=None, repeat=5, budgets=None, check_latency=True):
+    """
+    Benchmark ENDPOINTS (or only ``names``). Each returned result carries a
+    ``problems`` list that is empty when the endpoint is within budget.
+    """
+    budgets = load_budgets()["endpoints"] if budgets is None else budgets
+    ctx = BenchmarkContext()
+    results = []
+    for endpoint in ENDPOINTS:
+        if names and endpoint.name not in names:
+            continue
+        result = benchmark_endpoint(endpoint, ctx, repeat=repeat)
+        result["problems"] = check_budget(
+            result, budgets.get(endpoint.name), check_latency=check_latency
+        )
+        results.append(result)
+    return results
+
+
+RENDERERS = {"drf": JSONRenderer, "fast": FastJSONRenderer}
+
+
+def order_page(page_size):
+    """The newest ``page_size`` orders as the paginated order list returns them."""
+    orders = Order.objects.order_by("-id")[:page_size]
+    return {
+        "count": Order.objects.count(),
+        "next": None,
+        "previous": None,
+        "results": OrderSerializer(orders, many=True).data,
+    }
+
+
+def benchmark_renderers(page_size=100, repeat=20):
+    """
+    Render one page of orders ``repeat`` times with each of RENDERERS.
+    Returns one result per renderer, with ``identical`` telling whether its
+    bytes match DRF's.
+    """
+    data = order_page(page_size)
+    if not data["results"]:
+        raise ValueError("No orders to benchmark; run generate_synthetic_data first.")
+    expected = JSONRenderer().render(data)
+    results = []
+    for name, renderer_class in RENDERERS.items():
+        renderer = renderer_class()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rendered = renderer.render(data)
+            timings.append((time.perf_counter() - started) * 1000)
+        results.append(
+            {
+                "name": name,
+                "orders": len(data["results"]),
+                "bytes": len(rendered),
+                "identical": rendered == expected,
+                "median_ms": round(statistics.median(timings), 3),
+                "p95_ms": round(_percentile(timings, 95), 3),
+            }
+        )
+    return results
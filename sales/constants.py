@@ -22,3 +22,24 @@ EXCLUDED_STATUSES = [
     "Returned By YDM",
     "Returned By Daraz",
 ]
+
+# Final statuses: orders in them no longer change and may be archived
+CLOSED_ORDER_STATUSES = [
+    "Delivered",
+    "Cancelled",
+    "Returned By Customer",
+    "Returned By Dash",
+    "Returned By PicknDrop",
+    "Returned By YDM",
+    "Returned By Daraz",
+]
+
+# Statuses in which an order's products are back in stock
+RETURN_STATUSES = [
+    "Cancelled",
+    "Returned By Customer",
+    "Returned By Dash",
+    "Returned By YDM",
+    "Returned By PicknDrop",
+    "Returned By Daraz",
+]
@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from sales.archive import (
+    ORDER_ARCHIVE_AFTER_DAYS,
+    ORDER_ARCHIVE_BATCH_SIZE,
+    archive_orders,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move closed orders older than ORDER_ARCHIVE_AFTER_DAYS, with their "
+        "products, change logs and comments, into the order archive"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=ORDER_ARCHIVE_AFTER_DAYS,
+            help=f"Archive orders created at least this many days ago "
+            f"(default: {ORDER_ARCHIVE_AFTER_DAYS})",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=ORDER_ARCHIVE_BATCH_SIZE,
+            help=f"Orders moved per transaction (default: {ORDER_ARCHIVE_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--limit", type=int, help="Stop after archiving this many orders"
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the orders that would be archived",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] < 1 or options["batch_size"] < 1:
+            raise CommandError("--days and --batch-size must be positive")
+
+        before = timezone.now() - timedelta(days=options["days"])
+        moved = archive_orders(
+            before=before,
+            batch_size=options["batch_size"],
+            limit=options["limit"],
+            dry_run=options["dry_run"],
+        )
+        verb = "Would archive" if options["dry_run"] else "Archived"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {moved} order(s) created before {before:%Y-%m-%d}"
+            )
+        )
@@ -0,0 +1,76 @@
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from sales.benchmarks import ENDPOINTS, load_budgets, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the hot API endpoints against the current data and fail when "
+        "one exceeds its checked-in query or latency budget"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            choices=[endpoint.name for endpoint in ENDPOINTS],
+            help="Benchmark only these endpoints",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--generate",
+            action="store_true",
+            help="First build the reference dataset described in the budgets file",
+        )
+        parser.add_argument(
+            "--no-latency",
+            action="store_true",
+            help="Only enforce query budgets (for noisy machines)",
+        )
+        parser.add_argument("--json", help="Also write the results to this file")
+
+    def handle(self, *args, **options):
+        budgets = load_budgets()
+        if options["generate"]:
+            call_command(
+                "generate_synthetic_data",
+                prefix="bench",
+                stdout=self.stdout,
+                **budgets["dataset"],
+            )
+
+        try:
+            results = run_benchmarks(
+                names=options["only"],
+                repeat=options["repeat"],
+                budgets=budgets["endpoints"],
+                check_latency=not options["no_latency"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(
+            f"{'endpoint':<26}{'status':>7}{'queries':>9}{'sql ms':>9}"
+            f"{'median ms':>11}{'p95 ms':>9}"
+        )
+        for result in results:
+            line = (
+                f"{result['name']:<26}{result['status_code']:>7}"
+                f"{result['queries']:>9}{result['sql_ms']:>9}"
+                f"{result['median_ms']:>11}{result['p95_ms']:>9}"
+            )
+            if result["problems"]:
+                line = self.style.ERROR(f"{line}  {'; '.join(result['problems'])}")
+            self.stdout.write(line)
+
+        if options["json"]:
+            with open(options["json"], "w") as fh:
+                json.dump(results, fh, indent=2)
+
+        failed = [result["name"] for result in results if result["problems"]]
+        if failed:
+            raise CommandError(f"Over budget: {', '.join(failed)}")
+        self.stdout.write(self.style.SUCCESS("All endpoints within budget"))
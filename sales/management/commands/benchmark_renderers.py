@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sales.benchmarks import benchmark_renderers
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's JSON renderer with core.fast_json on pages of "
+        "OrderSerializer output from the current data"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            nargs="+",
+            default=[20, 100],
+            help="Orders per rendered page (default: 20 100)",
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'renderer':<10}{'orders':>8}{'bytes':>10}{'median ms':>11}"
+            f"{'p95 ms':>9}{'speedup':>9}"
+        )
+        mismatched = []
+        for page_size in options["page_size"]:
+            try:
+                results = benchmark_renderers(page_size, repeat=options["repeat"])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            baseline = results[0]["median_ms"]
+            for result in results:
+                speedup = baseline / result["median_ms"] if result["median_ms"] else 0
+                self.stdout.write(
+                    f"{result['name']:<10}{result['orders']:>8}{result['bytes']:>10}"
+                    f"{result['median_ms']:>11}{result['p95_ms']:>9}{speedup:>8.1f}x"
+                )
+                if not result["identical"]:
+                    mismatched.append(f"{result['name']} ({page_size} orders)")
+
+        if mismatched:
+            raise CommandError(f"Output differs from DRF: {', '.join(mismatched)}")
+        self.stdout.write(self.style.SUCCESS("All renderers produce identical output"))
@@ -0,0 +1,180 @@
+import re
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from export_data.views import CustomOrderFilter
+from logistics.views import OrderFilter as LogisticsOrderFilter
+from sales.models import Order
+from sales.views import OrderFilter
+
+# Plan lines that mean the whole sales_order table is read
+SEQ_SCAN_PATTERNS = {
+    "postgresql": re.compile(r"Seq Scan on sales_order\b"),
+    "sqlite": re.compile(r"\bSCAN sales_order\b"),
+}
+
+
+@dataclass
+class FilterCheck:
+    label: str
+    build: object  # callable(sample) -> Order queryset
+    # Served by an expression index that only exists on PostgreSQL
+    postgres_only: bool = False
+
+
+class Sample:
+    """Representative filter values, taken from the data when there is any."""
+
+    def __init__(self):
+        order = Order.objects.order_by("-id").first()
+        self.franchise = getattr(order, "franchise_id", None) or 1
+        self.distributor = getattr(order, "distributor_id", None) or 1
+        self.factory = getattr(order, "factory_id", None) or 1
+        self.sales_person = getattr(order, "sales_person_id", None) or 1
+        self.phone_number = getattr(order, "phone_number", None) or "9800000000"
+        self.order_code = getattr(order, "order_code", None) or "ORD-00000000"
+        self.today = timezone.localdate()
+        self.month_ago = self.today - timedelta(days=30)
+
+
+def _sales_filter(data):
+    return OrderFilter(data, queryset=Order.objects.all()).qs
+
+
+CHECKS = [
+    FilterCheck(
+        "sales.OrderFilter franchise + start/end_date",
+        lambda s: _sales_filter(
+            {"franchise": s.franchise, "start_date": s.month_ago, "end_date": s.today}
+        ),
+    ),
+    FilterCheck(
+        "sales.OrderFilter distributor + date",
+        lambda s: _sales_filter({"distributor": s.distributor, "date": s.today}),
+    ),
+    FilterCheck(
+        "sales.OrderFilter sales_person + start/end_date",
+        lambda s: _sales_filter(
+            {
+                "sales_person": s.sales_person,
+                "start_date": s.month_ago,
+                "end_date": s.today,
+            }
+        ),
+    ),
+    FilterCheck(
+        "sales.OrderFilter logistics",
+        lambda s: _sales_filter({"logistics": "YDM"}),
+    ),
+    FilterCheck(
+        "logistics.OrderFilter franchise + order_status (YDM export)",
+        lambda s: LogisticsOrderFilter(
+            {"franchise": s.franchise, "order_status": "Sent to YDM"},
+            queryset=Order.objects.filter(logistics="YDM"),
+        ).qs,
+    ),
+    FilterCheck(
+        "export_data.CustomOrderFilter date_from/date_to",
+        lambda s: CustomOrderFilter(
+            {"date_from": s.month_ago, "date_to": s.today},
+            queryset=Order.objects.all(),
+        ).qs,
+        postgres_only=True,
+    ),
+    FilterCheck(
+        "franchise + created_at__date (daily report)",
+        lambda s: Order.objects.filter(
+            franchise_id=s.franchise, created_at__date=s.today
+        ),
+        postgres_only=True,
+    ),
+    FilterCheck(
+        "statistic: factory + date range",
+        lambda s: Order.objects.filter(
+            factory_id=s.factory, date__gte=s.month_ago, date__lte=s.today
+        ),
+    ),
+    FilterCheck(
+        "statistic: sales_person + date year/month",
+        lambda s: Order.objects.filter(
+            sales_person_id=s.sales_person,
+            date__year=s.today.year,
+            date__month=s.today.month,
+        ),
+    ),
+    FilterCheck(
+        "statistic: franchise + date",
+        lambda s: Order.objects.filter(franchise_id=s.franchise, date=s.today),
+    ),
+    FilterCheck(
+        "logistics + order_status",
+        lambda s: Order.objects.filter(logistics="YDM", order_status="Sent to YDM"),
+    ),
+    FilterCheck(
+        "phone_number",
+        lambda s: Order.objects.filter(phone_number=s.phone_number),
+    ),
+    FilterCheck(
+        "order_code",
+        lambda s: Order.objects.filter(order_code=s.order_code),
+    ),
+]
+
+
+def explain(queryset, force_index=True):
+    """EXPLAIN ``queryset``; with ``force_index`` PostgreSQL avoids seq scans
+    whenever an index can serve the query, as it would on a large table."""
+    connection = connections[queryset.db]
+    with transaction.atomic(using=queryset.db):
+        if force_index and connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the canonical Order filter combinations and report those that "
+        "still scan the whole sales_order table"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--planner-default",
+            action="store_true",
+            help="Keep PostgreSQL's own choice instead of disabling seq scans "
+            "(small tables are always seq scanned then)",
+        )
+
+    def handle(self, *args, **options):
+        vendor = connections[Order.objects.all().db].vendor
+        pattern = SEQ_SCAN_PATTERNS.get(vendor)
+        if pattern is None:
+            raise CommandError(f"Plans from {vendor} are not supported")
+
+        sample = Sample()
+        seq_scans = []
+        for check in CHECKS:
+            if check.postgres_only and vendor != "postgresql":
+                self.stdout.write(f"  skip      {check.label} (PostgreSQL only)")
+                continue
+            plan = explain(
+                check.build(sample), force_index=not options["planner_default"]
+            )
+            if pattern.search(plan):
+                seq_scans.append(check.label)
+                self.stdout.write(self.style.ERROR(f"  SEQ SCAN  {check.label}"))
+            else:
+                self.stdout.write(f"  index     {check.label}")
+            if options["verbosity"] > 1:
+                self.stdout.write(f"{plan}\n")
+
+        if seq_scans:
+            raise CommandError(
+                f"{len(seq_scans)} filter(s) scan sales_order: {', '.join(seq_scans)}"
+            )
+        self.stdout.write(self.style.SUCCESS("All Order filters use an index"))
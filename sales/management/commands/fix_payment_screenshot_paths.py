@@ -64,7 +64,7 @@ class Command(BaseCommand):
 
             if not dry_run:
                 order.payment_screenshot = new_path
-                order.save(update_fields=["payment_screenshot"])
+                order.save(update_fields=["payment_screenshot", "updated_at"])
 
         if dry_run:
             self.stdout.write(
@@ -0,0 +1,516 @@
+import csv
+import io
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+
+from account.models import CustomUser, Distributor, Factory, Franchise
+from logistics.models import AssignOrder, Invoice, OrderChangeLog
+from sales.models import Inventory, Location, Order, OrderProduct, Product
+
+# Status each generated order ends in, with its default share of orders.
+DEFAULT_STATUS_WEIGHTS = {
+    "Delivered": 55,
+    "Processing": 8,
+    "Pending": 4,
+    "Verified": 3,
+    "Sent to YDM": 6,
+    "Out For Delivery": 4,
+    "Sent to Dash": 3,
+    "Cancelled": 9,
+    "Returned By Customer": 3,
+    "Returned By YDM": 3,
+    "Rescheduled": 2,
+}
+
+# Statuses an order goes through before reaching its final one; each step
+# becomes an OrderChangeLog row.
+STATUS_PATHS = {
+    "Pending": [],
+    "Processing": ["Processing"],
+    "Verified": ["Processing", "Verified"],
+    "Sent to YDM": ["Processing", "Sent to YDM"],
+    "Sent to Dash": ["Processing", "Sent to Dash"],
+    "Out For Delivery": ["Processing", "Sent to YDM", "Out For Delivery"],
+    "Rescheduled": ["Processing", "Sent to YDM", "Out For Delivery", "Rescheduled"],
+    "Delivered": ["Processing", "Sent to YDM", "Out For Delivery", "Delivered"],
+    "Cancelled": ["Processing", "Cancelled"],
+    "Returned By Customer": ["Processing", "Sent to YDM", "Returned By Customer"],
+    "Returned By YDM": [
+        "Processing",
+        "Sent to YDM",
+        "Out For Delivery",
+        "Returned By YDM",
+    ],
+}
+
+# Orders whose path reaches one of these were handed to a YDM rider.
+RIDER_STATUSES = {"Out For Delivery"}
+
+PRODUCT_NAMES = [
+    "Hair Oil",
+    "Onion Hair Oil",
+    "Sachet Oil",
+    "Shampoo Bottle",
+    "Mint Shampoo",
+    "Conditioner",
+    "Body Lotion",
+    "Face Wash",
+    "Sunflower Oil",
+    "Hair Serum",
+]
+CITIES = ["Kathmandu", "Lalitpur", "Bhaktapur", "Pokhara", "Butwal", "Biratnagar"]
+PAYMENT_WEIGHTS = {
+    "Cash on Delivery": 80,
+    "Prepaid": 15,
+    "Office Visit": 3,
+    "Indrive": 2,
+}
+
+
+def parse_weights(value):
+    """``"Delivered=60,Cancelled=10"`` -> ``{"Delivered": 60.0, ...}``."""
+    weights = {}
+    for part in value.split(","):
+        status, _, weight = part.partition("=")
+        status = status.strip()
+        if status not in STATUS_PATHS:
+            raise CommandError(f"Unknown order status '{status}' in --status-weights")
+        try:
+            weights[status] = float(weight)
+        except ValueError:
+            raise CommandError(f"Invalid weight for '{status}' in --status-weights")
+    return weights
+
+
+def order_code(n):
+    # Multiplying by an odd constant is a bijection mod 2**32, so codes are
+    # unique within a run while looking like generate_order_id() output.
+    return f"ORD-{(n * 0x9E3779B1) % 2**32:08X}"
+
+
+@contextmanager
+def historic_timestamps(*fields):
+    """Let bulk_create keep the timestamps we set on auto_now(_add) fields."""
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields if hasattr(f, "auto_now")]
+    for field, _, _ in saved:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic factory -> distributor -> franchise hierarchy "
+        "with users, inventory, orders, change logs, rider assignments and "
+        "invoices for load and scaling tests"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=10000)
+        parser.add_argument("--factories", type=int, default=1)
+        parser.add_argument("--distributors", type=int, default=3, help="Per factory")
+        parser.add_argument("--franchises", type=int, default=5, help="Per distributor")
+        parser.add_argument(
+            "--salespersons", type=int, default=4, help="Per franchise"
+        )
+        parser.add_argument("--riders", type=int, default=20)
+        parser.add_argument("--products", type=int, default=len(PRODUCT_NAMES))
+        parser.add_argument(
+            "--days", type=int, default=365, help="Spread orders over this many days"
+        )
+        parser.add_argument(
+            "--max-items", type=int, default=3, help="Max products per order"
+        )
+        parser.add_argument(
+            "--status-weights",
+            type=parse_weights,
+            default=DEFAULT_STATUS_WEIGHTS,
+            help='Final status mix, e.g. "Delivered=60,Cancelled=10,Pending=5"',
+        )
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.0,
+            help="Zipf exponent for how unevenly orders spread over salespeople "
+            "(0 = uniform)",
+        )
+        parser.add_argument(
+            "--invoices", type=int, default=12, help="Invoices per franchise"
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument(
+            "--prefix",
+            default="synth",
+            help="Prefix for generated names and usernames",
+        )
+        parser.add_argument("--database", default="default")
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Use bulk_create even on PostgreSQL instead of COPY",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.db = options["database"]
+        self.prefix = options["prefix"]
+        self.batch_size = options["batch_size"]
+        self.use_copy = (
+            connections[self.db].vendor == "postgresql" and not options["no_copy"]
+        )
+        if CustomUser.objects.using(self.db).filter(
+            username__startswith=f"{self.prefix}-"
+        ).exists():
+            raise CommandError(
+                f"Users prefixed '{self.prefix}-' already exist; pass another --prefix"
+            )
+
+        started = time.monotonic()
+        with transaction.atomic(using=self.db):
+            hierarchy = self.create_hierarchy(options)
+        self.stdout.write(
+            f"  hierarchy: {len(hierarchy['franchises'])} franchises, "
+            f"{len(hierarchy['salespersons'])} salespeople, "
+            f"{len(hierarchy['riders'])} riders"
+        )
+
+        counts = self.create_orders(hierarchy, options, started)
+
+        with transaction.atomic(using=self.db):
+            counts["invoices"] = self.create_invoices(hierarchy, options)
+
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {summary} in {time.monotonic() - started:.1f}s"
+            )
+        )
+
+    # ------------------------------------------------------------------
+    # Hierarchy
+    # ------------------------------------------------------------------
+    def _bulk(self, objs):
+        if not objs:
+            return objs
+        return type(objs[0]).objects.using(self.db).bulk_create(
+            objs, batch_size=self.batch_size
+        )
+
+    def create_hierarchy(self, options):
+        p = self.prefix
+        factories = self._bulk(
+            [Factory(name=f"{p} Factory {i}") for i in range(options["factories"])]
+        )
+        distributors = self._bulk(
+            [
+                Distributor(factory=factory, name=f"{p} Distributor {f}-{i}")
+                for f, factory in enumerate(factories)
+                for i in range(options["distributors"])
+            ]
+        )
+        franchises = self._bulk(
+            [
+                Franchise(distributor=distributor, name=f"{p} Franchise {d}-{i}")
+                for d, distributor in enumerate(distributors)
+                for i in range(options["franchises"])
+            ]
+        )
+
+        password = make_password("password123")
+        phone = iter(range(9700000000, 9800000000))
+
+        def user(username, role, **kwargs):
+            return CustomUser(
+                username=f"{p}-{username}",
+                password=password,
+                first_name=username,
+                phone_number=str(next(phone)),
+                role=role,
+                **kwargs,
+            )
+
+        salespersons = self._bulk(
+            [
+                user(
+                    f"sales-{f}-{i}",
+                    "SalesPerson",
+                    franchise=franchise,
+                    distributor=franchise.distributor,
+                    factory=franchise.distributor.factory,
+                )
+                for f, franchise in enumerate(franchises)
+                for i in range(options["salespersons"])
+            ]
+        )
+        riders = self._bulk(
+            [user(f"rider-{i}", "YDM_Rider") for i in range(options["riders"])]
+        )
+        self._bulk(
+            [
+                user(f"franchise-{f}", "Franchise", franchise=franchise)
+                for f, franchise in enumerate(franchises)
+            ]
+        )
+
+        products = self._bulk(
+            [
+                Product(
+                    name=f"{p} {PRODUCT_NAMES[i % len(PRODUCT_NAMES)]} {i}",
+                    status="finished_product",
+                )
+                for i in range(options["products"])
+            ]
+        )
+        prices = {
+            product.pk: Decimal(self.rng.randrange(500, 3000, 50))
+            for product in products
+        }
+        inventories = self._bulk(
+            [
+                Inventory(
+                    franchise=franchise,
+                    product=product,
+                    quantity=self.rng.randint(500, 5000),
+                    status="ready_to_dispatch",
+                )
+                for franchise in franchises
+                for product in products
+            ]
+            + [
+                Inventory(factory=factory, product=product, quantity=100000)
+                for factory in factories
+                for product in products
+            ]
+        )
+        by_franchise = {}
+        for inventory in inventories:
+            if inventory.franchise_id:
+                by_franchise.setdefault(inventory.franchise_id, []).append(inventory)
+
+        locations = list(Location.objects.using(self.db).filter(logistics="YDM")[:200])
+        return {
+            "franchises": franchises,
+            "salespersons": salespersons,
+            "riders": riders,
+            "inventories": by_franchise,
+            "prices": prices,
+            "locations": locations,
+        }
+
+    # ------------------------------------------------------------------
+    # Orders and their children
+    # ------------------------------------------------------------------
+    def create_orders(self, hierarchy, options, started):
+        rng = self.rng
+        salespersons = hierarchy["salespersons"]
+        # Zipf-like popularity: a few salespeople take most of the orders.
+        sales_weights = [
+            1 / (rank + 1) ** options["skew"] for rank in range(len(salespersons))
+        ]
+        statuses = list(options["status_weights"])
+        status_weights = list(options["status_weights"].values())
+        payments = list(PAYMENT_WEIGHTS)
+        payment_weights = list(PAYMENT_WEIGHTS.values())
+        now = timezone.now()
+        days = max(options["days"], 1)
+        code_offset = rng.getrandbits(31)
+        counts = dict.fromkeys(
+            ["orders", "order_products", "change_logs", "assignments"], 0
+        )
+
+        total = options["orders"]
+        for batch_start in range(0, total, self.batch_size):
+            size = min(self.batch_size, total - batch_start)
+            orders, plans = [], []
+            for n in range(batch_start, batch_start + size):
+                sales_person = rng.choices(salespersons, sales_weights)[0]
+                final_status = rng.choices(statuses, status_weights)[0]
+                # Younger days are busier: triangular skew toward today.
+                created_at = now - timedelta(
+                    days=rng.triangular(0, days, 0), seconds=rng.randint(0, 86399)
+                )
+                items = [
+                    (inventory, rng.randint(1, 3))
+                    for inventory in rng.sample(
+                        hierarchy["inventories"][sales_person.franchise_id],
+                        rng.randint(1, options["max_items"]),
+                    )
+                ]
+                delivery_charge = Decimal(rng.choice([0, 100, 150]))
+                total_amount = delivery_charge + sum(
+                    hierarchy["prices"][inventory.product_id] * qty
+                    for inventory, qty in items
+                )
+                location = (
+                    rng.choice(hierarchy["locations"])
+                    if hierarchy["locations"]
+                    else None
+                )
+                orders.append(
+                    Order(
+                        order_code=order_code(code_offset + n),
+                        sales_person=sales_person,
+                        franchise_id=sales_person.franchise_id,
+                        distributor_id=sales_person.distributor_id,
+                        factory_id=sales_person.factory_id,
+                        location=location,
+                        full_name=f"{self.prefix} Customer {n}",
+                        city=location.name if location else rng.choice(CITIES),
+                        delivery_address=f"Ward {rng.randint(1, 32)}",
+                        phone_number=str(rng.randint(9800000000, 9869999999)),
+                        payment_method=rng.choices(payments, payment_weights)[0],
+                        order_status=final_status,
+                        delivery_charge=delivery_charge,
+                        delivery_type=rng.choice(["Inside valley", "Outside valley"]),
+                        total_amount=total_amount,
+                        logistics="YDM",
+                        date=timezone.localtime(created_at).date(),
+                        created_at=created_at,
+                        updated_at=created_at,
+                    )
+                )
+                plans.append((items, STATUS_PATHS[final_status]))
+
+            with transaction.atomic(using=self.db):
+                with historic_timestamps(Order._meta.get_field("updated_at")):
+                    orders = self._bulk(orders)
+                batch_counts = self.create_children(orders, plans, hierarchy)
+            counts["orders"] += len(orders)
+            for name, count in batch_counts.items():
+                counts[name] += count
+            self.stdout.write(
+                f"  {counts['orders']}/{total} orders "
+                f"({time.monotonic() - started:.1f}s)"
+            )
+        return counts
+
+    def create_children(self, orders, plans, hierarchy):
+        rng = self.rng
+        riders = hierarchy["riders"]
+        order_products, change_logs, assignments = [], [], []
+        for order, (items, path) in zip(orders, plans):
+            for inventory, quantity in items:
+                order_products.append((order.pk, inventory.pk, quantity))
+            changed_at = order.created_at
+            old_status = "Pending"
+            for new_status in path:
+                changed_at += timedelta(hours=rng.uniform(1, 36))
+                change_logs.append(
+                    (
+                        order.pk,
+                        order.sales_person_id,
+                        old_status,
+                        new_status,
+                        "",
+                        changed_at,
+                    )
+                )
+                if new_status in RIDER_STATUSES and riders:
+                    assignments.append(
+                        (
+                            order.pk,
+                            rng.choice(riders).pk,
+                            changed_at,
+                            True,
+                            Decimal(rng.choice([100, 150])),
+                            rng.choice(["Inside Ringroad", "Outside Ringroad"]),
+                        )
+                    )
+                old_status = new_status
+
+        self.write_rows(OrderProduct, ["order", "product", "quantity"], order_products)
+        self.write_rows(
+            OrderChangeLog,
+            ["order", "user", "old_status", "new_status", "comment", "changed_at"],
+            change_logs,
+        )
+        self.write_rows(
+            AssignOrder,
+            [
+                "order",
+                "user",
+                "assigned_at",
+                "is_rider_verified",
+                "ydm_delivery_charge",
+                "delivery_location_type",
+            ],
+            assignments,
+        )
+        return {
+            "order_products": len(order_products),
+            "change_logs": len(change_logs),
+            "assignments": len(assignments),
+        }
+
+    def write_rows(self, model, field_names, rows):
+        """Insert leaf rows (nothing references them) with COPY or bulk_create."""
+        if not rows:
+            return
+        fields = [model._meta.get_field(name) for name in field_names]
+        if self.use_copy:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            buffer.seek(0)
+            columns = ", ".join(field.column for field in fields)
+            with connections[self.db].cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {model._meta.db_table} ({columns}) "
+                    "FROM STDIN WITH (FORMAT csv)",
+                    buffer,
+                )
+            return
+        attnames = [field.attname for field in fields]
+        with historic_timestamps(*fields):
+            self._bulk([model(**dict(zip(attnames, row))) for row in rows])
+
+    # ------------------------------------------------------------------
+    # Invoices
+    # ------------------------------------------------------------------
+    def create_invoices(self, hierarchy, options):
+        rng = self.rng
+        now = timezone.now()
+        invoices = []
+        for franchise in hierarchy["franchises"]:
+            for i in range(options["invoices"]):
+                total = Decimal(rng.randrange(10000, 500000, 100))
+                paid = (total * Decimal(rng.choice(["0", "0.5", "1"]))).quantize(
+                    Decimal("0.01")
+                )
+                if paid == total:
+                    invoice_status = "Paid"
+                else:
+                    invoice_status = "Partially Paid" if paid else "Pending"
+                created_at = datetime.combine(
+                    (now - timedelta(days=30 * i)).date(), dt_time(10)
+                ).replace(tzinfo=now.tzinfo)
+                invoices.append(
+                    Invoice(
+                        franchise=franchise,
+                        invoice_code=f"{self.prefix.upper()}-INV-{franchise.pk}-{i}",
+                        total_amount=total,
+                        paid_amount=paid,
+                        due_amount=total - paid,
+                        status=invoice_status,
+                        is_approved=paid == total,
+                        created_at=created_at,
+                        updated_at=created_at,
+                    )
+                )
+        with historic_timestamps(
+            Invoice._meta.get_field("created_at"),
+            Invoice._meta.get_field("updated_at"),
+        ):
+            self._bulk(invoices)
+        return len(invoices)
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-19 02:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0098_order_package_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('captured_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('duration_ms', models.FloatField(db_index=True)),
+                ('database', models.CharField(max_length=50)),
+                ('sql', models.TextField()),
+                ('params_shape', models.CharField(blank=True, max_length=255)),
+                ('view', models.CharField(blank=True, max_length=255)),
+                ('stack_frame', models.CharField(blank=True, max_length=500)),
+                ('explain_plan', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Slow queries',
+                'ordering': ['-captured_at'],
+            },
+        ),
+    ]
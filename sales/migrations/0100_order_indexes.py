@@ -0,0 +1,190 @@
+import uuid
+
+from django.conf import settings
+from django.contrib.postgres import operations as postgres_operations
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+import sales.models
+
+# Not atomic: on PostgreSQL every index is built CONCURRENTLY, so sales_order
+# stays writable while they build. Other databases (sqlite in tests) get
+# plain indexes.
+
+# created_at::date in the project time zone, the expression Django emits for
+# created_at__date lookups on PostgreSQL.
+CREATED_DATE = f"((created_at AT TIME ZONE '{settings.TIME_ZONE}')::date)"
+DATE_INDEXES = (
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS order_created_date_idx "
+    f"ON sales_order ({CREATED_DATE})",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS order_franchise_created_date_idx "
+    f"ON sales_order (franchise_id, {CREATED_DATE})",
+)
+
+
+class AddIndexConcurrently(postgres_operations.AddIndexConcurrently):
+    """AddIndexConcurrently on PostgreSQL, a plain AddIndex elsewhere."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+
+class MakeUniqueConcurrently(migrations.AlterField):
+    """
+    AlterField to a unique field. On PostgreSQL the unique index (and the
+    varchar_pattern_ops index Django adds for LIKE lookups) is built
+    CONCURRENTLY and then attached as the unique constraint, which only
+    takes a brief lock.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        table = model._meta.db_table
+        column = model._meta.get_field(self.name).column
+        unique = schema_editor._create_index_name(table, [column], suffix="_uniq")
+        like = schema_editor._create_index_name(table, [column], suffix="_like")
+        quote = schema_editor.quote_name
+        # Left INVALID by an interrupted build
+        schema_editor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {quote(unique)}")
+        schema_editor.execute(
+            f"CREATE UNIQUE INDEX CONCURRENTLY {quote(unique)} "
+            f"ON {quote(table)} ({quote(column)})"
+        )
+        schema_editor.execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(unique)} "
+            f"UNIQUE USING INDEX {quote(unique)}"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(like)} "
+            f"ON {quote(table)} ({quote(column)} varchar_pattern_ops)"
+        )
+
+
+def deduplicate_order_codes(apps, schema_editor):
+    """Give every order but the oldest one of a shared code a fresh code."""
+    Order = apps.get_model("sales", "Order")
+    duplicated = (
+        Order.objects.exclude(order_code__isnull=True)
+        .values("order_code")
+        .annotate(total=Count("id"), first_id=Min("id"))
+        .filter(total__gt=1)
+    )
+    taken = set()
+    for row in duplicated:
+        for order in Order.objects.filter(order_code=row["order_code"]).exclude(
+            id=row["first_id"]
+        ):
+            code = None
+            while code is None or code in taken or (
+                Order.objects.filter(order_code=code).exists()
+            ):
+                code = f"ORD-{uuid.uuid4().hex[:8].upper()}"
+            taken.add(code)
+            order.order_code = code
+            order.save(update_fields=["order_code"])
+
+
+def create_date_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for sql in DATE_INDEXES:
+            schema_editor.execute(sql)
+
+
+def drop_date_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            "DROP INDEX CONCURRENTLY IF EXISTS order_created_date_idx"
+        )
+        schema_editor.execute(
+            "DROP INDEX CONCURRENTLY IF EXISTS order_franchise_created_date_idx"
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("sales", "0099_slowquery"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            deduplicate_order_codes, migrations.RunPython.noop, atomic=True
+        ),
+        MakeUniqueConcurrently(
+            model_name="order",
+            name="order_code",
+            field=models.CharField(
+                blank=True,
+                default=sales.models.generate_order_id,
+                max_length=20,
+                null=True,
+                unique=True,
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(
+                fields=["franchise", "date"], name="order_franchise_date_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(
+                fields=["distributor", "date"], name="order_distributor_date_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(
+                fields=["factory", "date"], name="order_factory_date_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(
+                fields=["sales_person", "date"], name="order_salesperson_date_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(
+                fields=["franchise", "order_status"],
+                name="order_franchise_status_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(
+                fields=["logistics", "order_status"],
+                name="order_logistics_status_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(fields=["phone_number"], name="order_phone_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="order",
+            index=models.Index(fields=["created_at"], name="order_created_at_idx"),
+        ),
+        migrations.RunPython(create_date_indexes, drop_date_indexes),
+    ]
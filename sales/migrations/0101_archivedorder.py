@@ -0,0 +1,62 @@
+# Generated by Django 5.1.4 on 2026-10-19 02:48
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0100_order_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.PositiveBigIntegerField(unique=True)),
+                ('order_code', models.CharField(blank=True, max_length=20, null=True)),
+                ('franchise_id', models.IntegerField(blank=True, null=True)),
+                ('distributor_id', models.IntegerField(blank=True, null=True)),
+                ('factory_id', models.IntegerField(blank=True, null=True)),
+                ('sales_person_id', models.IntegerField(blank=True, null=True)),
+                ('full_name', models.CharField(max_length=200)),
+                ('phone_number', models.CharField(max_length=20)),
+                ('order_status', models.CharField(max_length=255)),
+                ('logistics', models.CharField(blank=True, max_length=255, null=True)),
+                ('date', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(blank=True, null=True)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('prepaid_amount', models.DecimalField(blank=True, decimal_places=2, default=0, max_digits=10, null=True)),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('records', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-order_id'],
+                'indexes': [models.Index(fields=['franchise_id', 'date'], name='archived_franchise_date_idx'), models.Index(fields=['created_at'], name='archived_created_at_idx'), models.Index(fields=['order_code'], name='archived_order_code_idx'), models.Index(fields=['phone_number'], name='archived_phone_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(blank=True, null=True)),
+                ('franchise_id', models.IntegerField(blank=True, null=True)),
+                ('distributor_id', models.IntegerField(blank=True, null=True)),
+                ('factory_id', models.IntegerField(blank=True, null=True)),
+                ('sales_person_id', models.IntegerField(blank=True, null=True)),
+                ('order_status', models.CharField(max_length=255)),
+                ('logistics', models.CharField(blank=True, max_length=255, null=True)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('prepaid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('delivery_charge', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['franchise_id', 'date'], name='rollup_franchise_date_idx'), models.Index(fields=['sales_person_id', 'date'], name='rollup_salesperson_date_idx'), models.Index(fields=['factory_id', 'date'], name='rollup_factory_date_idx')],
+            },
+        ),
+    ]
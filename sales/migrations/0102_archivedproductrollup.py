@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-19 03:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0101_archivedorder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedProductRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(blank=True, null=True)),
+                ('franchise_id', models.IntegerField(blank=True, null=True)),
+                ('distributor_id', models.IntegerField(blank=True, null=True)),
+                ('factory_id', models.IntegerField(blank=True, null=True)),
+                ('sales_person_id', models.IntegerField(blank=True, null=True)),
+                ('order_status', models.CharField(max_length=255)),
+                ('product_id', models.IntegerField()),
+                ('product_name', models.CharField(max_length=255)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['franchise_id', 'date'], name='prollup_franchise_date_idx'), models.Index(fields=['sales_person_id', 'date'], name='prollup_salesperson_date_idx'), models.Index(fields=['factory_id', 'date'], name='prollup_factory_date_idx')],
+            },
+        ),
+    ]
@@ -1,6 +1,7 @@
 import uuid
 
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, router, transaction
 from django.utils import timezone
 
 from core.utils.s3bucket import PublicMediaStorage
@@ -265,7 +266,7 @@ class Order(models.Model):
         ("Daraz", "Daraz"),
     ]
     order_code = models.CharField(
-        max_length=20, default=generate_order_id, null=True, blank=True
+        max_length=20, default=generate_order_id, unique=True, null=True, blank=True
     )
     franchise = models.ForeignKey(
         "account.Franchise",
@@ -349,13 +350,48 @@ class Order(models.Model):
     package_code = models.CharField(max_length=255, blank=True, null=True)
     is_delivery_free = models.BooleanField(default=False)
 
+    class Meta:
+        # The (owner, date) pairs back the list, statistics and export filters.
+        # PostgreSQL also gets created_at::date expression indexes, added in
+        # migration 0100 (see manage.py explain_order_filters).
+        indexes = [
+            models.Index(fields=["franchise", "date"], name="order_franchise_date_idx"),
+            models.Index(
+                fields=["distributor", "date"], name="order_distributor_date_idx"
+            ),
+            models.Index(fields=["factory", "date"], name="order_factory_date_idx"),
+            models.Index(
+                fields=["sales_person", "date"], name="order_salesperson_date_idx"
+            ),
+            models.Index(
+                fields=["franchise", "order_status"], name="order_franchise_status_idx"
+            ),
+            models.Index(
+                fields=["logistics", "order_status"], name="order_logistics_status_idx"
+            ),
+            models.Index(fields=["phone_number"], name="order_phone_idx"),
+            models.Index(fields=["created_at"], name="order_created_at_idx"),
+        ]
+
     def __str__(self):
         return f"{self.full_name} - {self.order_status}"
 
     def save(self, *args, **kwargs):
         if not self.order_code:
             self.order_code = generate_order_id()
-        super().save(*args, **kwargs)
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        # order_code is unique and random, so a new order can draw a taken one
+        using = kwargs.get("using") or router.db_for_write(Order, instance=self)
+        for attempt in range(3):
+            try:
+                with transaction.atomic(using=using):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                taken = Order.objects.filter(order_code=self.order_code).exists()
+                if attempt == 2 or not taken:
+                    raise
+                self.order_code = generate_order_id()
 
 
 class Commission(models.Model):
@@ -430,3 +466,135 @@ class HistoricalDataConfig(models.Model):
                 "base_date": timezone.localdate(),
             },
         )[0]
+
+
+class SlowQuery(models.Model):
+    """A query that ran longer than SLOW_QUERY_THRESHOLD_MS (see core.slow_queries)."""
+
+    captured_at = models.DateTimeField(default=timezone.now, db_index=True)
+    duration_ms = models.FloatField(db_index=True)
+    database = models.CharField(max_length=50)
+    sql = models.TextField()
+    # Types of the parameters, never their values, e.g. "(int, str, list[3])"
+    params_shape = models.CharField(max_length=255, blank=True)
+    view = models.CharField(max_length=255, blank=True)
+    stack_frame = models.CharField(max_length=500, blank=True)
+    explain_plan = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-captured_at"]
+        verbose_name_plural = "Slow queries"
+
+    def __str__(self):
+        return f"{self.duration_ms:.0f}ms {self.view or '-'}: {self.sql[:80]}"
+
+
+class ArchivedOrder(models.Model):
+    """
+    A closed order moved out of sales_order by sales.archive. It may live in a
+    separate database (settings.ORDER_ARCHIVE_DATABASE), so related rows are
+    referenced by id only.
+    """
+
+    # id the order had in sales_order
+    order_id = models.PositiveBigIntegerField(unique=True)
+    order_code = models.CharField(max_length=20, null=True, blank=True)
+    franchise_id = models.IntegerField(null=True, blank=True)
+    distributor_id = models.IntegerField(null=True, blank=True)
+    factory_id = models.IntegerField(null=True, blank=True)
+    sales_person_id = models.IntegerField(null=True, blank=True)
+    full_name = models.CharField(max_length=200)
+    phone_number = models.CharField(max_length=20)
+    order_status = models.CharField(max_length=255)
+    logistics = models.CharField(max_length=255, null=True, blank=True)
+    date = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(null=True, blank=True)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    prepaid_amount = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, blank=True, null=True
+    )
+    # OrderSerializer output at archive time, served as-is to readers
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    # The order and its products, change logs and comments in fixture format
+    records = models.JSONField(encoder=DjangoJSONEncoder)
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-order_id"]
+        indexes = [
+            models.Index(
+                fields=["franchise_id", "date"], name="archived_franchise_date_idx"
+            ),
+            models.Index(fields=["created_at"], name="archived_created_at_idx"),
+            models.Index(fields=["order_code"], name="archived_order_code_idx"),
+            models.Index(fields=["phone_number"], name="archived_phone_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.order_code} - {self.full_name} ({self.order_status})"
+
+
+class ArchivedOrderRollup(models.Model):
+    """Per-day totals of archived orders, kept so statistics still count them."""
+
+    date = models.DateField(null=True, blank=True)
+    franchise_id = models.IntegerField(null=True, blank=True)
+    distributor_id = models.IntegerField(null=True, blank=True)
+    factory_id = models.IntegerField(null=True, blank=True)
+    sales_person_id = models.IntegerField(null=True, blank=True)
+    order_status = models.CharField(max_length=255)
+    logistics = models.CharField(max_length=255, null=True, blank=True)
+    order_count = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    prepaid_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    delivery_charge = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["franchise_id", "date"], name="rollup_franchise_date_idx"
+            ),
+            models.Index(
+                fields=["sales_person_id", "date"], name="rollup_salesperson_date_idx"
+            ),
+            models.Index(fields=["factory_id", "date"], name="rollup_factory_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.order_status}: {self.order_count}"
+
+
+class ArchivedProductRollup(models.Model):
+    """
+    Per-day product totals of archived orders, for the product statistics.
+    ``revenue`` is the product's share of the order total, by quantity.
+    """
+
+    date = models.DateField(null=True, blank=True)
+    franchise_id = models.IntegerField(null=True, blank=True)
+    distributor_id = models.IntegerField(null=True, blank=True)
+    factory_id = models.IntegerField(null=True, blank=True)
+    sales_person_id = models.IntegerField(null=True, blank=True)
+    order_status = models.CharField(max_length=255)
+    product_id = models.IntegerField()
+    product_name = models.CharField(max_length=255)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["franchise_id", "date"],
+                name="prollup_franchise_date_idx",
+            ),
+            models.Index(
+                fields=["sales_person_id", "date"],
+                name="prollup_salesperson_date_idx",
+            ),
+            models.Index(
+                fields=["factory_id", "date"], name="prollup_factory_date_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.product_name}: {self.quantity}"
@@ -1,11 +1,13 @@
 from datetime import date
 
+from django.db.models import Prefetch
 from django.utils import timezone
 from rest_framework import serializers
 
 from account.models import CustomUser, Franchise
 from account.serializers import SmallUserSerializer, UserSmallSerializer
 from daraz.models import DarazLocation
+from logistics.models import OrderChangeLog
 from logistics.serializers import OrderCommentSerializer
 
 from .models import (
@@ -165,7 +167,93 @@ class OrderProductSerializer(serializers.ModelSerializer):
         return {"id": obj.product.id, "name": obj.product.product.name}
 
 
-class OrderSerializer(serializers.ModelSerializer):
+def _field_names(value):
+    """``"a, b"`` or ``["a", "b"]`` -> ``{"a", "b"}``."""
+    if isinstance(value, str):
+        value = value.split(",")
+    return {name.strip() for name in value if name.strip()}
+
+
+def _prefetched(obj, related_name):
+    """Rows of ``related_name`` loaded by prefetch_related, or None."""
+    cache = getattr(obj, "_prefetched_objects_cache", {})
+    return list(cache[related_name]) if related_name in cache else None
+
+
+class SparseFieldsetMixin:
+    """
+    Renders only the fields a GET asks for with ``?fields=a,b``,
+    ``?profile=<name>`` (a named list in ``field_profiles``) and
+    ``?omit=c``, or the same keyword arguments. Other fields are dropped
+    before serializing, so their SerializerMethodFields never run. ``id``
+    is always rendered.
+
+    ``field_select_related`` and ``field_prefetch_related`` map a field to
+    the lookups it needs; ``optimize_queryset`` adds those of the fields
+    that will be rendered.
+    """
+
+    field_profiles = {}
+    field_select_related = {}
+    field_prefetch_related = {}
+
+    def __init__(self, *args, fields=None, omit=None, profile=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.selected_fields(
+            self.context.get("request"), fields=fields, omit=omit, profile=profile
+        )
+        for name in set(self.fields) - selected:
+            self.fields.pop(name)
+
+    @classmethod
+    def selected_fields(cls, request=None, fields=None, omit=None, profile=None):
+        available = set(cls.Meta.fields)
+        if request is not None and request.method == "GET":
+            fields = fields or request.query_params.get("fields")
+            omit = omit or request.query_params.get("omit")
+            profile = profile or request.query_params.get("profile")
+
+        selected = set()
+        if profile:
+            if profile not in cls.field_profiles:
+                raise serializers.ValidationError(
+                    {
+                        "profile": f"Unknown profile '{profile}'. Choose from: "
+                        f"{', '.join(sorted(cls.field_profiles))}."
+                    }
+                )
+            selected |= set(cls.field_profiles[profile])
+        if fields:
+            selected |= _field_names(fields)
+        omitted = _field_names(omit) if omit else set()
+        unknown = (selected | omitted) - available
+        if unknown:
+            raise serializers.ValidationError(
+                {"fields": f"Unknown field(s): {', '.join(sorted(unknown))}."}
+            )
+        return ((selected or available) - omitted) | {"id"}
+
+    @classmethod
+    def optimize_queryset(cls, queryset, request=None, **selection):
+        """``queryset`` with the joins and prefetches the rendered fields use."""
+        selected = cls.selected_fields(request, **selection)
+        select_related = {
+            lookup
+            for name in selected
+            for lookup in cls.field_select_related.get(name, ())
+        }
+        prefetches = {}
+        for name in selected:
+            for lookup in cls.field_prefetch_related.get(name, ()):
+                prefetches[getattr(lookup, "prefetch_to", lookup)] = lookup
+        if select_related:
+            queryset = queryset.select_related(*sorted(select_related))
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches.values())
+        return queryset
+
+
+class OrderSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     sales_person = UserSmallSerializer(read_only=True)
     order_products = OrderProductSerializer(many=True, required=False)
     promo_code = serializers.CharField(required=False, allow_null=True)
@@ -231,11 +319,108 @@ class OrderSerializer(serializers.ModelSerializer):
             "won_game",
         ]
 
+    field_profiles = {
+        # Rider app delivery screen
+        "rider": [
+            "order_code",
+            "full_name",
+            "phone_number",
+            "alternate_phone_number",
+            "city",
+            "delivery_address",
+            "landmark",
+            "location_name",
+            "order_status",
+            "payment_method",
+            "total_amount",
+            "prepaid_amount",
+            "delivery_charge",
+            "order_products",
+            "remarks",
+            "is_rider_verified",
+            "comments",
+        ],
+        # Packing slips
+        "packaging": [
+            "order_code",
+            "full_name",
+            "phone_number",
+            "city",
+            "order_status",
+            "logistics",
+            "delivery_type",
+            "order_products",
+            "remarks",
+            "package_code",
+            "tracking_code",
+            "created_at",
+        ],
+        # Spreadsheet exports: stored columns only
+        "export": [
+            "order_code",
+            "sales_person",
+            "full_name",
+            "city",
+            "delivery_address",
+            "landmark",
+            "phone_number",
+            "alternate_phone_number",
+            "payment_method",
+            "order_status",
+            "date",
+            "created_at",
+            "order_products",
+            "total_amount",
+            "delivery_charge",
+            "prepaid_amount",
+            "delivery_type",
+            "logistics",
+            "location_name",
+            "tracking_code",
+            "remarks",
+            "is_delivery_free",
+        ],
+    }
+    field_select_related = {
+        "sales_person": [
+            "sales_person__franchise",
+            "sales_person__distributor",
+            "sales_person__factory",
+        ],
+        "location_name": ["location", "daraz_location"],
+    }
+    field_prefetch_related = {
+        "order_products": [
+            Prefetch(
+                "order_products",
+                queryset=OrderProduct.objects.select_related("product__product"),
+            )
+        ],
+        "ydm_rider": ["assign_orders__user"],
+        "ydm_rider_name": ["assign_orders__user"],
+        "is_rider_verified": ["assign_orders"],
+        "comments": ["comments"],
+        "sent_to_ydm_date": [
+            Prefetch(
+                "change_logs",
+                queryset=OrderChangeLog.objects.filter(
+                    new_status="Sent to YDM"
+                ).order_by("changed_at"),
+                to_attr="sent_to_ydm_logs",
+            )
+        ],
+        "won_game": ["game_winners__game", "game_winners__condition"],
+    }
+
     def get_won_game(self, obj):
         try:
-            from sales_game.models import GameWinner
+            winners = _prefetched(obj, "game_winners")
+            if winners is None:
+                from sales_game.models import GameWinner
 
-            winner = GameWinner.objects.filter(order=obj).first()
+                winner = GameWinner.objects.filter(order=obj).first()
+            else:
+                winner = min(winners, key=lambda winner: winner.id, default=None)
             if winner:
                 return {
                     "game_name": winner.game.name,
@@ -246,17 +431,23 @@ class OrderSerializer(serializers.ModelSerializer):
             pass
         return None
 
+    def _assignment(self, obj):
+        # AssignOrder is ordered newest first
+        assignments = _prefetched(obj, "assign_orders")
+        if assignments is None:
+            return obj.assign_orders.select_related("user").first()
+        return assignments[0] if assignments else None
+
     def get_ydm_rider(self, obj):
-        # Get the assigned user using select_related to optimize the query
-        assignment = obj.assign_orders.select_related("user").first()
+        assignment = self._assignment(obj)
         return assignment.user.phone_number if assignment and assignment.user else None
 
     def get_ydm_rider_name(self, obj):
-        assignment = obj.assign_orders.select_related("user").first()
+        assignment = self._assignment(obj)
         return assignment.user.first_name if assignment and assignment.user else None
 
     def get_is_rider_verified(self, obj):
-        assignment = obj.assign_orders.first()
+        assignment = self._assignment(obj)
         return assignment.is_rider_verified if assignment else False
 
     def get_location_name(self, obj):
@@ -267,12 +458,19 @@ class OrderSerializer(serializers.ModelSerializer):
         return None
 
     def get_comments(self, obj):
-        latest_comment = obj.comments.order_by("-id").first()
+        comments = _prefetched(obj, "comments")
+        if comments is None:
+            latest_comment = obj.comments.order_by("-id").first()
+        else:
+            latest_comment = max(comments, key=lambda c: c.id, default=None)
         if latest_comment:
             return OrderCommentSerializer(latest_comment).data
         return None
 
     def get_sent_to_ydm_date(self, obj):
+        if hasattr(obj, "sent_to_ydm_logs"):
+            logs = obj.sent_to_ydm_logs
+            return logs[0].changed_at if logs else None
         sent_to_ydm_log = (
             obj.change_logs
             .filter(new_status="Sent to YDM")
@@ -304,11 +502,15 @@ class OrderSerializer(serializers.ModelSerializer):
         # ✅ Create Order
         order = Order.objects.create(**validated_data, promo_code=promo_code_instance)
 
-        # ✅ Create Order Products
-        for order_product_data in order_products_data:
-            product = order_product_data["product"]
-            quantity = order_product_data["quantity"]
-            OrderProduct.objects.create(order=order, product=product, quantity=quantity)
+        # ✅ Create Order Products (kept for the sales game hook in perform_create)
+        self.created_order_products = [
+            OrderProduct.objects.create(
+                order=order,
+                product=order_product_data["product"],
+                quantity=order_product_data["quantity"],
+            )
+            for order_product_data in order_products_data
+        ]
 
         # ✅ Update promo code usage count
         if promo_code_instance:
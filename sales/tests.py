@@ -1,3 +1,936 @@
-from django.test import TestCase
+import io
+import multiprocessing
+import os
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from datetime import time as dt_time
+from datetime import timezone as dt_tz
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from account.models import CustomUser, Franchise
+from core import db_router, metrics, middleware, slow_queries
+from core.fast_json import FastJSONParser, FastJSONRenderer
+from logistics.models import (
+    AssignOrder,
+    CourierOutbox,
+    Invoice,
+    OrderChangeLog,
+    OrderComment,
+)
+
+from . import benchmarks
+from .archive import archive_orders, historical_orders
+from .models import (
+    ArchivedOrder,
+    ArchivedOrderRollup,
+    DatabaseMode,
+    Inventory,
+    Location,
+    Order,
+    OrderProduct,
+    Product,
+    SlowQuery,
+)
+from .serializers import OrderSerializer
+
+
+class LocationUploadViewTests(APITestCase):
+    def setUp(self):
+        DatabaseMode.get_solo()
+        self.user = CustomUser.objects.create_user(
+            username="location_admin",
+            email="location_admin@example.com",
+            phone_number="9876544001",
+            password="password123",
+            role="SuperAdmin",
+        )
+        self.client.force_authenticate(user=self.user)
+        Location.objects.create(
+            name="Kathmandu", logistics="YDM", coverage_areas=["Baneshwor", "Koteshwor"]
+        )
+        Location.objects.create(
+            name="Lalitpur", logistics="YDM", coverage_areas=["Jawalakhel"]
+        )
+        # Same name for another provider must not be touched.
+        Location.objects.create(
+            name="Kathmandu", logistics="DASH", coverage_areas=["Thamel"]
+        )
+
+    def _upload(self, rows):
+        body = "Location Name,Coverage Area\n" + "".join(
+            f'{name},"{areas}"\n' for name, areas in rows
+        )
+        upload = SimpleUploadedFile("locations.csv", body.encode(), "text/csv")
+        return self.client.post(
+            "/api/sales/upload-locations/",
+            {"file": upload, "logistics": "YDM"},
+            format="multipart",
+        )
+
+    def test_merges_in_order_and_reports_counts(self):
+        rows = [
+            ("Kathmandu", "Koteshwor, Thamel"),
+            ("Bhaktapur", "Suryabinayak, Thimi"),
+            ("Kathmandu", "Baluwatar"),
+            ("Lalitpur", "Jawalakhel"),
+            ("Bhaktapur", "Thimi, Sallaghari"),
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self._upload(rows)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["locations_created"], 1)
+        self.assertEqual(response.data["locations_updated"], 1)
+        self.assertEqual(response.data["locations_unchanged"], 1)
+        self.assertIn("elapsed_ms", response.data)
+        self.assertEqual(
+            Location.objects.get(name="Kathmandu", logistics="YDM").coverage_areas,
+            ["Baneshwor", "Koteshwor", "Thamel", "Baluwatar"],
+        )
+        self.assertEqual(
+            Location.objects.get(name="Bhaktapur").coverage_areas,
+            ["Suryabinayak", "Thimi", "Sallaghari"],
+        )
+        self.assertEqual(
+            Location.objects.get(name="Kathmandu", logistics="DASH").coverage_areas,
+            ["Thamel"],
+        )
+        # db mode + one read + insert + update, wrapped in savepoints
+        self.assertLessEqual(len(ctx.captured_queries), 10)
+
+
+class RequestMetricsTests(APITestCase):
+    def setUp(self):
+        DatabaseMode.get_solo()
+        metrics.registry.reset()
+        self.admin = CustomUser.objects.create_user(
+            username="metrics_admin",
+            phone_number="9876544101",
+            password="password123",
+            role="SuperAdmin",
+        )
+
+    def _scrape(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get("/api/metrics/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        return response.content.decode()
+
+    def test_records_latency_queries_and_size_per_view(self):
+        self.client.get("/api/no-such-endpoint/")
+        self.client.force_authenticate(user=self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/sales/locations/")
+        location_queries = len(ctx.captured_queries)
+        self._scrape()
+        body = self._scrape()
+
+        self.assertIn(
+            'http_requests_total{view="metrics",method="GET",status="2xx"} 1', body
+        )
+        self.assertIn(
+            'http_requests_total{view="<unresolved>",method="GET",status="4xx"} 1',
+            body,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="metrics",method="GET",'
+            'le="+Inf"} 1',
+            body,
+        )
+        self.assertIn(
+            'http_request_sql_queries_count{view="metrics",method="GET"} 1', body
+        )
+        self.assertIn(
+            'http_request_sql_queries_sum{view="location-search",method="GET"} '
+            f"{float(location_queries)}",
+            body,
+        )
+        self.assertIn(
+            'http_response_size_bytes_count{view="metrics",method="GET"} 1', body
+        )
+
+    def test_unsampled_requests_are_only_counted(self):
+        with mock.patch.object(middleware, "METRICS_SAMPLE_RATE", 0.0):
+            self._scrape()
+        body = self._scrape()
+
+        self.assertIn(
+            'http_requests_total{view="metrics",method="GET",status="2xx"} 1', body
+        )
+        self.assertIn(
+            'http_requests_sampled_total{view="metrics",method="GET"} 0', body
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{view="metrics",method="GET"} 0', body
+        )
+
+    def test_requires_admin(self):
+        franchise_user = CustomUser.objects.create_user(
+            username="metrics_franchise",
+            phone_number="9876544102",
+            password="password123",
+            role="Franchise",
+        )
+        self.client.force_authenticate(user=franchise_user)
+        self.assertEqual(
+            self.client.get("/api/metrics/").status_code, status.HTTP_403_FORBIDDEN
+        )
+        self.client.force_authenticate(user=None)
+        self.assertEqual(
+            self.client.get("/api/metrics/").status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+
+class SlowQueryCaptureTests(APITestCase):
+    def setUp(self):
+        DatabaseMode.get_solo()
+        self.admin = CustomUser.objects.create_user(
+            username="slow_query_admin",
+            phone_number="9876544201",
+            password="password123",
+            role="SuperAdmin",
+        )
+        Location.objects.create(name="Kathmandu", logistics="YDM")
+        self.client.force_authenticate(user=self.admin)
+
+    def test_captures_queries_over_threshold_with_origin(self):
+        upload = SimpleUploadedFile(
+            "locations.csv", b"Location Name,Coverage Area\nKathmandu,Thamel\n"
+        )
+        with mock.patch.object(slow_queries, "SLOW_QUERY_THRESHOLD_MS", 1e-6):
+            response = self.client.post(
+                "/api/sales/upload-locations/",
+                {"file": upload, "logistics": "YDM"},
+                format="multipart",
+            )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        query = SlowQuery.objects.filter(sql__startswith="SELECT").get(
+            sql__contains='FROM "sales_location"'
+        )
+        self.assertEqual(query.view, "upload-locations")
+        self.assertEqual(query.database, "default")
+        self.assertRegex(
+            query.stack_frame, r"^sales/utils\.py:\d+ in upsert_locations$"
+        )
+        self.assertRegex(query.params_shape, r"^\((str|list\[1\])(, str)*\)$")
+        # EXPLAIN plans are only collected on PostgreSQL
+        self.assertEqual(query.explain_plan, "")
+        # Saving the captures is not itself captured
+        self.assertFalse(SlowQuery.objects.filter(sql__contains="sales_slowquery"))
+
+    def test_below_threshold_and_trimming(self):
+        self.client.get("/api/sales/locations/")
+        self.assertFalse(SlowQuery.objects.exists())
+
+        with mock.patch.multiple(
+            slow_queries, SLOW_QUERY_THRESHOLD_MS=1e-6, SLOW_QUERY_MAX_ROWS=3
+        ):
+            for _ in range(4):
+                self.client.get("/api/sales/locations/")
+        self.assertEqual(SlowQuery.objects.count(), 3)
+
+    def test_params_shape(self):
+        self.assertEqual(
+            slow_queries._params_shape((1, "secret", [1, 2, 3]), False),
+            "(int, str, list[3])",
+        )
+        self.assertEqual(
+            slow_queries._params_shape({"code": "x"}, False), "{code: str}"
+        )
+        self.assertEqual(slow_queries._params_shape([(1,), (2,)], True), "executemany")
+
+
+def _watch_database_mode(started, results):
+    """Worker process: report every database name change it observes."""
+    seen = middleware.get_current_db_name()
+    results.put(seen)
+    started.set()
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        current = middleware.get_current_db_name()
+        if current != seen:
+            results.put(current)
+            return
+        time.sleep(0.01)
+
+
+class DatabaseModeStampTests(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        for name, value in (
+            ("DATABASE_MODE_FILE", os.path.join(tmpdir.name, "mode")),
+            ("DATABASE_MODE_POLL_INTERVAL", 0.05),
+        ):
+            patcher = mock.patch.object(middleware, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        middleware._mode_cache.update(db_name=None, stamp=None, checked_at=0.0)
+        self.addCleanup(
+            middleware._mode_cache.update, db_name=None, stamp=None, checked_at=0.0
+        )
+        middleware.set_current_db_name(False)
+
+    def test_switch_reaches_every_worker_process(self):
+        ctx = multiprocessing.get_context("fork")
+        results = ctx.Queue()
+        workers = []
+        for _ in range(3):
+            started = ctx.Event()
+            process = ctx.Process(
+                target=_watch_database_mode, args=(started, results)
+            )
+            process.start()
+            started.wait(5)
+            workers.append(process)
+
+        middleware.set_current_db_name(True)
+        for process in workers:
+            process.join(5)
+
+        observed = [results.get(timeout=1) for _ in range(6)]
+        self.assertEqual(sorted(observed), ["default"] * 3 + ["demo"] * 3)
+        self.assertTrue(all(process.exitcode == 0 for process in workers))
+
+    def test_polls_stamp_without_querying_database_mode(self):
+        middleware.get_current_db_name()
+        with mock.patch.object(middleware.DatabaseMode, "get_solo") as get_solo:
+            for _ in range(3):
+                time.sleep(0.06)
+                self.assertEqual(middleware.get_current_db_name(), "default")
+        get_solo.assert_not_called()
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        for name, value in (
+            ("DATABASE_REPLICAS", ["replica"]),
+            ("_replica_cycle", iter(lambda: "replica", None)),
+        ):
+            patcher = mock.patch.object(db_router, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.router = db_router.DynamicDBRouter()
+        self.factory = RequestFactory()
+
+    def _run(self, method, view, write=False):
+        seen = []
+
+        def get_response(request):
+            mw.process_view(request, view, (), {})
+            seen.append(self.router.db_for_read(Order))
+            if write:
+                self.router.db_for_write(Order)
+                seen.append(self.router.db_for_read(Order))
+            return None
+
+        mw = middleware.ModelBasedDBSwitchMiddleware(get_response)
+        with mock.patch.object(middleware, "get_current_db_name", lambda: "default"):
+            mw(getattr(self.factory, method)("/"))
+        return seen
+
+    def test_reporting_reads_use_replica_until_a_write(self):
+        from logistics.views import get_complete_dashboard_stats
+        from statistic.views import DashboardStatsView
+
+        stats_view = DashboardStatsView.as_view()
+        self.assertEqual(self._run("get", stats_view), ["replica"])
+        self.assertEqual(
+            self._run("get", get_complete_dashboard_stats), ["replica"]
+        )
+        self.assertEqual(
+            self._run("get", stats_view, write=True), ["replica", "default"]
+        )
+        self.assertEqual(self._run("post", stats_view), ["default"])
+        # The marker does not leak into the next request on this thread.
+        self.assertEqual(self.router.db_for_read(Order), "default")
+
+    def test_other_views_and_demo_mode_stay_on_current_database(self):
+        from sales.views import OrderListCreateView
+
+        self.assertEqual(self._run("get", OrderListCreateView.as_view()), ["default"])
+        db_router.set_current_db("demo")
+        self.addCleanup(db_router.set_current_db, "default")
+        with db_router.replica_reads():
+            self.assertEqual(self.router.db_for_read(Order), "demo")
+        self.assertFalse(self.router.allow_migrate("replica", "sales"))
+
+
+class GenerateSyntheticDataTests(TestCase):
+    def test_generates_consistent_hierarchy_and_history(self):
+        call_command(
+            "generate_synthetic_data",
+            "--status-weights=Delivered=3,Pending=1,Cancelled=1",
+            orders=120,
+            distributors=2,
+            franchises=2,
+            salespersons=2,
+            riders=3,
+            invoices=2,
+            batch_size=50,
+            seed=7,
+            stdout=io.StringIO(),
+        )
+
+        self.assertEqual(Order.objects.count(), 120)
+        self.assertEqual(
+            Order.objects.values("order_code").distinct().count(), 120
+        )
+        self.assertEqual(Invoice.objects.count(), 8)
+        self.assertFalse(
+            OrderProduct.objects.exclude(
+                product__franchise=F("order__franchise")
+            ).exists()
+        )
+        for order in Order.objects.prefetch_related("change_logs"):
+            logs = list(order.change_logs.all())
+            if order.order_status == "Pending":
+                self.assertEqual(logs, [])
+            else:
+                self.assertEqual(logs[-1].new_status, order.order_status)
+                self.assertGreater(logs[0].changed_at, order.created_at)
+        delivered = Order.objects.filter(order_status="Delivered").count()
+        self.assertEqual(AssignOrder.objects.count(), delivered)
+        self.assertLess(
+            OrderChangeLog.objects.order_by("changed_at").first().changed_at,
+            timezone.now() - timedelta(days=1),
+        )
+
+
+class EndpointBudgetTests(TestCase):
+    """Fails when a hot endpoint issues more queries than its checked-in budget."""
+
+    @classmethod
+    def setUpTestData(cls):
+        DatabaseMode.get_solo()
+        call_command(
+            "generate_synthetic_data",
+            stdout=io.StringIO(),
+            **benchmarks.load_budgets()["dataset"],
+        )
+
+    def test_endpoints_within_query_budgets(self):
+        # Latency is enforced by `manage.py benchmark_endpoints`, not here.
+        results = benchmarks.run_benchmarks(repeat=1, check_latency=False)
+
+        self.assertEqual(len(results), len(benchmarks.ENDPOINTS))
+        for result in results:
+            with self.subTest(endpoint=result["name"]):
+                self.assertEqual(result["problems"], [], result)
+
+    def test_fast_renderer_matches_drf_on_order_pages(self):
+        results = benchmarks.benchmark_renderers(page_size=50, repeat=2)
+
+        self.assertEqual([r["name"] for r in results], ["drf", "fast"])
+        for result in results:
+            self.assertEqual(result["orders"], 50)
+            self.assertTrue(result["identical"], result)
+
+
+class FastJSONTests(SimpleTestCase):
+    def test_renders_exactly_like_drf(self):
+        data = ReturnDict(
+            {
+                "total_amount": Decimal("1500.50"),
+                "created_at": datetime(
+                    2024, 5, 1, 10, 30, 15, 123456, tzinfo=dt_tz.utc
+                ),
+                "local": timezone.localtime(
+                    datetime(2024, 5, 1, 10, 30, tzinfo=dt_tz.utc)
+                ),
+                "naive": datetime(2024, 5, 1, 10, 30),
+                "date": date(2024, 5, 1),
+                "time": dt_time(9, 15),
+                "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+                "label": gettext_lazy("Delivered"),
+                "remarks": "नमस्ते \u2028 \u2029 \"quoted\"",
+                "by_status": {1: 2, "Pending": None},
+                "big": 2**70,
+                "results": ReturnList([{"price": Decimal("0.10")}], serializer=None),
+            },
+            serializer=None,
+        )
+
+        for media_type in (None, "application/json; indent=4"):
+            with self.subTest(media_type=media_type):
+                self.assertEqual(
+                    FastJSONRenderer().render(data, media_type),
+                    JSONRenderer().render(data, media_type),
+                )
+
+    def test_parses_exactly_like_drf(self):
+        bodies = [
+            b'{"order_ids": [1, 2], "amount": 12.5, "name": "\u0930\u093e\u092e"}',
+            b'{"id": 123456789012345678901234567890}',
+            b'"\\ud800"',
+        ]
+        for body in bodies:
+            with self.subTest(body=body):
+                self.assertEqual(
+                    FastJSONParser().parse(io.BytesIO(body)),
+                    JSONParser().parse(io.BytesIO(body)),
+                )
+
+        errors = []
+        for parser in (FastJSONParser(), JSONParser()):
+            with self.assertRaises(ParseError) as ctx:
+                parser.parse(io.BytesIO(b'{"amount": NaN}'))
+            errors.append(str(ctx.exception))
+        self.assertEqual(errors[0], errors[1])
+
+
+class OrderIndexTests(TestCase):
+    def setUp(self):
+        DatabaseMode.get_solo()
+        self.user = CustomUser.objects.create_user(
+            username="index_salesperson",
+            phone_number="9876544301",
+            password="password123",
+            role="SalesPerson",
+        )
+
+    def _order(self, **kwargs):
+        return Order.objects.create(
+            sales_person=self.user,
+            full_name="John Doe",
+            phone_number="9876543210",
+            payment_method="Cash on Delivery",
+            **kwargs,
+        )
+
+    def test_taken_order_code_is_redrawn(self):
+        self._order(order_code="ORD-AAAAAAAA")
+
+        with mock.patch(
+            "sales.models.generate_order_id", return_value="ORD-BBBBBBBB"
+        ):
+            order = self._order(order_code="ORD-AAAAAAAA")
+
+        self.assertEqual(order.order_code, "ORD-BBBBBBBB")
+        self.assertEqual(Order.objects.filter(order_code="ORD-AAAAAAAA").count(), 1)
+
+    def test_filters_use_indexes(self):
+        self._order()
+        out = io.StringIO()
+        call_command("explain_order_filters", stdout=out)
+
+        self.assertIn("All Order filters use an index", out.getvalue())
+        self.assertNotIn("SEQ SCAN", out.getvalue())
+
+
+class OrderArchiveTests(APITestCase):
+    def setUp(self):
+        DatabaseMode.get_solo()
+        self.franchise = Franchise.objects.create(name="Archive Franchise")
+        self.user = CustomUser.objects.create_user(
+            username="archive_salesperson",
+            phone_number="9876544401",
+            password="password123",
+            role="SalesPerson",
+            franchise=self.franchise,
+        )
+        product = Product.objects.create(name="Hair Oil")
+        self.inventory = Inventory.objects.create(
+            product=product, franchise=self.franchise, quantity=10
+        )
+
+    def _order(self, days_ago=400, **kwargs):
+        created_at = timezone.now() - timedelta(days=days_ago)
+        kwargs.setdefault("order_status", "Delivered")
+        kwargs.setdefault("logistics", "DASH")
+        kwargs.setdefault("full_name", "Jane Doe")
+        kwargs.setdefault("phone_number", f"98000{Order.objects.count():05d}")
+        return Order.objects.create(
+            sales_person=self.user,
+            franchise=self.franchise,
+            delivery_address="Kathmandu",
+            payment_method="Cash on Delivery",
+            total_amount=1000,
+            created_at=created_at,
+            date=timezone.localdate(created_at),
+            **kwargs,
+        )
+
+    def test_moves_old_closed_orders_with_related_rows(self):
+        order = self._order()
+        OrderProduct.objects.create(order=order, product=self.inventory, quantity=2)
+        OrderChangeLog.objects.create(
+            order=order, user=self.user, old_status="Pending", new_status="Delivered"
+        )
+        OrderComment.objects.create(order=order, user=self.user, comment="Called")
+        recent = self._order(days_ago=10)
+        open_order = self._order(order_status="Pending")
+        ydm = self._order(logistics="YDM")
+        assigned = self._order()
+        AssignOrder.objects.create(order=assigned, user=self.user)
+
+        out = io.StringIO()
+        call_command("archive_orders", stdout=out)
+
+        self.assertIn("Archived 1 order(s)", out.getvalue())
+        self.assertFalse(Order.objects.filter(id=order.id).exists())
+        self.assertFalse(OrderProduct.objects.filter(order_id=order.id).exists())
+        self.assertEqual(
+            set(Order.objects.values_list("id", flat=True)),
+            {recent.id, open_order.id, ydm.id, assigned.id},
+        )
+        archived = ArchivedOrder.objects.get(order_id=order.id)
+        self.assertEqual(archived.order_code, order.order_code)
+        self.assertEqual(archived.payload["order_products"][0]["quantity"], 2)
+        self.assertEqual(
+            sorted(record["model"] for record in archived.records),
+            [
+                "logistics.orderchangelog",
+                "logistics.ordercomment",
+                "sales.order",
+                "sales.orderproduct",
+            ],
+        )
+        rollup = ArchivedOrderRollup.objects.get()
+        self.assertEqual(
+            (rollup.franchise_id, rollup.order_status, rollup.order_count),
+            (self.franchise.id, "Delivered", 1),
+        )
+        self.assertEqual(rollup.total_amount, 1000)
+
+    def test_dry_run_and_rerun_do_not_double_count(self):
+        order = self._order()
+        self.assertEqual(archive_orders(dry_run=True), 1)
+        self.assertTrue(Order.objects.filter(id=order.id).exists())
+
+        # A run that stopped after the archive copy committed
+        ArchivedOrder.objects.create(
+            order_id=order.id, full_name="Jane Doe", payload={}, records=[]
+        )
+        self.assertEqual(archive_orders(batch_size=1), 1)
+
+        self.assertFalse(Order.objects.filter(id=order.id).exists())
+        self.assertEqual(ArchivedOrder.objects.count(), 1)
+        self.assertFalse(ArchivedOrderRollup.objects.exists())
+
+    def test_historical_orders_merge_hot_and_archived(self):
+        first, second, third = self._order(), self._order(), self._order()
+        third.order_status = "Cancelled"
+        third.save()
+        second.order_status = "Pending"
+        second.save()
+        archive_orders()
+
+        orders = historical_orders(created_at__lt=timezone.now())
+        self.assertEqual(orders.count(), 3)
+        self.assertEqual(
+            [(type(o).__name__, o.full_name) for o in orders[0:3]],
+            [
+                ("ArchivedOrder", "Jane Doe"),
+                ("Order", "Jane Doe"),
+                ("ArchivedOrder", "Jane Doe"),
+            ],
+        )
+        self.assertEqual(
+            [getattr(o, "order_id", o.id) for o in orders],
+            [third.id, second.id, first.id],
+        )
+        self.assertEqual(len(orders[1:]), 2)
+
+    def test_old_order_exports_include_archived_orders(self):
+        archived = self._order(full_name="Archived Customer")
+        OrderProduct.objects.create(order=archived, product=self.inventory, quantity=3)
+        archive_orders()
+        self._order(
+            order_status="Pending", full_name="Hot Customer", phone_number="9811111111"
+        )
+
+        response = self.client.get("/api/sales/export-unique-old-orders/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        sheet = openpyxl.load_workbook(io.BytesIO(response.content)).active
+        rows = {row[3]: row for row in sheet.iter_rows(min_row=2, values_only=True)}
+        self.assertEqual(set(rows), {"Archived Customer", "Hot Customer"})
+        self.assertEqual(rows["Archived Customer"][10], "3x Hair Oil")
+
+    def test_statistics_count_archived_orders(self):
+        self._order()
+        self._order(order_status="Cancelled")
+        self._order(days_ago=0)
+        archive_orders()
+        self.assertEqual(Order.objects.count(), 1)
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get("/api/sales/statistics/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["all_time_orders"], 2)
+        self.assertEqual(response.data["all_time_sales"], 2000)
+        self.assertEqual(response.data["cancelled_orders"]["cancelled"], 1)
+        self.assertEqual(response.data["total_orders"], 1)
+
+
+    def test_every_statistics_view_counts_archived_orders(self):
+        archived = self._order(days_ago=20)
+        OrderProduct.objects.create(order=archived, product=self.inventory, quantity=2)
+        self._order(days_ago=20, order_status="Cancelled")
+        archive_orders(before=timezone.now() - timedelta(days=10))
+        hot = self._order(days_ago=0, order_status="Pending")
+        OrderProduct.objects.create(order=hot, product=self.inventory, quantity=1)
+        self.assertEqual(Order.objects.count(), 1)
+        self.client.force_authenticate(self.user)
+
+        def get(url):
+            response = self.client.get(f"/api/sales/{url}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+            return response.data
+
+        def total(rows, field):
+            return sum(row[field] for row in rows)
+
+        data = get("revenue/?filter=yearly")["data"]
+        self.assertEqual(
+            (total(data, "order_count"), total(data, "total_revenue")), (2, 2000)
+        )
+        data = get("revenue-with-cancelled/?filter=yearly")["data"]
+        self.assertEqual(
+            (total(data, "order_count"), total(data, "cancelled_count")), (3, 1)
+        )
+        products = get("top-products/")["products"]
+        self.assertEqual(
+            [
+                (p["product_name"], p["total_quantity"], p["total_amount"])
+                for p in products
+            ],
+            [("Hair Oil", 3, 2000.0)],
+        )
+        self.assertEqual(get("revenue-by-product/")["total_revenue"], 2000.0)
+        stats = get("dashboard-stats/")
+        self.assertEqual(
+            (stats["total_revenue"]["amount"], stats["orders"]["count"]), (2000.0, 2)
+        )
+        stats = get(f"salesperson/{self.user.phone_number}/statistics/")
+        self.assertEqual(
+            (stats["total_orders"], stats["total_cancelled_orders"]), (2, 1)
+        )
+        self.assertEqual(stats["product_sales"][0]["quantity_sold"], 3)
+        data = get(f"salesperson/{self.user.phone_number}/revenue/?filter=yearly")
+        self.assertEqual(total(data["data"], "order_count"), 3)
+        [seller] = get("top-salespersons/?filter=all")["results"]
+        self.assertEqual((seller["sales_count"], seller["total_sales"]), (2, 2000.0))
+        self.assertEqual(seller["product_sales"][0]["quantity_sold"], 3)
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        DatabaseMode.get_solo()
+        self.franchise = Franchise.objects.create(name="Sparse Franchise")
+        self.user = CustomUser.objects.create_user(
+            username="sparse_franchise",
+            phone_number="9876544501",
+            password="password123",
+            role="Franchise",
+            franchise=self.franchise,
+        )
+        rider = CustomUser.objects.create_user(
+            username="sparse_rider",
+            phone_number="9876544502",
+            password="password123",
+            role="YDM_Rider",
+        )
+        product = Product.objects.create(name="Hair Oil")
+        inventory = Inventory.objects.create(
+            product=product, franchise=self.franchise, quantity=10
+        )
+        for i in range(3):
+            order = Order.objects.create(
+                sales_person=self.user,
+                franchise=self.franchise,
+                full_name=f"Customer {i}",
+                phone_number=f"98000045{i:02d}",
+                payment_method="Cash on Delivery",
+                total_amount=Decimal("1500.00"),
+            )
+            OrderProduct.objects.create(order=order, product=inventory, quantity=1)
+            AssignOrder.objects.create(order=order, user=rider, is_rider_verified=True)
+            OrderComment.objects.create(order=order, user=self.user, comment="Call")
+            OrderChangeLog.objects.create(
+                order=order,
+                user=self.user,
+                old_status="Pending",
+                new_status="Sent to YDM",
+            )
+        self.client.force_authenticate(user=self.user)
+
+    def _list(self, **params):
+        return self.client.get(reverse("order-create"), params)
+
+    def test_fields_profile_and_omit_pick_the_rendered_keys(self):
+        response = self._list(fields="order_code,total_amount")
+        self.assertEqual(
+            set(response.data["results"][0]), {"id", "order_code", "total_amount"}
+        )
+
+        response = self._list(profile="packaging", omit="created_at")
+        self.assertEqual(
+            set(response.data["results"][0]),
+            {"id", *OrderSerializer.field_profiles["packaging"]} - {"created_at"},
+        )
+
+        response = self._list(omit="won_game,comments")
+        # location and daraz_location are write-only
+        self.assertEqual(
+            set(response.data["results"][0]),
+            set(OrderSerializer.Meta.fields)
+            - {"won_game", "comments", "location", "daraz_location"},
+        )
+
+    def test_unrequested_method_fields_are_not_computed(self):
+        with mock.patch.object(OrderSerializer, "get_won_game") as get_won_game:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self._list(profile="rider")
+            rider_queries = len(ctx.captured_queries)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        get_won_game.assert_not_called()
+        self.assertTrue(response.data["results"][0]["is_rider_verified"])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self._list()
+        self.assertLess(rider_queries, len(ctx.captured_queries))
+
+    def test_default_output_matches_unprefetched_serializer(self):
+        response = self._list()
+
+        orders = Order.objects.order_by("-id")
+        self.assertEqual(
+            response.data["results"], OrderSerializer(orders, many=True).data
+        )
+        self.assertEqual(response.data["results"][0]["comments"]["comment"], "Call")
+        self.assertIsNotNone(response.data["results"][0]["sent_to_ydm_date"])
+
+    def test_unknown_field_or_profile_is_rejected(self):
+        for params in ({"fields": "order_code,secret"}, {"profile": "nope"}):
+            with self.subTest(params=params):
+                response = self._list(**params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        DatabaseMode.get_solo()
+        self.franchise = Franchise.objects.create(name="Etag Franchise")
+        self.user = CustomUser.objects.create_user(
+            username="etag_franchise",
+            phone_number="9876544601",
+            password="password123",
+            role="Franchise",
+            franchise=self.franchise,
+        )
+        self.order = Order.objects.create(
+            sales_person=self.user,
+            franchise=self.franchise,
+            full_name="Customer",
+            phone_number="9800004601",
+            payment_method="Cash on Delivery",
+            logistics="YDM",
+            total_amount=Decimal("1500.00"),
+        )
+        self.assignment = AssignOrder.objects.create(order=self.order, user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def _get(self, name, etag=None, **kwargs):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(reverse(name, kwargs=kwargs), **headers)
+
+    def test_unchanged_order_list_is_not_modified(self):
+        response = self._get("order-create")
+        etag = response["ETag"]
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertIn("Last-Modified", response)
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        with mock.patch.object(OrderSerializer, "get_won_game") as get_won_game:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self._get("order-create", etag)
+            queries = len(ctx.captured_queries)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+        get_won_game.assert_not_called()
+        self.assertLessEqual(queries, 3)
+
+    def test_changes_outside_the_order_row_change_the_etag(self):
+        etag = self._get("order-create")["ETag"]
+
+        AssignOrder.objects.filter(pk=self.assignment.pk).update(
+            is_rider_verified=True
+        )
+        response = self._get("order-create", etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["results"][0]["is_rider_verified"])
+        etag = response["ETag"]
+
+        OrderComment.objects.create(order=self.order, user=self.user, comment="Call")
+        self.assertEqual(self._get("order-create", etag).status_code, 200)
+
+    def test_courier_tracking_code_changes_the_etag(self):
+        from dash.utils import DashOutboxHandler
+
+        etag = self._get("order-create")["ETag"]
+        entry = CourierOutbox.objects.create(order=self.order, provider="DASH")
+
+        DashOutboxHandler().apply(
+            entry, {"data": {"detail": [{"tracking_code": "DASH-4601"}]}}
+        )
+
+        response = self._get("order-create", etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["tracking_code"], "DASH-4601")
+
+    def test_statistics_and_statement(self):
+        etag = self._get("sales-statistics")["ETag"]
+        self.assertEqual(self._get("sales-statistics", etag).status_code, 304)
+
+        self.order.order_status = "Delivered"
+        self.order.save()
+        self.assertEqual(self._get("sales-statistics", etag).status_code, 200)
+
+        response = self.client.get(
+            reverse("sales-statistics"), {"start_date": "2024-13-01"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data, {"detail": "Invalid date format. Use YYYY-MM-DD"}
+        )
+
+        statement = {
+            "name": "franchise_statement_full",
+            "franchise_id": self.franchise.id,
+        }
+        etag = self._get(**statement)["ETag"]
+        self.assertEqual(self._get(etag=etag, **statement).status_code, 304)
+        Invoice.objects.create(
+            franchise=self.franchise, created_by=self.user, total_amount=100
+        )
+        self.assertEqual(self._get(etag=etag, **statement).status_code, 200)
@@ -247,3 +247,98 @@ def deduct_single_inventory_item(user, instance, inv_id, qty):
         )
     except Inventory.DoesNotExist:
         raise Exception(f"Inventory ID {inv_id} not found for this organization.")
+
+
+def upsert_locations(rows, logistics, batch_size=500):
+    """
+    Merge ``(location_name, coverage_raw)`` rows into the Location table for
+    one ``logistics`` provider.
+
+    Existing locations are loaded once and merged in memory: current areas
+    keep their order and new areas are appended in sheet order without
+    duplicates. Writes go through bulk_create/bulk_update in ``batch_size``
+    batches inside one transaction.
+
+    Returns ``{"created": n, "updated": n, "unchanged": n}`` (per location).
+    """
+    from django.db import transaction
+
+    from sales.models import Location
+
+    incoming = {}
+    for location_name, coverage_raw in rows:
+        if not location_name or not coverage_raw:
+            continue
+        areas = incoming.setdefault(str(location_name).strip(), {})
+        for area in str(coverage_raw).split(","):
+            if area.strip():
+                areas.setdefault(area.strip(), None)
+
+    existing = {}
+    for location in Location.objects.filter(
+        logistics=logistics, name__in=list(incoming)
+    ).order_by("id"):
+        # Keep the oldest row if a name was saved twice.
+        existing.setdefault(location.name, location)
+
+    to_create, to_update, unchanged = [], [], 0
+    for name, areas in incoming.items():
+        location = existing.get(name)
+        if location is None:
+            to_create.append(
+                Location(name=name, logistics=logistics, coverage_areas=list(areas))
+            )
+            continue
+        current = location.coverage_areas or []
+        merged = list(dict.fromkeys([*current, *areas]))
+        if merged != current:
+            location.coverage_areas = merged
+            to_update.append(location)
+        else:
+            unchanged += 1
+
+    with transaction.atomic():
+        Location.objects.bulk_create(to_create, batch_size=batch_size)
+        Location.objects.bulk_update(
+            to_update, ["coverage_areas"], batch_size=batch_size
+        )
+
+    return {
+        "created": len(to_create),
+        "updated": len(to_update),
+        "unchanged": unchanged,
+    }
+
+
+def order_change_markers(orders, assignments=False, comments=False):
+    """
+    Change markers (see core.conditional) of an Order queryset: its count and
+    newest updated_at. ``assignments`` and ``comments`` add the rider
+    assignments and comments of those orders, which change without touching
+    the order row.
+    """
+    from django.db.models import Count, F, Max, Q, Sum
+
+    from logistics.models import AssignOrder, OrderComment
+
+    orders = orders.order_by()
+    markers = {
+        "orders": orders.aggregate(count=Count("id"), updated=Max("updated_at"))
+    }
+    if assignments:
+        markers["assignments"] = AssignOrder.objects.filter(
+            order__in=orders.values("id")
+        ).aggregate(
+            count=Count("id"),
+            assigned=Max("assigned_at"),
+            # Checksums of the columns updated in place
+            riders=Sum(F("order_id") * F("user_id")),
+            verified=Sum("order_id", filter=Q(is_rider_verified=True)),
+            delivery_charges=Sum("ydm_delivery_charge"),
+            cancelled_charges=Sum("ydm_cancelled_charge"),
+        )
+    if comments:
+        markers["comments"] = OrderComment.objects.filter(
+            order__in=orders.values("id")
+        ).aggregate(count=Count("id"), updated=Max("updated_at"))
+    return markers
@@ -6,6 +6,7 @@ import urllib.request
 import zipfile
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date, datetime, time, timedelta
+from time import perf_counter
 
 import openpyxl
 from dateutil.relativedelta import relativedelta
@@ -29,11 +30,14 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from account.models import CustomUser, Distributor, Factory, Franchise
+from core.conditional import ConditionalGetMixin
 from core.middleware import get_current_db_name, set_current_db_name
 from logistics.models import AssignOrder, OrderChangeLog
-from logistics.utils import create_order_log
+from logistics.outbox import enqueue_courier_push
+from logistics.transitions import Transition, apply_transition_effects
 
-from .constants import EXCLUDED_STATUSES
+from .archive import historical_orders, representations
+from .constants import EXCLUDED_STATUSES, RETURN_STATUSES
 from .models import (
     Commission,
     DatabaseMode,
@@ -64,16 +68,17 @@ from .serializers import (
 )
 from .utils import (
     append_order_status_comments,
-    deduct_order_inventory,
     deduct_single_inventory_item,
     format_inventory_list,
     format_product_inventory_list,
     get_inventory_by_user_role,
     get_owner_by_role,
     handle_free_delivery_toggle,
+    order_change_markers,
     parse_order_products,
     resolve_order_logistics_and_status,
     restore_order_inventory,
+    upsert_locations,
 )
 
 # Create your views here.
@@ -510,10 +515,13 @@ class FranchiseOrdersListView(generics.ListAPIView):
         if not franchise_id:
             return Order.objects.none()
 
-        return Order.objects.filter(franchise_id=franchise_id).order_by("-id")
+        return OrderSerializer.optimize_queryset(
+            Order.objects.filter(franchise_id=franchise_id).order_by("-id"),
+            self.request,
+        )
 
 
-class OrderListCreateView(generics.ListCreateAPIView):
+class OrderListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     queryset = Order.objects.all().order_by("-id")
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
@@ -528,8 +536,15 @@ class OrderListCreateView(generics.ListCreateAPIView):
     pagination_class = CustomPagination
     parser_classes = (JSONParser, FormParser, MultiPartParser)
 
+    def get_change_markers(self):
+        return order_change_markers(
+            self.filter_queryset(self.get_queryset()), assignments=True, comments=True
+        )
+
     def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
+        queryset = self.filter_queryset(
+            OrderSerializer.optimize_queryset(self.get_queryset(), request)
+        )
         status_filter = request.query_params.get("order_status")
 
         page = self.paginate_queryset(queryset)
@@ -890,7 +905,9 @@ class OrderListCreateView(generics.ListCreateAPIView):
         try:
             from sales_game.models import check_order_for_games
 
-            check_order_for_games(order)
+            check_order_for_games(
+                order, getattr(serializer, "created_order_products", None)
+            )
         except ImportError:
             pass
 
@@ -902,6 +919,7 @@ class OrderUpdateView(generics.UpdateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
 
+    @transaction.atomic
     def update(self, request, *args, **kwargs):
         order = self.get_object()
         previous_status = order.order_status
@@ -933,22 +951,22 @@ class OrderUpdateView(generics.UpdateAPIView):
                 order=order, new_status="Sent to YDM"
             ).exists()
 
-            # Push to YDM BEFORE saving — status is only persisted on success
-            if (
+            push_to_ydm = (
                 resolved_status == "Sent to YDM"
                 and previous_status != "Sent to YDM"
                 and resolved_logistics == "YDM"
                 and not already_sent_to_ydm
-            ):
-                from ydm.services.ydm_service import push_order_to_ydm
+            )
 
-                print(
-                    f"[YDM] Pushing order pk={order.pk} to YDM before saving status..."
-                )
-                push_order_to_ydm(order)  # raises ValidationError on failure
-                print("[YDM] Push successful — saving order status 'Sent to YDM'.")
+            # The YDM push goes through the courier outbox, written in the same
+            # transaction as the status so neither commits without the other.
+            with transaction.atomic():
+                if push_to_ydm:
+                    from ydm.services.ydm_service import validate_ydm_push
 
-            order.save()
+                    validate_ydm_push(order)  # raises ValidationError on failure
+                    enqueue_courier_push(order, "YDM", user=request.user)
+                order.save()
 
         # -----------------------------------------
         # 4️⃣ PERFORM DRF NORMAL UPDATE
@@ -957,64 +975,13 @@ class OrderUpdateView(generics.UpdateAPIView):
         order.refresh_from_db()
 
         # -----------------------------------------
-        # 5️⃣ ORDER STATUS CHANGE LOG ENTRY
+        # 5️⃣ STATUS CHANGE LOG, YDM CHARGES, INVENTORY RESTORE/DEDUCT
         # -----------------------------------------
-        new_status = order.order_status
-        if new_status != previous_status:
-            create_order_log(
-                order, previous_status, new_status, user=request.user, comment=comment
-            )
-            # If logistics is YDM, manage the cancelled charge on AssignOrder based on status transitions
-            if order.logistics == "YDM":
-                # 5a. YDM push already succeeded before save — nothing to do here
-
-                cancelled_statuses = [
-                    "Cancelled",
-                    "Return Pending",
-                    "Returned By Customer",
-                    "Returned By YDM",
-                ]
-                if (
-                    new_status in cancelled_statuses
-                    and previous_status not in cancelled_statuses
-                ):
-                    from logistics.models import YdmLogisticsSetting
-
-                    setting = YdmLogisticsSetting.load()
-                    for assignment in order.assign_orders.all():
-                        assignment.ydm_cancelled_charge = setting.cancelled_charge
-                        assignment.save()
-                elif (
-                    previous_status in cancelled_statuses
-                    and new_status not in cancelled_statuses
-                ):
-                    for assignment in order.assign_orders.all():
-                        assignment.ydm_cancelled_charge = None
-                        assignment.save()
-
-        # -----------------------------------------
-        # 6️⃣ HANDLE ORDER CANCELLATION / RETURNS
-        # -----------------------------------------
-        return_statuses = [
-            "Cancelled",
-            "Returned By Customer",
-            "Returned By Dash",
-            "Returned By YDM",
-            "Returned By PicknDrop",
-            "Returned By Daraz",
-        ]
-
-        is_returning = new_status in return_statuses
-        was_returning = previous_status in return_statuses
-
-        if is_returning != was_returning:
-            with transaction.atomic():
-                if is_returning:
-                    restore_order_inventory(order, request.user)
-                else:
-                    deduct_order_inventory(order, request.user)
-
-        return response
+        apply_transition_effects(
+            [Transition(order, previous_status, order.order_status)],
+            user=request.user,
+            comment=comment,
+        )
 
         return response
 
@@ -1566,61 +1533,20 @@ class OrderDetailUpdateView(generics.RetrieveUpdateAPIView):
             # Update the instance with only the modified fields
             serializer = self.get_serializer(instance, data=modified_data, partial=True)
             serializer.is_valid(raise_exception=True)
-            order = serializer.save()
-
-            new_status = order.order_status
-            create_order_log(
-                order, old_status, new_status, user=request.user, comment=comment
-            )
-
-            # ---------------------------------------------------------
-            # 3️⃣ Handle inventory sync for products and status changes
-            # ---------------------------------------------------------
-            inventoried_statuses = [
-                "Pending",
-                "Processing",
-                "Verified",
-                "Sent to Dash",
-                "Sent to YDM",
-                "Sent to Daraz",
-                "Sent to PicknDrop",
-                "Delivered",
-                "Indrive",
-                "Out For Delivery",
-                "Rescheduled",
-            ]
-
-            return_statuses = [
-                "Cancelled",
-                "Returned By Customer",
-                "Returned By Dash",
-                "Returned By YDM",
-                "Returned By PicknDrop",
-                "Returned By Daraz",
-            ]
-
-            old_status_sync = instance.order_status
-            new_status_sync = modified_data.get("order_status", old_status_sync)
-
-            was_active = old_status_sync in inventoried_statuses
-            is_active = new_status_sync in inventoried_statuses
-
-            is_returning = new_status_sync in return_statuses
-            was_returning = old_status_sync in return_statuses
-
-            products_updated = order_products is not None
-            status_changed = new_status_sync != old_status_sync
-
             with transaction.atomic():
-                if products_updated:
-                    # If it was active, restore the OLD products back to stock
-                    if was_active:
+                order = serializer.save()
+
+                # ---------------------------------------------------------
+                # 3️⃣ Swap products; stock moves as for the status it had
+                # ---------------------------------------------------------
+                if order_products is not None:
+                    in_stock = old_status not in RETURN_STATUSES
+                    if in_stock:
+                        # Put the OLD products back to stock
                         restore_order_inventory(instance, request.user)
 
-                    # Delete existing products
                     instance.order_products.all().delete()
 
-                    # Create new products and deduct if NEW status is active
                     for product_data in order_products:
                         qty = int(product_data["quantity"])
                         inv_id = product_data["product_id"]
@@ -1629,22 +1555,19 @@ class OrderDetailUpdateView(generics.RetrieveUpdateAPIView):
                             order=instance, product_id=inv_id, quantity=qty
                         )
 
-                        if is_active:
+                        if in_stock:
                             deduct_single_inventory_item(
                                 request.user, instance, inv_id, qty
                             )
 
-                elif status_changed:
-                    # Scenario: Products didn't change, but status moved
-                    if was_active and is_returning:
-                        # Moving from Active -> Return/Cancelled
-                        # Restore CURRENT products to stock
-                        restore_order_inventory(instance, request.user)
-
-                    elif was_returning and not is_returning:
-                        # Moving from Return/Cancelled -> Any other stage
-                        # Deduct CURRENT products from stock
-                        deduct_order_inventory(order, request.user)
+                # ---------------------------------------------------------
+                # 4️⃣ STATUS CHANGE LOG, YDM CHARGES, INVENTORY RESTORE/DEDUCT
+                # ---------------------------------------------------------
+                apply_transition_effects(
+                    [Transition(order, old_status, order.order_status)],
+                    user=request.user,
+                    comment=comment,
+                )
 
             # Update promo code usage if changed and provided
             if (
@@ -1891,38 +1814,19 @@ class LocationUploadView(APIView):
         except Exception as e:
             return Response({"error": f"Failed to process file: {str(e)}"}, status=400)
 
-        # Save to DB
-        created, updated = 0, 0
-        for location_name, coverage_raw in rows:
-            if not location_name or not coverage_raw:
-                continue
-
-            location_name = str(location_name).strip()
-            coverage_list = [
-                area.strip() for area in str(coverage_raw).split(",") if area.strip()
-            ]
-
-            location, is_created = Location.objects.get_or_create(
-                name=location_name, logistics=logistics_choice
-            )
-
-            if is_created:
-                location.coverage_areas = coverage_list
-                created += 1
-            else:
-                # Merge new areas without duplicates
-                merged = list(set(location.coverage_areas + coverage_list))
-                if merged != location.coverage_areas:
-                    location.coverage_areas = merged
-                    updated += 1
-
-            location.save()
+        # Save to DB: one read, batched writes, single transaction
+        started = perf_counter()
+        counts = upsert_locations(rows, logistics_choice)
+        elapsed_ms = round((perf_counter() - started) * 1000, 1)
 
         return Response(
             {
                 "message": "Upload successful",
-                "locations_created": created,
-                "locations_updated": updated,
+                "rows_processed": len(rows),
+                "locations_created": counts["created"],
+                "locations_updated": counts["updated"],
+                "locations_unchanged": counts["unchanged"],
+                "elapsed_ms": elapsed_ms,
             },
             status=201,
         )
@@ -2249,10 +2153,13 @@ class BulkUpdateFranchiseOrderDateView(APIView):
                     new_dt = timezone.make_aware(new_dt)
 
                 order.created_at = new_dt
+                order.updated_at = timezone.now()
                 updated_orders.append(order)
 
             # Bulk update
-            Order.objects.bulk_update(updated_orders, ["date", "created_at"])
+            Order.objects.bulk_update(
+                updated_orders, ["date", "created_at", "updated_at"]
+            )
 
             return Response(
                 {
@@ -2400,9 +2307,11 @@ class FranchiseHistoricalOrderView(generics.ListAPIView):
         start_date = target_month_start + timedelta(days=(effective_week - 1) * 7)
         end_date = start_date + timedelta(days=6)
 
-        return Order.objects.filter(
-            franchise=franchise, date__range=[start_date, end_date]
-        ).order_by("-id")
+        # Old enough weeks may already be partly archived (sales.archive)
+        return historical_orders(
+            franchise_id=getattr(franchise, "id", None),
+            date__range=[start_date, end_date],
+        )
 
     def list(self, request, *args, **kwargs):
         user = self.request.user
@@ -2437,17 +2346,18 @@ class FranchiseHistoricalOrderView(generics.ListAPIView):
             "date_range": {"start": start_date, "end": end_date},
         }
 
+        def serialize(order):
+            return self.get_serializer(order).data
+
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            response = self.get_paginated_response(serializer.data)
+            response = self.get_paginated_response(representations(page, serialize))
             # Add custom fields to paginated response
             response.data.update(rotation_data)
             return response
 
-        serializer = self.get_serializer(queryset, many=True)
         response_data = {"count": queryset.count()}
         response_data.update(rotation_data)
-        response_data["results"] = serializer.data
+        response_data["results"] = representations(queryset, serialize)
         return Response(response_data)
 
 
@@ -1,6 +1,13 @@
+import os
 import random
+import threading
+import time
+from collections import defaultdict
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 
 from sales.models import Order, Product
 
@@ -154,24 +161,151 @@ class GameWinner(models.Model):
         return f"Order {self.order.order_code} won {str(self.condition)}"
 
 
-def check_order_for_games(order):
+# Seconds a compiled matcher is trusted before it is rebuilt. Saves in this
+# process invalidate it straight away; other workers pick changes up on expiry.
+GAME_MATCHER_TTL = int(os.getenv("GAME_MATCHER_TTL", 60))
+
+_matcher_cache = {"matcher": None, "loaded_at": 0.0, "generation": 0}
+_matcher_lock = threading.Lock()
+
+
+class ActiveGameMatcher:
+    """
+    The active game's active condition with its rules compiled down to sets of
+    product ids, so an order can be checked without touching the database.
+    """
+
+    def __init__(self, game, condition, rules):
+        self.game = game
+        self.condition = condition
+        # [(frozenset of Product ids, min_quantity), ...]
+        self.rules = rules
+
+    @classmethod
+    def compile(cls):
+        game = (
+            Game.objects.filter(is_active=True)
+            .select_related("active_condition")
+            .first()
+        )
+        if not game or not game.active_condition:
+            return None
+        if GameWinner.objects.filter(game=game).exists():
+            return None
+
+        condition = game.active_condition
+        rules = []
+        for rule in condition.rules.all():
+            if rule.rule_type == "product":
+                if not rule.product_id:
+                    return None
+                product_ids = frozenset([rule.product_id])
+            elif rule.rule_type == "keyword":
+                if not rule.keyword:
+                    return None
+                product_ids = frozenset(
+                    Product.objects.filter(
+                        name__icontains=rule.keyword.strip()
+                    ).values_list("id", flat=True)
+                )
+            else:
+                continue
+            rules.append((product_ids, rule.min_quantity))
+        if not rules:
+            return None
+        return cls(game, condition, rules)
+
+    def matches(self, lines):
+        """``lines`` is an iterable of ``(product_id, quantity)`` pairs."""
+        quantities = defaultdict(int)
+        for product_id, quantity in lines:
+            quantities[product_id] += quantity
+        if not quantities:
+            return False
+        return all(
+            sum(qty for pid, qty in quantities.items() if pid in product_ids)
+            >= min_quantity
+            for product_ids, min_quantity in self.rules
+        )
+
+
+def get_active_game_matcher():
+    """
+    The cached ActiveGameMatcher, or None when no game can currently be won.
+    """
+    now = time.monotonic()
+    with _matcher_lock:
+        generation = _matcher_cache["generation"]
+        if now - _matcher_cache["loaded_at"] <= GAME_MATCHER_TTL:
+            return _matcher_cache["matcher"]
+
+    matcher = ActiveGameMatcher.compile()
+    with _matcher_lock:
+        # Don't store a matcher built from rows that changed while compiling.
+        if _matcher_cache["generation"] == generation:
+            _matcher_cache.update(matcher=matcher, loaded_at=now)
+    return matcher
+
+
+def invalidate_game_matcher():
+    with _matcher_lock:
+        _matcher_cache.update(
+            matcher=None,
+            loaded_at=0.0,
+            generation=_matcher_cache["generation"] + 1,
+        )
+
+
+@receiver([post_save, post_delete], sender=Game)
+@receiver([post_save, post_delete], sender=GameCondition)
+@receiver([post_save, post_delete], sender=GameConditionRule)
+@receiver([post_save, post_delete], sender=GameWinner)
+@receiver([post_save, post_delete], sender=Product)
+def _game_rules_changed(sender, **kwargs):
+    invalidate_game_matcher()
+    # Rebuild again once the change is visible to other connections.
+    transaction.on_commit(invalidate_game_matcher)
+
+
+def _order_lines(order, order_products):
+    if order_products is None:
+        return order.order_products.values_list("product__product_id", "quantity")
+    return [(op.product.product_id, op.quantity) for op in order_products]
+
+
+def check_order_for_games(order, order_products=None):
     """
     Check if the newly created order satisfies any active game's active condition.
     If so, record a GameWinner.
     A salesperson can only win once per game.
+
+    Pass the OrderProduct rows (with their inventory loaded) when they are at
+    hand, so a non-winning order costs no queries.
     """
-    active_game = Game.objects.filter(is_active=True).first()
-    if not active_game or not active_game.active_condition:
+    matcher = get_active_game_matcher()
+    if matcher is None:
         return
-
-    # Check if this game has already been won by anyone (once won, no one else can win)
-    if GameWinner.objects.filter(game=active_game).exists():
+    lines = list(_order_lines(order, order_products))
+    if not matcher.matches(lines):
         return
 
-    condition = active_game.active_condition
-    if condition.check_order_matches(order):
-        # Record the win
-        winner, created = GameWinner.objects.get_or_create(
+    with transaction.atomic():
+        # The cached matcher can predate rule changes made in another worker,
+        # so a match is checked again against fresh rows before claiming.
+        matcher = ActiveGameMatcher.compile()
+        if matcher is None or not matcher.matches(lines):
+            invalidate_game_matcher()
+            return
+        active_game, condition = matcher.game, matcher.condition
+        # Claim the game; a concurrent winner leaves 0 rows here.
+        claimed = Game.objects.filter(
+            pk=active_game.pk, is_active=True, active_condition=condition
+        ).update(is_active=False, updated_at=timezone.now())
+        if not claimed:
+            invalidate_game_matcher()
+            return
+        # Once won, the game is deactivated so active game becomes null/inactive
+        GameWinner.objects.get_or_create(
             game=active_game,
             condition=condition,
             order=order,
@@ -179,7 +313,4 @@ def check_order_for_games(order):
                 "message": f"Congratulations! You won the '{active_game.name}' game by satisfying condition: '{str(condition)}'"
             },
         )
-        if created:
-            # Once won, deactivate this game so active game becomes null/inactive
-            active_game.is_active = False
-            active_game.save(update_fields=["is_active"])
+    invalidate_game_matcher()
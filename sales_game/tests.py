@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from account.models import Franchise
 from sales.models import Inventory, Order, OrderProduct, Product
@@ -9,6 +11,8 @@ from sales_game.models import (
     GameConditionRule,
     GameWinner,
     check_order_for_games,
+    get_active_game_matcher,
+    invalidate_game_matcher,
 )
 
 User = get_user_model()
@@ -16,6 +20,7 @@ User = get_user_model()
 
 class GameLogicTestCase(TestCase):
     def setUp(self):
+        invalidate_game_matcher()
         # Create user & franchise
         self.franchise = Franchise.objects.create(name="Test Franchise")
         self.user = User.objects.create_user(
@@ -313,3 +318,65 @@ class GameLogicTestCase(TestCase):
         game2.refresh_from_db()
         assert not game1.is_active
         assert game2.is_active
+
+    def _order_with(self, *lines):
+        order = Order.objects.create(
+            sales_person=self.user,
+            franchise=self.franchise,
+            full_name="Cached Customer",
+            phone_number="9876543212",
+            payment_method="Cash on Delivery",
+        )
+        order_products = [
+            OrderProduct.objects.create(order=order, product=inv, quantity=qty)
+            for inv, qty in lines
+        ]
+        return order, order_products
+
+    def test_cached_matcher_adds_no_queries_for_losing_orders(self):
+        order, order_products = self._order_with((self.inv_sachet_oil, 5))
+        check_order_for_games(order, order_products)
+
+        with CaptureQueriesContext(connection) as ctx:
+            check_order_for_games(order, order_products)
+
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertFalse(GameWinner.objects.exists())
+
+    def test_matcher_is_rebuilt_when_rules_change(self):
+        order, order_products = self._order_with(
+            (self.inv_body_lotion, 2), (self.inv_sunflower_oil, 1)
+        )
+        check_order_for_games(order, order_products)
+        self.assertFalse(GameWinner.objects.exists())
+
+        self.cond_sachet_shampoo.rules.all().delete()
+        GameConditionRule.objects.create(
+            condition=self.cond_sachet_shampoo,
+            rule_type="keyword",
+            keyword="LOTION",
+            min_quantity=2,
+        )
+        check_order_for_games(order, order_products)
+
+        winner = GameWinner.objects.get()
+        self.assertEqual(winner.order, order)
+        self.game.refresh_from_db()
+        self.assertFalse(self.game.is_active)
+
+    def test_stale_matcher_does_not_award_under_changed_rules(self):
+        get_active_game_matcher()
+        # Another worker raises the bar; update() sends no signals, so this
+        # process keeps its cached matcher.
+        GameConditionRule.objects.filter(condition=self.cond_sachet_shampoo).update(
+            min_quantity=5
+        )
+        order, order_products = self._order_with(
+            (self.inv_sachet_oil, 1), (self.inv_shampoo_bottle, 1)
+        )
+
+        check_order_for_games(order, order_products)
+
+        self.assertFalse(GameWinner.objects.exists())
+        self.game.refresh_from_db()
+        self.assertTrue(self.game.is_active)
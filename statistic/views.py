@@ -1,4 +1,6 @@
+from collections import defaultdict
 from datetime import datetime
+from functools import cached_property
 
 from django.db import models
 from django.db.models import Count, Q, Sum
@@ -7,19 +9,33 @@ from django.utils import timezone
 from django_filters import rest_framework as django_filters
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, status
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import ParseError, PermissionDenied, ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from account.models import CustomUser, Franchise
+from core.conditional import ConditionalGetMixin
+from sales.archive import (
+    add_archived_rows,
+    archived_totals,
+    rollup_aggregates,
+    rollup_filters,
+)
 from sales.constants import ACTIVE_ORDER_STATUSES, EXCLUDED_STATUSES
-from sales.models import Inventory, Order, OrderProduct
+from sales.models import (
+    ArchivedOrderRollup,
+    ArchivedProductRollup,
+    Inventory,
+    Order,
+    OrderProduct,
+)
 from sales.serializers import (
     OrderSerializer,
     SalesPersonStatisticsSerializer,
     TopSalespersonSerializer,
 )
+from sales.utils import order_change_markers
 from sales.views import CustomPagination
 
 from .models import Report
@@ -109,10 +125,109 @@ class LatestOrdersView(generics.ListAPIView):
     serializer_class = OrderSerializer
 
 
-class SalesStatisticsView(generics.GenericAPIView):
+def order_scope(request, sales_person_scope="own"):
+    """
+    Order filters (``franchise_id``, ``factory_id``, ...) for what the user
+    may see, or None for roles without statistics. They work on Order and
+    on the archive rollups alike. SalesPersons see their own orders, or their
+    franchise's with ``sales_person_scope="franchise"``.
+    """
+    franchise = request.query_params.get("franchise")
+    distributor = request.query_params.get("distributor")
+    user = request.user
+    if user.role == "SuperAdmin":
+        if franchise:
+            return {"franchise_id": franchise}
+        if distributor:
+            return {"distributor_id": distributor}
+        return {"factory_id": user.factory_id}
+    if user.role == "Distributor":
+        franchises = Franchise.objects.filter(distributor=user.distributor)
+        return {"franchise_id__in": list(franchises.values_list("id", flat=True))}
+    if user.role in ["Franchise", "Packaging"] or (
+        user.role == "SalesPerson" and sales_person_scope == "franchise"
+    ):
+        return {"franchise_id": user.franchise_id}
+    if user.role == "SalesPerson":
+        return {"sales_person_id": user.id}
+    return None
+
+
+def period_rows(orders, rollups, period, archived_period, aggregates):
+    """
+    Per-period ``aggregates`` of the hot ``orders`` and the archived orders
+    in ``rollups`` (ArchivedOrderRollup rows), summed. ``period`` and
+    ``archived_period`` group each, e.g. TruncMonth("created_at") and
+    TruncMonth("date").
+    """
+    # Aliased, as names like order_count are also rollup columns
+    archived = (
+        rollups
+        .annotate(period=archived_period)
+        .values("period")
+        .annotate(**{
+            f"archived_{name}": aggregate
+            for name, aggregate in rollup_aggregates(aggregates).items()
+        })
+        .order_by("period")
+    )
+    return add_archived_rows(
+        orders
+        .annotate(period=period)
+        .values("period")
+        .annotate(**aggregates)
+        .order_by("period"),
+        [
+            {"period": row["period"]}
+            | {name: row[f"archived_{name}"] for name in aggregates}
+            for row in archived
+        ],
+        key="period",
+    )
+
+
+def archived_product_rows(rollups, **aggregates):
+    """
+    Per-product ``aggregates`` of ArchivedProductRollup rows, keyed like
+    OrderProduct rows grouped by ``product__product__id`` and ``__name``.
+    """
+    return [
+        {
+            "product__product__id": row.pop("product_id"),
+            "product__product__name": row.pop("product_name"),
+            **row,
+        }
+        for row in rollups.values("product_id", "product_name").annotate(
+            **aggregates
+        )
+    ]
+
+
+class SalesStatisticsView(ConditionalGetMixin, generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
 
-    def get_stats_for_queryset(self, queryset, today, is_filtered=False):
+    def add_archived(self, stats, daily_stats, archived, is_filtered):
+        """Add archived orders' rollup totals to the stats of the hot rows."""
+        for order_status, (orders, amount) in archived.items():
+            if order_status in EXCLUDED_STATUSES:
+                stats["cancelled_orders_count"] += orders
+                stats["all_time_cancelled_sales"] += amount
+            else:
+                stats["all_time_orders"] += orders
+                stats["all_time_sales"] += amount
+                if is_filtered:
+                    daily_stats["total_orders"] += orders
+                    daily_stats["total_sales"] = (
+                        daily_stats["total_sales"] or 0
+                    ) + amount
+            # e.g. "Returned By Dash" -> returned_by_dash_count/_amount
+            key = order_status.lower().replace(" ", "_")
+            if f"{key}_count" in stats:
+                stats[f"{key}_count"] += orders
+            if f"{key}_amount" in stats:
+                stats[f"{key}_amount"] += amount
+
+    def get_stats_for_queryset(self, queryset, today, is_filtered=False, archived=None):
         """Helper method to get statistics for a queryset"""
         # Define excluded statuses
         excluded_statuses = EXCLUDED_STATUSES
@@ -202,6 +317,8 @@ class SalesStatisticsView(generics.GenericAPIView):
                 "total_amount", filter=Q(order_status="Return Pending"), default=0
             ),
         )
+        if archived:
+            self.add_archived(all_time_stats, daily_stats, archived, is_filtered)
 
         return {
             "date": today,
@@ -243,31 +360,13 @@ class SalesStatisticsView(generics.GenericAPIView):
             },
         }
 
-    def get(self, request):
-        franchise = self.request.query_params.get("franchise")
-        distributor = self.request.query_params.get("distributor")
-        user = self.request.user
+    @cached_property
+    def scope(self):
+        """``(filters, today, is_filtered)`` of the orders being summarised."""
         today = timezone.now().date()
-
-        if user.role == "SuperAdmin":
-            if franchise:
-                queryset = Order.objects.filter(franchise=franchise)
-            elif distributor:
-                queryset = Order.objects.filter(distributor=distributor)
-            else:
-                queryset = Order.objects.filter(factory=user.factory)
-        elif user.role == "Distributor":
-            franchises = Franchise.objects.filter(distributor=user.distributor)
-            queryset = Order.objects.filter(franchise__in=franchises)
-        elif user.role in ["Franchise", "Packaging"]:
-            queryset = Order.objects.filter(franchise=user.franchise)
-        elif user.role == "SalesPerson":
-            queryset = Order.objects.filter(sales_person=user)
-        else:
-            return Response(
-                {"detail": "You don't have permission to view statistics"},
-                status=status.HTTP_403_FORBIDDEN,
-            )
+        filters = order_scope(self.request)
+        if filters is None:
+            raise PermissionDenied("You don't have permission to view statistics")
 
         start_date = self.request.query_params.get("start_date")
         end_date = self.request.query_params.get("end_date")
@@ -278,34 +377,39 @@ class SalesStatisticsView(generics.GenericAPIView):
                 start_date_obj = datetime.strptime(start_date, "%Y-%m-%d").date()
                 if end_date:
                     end_date_obj = datetime.strptime(end_date, "%Y-%m-%d").date()
-                    queryset = queryset.filter(
-                        date__gte=start_date_obj, date__lte=end_date_obj
-                    )
+                    filters.update(date__gte=start_date_obj, date__lte=end_date_obj)
                     today = end_date_obj
                     is_filtered = True
                 else:
-                    queryset = queryset.filter(date=start_date_obj)
+                    filters["date"] = start_date_obj
                     today = start_date_obj
                     is_filtered = True
             except ValueError:
-                return Response(
-                    {"detail": "Invalid date format. Use YYYY-MM-DD"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
+                raise ParseError("Invalid date format. Use YYYY-MM-DD")
         elif end_date:
             try:
                 end_date_obj = datetime.strptime(end_date, "%Y-%m-%d").date()
-                queryset = queryset.filter(date__lte=end_date_obj)
+                filters["date__lte"] = end_date_obj
                 today = end_date_obj
                 is_filtered = True
             except ValueError:
-                return Response(
-                    {"detail": "Invalid date format. Use YYYY-MM-DD"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
+                raise ParseError("Invalid date format. Use YYYY-MM-DD")
+        return filters, today, is_filtered
 
+    def get_change_markers(self):
+        # Archiving deletes hot orders, so it changes the order count too
+        return order_change_markers(Order.objects.filter(**self.scope[0]))
+
+    def get(self, request):
+        filters, today, is_filtered = self.scope
         return Response(
-            self.get_stats_for_queryset(queryset, today, is_filtered=is_filtered)
+            self.get_stats_for_queryset(
+                Order.objects.filter(**filters),
+                today,
+                is_filtered=is_filtered,
+                # Orders moved to the archive are counted from their rollups
+                archived=archived_totals(**filters),
+            )
         )
 
 
@@ -380,9 +484,8 @@ class TopSalespersonView(generics.ListAPIView):
                 orders_filter["orders__date__month"] = current_date.month
 
         # Create base queryset with time filters
-        salespersons = (
-            salespersons
-            .annotate(
+        salespersons = list(
+            salespersons.annotate(
                 sales_count=Count(
                     "orders",
                     filter=models.Q(**orders_filter)
@@ -394,10 +497,38 @@ class TopSalespersonView(generics.ListAPIView):
                     & ~models.Q(orders__order_status__in=excluded_statuses),
                 ),
             )
-            .filter(sales_count__gt=0, total_sales__gt=0)
-            .order_by("-sales_count", "-total_sales")
         )
 
+        # Orders moved to the archive are counted from their rollups
+        self.archived_filters = {
+            **rollup_filters(orders_filter, prefix="orders__"),
+            "sales_person_id__in": [salesperson.id for salesperson in salespersons],
+        }
+        archived = {}
+        if salespersons:
+            archived = {
+                row["sales_person_id"]: row
+                for row in ArchivedOrderRollup.objects
+                .filter(**self.archived_filters)
+                .exclude(order_status__in=excluded_statuses)
+                .values("sales_person_id")
+                .annotate(orders=Sum("order_count"), amount=Sum("total_amount"))
+            }
+        for salesperson in salespersons:
+            if salesperson.id in archived:
+                row = archived[salesperson.id]
+                salesperson.sales_count += row["orders"]
+                salesperson.total_sales = (salesperson.total_sales or 0) + row["amount"]
+
+        salespersons = [
+            salesperson
+            for salesperson in salespersons
+            if salesperson.sales_count > 0 and (salesperson.total_sales or 0) > 0
+        ]
+        salespersons.sort(
+            key=lambda salesperson: (salesperson.sales_count, salesperson.total_sales),
+            reverse=True,
+        )
         return salespersons
 
     def list(self, request, *args, **kwargs):
@@ -413,6 +544,21 @@ class TopSalespersonView(generics.ListAPIView):
         # Define excluded statuses
         excluded_statuses = EXCLUDED_STATUSES
 
+        archived_products = defaultdict(list)
+        if queryset:
+            for row in (
+                ArchivedProductRollup.objects
+                .filter(**self.archived_filters)
+                .exclude(order_status__in=excluded_statuses)
+                .values("sales_person_id", "product_id", "product_name")
+                .annotate(total_quantity=Sum("quantity"))
+            ):
+                archived_products[row["sales_person_id"]].append({
+                    "product__product__id": row["product_id"],
+                    "product__product__name": row["product_name"],
+                    "total_quantity": row["total_quantity"],
+                })
+
         for index, item in enumerate(data):
             salesperson = queryset[index]
 
@@ -459,13 +605,15 @@ class TopSalespersonView(generics.ListAPIView):
                     date__year=current_date.year, date__month=current_date.month
                 )
 
-            product_sales = (
+            product_sales = add_archived_rows(
                 OrderProduct.objects
                 .filter(order__in=orders_query)
                 .values("product__product__id", "product__product__name")
-                .annotate(total_quantity=Sum("quantity"))
-                .order_by("-total_quantity")
+                .annotate(total_quantity=Sum("quantity")),
+                archived_products[salesperson.id],
+                key="product__product__id",
             )
+            product_sales.sort(key=lambda p: p["total_quantity"], reverse=True)
 
             item["sales_count"] = queryset[index].sales_count
             item["total_sales"] = float(queryset[index].total_sales)
@@ -486,8 +634,6 @@ class RevenueView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        franchise = self.request.query_params.get("franchise")
-        distributor = self.request.query_params.get("distributor")
         user = self.request.user
         filter_type = request.GET.get("filter", "monthly")  # Default to monthly
         today = timezone.now().date()
@@ -497,75 +643,43 @@ class RevenueView(generics.ListAPIView):
 
         try:
             # Base queryset based on user role
-            if user.role == "SuperAdmin":
-                if franchise:
-                    base_queryset = Order.objects.filter(franchise=franchise)
-                elif distributor:
-                    base_queryset = Order.objects.filter(distributor=distributor)
-                else:
-                    base_queryset = Order.objects.filter(factory=user.factory)
-            elif user.role == "Distributor":
-                franchises = Franchise.objects.filter(distributor=user.distributor)
-                base_queryset = Order.objects.filter(franchise__in=franchises)
-            elif user.role in ["Franchise", "Packaging"]:
-                base_queryset = Order.objects.filter(franchise=user.franchise)
-            elif user.role == "SalesPerson":
-                base_queryset = Order.objects.filter(sales_person=user)
-            else:
+            filters = order_scope(request)
+            if filters is None:
                 return Response(
                     {"error": "Unauthorized access"}, status=status.HTTP_403_FORBIDDEN
                 )
-            base_queryset = base_queryset.exclude(order_status__in=excluded_statuses)
 
             if filter_type == "daily":
-                revenue = (
-                    base_queryset
-                    .filter(created_at__year=today.year, created_at__month=today.month)
-                    .values("date")
-                    .annotate(
-                        period=models.F("date"),
-                        total_revenue=Sum("total_amount", default=0),
-                        order_count=Count("id"),
-                    )
-                    .order_by("date")
-                )
-
+                period_filter = {
+                    "created_at__year": today.year,
+                    "created_at__month": today.month,
+                }
+                period, archived_period = models.F("date"), models.F("date")
             elif filter_type == "weekly":
-                revenue = (
-                    base_queryset
-                    .filter(created_at__year=today.year)
-                    .annotate(period=TruncWeek("created_at"))
-                    .values("period")
-                    .annotate(
-                        total_revenue=Sum("total_amount", default=0),
-                        order_count=Count("id"),
-                    )
-                    .order_by("period")
-                )
-
+                period_filter = {"created_at__year": today.year}
+                period, archived_period = TruncWeek("created_at"), TruncWeek("date")
             elif filter_type == "yearly":
-                revenue = (
-                    base_queryset
-                    .annotate(period=TruncYear("created_at"))
-                    .values("period")
-                    .annotate(
-                        total_revenue=Sum("total_amount", default=0),
-                        order_count=Count("id"),
-                    )
-                    .order_by("period")
-                )
-
+                period_filter = {}
+                period, archived_period = TruncYear("created_at"), TruncYear("date")
             else:  # Default is monthly
-                revenue = (
-                    base_queryset
-                    .annotate(period=TruncMonth("created_at"))
-                    .values("period")
-                    .annotate(
-                        total_revenue=Sum("total_amount", default=0),
-                        order_count=Count("id"),
-                    )
-                    .order_by("period")
-                )
+                period_filter = {}
+                period, archived_period = TruncMonth("created_at"), TruncMonth("date")
+
+            # Orders moved to the archive are counted from their rollups
+            revenue = period_rows(
+                Order.objects
+                .filter(**filters, **period_filter)
+                .exclude(order_status__in=excluded_statuses),
+                ArchivedOrderRollup.objects
+                .filter(**filters, **rollup_filters(period_filter))
+                .exclude(order_status__in=excluded_statuses),
+                period,
+                archived_period,
+                {
+                    "total_revenue": Sum("total_amount", default=0),
+                    "order_count": Count("id"),
+                },
+            )
 
             # Format the response data
             response_data = [
@@ -602,9 +716,6 @@ class RevenueWithCancelledView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        franchise = self.request.query_params.get("franchise")
-        distributor = self.request.query_params.get("distributor")
-        user = self.request.user
         filter_type = request.GET.get("filter", "daily")  # Default to daily
         specific_date = request.query_params.get("start_date")
         end_date = request.query_params.get("end_date")
@@ -615,21 +726,8 @@ class RevenueWithCancelledView(generics.ListAPIView):
 
         try:
             # Base queryset based on user role
-            if user.role == "SuperAdmin":
-                if franchise:
-                    base_queryset = Order.objects.filter(franchise=franchise)
-                elif distributor:
-                    base_queryset = Order.objects.filter(distributor=distributor)
-                else:
-                    base_queryset = Order.objects.filter(factory=user.factory)
-            elif user.role == "Distributor":
-                franchises = Franchise.objects.filter(distributor=user.distributor)
-                base_queryset = Order.objects.filter(franchise__in=franchises)
-            elif user.role in ["Franchise", "Packaging"]:
-                base_queryset = Order.objects.filter(franchise=user.franchise)
-            elif user.role == "SalesPerson":
-                base_queryset = Order.objects.filter(sales_person=user)
-            else:
+            filters = order_scope(request)
+            if filters is None:
                 return Response(
                     {"error": "Unauthorized access"}, status=status.HTTP_403_FORBIDDEN
                 )
@@ -676,19 +774,14 @@ class RevenueWithCancelledView(generics.ListAPIView):
             }
 
             # Handle date filtering
+            period = archived_period = models.F("date")
             if specific_date and not end_date:
                 try:
                     # Convert string to date object
                     specific_date_obj = datetime.strptime(
                         specific_date, "%Y-%m-%d"
                     ).date()
-                    base_queryset = base_queryset.filter(date=specific_date_obj)
-                    revenue = (
-                        base_queryset
-                        .values("date")
-                        .annotate(period=models.F("date"), **annotation_fields)
-                        .order_by("date")
-                    )
+                    filters["date"] = specific_date_obj
                 except ValueError:
                     return Response(
                         {"error": "Invalid date format. Use YYYY-MM-DD"},
@@ -701,55 +794,33 @@ class RevenueWithCancelledView(generics.ListAPIView):
                         specific_date, "%Y-%m-%d"
                     ).date()
                     end_date_obj = datetime.strptime(end_date, "%Y-%m-%d").date()
-                    base_queryset = base_queryset.filter(
-                        date__gte=specific_date_obj, date__lte=end_date_obj
-                    )
-                    revenue = (
-                        base_queryset
-                        .values("date")
-                        .annotate(period=models.F("date"), **annotation_fields)
-                        .order_by("date")
-                    )
+                    filters.update(date__gte=specific_date_obj, date__lte=end_date_obj)
                 except ValueError:
                     return Response(
                         {"error": "Invalid date format. Use YYYY-MM-DD"},
                         status=status.HTTP_400_BAD_REQUEST,
                     )
+            # Handle filter types
+            elif filter_type == "daily":
+                filters.update(date__year=today.year, date__month=today.month)
+            elif filter_type == "weekly":
+                filters["date__year"] = today.year
+                period = archived_period = TruncWeek("date")
+            elif filter_type == "monthly":
+                period = archived_period = TruncMonth("date")
+            elif filter_type == "yearly":
+                period = archived_period = TruncYear("date")
             else:
-                # Handle filter types
-                if filter_type == "daily":
-                    revenue = (
-                        base_queryset
-                        .filter(date__year=today.year, date__month=today.month)
-                        .values("date")
-                        .annotate(period=models.F("date"), **annotation_fields)
-                        .order_by("date")
-                    )
-                elif filter_type == "weekly":
-                    revenue = (
-                        base_queryset
-                        .filter(date__year=today.year)
-                        .annotate(period=TruncWeek("date"))
-                        .values("period")
-                        .annotate(**annotation_fields)
-                        .order_by("period")
-                    )
-                elif filter_type == "monthly":
-                    revenue = (
-                        base_queryset
-                        .annotate(period=TruncMonth("date"))
-                        .values("period")
-                        .annotate(**annotation_fields)
-                        .order_by("period")
-                    )
-                elif filter_type == "yearly":
-                    revenue = (
-                        base_queryset
-                        .annotate(period=TruncYear("date"))
-                        .values("period")
-                        .annotate(**annotation_fields)
-                        .order_by("period")
-                    )
+                raise ValueError(f"Unknown filter '{filter_type}'")
+
+            # Orders moved to the archive are counted from their rollups
+            revenue = period_rows(
+                Order.objects.filter(**filters),
+                ArchivedOrderRollup.objects.filter(**filters),
+                period,
+                archived_period,
+                annotation_fields,
+            )
 
             # Format response data with detailed status counts
             response_data = [
@@ -797,9 +868,6 @@ class TopProductsView(generics.ListAPIView):
 
     def get(self, request, *args, **kwargs):
         try:
-            franchise = self.request.query_params.get("franchise")
-            distributor = self.request.query_params.get("distributor")
-            user = self.request.user
             filter_type = request.GET.get("filter")
             current_date = timezone.now()
 
@@ -807,39 +875,8 @@ class TopProductsView(generics.ListAPIView):
             excluded_statuses = EXCLUDED_STATUSES
 
             # Base query for order products based on user role
-            if user.role == "SuperAdmin":
-                if franchise:
-                    base_query = OrderProduct.objects.filter(
-                        order__franchise=franchise,
-                        order__order_status__in=ACTIVE_ORDER_STATUSES,
-                    ).exclude(order__order_status__in=excluded_statuses)
-                elif distributor:
-                    base_query = OrderProduct.objects.filter(
-                        order__distributor=distributor,
-                        order__order_status__in=ACTIVE_ORDER_STATUSES,
-                    ).exclude(order__order_status__in=excluded_statuses)
-                else:
-                    base_query = OrderProduct.objects.filter(
-                        order__factory=user.factory,
-                        order__order_status__in=ACTIVE_ORDER_STATUSES,
-                    ).exclude(order__order_status__in=excluded_statuses)
-            elif user.role == "Distributor":
-                franchises = Franchise.objects.filter(distributor=user.distributor)
-                base_query = OrderProduct.objects.filter(
-                    order__franchise__in=franchises,
-                    order__order_status__in=ACTIVE_ORDER_STATUSES,
-                ).exclude(order__order_status__in=excluded_statuses)
-            elif user.role in ["Franchise", "Packaging"]:
-                base_query = OrderProduct.objects.filter(
-                    order__franchise=user.franchise,
-                    order__order_status__in=ACTIVE_ORDER_STATUSES,
-                ).exclude(order__order_status__in=excluded_statuses)
-            elif user.role == "SalesPerson":
-                base_query = OrderProduct.objects.filter(
-                    order__sales_person=user,
-                    order__order_status__in=ACTIVE_ORDER_STATUSES,
-                ).exclude(order__order_status__in=excluded_statuses)
-            else:
+            filters = order_scope(request)
+            if filters is None:
                 return Response(
                     {"error": "Unauthorized access"}, status=status.HTTP_403_FORBIDDEN
                 )
@@ -849,14 +886,19 @@ class TopProductsView(generics.ListAPIView):
                 if filter_type == "weekly":
                     # Filter for the last 7 days
                     start_date = current_date - timezone.timedelta(days=7)
-                    base_query = base_query.filter(order__created_at__gte=start_date)
+                    filters["created_at__gte"] = start_date
                 elif filter_type == "monthly":
                     # Filter for current month only
-                    base_query = base_query.filter(
-                        order__created_at__year=current_date.year,
-                        order__created_at__month=current_date.month,
+                    filters.update(
+                        created_at__year=current_date.year,
+                        created_at__month=current_date.month,
                     )
 
+            base_query = OrderProduct.objects.filter(
+                **{f"order__{lookup}": value for lookup, value in filters.items()},
+                order__order_status__in=ACTIVE_ORDER_STATUSES,
+            ).exclude(order__order_status__in=excluded_statuses)
+
             # Get top products with aggregated data
             top_products = (
                 base_query
@@ -877,6 +919,22 @@ class TopProductsView(generics.ListAPIView):
                 )
                 .order_by("-total_quantity")  # Get top 5 by quantity
             )
+            # Products of archived orders
+            archived_products = archived_product_rows(
+                ArchivedProductRollup.objects.filter(
+                    **rollup_filters(filters),
+                    order_status__in=ACTIVE_ORDER_STATUSES,
+                ).exclude(order_status__in=excluded_statuses),
+                total_quantity=Sum("quantity"),
+                total_amount=Sum("revenue"),
+            )
+            top_products = sorted(
+                add_archived_rows(
+                    top_products, archived_products, key="product__product__id"
+                ),
+                key=lambda item: item["total_quantity"],
+                reverse=True,
+            )
 
             # Calculate total revenue
             total_revenue = sum(item["total_amount"] for item in top_products)
@@ -918,8 +976,6 @@ class DashboardStatsView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        franchise = request.GET.get("franchise")
-        distributor = request.GET.get("distributor")
         user = self.request.user
         current_date = timezone.now()
         last_month = current_date - timezone.timedelta(days=30)
@@ -928,13 +984,14 @@ class DashboardStatsView(generics.GenericAPIView):
         excluded_statuses = EXCLUDED_STATUSES
 
         # Base queryset filters based on user role
+        filters = order_scope(request, sales_person_scope="franchise")
+        if filters is None:
+            return Response({"error": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
+        orders = Order.objects.filter(**filters)
+        # Archived orders are counted per order date
+        rollups = ArchivedOrderRollup.objects.filter(**filters)
+
         if user.role == "SuperAdmin":
-            if franchise:
-                orders = Order.objects.filter(franchise=franchise)
-            elif distributor:
-                orders = Order.objects.filter(distributor=distributor)
-            else:
-                orders = Order.objects.filter(factory=user.factory)
             # For SuperAdmin: all orders, all distributors/franchises as customers, all products
             customers = CustomUser.objects.filter(
                 role__in=["Distributor", "Franchise", "SalesPerson"], is_active=True
@@ -949,7 +1006,6 @@ class DashboardStatsView(generics.GenericAPIView):
         elif user.role == "Distributor":
             # For Distributor: orders from their franchises, their franchises as customers
             franchises = Franchise.objects.filter(distributor=user.distributor)
-            orders = Order.objects.filter(franchise__in=franchises)
             customers = CustomUser.objects.filter(
                 franchise__in=franchises, is_active=True
             )
@@ -962,7 +1018,6 @@ class DashboardStatsView(generics.GenericAPIView):
 
         elif user.role in ["Franchise", "SalesPerson", "Packaging"]:
             # For Franchise/SalesPerson: their orders, their sales persons as customers
-            orders = Order.objects.filter(franchise=user.franchise)
             customers = CustomUser.objects.filter(
                 franchise=user.franchise,
                 role__in=["SalesPerson", "Franchise"],
@@ -974,8 +1029,6 @@ class DashboardStatsView(generics.GenericAPIView):
                 .values("product")
                 .distinct()
             )
-        else:
-            return Response({"error": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
 
         # Calculate current period stats
         current_revenue = (
@@ -987,14 +1040,21 @@ class DashboardStatsView(generics.GenericAPIView):
             .exclude(order_status__in=excluded_statuses)
             .aggregate(total=Sum("total_amount"))["total"]
             or 0
-        )
+        ) + rollups.filter(
+            date__gte=timezone.localdate(last_month),
+            order_status__in=ACTIVE_ORDER_STATUSES,
+        ).exclude(order_status__in=excluded_statuses).aggregate(
+            total=Sum("total_amount", default=0)
+        )["total"]
 
         current_orders = (
             orders
             .filter(created_at__gte=last_month)
             .exclude(order_status__in=excluded_statuses)
             .count()
-        )
+        ) + rollups.filter(date__gte=timezone.localdate(last_month)).exclude(
+            order_status__in=excluded_statuses
+        ).aggregate(total=Sum("order_count", default=0))["total"]
         current_customers = customers.filter(date_joined__gte=last_month).count()
         current_products = products.count()
 
@@ -1011,6 +1071,14 @@ class DashboardStatsView(generics.GenericAPIView):
             .aggregate(total=Sum("total_amount"))["total"]
             or 0
         )
+        previous_rollups = rollups.filter(
+            date__gte=timezone.localdate(previous_month),
+            date__lt=timezone.localdate(last_month),
+            order_status__in=ACTIVE_ORDER_STATUSES,
+        ).exclude(order_status__in=excluded_statuses)
+        previous_revenue += previous_rollups.aggregate(
+            total=Sum("total_amount", default=0)
+        )["total"]
 
         previous_orders = (
             orders
@@ -1021,7 +1089,7 @@ class DashboardStatsView(generics.GenericAPIView):
             )
             .exclude(order_status__in=excluded_statuses)
             .count()
-        )
+        ) + previous_rollups.aggregate(total=Sum("order_count", default=0))["total"]
 
         previous_customers = customers.filter(
             date_joined__gte=previous_month, date_joined__lt=last_month
@@ -1091,26 +1159,23 @@ class RevenueByProductView(generics.GenericAPIView):
         excluded_statuses = EXCLUDED_STATUSES
 
         # Filter orders based on user role
+        active_only = True
         if user.role == "SuperAdmin":
             if franchise:
-                orders = Order.objects.filter(franchise=franchise)
+                filters = {"franchise_id": franchise}
+                active_only = False
             elif distributor:
-                orders = Order.objects.filter(distributor=distributor)
+                filters = {"distributor_id": distributor}
+                active_only = False
             else:
-                orders = Order.objects.filter(
-                    order_status__in=ACTIVE_ORDER_STATUSES
-                ).exclude(order_status__in=excluded_statuses)
+                filters = {}
         elif user.role == "Distributor":
             franchises = Franchise.objects.filter(distributor=user.distributor)
-            orders = Order.objects.filter(
-                franchise__in=franchises,
-                order_status__in=ACTIVE_ORDER_STATUSES,
-            ).exclude(order_status__in=excluded_statuses)
+            filters = {
+                "franchise_id__in": list(franchises.values_list("id", flat=True))
+            }
         elif user.role in ["Franchise", "SalesPerson", "Packaging"]:
-            orders = Order.objects.filter(
-                franchise=user.franchise,
-                order_status__in=ACTIVE_ORDER_STATUSES,
-            ).exclude(order_status__in=excluded_statuses)
+            filters = {"franchise_id": user.franchise_id}
         else:
             return Response({"error": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
 
@@ -1119,14 +1184,24 @@ class RevenueByProductView(generics.GenericAPIView):
             if filter_type == "weekly":
                 # Filter for the last 7 days
                 start_date = current_date - timezone.timedelta(days=7)
-                orders = orders.filter(created_at__gte=start_date)
+                filters["created_at__gte"] = start_date
             elif filter_type == "monthly":
                 # Filter for current month only
-                orders = orders.filter(
+                filters.update(
                     created_at__year=current_date.year,
                     created_at__month=current_date.month,
                 )
 
+        orders = Order.objects.filter(**filters)
+        rollups = ArchivedProductRollup.objects.filter(**rollup_filters(filters))
+        if active_only:
+            orders = orders.filter(order_status__in=ACTIVE_ORDER_STATUSES).exclude(
+                order_status__in=excluded_statuses
+            )
+            rollups = rollups.filter(order_status__in=ACTIVE_ORDER_STATUSES).exclude(
+                order_status__in=excluded_statuses
+            )
+
         # Get all order products and calculate revenue per product
         product_revenue = (
             OrderProduct.objects
@@ -1147,6 +1222,12 @@ class RevenueByProductView(generics.GenericAPIView):
             )
             .order_by("-total_revenue")
         )
+        # Products of archived orders
+        product_revenue = add_archived_rows(
+            product_revenue,
+            archived_product_rows(rollups, total_revenue=Sum("revenue")),
+            key="product__product__id",
+        )
 
         # Calculate total revenue
         total_revenue = sum(item["total_revenue"] for item in product_revenue)
@@ -1201,14 +1282,14 @@ class SalesPersonStatisticsView(APIView):
             specific_date = request.query_params.get("date")
             end_date = request.query_params.get("end_date")
 
-            # Base queryset for orders
-            orders = Order.objects.filter(sales_person=salesperson)
+            # Order filters
+            filters = {}
 
             # Apply specific date filter if provided
             if specific_date and not end_date:
                 try:
                     specific_date = datetime.strptime(specific_date, "%Y-%m-%d").date()
-                    orders = orders.filter(created_at__date=specific_date)
+                    filters["created_at__date"] = specific_date
                 except ValueError:
                     return Response(
                         {"error": "Invalid date format. Use YYYY-MM-DD"},
@@ -1218,7 +1299,7 @@ class SalesPersonStatisticsView(APIView):
                 try:
                     specific_date = datetime.strptime(specific_date, "%Y-%m-%d").date()
                     end_date = datetime.strptime(end_date, "%Y-%m-%d").date()
-                    orders = orders.filter(
+                    filters.update(
                         created_at__date__gte=specific_date,
                         created_at__date__lte=end_date,
                     )
@@ -1229,45 +1310,68 @@ class SalesPersonStatisticsView(APIView):
                     )
             # Apply time filter if no specific date is provided
             elif filter_type == "daily":
-                orders = orders.filter(created_at__date=timezone.now().date())
+                filters["created_at__date"] = timezone.now().date()
             elif filter_type == "weekly":
-                orders = orders.filter(
-                    created_at__gte=timezone.now() - timezone.timedelta(days=7)
-                )
+                filters["created_at__gte"] = timezone.now() - timezone.timedelta(days=7)
             elif filter_type == "monthly":
-                orders = orders.filter(
-                    created_at__gte=timezone.now() - timezone.timedelta(days=30)
+                filters["created_at__gte"] = timezone.now() - timezone.timedelta(
+                    days=30
                 )
 
+            orders = Order.objects.filter(sales_person=salesperson, **filters)
+            # Archived orders of the salesperson, by order date
+            archived_filters = {
+                "sales_person_id": salesperson.id,
+                **rollup_filters(filters),
+            }
+            cancelled = Q(order_status__in=excluded_statuses)
+            archived = ArchivedOrderRollup.objects.filter(
+                **archived_filters
+            ).aggregate(
+                orders=Sum("order_count", filter=~cancelled, default=0),
+                cancelled_orders=Sum("order_count", filter=cancelled, default=0),
+                amount=Sum("total_amount", filter=~cancelled, default=0),
+                cancelled_amount=Sum("total_amount", filter=cancelled, default=0),
+                delivery=Sum("delivery_charge", filter=~cancelled, default=0),
+                cancelled_delivery=Sum(
+                    "delivery_charge", filter=cancelled, default=0
+                ),
+            )
+            product_rollups = ArchivedProductRollup.objects.filter(**archived_filters)
+
             # Calculate total orders and amount
-            total_orders = orders.exclude(order_status__in=excluded_statuses).count()
-            total_cancelled_orders = orders.filter(
-                order_status__in=excluded_statuses
-            ).count()
+            total_orders = (
+                orders.exclude(order_status__in=excluded_statuses).count()
+                + archived["orders"]
+            )
+            total_cancelled_orders = (
+                orders.filter(order_status__in=excluded_statuses).count()
+                + archived["cancelled_orders"]
+            )
             total_amount = (
                 orders.exclude(order_status__in=excluded_statuses).aggregate(
                     total=Sum("total_amount")
                 )["total"]
                 or 0
-            )
+            ) + archived["amount"]
             total_cancelled_amount = (
                 orders.filter(order_status__in=excluded_statuses).aggregate(
                     total=Sum("total_amount")
                 )["total"]
                 or 0
-            )
+            ) + archived["cancelled_amount"]
             total_delivery_charge = (
                 orders.exclude(order_status__in=excluded_statuses).aggregate(
                     total=Sum("delivery_charge")
                 )["total"]
                 or 0
-            )
+            ) + archived["delivery"]
             total_cancelled_delivery_charge = (
                 orders.filter(order_status__in=excluded_statuses).aggregate(
                     total=Sum("delivery_charge")
                 )["total"]
                 or 0
-            )
+            ) + archived["cancelled_delivery"]
 
             # Get product-wise sales data
             product_sales = (
@@ -1277,6 +1381,18 @@ class SalesPersonStatisticsView(APIView):
                 .annotate(quantity_sold=Sum("quantity"))
                 .order_by("-quantity_sold")
             )
+            product_sales = sorted(
+                add_archived_rows(
+                    product_sales,
+                    archived_product_rows(
+                        product_rollups.exclude(order_status__in=excluded_statuses),
+                        quantity_sold=Sum("quantity"),
+                    ),
+                    key="product__product__id",
+                ),
+                key=lambda p: p["quantity_sold"],
+                reverse=True,
+            )
 
             # Get product-wise sales data for cancelled orders
             cancelled_product_sales = (
@@ -1286,6 +1402,18 @@ class SalesPersonStatisticsView(APIView):
                 .annotate(quantity_sold=Sum("quantity"))
                 .order_by("-quantity_sold")
             )
+            cancelled_product_sales = sorted(
+                add_archived_rows(
+                    cancelled_product_sales,
+                    archived_product_rows(
+                        product_rollups.filter(order_status__in=excluded_statuses),
+                        quantity_sold=Sum("quantity"),
+                    ),
+                    key="product__product__id",
+                ),
+                key=lambda p: p["quantity_sold"],
+                reverse=True,
+            )
 
             # Prepare response data
             data = {
@@ -1345,6 +1473,7 @@ class SalesPersonRevenueView(generics.GenericAPIView):
 
             # Base queryset for the specific salesperson
             base_queryset = Order.objects.filter(sales_person=salesperson)
+            rollups = ArchivedOrderRollup.objects.filter(sales_person_id=salesperson.id)
 
             # Common annotation fields with status-specific counts
             annotation_fields = {
@@ -1403,14 +1532,13 @@ class SalesPersonRevenueView(generics.GenericAPIView):
                     else:
                         date_filter = {"created_at__date": specific_date}
 
-                    revenue = (
-                        base_queryset
-                        .filter(**date_filter)
-                        .values("created_at__date")
-                        .annotate(
-                            period=models.F("created_at__date"), **annotation_fields
-                        )
-                        .order_by("created_at__date")
+                    # Archived orders are grouped by their order date
+                    revenue = period_rows(
+                        base_queryset.filter(**date_filter),
+                        rollups.filter(**rollup_filters(date_filter)),
+                        models.F("created_at__date"),
+                        models.F("date"),
+                        annotation_fields,
                     )
                 except ValueError:
                     return Response(
@@ -1419,41 +1547,30 @@ class SalesPersonRevenueView(generics.GenericAPIView):
                     )
             else:
                 # Handle filter types
+                date_filter = {}
                 if filter_type == "daily":
-                    revenue = (
-                        base_queryset
-                        .filter(
-                            created_at__year=today.year, created_at__month=today.month
-                        )
-                        .values("date")
-                        .annotate(period=models.F("date"), **annotation_fields)
-                        .order_by("date")
-                    )
+                    date_filter = {
+                        "created_at__year": today.year,
+                        "created_at__month": today.month,
+                    }
+                    period, archived_period = models.F("date"), models.F("date")
                 elif filter_type == "weekly":
-                    revenue = (
-                        base_queryset
-                        .filter(created_at__year=today.year)
-                        .annotate(period=TruncWeek("created_at"))
-                        .values("period")
-                        .annotate(**annotation_fields)
-                        .order_by("period")
-                    )
+                    date_filter = {"created_at__year": today.year}
+                    period, archived_period = TruncWeek("created_at"), TruncWeek("date")
                 elif filter_type == "monthly":
-                    revenue = (
-                        base_queryset
-                        .annotate(period=TruncMonth("created_at"))
-                        .values("period")
-                        .annotate(**annotation_fields)
-                        .order_by("period")
-                    )
+                    period = TruncMonth("created_at")
+                    archived_period = TruncMonth("date")
                 elif filter_type == "yearly":
-                    revenue = (
-                        base_queryset
-                        .annotate(period=TruncYear("created_at"))
-                        .values("period")
-                        .annotate(**annotation_fields)
-                        .order_by("period")
-                    )
+                    period, archived_period = TruncYear("created_at"), TruncYear("date")
+                else:
+                    raise ValueError(f"Unknown filter '{filter_type}'")
+                revenue = period_rows(
+                    base_queryset.filter(**date_filter),
+                    rollups.filter(**rollup_filters(date_filter)),
+                    period,
+                    archived_period,
+                    annotation_fields,
+                )
 
             # Format response data with detailed status counts
             response_data = [
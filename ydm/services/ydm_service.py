@@ -1,8 +1,12 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError
 
+from logistics.outbox import CourierHandler, PermanentDispatchError, get_concurrency
 from ydm.ydm_sdk import YDMApiError, YDMClient, YDMValidationError
 
 logger = logging.getLogger(__name__)
@@ -16,16 +20,40 @@ PAYMENT_TYPE_MAP: dict[str, str] = {
 }
 
 
-def _build_order_payload(order) -> dict:
+def _log_ydm_call(method: str, url: str, status_code, elapsed_ms: float) -> None:
+    logger.debug("YDM %s %s -> %s in %.1f ms", method, url, status_code, elapsed_ms)
+
+
+def get_ydm_client(base_url: str, api_key: str) -> YDMClient:
+    """
+    Return a YDMClient on the shared keep-alive session for ``base_url``.
+
+    Timeouts come from YDM_CONNECT_TIMEOUT / YDM_READ_TIMEOUT (seconds).
+    """
+    return YDMClient(
+        base_url=base_url,
+        api_key=api_key,
+        connect_timeout=getattr(settings, "YDM_CONNECT_TIMEOUT", 5),
+        read_timeout=getattr(settings, "YDM_READ_TIMEOUT", 30),
+        on_request=_log_ydm_call,
+    )
+
+
+def _build_order_payload(order, order_products=None) -> dict:
     """
     Build the YDM API payload from a sales Order instance.
+
+    ``order_products`` may be passed when the caller already loaded them
+    (with ``product__product``); otherwise they are queried here.
     """
+    if order_products is None:
+        order_products = order.order_products.select_related("product__product")
     products = [
         {
             "name": op.product.product.name,
             "quantity": op.quantity,
         }
-        for op in order.order_products.select_related("product__product").all()
+        for op in order_products
     ]
 
     payment_type = PAYMENT_TYPE_MAP.get(
@@ -92,7 +120,7 @@ def push_order_to_ydm(order) -> dict:
     payload = _build_order_payload(order)
     print(f"[YDM] Payload: {payload}")
 
-    client = YDMClient(base_url=base_url, api_key=ydm_config.api_key)
+    client = get_ydm_client(base_url, ydm_config.api_key)
 
     try:
         response = client.create_order(payload)
@@ -101,7 +129,7 @@ def push_order_to_ydm(order) -> dict:
         )
         if tracking_number:
             order.tracking_code = tracking_number
-            order.save(update_fields=["tracking_code"])
+            order.save(update_fields=["tracking_code", "updated_at"])
         print(f"[YDM] ✅ Success — tracking: {tracking_number}")
         logger.info(
             "Order pk=%s pushed to YDM. Tracking: %s",
@@ -118,3 +146,164 @@ def push_order_to_ydm(order) -> dict:
     except Exception as exc:
         logger.exception("Unexpected YDM error for order pk=%s: %s", order.pk, exc)
         raise ValidationError(f"Unexpected error sending order to YDM: {exc}")
+
+
+def _tracking_number(response) -> str | None:
+    return response.get("tracking_number") or response.get("tracking_code")
+
+
+def get_ydm_batch_concurrency() -> int:
+    """Worker count for push_orders_to_ydm (YDM_BATCH_CONCURRENCY, default 4)."""
+    return max(int(getattr(settings, "YDM_BATCH_CONCURRENCY", 4)), 1)
+
+
+def push_orders_to_ydm(orders, max_workers: int | None = None) -> list[dict]:
+    """
+    Push many sales Orders to YDM in one pass.
+
+    Configs and products for every order are loaded up front (one query for
+    YDMLogistics, one prefetch for order products), payloads are submitted
+    concurrently on a bounded thread pool, and every tracking code returned
+    is saved with a single ``bulk_update``.
+
+    Unlike push_order_to_ydm this never raises for a single bad order.
+    Returns one result dict per order, in input order:
+
+        {"order_id": 1, "order_code": "...", "status": "success",
+         "tracking_code": "YDM-1", "error": None, "retryable": False}
+
+    ``status`` is "success", "skipped" (franchise has no YDM config) or
+    "error". ``retryable`` marks errors that may pass on a later attempt
+    (API or network failures, not rejected payloads).
+    """
+    from sales.models import Order
+    from ydm.models import YDMLogistics
+
+    orders = list(orders)
+    results = {
+        order.pk: {
+            "order_id": order.pk,
+            "order_code": order.order_code,
+            "status": "error",
+            "tracking_code": None,
+            "error": None,
+            "retryable": False,
+        }
+        for order in orders
+    }
+    if not orders:
+        return []
+
+    base_url: str = getattr(settings, "YDM_BASE_URL", "")
+    if not base_url:
+        for result in results.values():
+            result["error"] = "YDM_BASE_URL is not configured."
+        return [results[order.pk] for order in orders]
+
+    configs = {
+        config.franchise_id: config
+        for config in YDMLogistics.objects.filter(
+            franchise_id__in={o.franchise_id for o in orders if o.franchise_id}
+        )
+    }
+    prefetch_related_objects(orders, "order_products__product__product")
+
+    jobs = []
+    for order in orders:
+        result = results[order.pk]
+        if order.franchise_id is None:
+            result["error"] = "Order has no franchise assigned."
+            continue
+        config = configs.get(order.franchise_id)
+        if config is None:
+            result["status"] = "skipped"
+            logger.info(
+                "No YDM Logistics configuration found for franchise id=%s. "
+                "Skipping YDM push of order pk=%s.",
+                order.franchise_id,
+                order.pk,
+            )
+            continue
+        payload = _build_order_payload(order, order.order_products.all())
+        jobs.append((order, config.api_key, payload))
+
+    def submit(job):
+        order, api_key, payload = job
+        return get_ydm_client(base_url, api_key).create_order(payload)
+
+    workers = min(max_workers or get_ydm_batch_concurrency(), len(jobs) or 1)
+    to_update = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ydm-batch") as pool:
+        futures = [(job[0], pool.submit(submit, job)) for job in jobs]
+        for order, future in futures:
+            result = results[order.pk]
+            try:
+                response = future.result()
+            except YDMValidationError as exc:
+                result["error"] = f"YDM rejected the order: {exc}"
+            except YDMApiError as exc:
+                result["error"] = f"YDM API error: {exc}"
+                result["retryable"] = True
+            except Exception as exc:  # noqa: BLE001
+                logger.exception("Unexpected YDM error for order pk=%s", order.pk)
+                result["error"] = f"Unexpected error sending order to YDM: {exc}"
+                result["retryable"] = True
+            else:
+                result["status"] = "success"
+                tracking_number = _tracking_number(response)
+                result["tracking_code"] = tracking_number
+                if tracking_number:
+                    order.tracking_code = tracking_number
+                    order.updated_at = timezone.now()
+                    to_update.append(order)
+            if result["error"]:
+                logger.error(
+                    "YDM batch push failed for order pk=%s: %s", order.pk, result["error"]
+                )
+
+    if to_update:
+        Order.objects.bulk_update(to_update, ["tracking_code", "updated_at"])
+    logger.info(
+        "YDM batch push: %s orders, %s succeeded",
+        len(orders),
+        sum(r["status"] == "success" for r in results.values()),
+    )
+    return [results[order.pk] for order in orders]
+
+
+def validate_ydm_push(order) -> None:
+    """
+    Cheap in-request checks run before an order is queued for YDM.
+
+    Raises rest_framework.exceptions.ValidationError so the status change is
+    rejected up front instead of being dead-lettered later by the dispatcher.
+    """
+    if not getattr(settings, "YDM_BASE_URL", ""):
+        raise ValidationError(
+            "YDM_BASE_URL is not configured. Cannot send order to YDM."
+        )
+    if order.franchise_id is None:
+        raise ValidationError("Order has no franchise assigned. Cannot send to YDM.")
+
+
+class YDMOutboxHandler(CourierHandler):
+    """
+    Delivers queued "Sent to YDM" pushes for the courier outbox, a whole
+    batch at a time through push_orders_to_ydm.
+    """
+
+    batch = True
+
+    def send_batch(self, entries):
+        results = push_orders_to_ydm(
+            [entry.order for entry in entries], max_workers=get_concurrency("YDM")
+        )
+        outcomes = {}
+        for entry, result in zip(entries, results):
+            if result["status"] != "error":
+                outcomes[entry.pk] = result
+            elif result["retryable"]:
+                outcomes[entry.pk] = RuntimeError(result["error"])
+            else:
+                outcomes[entry.pk] = PermanentDispatchError(result["error"])
+        return outcomes
@@ -1,3 +1,237 @@
-from django.test import TestCase
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from decimal import Decimal
+
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from account.models import CustomUser, Franchise
+from logistics.models import CourierOutbox, OrderChangeLog
+from logistics.outbox import dispatch_pending
+from sales.models import Inventory, Order, OrderProduct, Product
+
+from .models import YDMLogistics
+from .ydm_sdk import SessionPool, YDMApiError, YDMClient, metrics
+
+
+class ScriptedServer:
+    """
+    Local HTTP server replying with a scripted list of status codes, or with
+    ``reply(payload) -> (status, body)`` when given.
+    """
+
+    def __init__(self, statuses, reply=None):
+        self.statuses = list(statuses)
+        self.reply = reply
+        self.hits = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length)
+                server.hits.append((self.command, self.path, self.client_address[1]))
+                if server.reply is not None:
+                    code, data = server.reply(json.loads(raw or b"{}"))
+                else:
+                    code = server.statuses.pop(0) if server.statuses else 200
+                    data = {"ok": code < 400}
+                body = json.dumps(data).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = _reply
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class YDMSessionLayerTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = SessionPool()
+        metrics.reset()
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_clients_share_one_session_per_base_url(self):
+        a = YDMClient("http://ydm.example", api_key="a", session_pool=self.pool)
+        b = YDMClient("http://ydm.example/", api_key="b", session_pool=self.pool)
+        c = YDMClient("http://other.example", api_key="a", session_pool=self.pool)
+        self.assertIs(a.session, b.session)
+        self.assertIsNot(a.session, c.session)
+
+    def test_idempotent_get_is_retried(self):
+        server = ScriptedServer([503, 200])
+        try:
+            client = YDMClient(server.url, api_key="k", session_pool=self.pool)
+            self.assertEqual(client.get_order("YDM-1"), {"ok": True})
+        finally:
+            server.close()
+        self.assertEqual(len(server.hits), 2)
+
+    def test_post_is_not_retried(self):
+        server = ScriptedServer([503, 200])
+        try:
+            client = YDMClient(server.url, api_key="k", session_pool=self.pool)
+            with self.assertRaises(YDMApiError):
+                client.create_order({"recipient_name": "x"})
+        finally:
+            server.close()
+        self.assertEqual(len(server.hits), 1)
+
+    def test_connection_is_kept_alive_and_latency_recorded(self):
+        server = ScriptedServer([200, 200])
+        calls = []
+        try:
+            client = YDMClient(
+                server.url,
+                api_key="k",
+                session_pool=self.pool,
+                on_request=lambda *args: calls.append(args),
+            )
+            client.get_order("YDM-1")
+            client.get_order("YDM-2")
+        finally:
+            server.close()
+        # Both requests arrive from the same client port, i.e. one connection.
+        self.assertEqual(server.hits[0][2], server.hits[1][2])
+        self.assertEqual([call[2] for call in calls], [200, 200])
+        stats = metrics.snapshot()[("GET", "/api/orders/{id}/")]
+        self.assertEqual(stats["count"], 2)
+        self.assertEqual(stats["errors"], 0)
+
+
+class YDMBatchPushTests(APITestCase):
+    def setUp(self):
+        franchise = Franchise.objects.create(name="Batch Franchise")
+        other = Franchise.objects.create(name="No YDM Franchise")
+        YDMLogistics.objects.create(franchise=franchise, api_key="batch-key")
+        self.user = user = CustomUser.objects.create_user(
+            username="ydm_batch",
+            email="ydm_batch@example.com",
+            phone_number="9876543701",
+            password="password123",
+            role="Franchise",
+            franchise=franchise,
+        )
+        inventory = Inventory.objects.create(
+            product=Product.objects.create(name="Hair Oil"),
+            franchise=franchise,
+            quantity=100,
+        )
+        self.orders = []
+        owners = [
+            ("Good A", franchise),
+            ("Bad", franchise),
+            ("Good B", franchise),
+            ("Other", other),
+        ]
+        for index, (name, owner) in enumerate(owners):
+            order = Order.objects.create(
+                full_name=name,
+                phone_number=f"98000004{index:02d}",
+                delivery_address="Kathmandu",
+                payment_method="Cash on Delivery",
+                sales_person=user,
+                franchise=owner,
+                logistics="YDM",
+                order_status="Processing",
+                total_amount=Decimal("1500.00"),
+            )
+            OrderProduct.objects.create(
+                order=order, product=inventory, quantity=index + 1
+            )
+            self.orders.append(order)
+
+    @staticmethod
+    def _reply(payload):
+        if payload["recipient_name"] == "Bad":
+            return 400, {"recipient_phone": ["invalid"]}
+        return 201, {"tracking_number": f"YDM-{payload['external_order_code']}"}
+
+    def _assert_tracking_codes_saved(self, results):
+        for order, result in zip(self.orders, results):
+            order.refresh_from_db()
+            self.assertEqual(order.tracking_code, result.get("tracking_code"))
+        self.assertEqual(
+            self.orders[0].tracking_code, f"YDM-{self.orders[0].order_code}"
+        )
+
+    def _mark_sent_to_ydm(self, orders):
+        self.client.force_authenticate(user=self.user)
+        server = ScriptedServer([], reply=self._reply)
+        try:
+            with override_settings(YDM_BASE_URL=server.url):
+                response = self.client.post(
+                    reverse("update-order-status"),
+                    {"order_ids": [o.id for o in orders], "status": "Sent to YDM"},
+                    format="json",
+                )
+        finally:
+            server.close()
+        self.assertEqual(response.status_code, 200)
+        # The request itself never calls the courier
+        self.assertEqual(server.hits, [])
+        return response
+
+    def test_bulk_sent_to_ydm_is_pushed_by_the_dispatcher(self):
+        self._mark_sent_to_ydm(self.orders)
+        self.assertEqual(
+            CourierOutbox.objects.filter(
+                order__in=self.orders, status=CourierOutbox.STATUS_PENDING
+            ).count(),
+            len(self.orders),
+        )
+
+        server = ScriptedServer([], reply=self._reply)
+        try:
+            with override_settings(YDM_BASE_URL=server.url):
+                with CaptureQueriesContext(connection) as ctx:
+                    counts = dispatch_pending()
+        finally:
+            server.close()
+
+        self.assertEqual(counts, {"sent": 3, "pending": 0, "dead": 1})
+        entries = CourierOutbox.objects.filter(order__in=self.orders).order_by(
+            "order_id"
+        )
+        self.assertEqual(
+            [e.status for e in entries],
+            ["sent", "dead", "sent", "sent"],
+        )
+        self.assertIn("rejected", entries[1].last_error)
+        self.assertEqual(len(server.hits), 3)
+        self._assert_tracking_codes_saved([e.response or {} for e in entries])
+        # claim (5) + configs + three prefetch levels + one bulk UPDATE, then
+        # one UPDATE per outbox entry
+        self.assertLessEqual(len(ctx.captured_queries), 10 + len(self.orders))
+
+    def test_orders_sent_to_ydm_before_are_not_queued_again(self):
+        order = self.orders[0]
+        OrderChangeLog.objects.create(
+            order=order, user=self.user, old_status="Verified", new_status="Sent to YDM"
+        )
+        self._mark_sent_to_ydm([order])
+
+        order.refresh_from_db()
+        self.assertEqual(order.order_status, "Sent to YDM")
+        self.assertFalse(CourierOutbox.objects.filter(order=order).exists())
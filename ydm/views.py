@@ -1,10 +1,11 @@
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import generics, status
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from logistics.transitions import transition_orders
 from sales.models import Order
 
 from .models import YDMLogistics
@@ -173,9 +174,12 @@ class YDMWebhookAPIView(APIView):
             )
             return Response({"status": "received"}, status=status.HTTP_200_OK)
 
-        # Apply the status change
-        order.order_status = sales_new_status
-        order.save(update_fields=["order_status", "updated_at"])
+        # Apply the status change with its change log, charges and stock moves
+        try:
+            transition_orders([order], sales_new_status)
+        except ValidationError as exc:
+            print(f"[YDM Webhook] ❌ Order pk={order.pk} not updated: {exc.detail}")
+            return Response({"status": "received"}, status=status.HTTP_200_OK)
 
         print(
             f"[YDM Webhook] ✅ Order pk={order.pk} status updated: "
@@ -1,4 +1,5 @@
 from .client import YDMClient
 from .exceptions import YDMApiError, YDMValidationError
+from .session import SessionPool, metrics
 
-__all__ = ["YDMClient", "YDMApiError", "YDMValidationError"]
+__all__ = ["YDMClient", "YDMApiError", "YDMValidationError", "SessionPool", "metrics"]
@@ -1,18 +1,41 @@
 import requests
 
 from .exceptions import YDMApiError, YDMValidationError
+from .session import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    default_pool,
+    timed_request,
+)
 
 
 class BaseYDMClient:
-    """Base client containing common configuration and HTTP request logic."""
+    """
+    Base client containing common configuration and HTTP request logic.
 
-    def __init__(self, base_url: str, api_key: str = None):
+    Requests go through a keep-alive session shared by every client with the
+    same ``base_url`` (see ``session.SessionPool``). Idempotent methods are
+    retried with jittered backoff; POST/PATCH are never retried.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str = None,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        session_pool=None,
+        on_request=None,
+    ):
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
         self.headers = {}
         if self.api_key:
             self.headers["X-API-KEY"] = self.api_key
         self.headers["Accept"] = "application/json"
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = (session_pool or default_pool).get(self.base_url)
+        self.on_request = on_request
 
     def _get_url(self, path: str) -> str:
         return f"{self.base_url}/api/{path.lstrip('/')}"
@@ -20,9 +43,17 @@ class BaseYDMClient:
     def _request(self, method: str, url: str, **kwargs) -> requests.Response:
         headers = kwargs.pop("headers", {})
         merged_headers = {**self.headers, **headers}
+        kwargs.setdefault("timeout", self.timeout)
 
         try:
-            response = requests.request(method, url, headers=merged_headers, **kwargs)
+            response = timed_request(
+                self.session,
+                method,
+                url,
+                hook=self.on_request,
+                headers=merged_headers,
+                **kwargs,
+            )
             if response.status_code >= 400:
                 try:
                     err_detail = response.json()
@@ -0,0 +1,156 @@
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_CONNECT_TIMEOUT = 5.0  # seconds
+DEFAULT_READ_TIMEOUT = 30.0  # seconds
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.3
+DEFAULT_BACKOFF_JITTER = 0.3
+
+# Only methods that are safe to repeat are retried; a POST that timed out may
+# already have created an order on the YDM side.
+RETRY_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = (429, 502, 503, 504)
+
+
+def build_retry(max_retries: int = DEFAULT_MAX_RETRIES) -> Retry:
+    """Retry policy for idempotent calls: exponential backoff with jitter."""
+    return Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=DEFAULT_BACKOFF_FACTOR,
+        backoff_jitter=DEFAULT_BACKOFF_JITTER,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=RETRY_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+class SessionPool:
+    """
+    Thread-safe registry of keep-alive ``requests.Session`` objects, one per
+    base URL, so every client talking to the same YDM server shares its
+    connection pool.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ):
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def _create(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            max_retries=build_retry(self.max_retries),
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def get(self, base_url: str) -> requests.Session:
+        session = self._sessions.get(base_url)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(base_url)
+                if session is None:
+                    session = self._create()
+                    self._sessions[base_url] = session
+        return session
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+def endpoint_label(url: str) -> str:
+    """
+    URL path with identifier segments collapsed, e.g.
+    ``/api/orders/YDM-123/comments/`` -> ``/api/orders/{id}/comments/``.
+    """
+    path = requests.utils.urlparse(url).path
+    return "/".join(
+        "{id}" if any(ch.isdigit() for ch in segment) else segment
+        for segment in path.split("/")
+    )
+
+
+class LatencyMetrics:
+    """
+    In-process per-endpoint call statistics (count, errors, total/max ms).
+
+    Keys are ``(method, endpoint_label(url))`` so per-order URLs do not grow
+    the table without bound.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    def record(self, method: str, path: str, elapsed_ms: float, error: bool) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(
+                (method, path),
+                {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0},
+            )
+            stats["count"] += 1
+            stats["errors"] += int(error)
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    def snapshot(self) -> Dict[Tuple[str, str], Dict[str, float]]:
+        with self._lock:
+            return {key: dict(value) for key, value in self._stats.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+default_pool = SessionPool()
+metrics = LatencyMetrics()
+
+# Optional hook called after every SDK request with
+# (method, url, status_code or None, elapsed_ms).
+RequestHook = Callable[[str, str, Optional[int], float], None]
+
+
+def timed_request(
+    session: requests.Session,
+    method: str,
+    url: str,
+    hook: Optional[RequestHook] = None,
+    **kwargs,
+) -> requests.Response:
+    """Issue a request on ``session`` and record its latency."""
+    path = endpoint_label(url)
+    started = time.perf_counter()
+    status_code = None
+    try:
+        response = session.request(method, url, **kwargs)
+        status_code = response.status_code
+        return response
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics.record(
+            method, path, elapsed_ms, status_code is None or status_code >= 400
+        )
+        if hook is not None:
+            hook(method, url, status_code, elapsed_ms)